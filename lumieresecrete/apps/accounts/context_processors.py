@@ -1,4 +1,4 @@
-from .models import UserSettings, UserRole
+from .user_cache import get_user_settings
 
 
 def user_preferences(request):
@@ -7,14 +7,8 @@ def user_preferences(request):
     page_size = None
     is_manager = False
     if request.user.is_authenticated:
-        # Cache user settings on the user instance to avoid repeated DB hits per request
-        settings_obj = getattr(request.user, "_cached_usersettings", None)
-        if settings_obj is None:
-            try:
-                settings_obj = request.user.usersettings
-            except UserSettings.DoesNotExist:
-                settings_obj = None
-            setattr(request.user, "_cached_usersettings", settings_obj)
+        # Настройки лежат в общем кеше (apps.accounts.user_cache) и запоминаются на объекте пользователя
+        settings_obj = get_user_settings(request.user)
         if settings_obj:
             style = settings_obj.favorite_icon or style
             theme = settings_obj.theme or theme
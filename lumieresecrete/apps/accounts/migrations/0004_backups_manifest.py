@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_usersettings_favorite_icon'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backups',
+            name='manifest',
+            field=models.JSONField(blank=True, db_column='Manifest', editable=False, null=True),
+        ),
+    ]
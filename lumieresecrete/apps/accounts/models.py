@@ -14,8 +14,9 @@ class User(AbstractUser):
         cached = getattr(self, '_cached_is_manager', None)
         if cached is not None:
             return cached
-        role_match = self.userrole_set.filter(role__role_name__iexact='менеджер').exists()
-        result = role_match
+        from .user_cache import user_is_manager
+
+        result = user_is_manager(self)
         self._cached_is_manager = result
         return result
 
@@ -95,5 +96,7 @@ class Backups(models.Model):
     file_path = models.TextField(db_column='FilePath', null=True)
     status = models.CharField(max_length=100, db_column='Status', null=True)
     user = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True, db_column='UserID')
+    # Режим, движок и по каждой таблице число строк, SHA-256 и куски (см. admin_tools.backup)
+    manifest = models.JSONField(null=True, blank=True, editable=False, db_column='Manifest')
     class Meta:
         db_table = 'Backups'
@@ -1,9 +1,12 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 
-from .models import SessionLog
+from .models import Role, SessionLog, User, UserRole, UserSettings
+from .user_cache import invalidate_all_users, invalidate_user
 
 
 @receiver(user_logged_in)
@@ -30,3 +33,27 @@ def handle_user_logout(sender, user, request, **kwargs):
             login_time=None,
             logout_time=timezone.now(),
         )
+
+
+def _invalidate(callback, *args):
+    # Сразу — чтобы текущая транзакция видела свои правки; после коммита — чтобы запрос,
+    # прочитавший старые строки до коммита, не оставил в кеше снятую роль на USER_CACHE_TIMEOUT
+    callback(*args)
+    transaction.on_commit(lambda: callback(*args))
+
+
+@receiver([post_save, post_delete], sender=UserSettings)
+@receiver([post_save, post_delete], sender=UserRole)
+def invalidate_cached_user(sender, instance, **kwargs):
+    _invalidate(invalidate_user, instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user_record(sender, instance, **kwargs):
+    # Ключи по id: новый пользователь не должен получить запись удалённого с тем же id
+    _invalidate(invalidate_user, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Role)
+def invalidate_cached_roles(sender, instance, **kwargs):
+    _invalidate(invalidate_all_users)
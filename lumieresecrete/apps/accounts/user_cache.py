@@ -0,0 +1,67 @@
+"""Общий кеш настроек и роли пользователя.
+
+Настройки (``UserSettings``) читаются на каждой странице: тема и иконка — в
+контекст-процессоре, размер страницы и формат дат — в каталоге. Роль
+менеджера проверяют ``User.is_manager`` и вьюхи отчётов. Раньше результат
+запоминался только на объекте пользователя и пропадал вместе с запросом.
+Теперь он лежит в пространстве ``accounts`` общего кеша
+(``apps.common.cache``). LRU процесса у этого пространства выключен: снятие
+роли должно сразу действовать во всех воркерах.
+
+Ключи пользователя сбрасываются сигналами ``User``, ``UserRole`` и
+``UserSettings``; правка ``Role`` сбрасывает всё пространство. Сброс
+повторяется после коммита: иначе запрос, успевший прочитать строки до
+коммита, вернул бы в кеш старое значение.
+"""
+from apps.common.cache import namespace
+
+USER_CACHE_TIMEOUT = 3600
+MANAGER_ROLE = 'менеджер'
+
+_users = namespace('accounts', local_timeout=0)
+
+
+def _settings_key(user_id):
+    return f"settings:{user_id}"
+
+
+def _manager_key(user_id):
+    return f"manager:{user_id}"
+
+
+def get_user_settings(user):
+    """``UserSettings`` пользователя или ``None``; в пределах запроса запоминается на ``user``."""
+    if not getattr(user, 'is_authenticated', False):
+        return None
+    if hasattr(user, '_cached_usersettings'):
+        return user._cached_usersettings
+
+    def load():
+        from .models import UserSettings
+
+        return UserSettings.objects.filter(user_id=user.pk).first()
+
+    settings_obj = _users.get_or_set(_settings_key(user.pk), load, USER_CACHE_TIMEOUT)
+    user._cached_usersettings = settings_obj
+    return settings_obj
+
+
+def user_is_manager(user):
+    if not user or not getattr(user, 'is_authenticated', False) or user.pk is None:
+        return False
+
+    def load():
+        from .models import UserRole
+
+        return UserRole.objects.filter(user_id=user.pk, role__role_name__iexact=MANAGER_ROLE).exists()
+
+    return _users.get_or_set(_manager_key(user.pk), load, USER_CACHE_TIMEOUT)
+
+
+def invalidate_user(user_id):
+    if user_id:
+        _users.delete_many([_settings_key(user_id), _manager_key(user_id)])
+
+
+def invalidate_all_users():
+    _users.invalidate()
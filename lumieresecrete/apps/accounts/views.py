@@ -12,16 +12,12 @@ from django.urls import reverse_lazy
 
 from .forms import UserRegistrationForm, UserLoginForm, UserSettingsForm
 from .models import UserSettings, Role, UserRole
+from .user_cache import user_is_manager
 from apps.orders.models import OrderNotification
 
 
 def _user_is_manager(user):
-    if not user or not getattr(user, 'is_authenticated', False):
-        return False
-    return UserRole.objects.filter(
-        user=user,
-        role__role_name__iexact='менеджер'
-    ).exists()
+    return user_is_manager(user)
 
 
 @require_http_methods(["GET", "POST"])
@@ -0,0 +1,477 @@
+"""Потоковое резервное копирование базы.
+
+Копия — файл ``backup-<время>-<режим>.jsonl.gz``: каждая таблица читается
+кусками по ``BACKUP_CHUNK_SIZE`` строк в порядке первичного ключа и пишется
+построчно в сжатый JSONL. В памяти держится один кусок, а не вся база, как
+у ``dumpdata``. Строки файла:
+
+    {"backup": {"id": <uuid>, "mode": "full" | "incremental", "base": <BackupID>, ...}}
+    {"table": "app.model"}                      — полная копия: очистить таблицу
+    {"chunk": "app.model", "after": a, "last": b, "rows": n}
+                                                — инкремент: заменить строки с a < pk <= b
+    {"model": "app.model", "fields": {...}}     — строка таблицы
+    {"end": {"rows": {"app.model": n, ...}}}
+
+В ``Backups.manifest`` записывается по каждой таблице число строк, SHA-256 и
+список кусков ``[after, last, rows, sha256]``. Инкрементальная копия берёт
+границы кусков из последней копии и пишет только куски с изменившейся
+контрольной суммой (обновления, вставки и удаления внутри диапазона), плюс
+всё, что появилось после её последнего ключа. Читать базу приходится
+целиком, но записывается и хранится только разница. Восстановление
+инкремента применяется поверх уже восстановленной базовой копии: если база
+сейчас в состоянии другой копии (последняя созданная или восстановленная
+запись ``Backups``), инкремент отклоняется, пока его не применят с ``force``.
+
+Восстановление идёт одной транзакцией пачками ``bulk_create`` с отложенной
+проверкой внешних ключей (``SET CONSTRAINTS ALL DEFERRED`` в PostgreSQL,
+``PRAGMA defer_foreign_keys`` в SQLite), без сигналов моделей. После
+вставки проверяются ключи и сдвигаются последовательности.
+
+По умолчанию (``BACKUP_ENGINE = 'jsonl'``) все копии — JSONL. При ``'auto'``
+полные копии на PostgreSQL делает ``pg_dump`` (формат custom), если в системе
+есть ``pg_dump``, ``pg_restore`` и ``psql``; восстанавливаются только данные,
+поверх текущей схемы. Инкременты всегда в JSONL.
+"""
+import datetime
+import decimal
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import uuid
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.duration import duration_iso_string
+
+DEFAULT_CHUNK_SIZE = 2000
+FORMAT_VERSION = 1
+JSONL_SUFFIX = '.jsonl.gz'
+PG_DUMP_SUFFIX = '.dump'
+# Журнал копий и очередь задач не копируются: восстановление не должно стирать само себя
+DEFAULT_EXCLUDE = ('accounts.backups', 'jobs.job', 'sessions.session')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def backup_dir():
+    directory = Path(_setting('BACKUP_DIR', Path(settings.BASE_DIR).parent / "backups"))
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def backup_models():
+    """Модели, чьи таблицы попадают в копию, в стабильном порядке."""
+    excluded = {label.lower() for label in _setting('BACKUP_EXCLUDE_MODELS', DEFAULT_EXCLUDE)}
+    models = []
+    for model in apps.get_models(include_auto_created=True):
+        opts = model._meta
+        if opts.proxy or not opts.managed or opts.swapped or opts.label_lower in excluded:
+            continue
+        models.append(model)
+    return sorted(models, key=lambda model: model._meta.label_lower)
+
+
+class _Encoder(json.JSONEncoder):
+    # DjangoJSONEncoder обрезает микросекунды до миллисекунд — для копии это потеря данных
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.date, datetime.time)):
+            return o.isoformat()
+        if isinstance(o, datetime.timedelta):
+            return duration_iso_string(o)
+        if isinstance(o, (decimal.Decimal, uuid.UUID)):
+            return str(o)
+        return super().default(o)
+
+
+def _dumps(obj):
+    return json.dumps(obj, cls=_Encoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def _columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _read_range(model, columns, after, last, limit=None):
+    queryset = model._base_manager.order_by('pk')
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+    if last is not None:
+        queryset = queryset.filter(pk__lte=last)
+    if limit is not None:
+        queryset = queryset[:limit]
+    return list(queryset.values_list(*columns))
+
+
+def _table_chunks(model, columns, chunk_size, base_chunks=None):
+    """Куски таблицы ``(after, last, rows)``: сначала по границам базовой копии, затем хвост."""
+    pk_index = columns.index(model._meta.pk.attname)
+    after = None
+    for base_after, base_last, _, _ in base_chunks or []:
+        yield base_after, base_last, _read_range(model, columns, base_after, base_last)
+        after = base_last
+    while True:
+        rows = _read_range(model, columns, after, None, limit=chunk_size)
+        if not rows:
+            return
+        last = rows[-1][pk_index]
+        yield after, last, rows
+        after = last
+
+
+def last_backup():
+    """Последняя успешная JSONL-копия — база для инкремента."""
+    from apps.accounts.models import Backups
+
+    for backup in Backups.objects.filter(status="success", manifest__isnull=False).order_by('-backup_id'):
+        if (backup.manifest or {}).get("engine") == "jsonl":
+            return backup
+    return None
+
+
+def _backup_id_by_uuid(value):
+    from apps.accounts.models import Backups
+
+    if not value:
+        return None
+    return Backups.objects.filter(status="success", manifest__id=value).values_list('backup_id', flat=True).first()
+
+
+def current_backup_id():
+    """Копия, в состоянии которой база: последняя созданная или восстановленная."""
+    from apps.accounts.models import Backups
+
+    latest = (
+        Backups.objects.filter(Q(status="success", manifest__isnull=False) | Q(type="restore"))
+        .order_by('-backup_id').first()
+    )
+    if latest is None:
+        return None
+    if latest.type == "restore":
+        return (latest.manifest or {}).get("backup_id")
+    return latest.backup_id
+
+
+def write_backup(fileobj, incremental=False, chunk_size=None, base=None):
+    """Пишет копию в бинарный поток ``fileobj`` (без сжатия) и возвращает манифест."""
+    chunk_size = chunk_size or _setting('BACKUP_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    if incremental and base is None:
+        base = last_backup()
+    base_tables = (base.manifest or {}).get("tables", {}) if incremental and base is not None else None
+    mode = "incremental" if base_tables is not None else "full"
+    manifest = {
+        "id": uuid.uuid4().hex,
+        "engine": "jsonl",
+        "format": FORMAT_VERSION,
+        "mode": mode,
+        "base": base.backup_id if base_tables is not None else None,
+        "created_at": timezone.now().isoformat(),
+        "chunk_size": chunk_size,
+        "tables": {},
+    }
+    written_rows = {}
+
+    def emit(obj):
+        fileobj.write(_dumps(obj).encode('utf-8'))
+        fileobj.write(b'\n')
+
+    emit({"backup": {key: manifest[key] for key in ("id", "format", "mode", "base", "created_at")}})
+    for model in backup_models():
+        label = model._meta.label_lower
+        columns = _columns(model)
+        base_chunks = (base_tables or {}).get(label, {}).get("chunks") if base_tables is not None else None
+        base_sums = {(after, last): sha for after, last, _, sha in base_chunks or []}
+        table_hash = hashlib.sha256()
+        chunks = []
+        total = written = 0
+        if mode == "full":
+            emit({"table": label})
+        for after, last, rows in _table_chunks(model, columns, chunk_size, base_chunks):
+            lines = [_dumps({"model": label, "fields": dict(zip(columns, row))}).encode('utf-8') for row in rows]
+            chunk_hash = hashlib.sha256()
+            for line in lines:
+                chunk_hash.update(line)
+                chunk_hash.update(b'\n')
+            digest = chunk_hash.hexdigest()
+            chunks.append([after, last, len(rows), digest])
+            table_hash.update(digest.encode('ascii'))
+            total += len(rows)
+            if mode == "incremental" and base_sums.get((after, last)) == digest:
+                continue
+            if mode == "incremental":
+                emit({"chunk": label, "after": after, "last": last, "rows": len(rows)})
+            for line in lines:
+                fileobj.write(line)
+                fileobj.write(b'\n')
+            written += len(rows)
+        manifest["tables"][label] = {
+            "rows": total,
+            "sha256": table_hash.hexdigest(),
+            "written_rows": written,
+            "chunks": chunks,
+        }
+        written_rows[label] = written
+    emit({"end": {"rows": written_rows}})
+    return manifest
+
+
+def pg_dump_available():
+    tools = ('pg_dump', 'pg_restore', 'psql')
+    return connection.vendor == 'postgresql' and all(shutil.which(tool) for tool in tools)
+
+
+def _pg_args():
+    db = settings.DATABASES['default']
+    args = []
+    for flag, key in (('--host', 'HOST'), ('--port', 'PORT'), ('--username', 'USER')):
+        if db.get(key):
+            args += [flag, str(db[key])]
+    env = dict(os.environ)
+    if db.get('PASSWORD'):
+        env['PGPASSWORD'] = str(db['PASSWORD'])
+    return args, env, db['NAME']
+
+
+def _excluded_tables():
+    excluded = {label.lower() for label in _setting('BACKUP_EXCLUDE_MODELS', DEFAULT_EXCLUDE)}
+    return [model._meta.db_table for model in apps.get_models() if model._meta.label_lower in excluded]
+
+
+def _pg_dump(path):
+    args, env, name = _pg_args()
+    excludes = [arg for table in _excluded_tables() for arg in ('--exclude-table', f'"{table}"')]
+    subprocess.run(['pg_dump', '--format=custom', '--no-owner', '--file', str(path), *args, *excludes, name], env=env, check=True)
+    return {
+        "id": uuid.uuid4().hex,
+        "engine": "pg_dump",
+        "format": FORMAT_VERSION,
+        "mode": "full",
+        "created_at": timezone.now().isoformat(),
+        "tables": {model._meta.label_lower: {"rows": model._base_manager.count()} for model in backup_models()},
+    }
+
+
+def _pg_restore(path):
+    """Данные дампа поверх текущей схемы одной транзакцией ``psql``.
+
+    ``pg_restore --clean`` удалял бы таблицы, а на ``Users`` и другие ссылаются
+    исключённые из дампа ``Jobs`` и ``Backups`` — PostgreSQL такой ``DROP`` не
+    выполнит. Поэтому схема не трогается: таблицы копии очищаются ``DELETE``
+    при отложенных внешних ключах, затем ``pg_restore --data-only`` (с
+    ``setval`` последовательностей) пишет данные в ту же транзакцию.
+    """
+    args, env, name = _pg_args()
+    tables = [model._meta.db_table for model in backup_models()]
+    prologue = ['BEGIN;', 'SET CONSTRAINTS ALL DEFERRED;']
+    prologue += [f'DELETE FROM {connection.ops.quote_name(table)};' for table in tables]
+    psql = subprocess.Popen(
+        ['psql', '--no-psqlrc', '--quiet', '--set', 'ON_ERROR_STOP=1', *args, '--dbname', name],
+        stdin=subprocess.PIPE, env=env,
+    )
+    try:
+        psql.stdin.write(('\n'.join(prologue) + '\n').encode('utf-8'))
+        dump = subprocess.Popen(
+            ['pg_restore', '--data-only', '--no-owner', '--file', '-', str(path)], stdout=subprocess.PIPE, env=env,
+        )
+        shutil.copyfileobj(dump.stdout, psql.stdin)
+        if dump.wait() != 0:
+            # Без COMMIT psql закроется, и транзакция откатится
+            raise subprocess.CalledProcessError(dump.returncode, 'pg_restore')
+        psql.stdin.write(b'COMMIT;\n')
+    finally:
+        psql.stdin.close()
+        code = psql.wait()
+    if code != 0:
+        raise subprocess.CalledProcessError(code, 'psql')
+    transaction.on_commit(cache.clear)
+    return {"engine": "pg_dump", "tables": len(tables)}
+
+
+def create_backup(incremental=False, engine=None, chunk_size=None, directory=None):
+    """Создаёт файл копии; возвращает ``(путь, манифест)``."""
+    engine = engine or _setting('BACKUP_ENGINE', 'jsonl')
+    directory = Path(directory) if directory else backup_dir()
+    stamp = timezone.now().strftime("%Y%m%d-%H%M%S-%f")
+    if engine == 'pg_dump' or (engine == 'auto' and not incremental and pg_dump_available()):
+        destination = directory / f"backup-{stamp}-full{PG_DUMP_SUFFIX}"
+        return destination, _pg_dump(destination)
+    destination = directory / f"backup-{stamp}-{'incremental' if incremental else 'full'}{JSONL_SUFFIX}"
+    partial = destination.with_name(destination.name + '.part')
+    try:
+        with gzip.open(partial, 'wb', compresslevel=6) as handle:
+            manifest = write_backup(handle, incremental=incremental, chunk_size=chunk_size)
+        final = destination.with_name(destination.name.replace('-incremental', f"-{manifest['mode']}"))
+        partial.replace(final)
+    finally:
+        partial.unlink(missing_ok=True)
+    return final, manifest
+
+
+def _defer_constraints():
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+        elif connection.vendor == 'sqlite':
+            cursor.execute('PRAGMA defer_foreign_keys = ON')
+
+
+class _Loader:
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.models = {model._meta.label_lower: model for model in backup_models()}
+        self.fields = {}
+        self.pending_model = None
+        self.pending = []
+        self.inserted = {}
+        self.touched = set()
+        self.skipped = 0
+
+    def _model(self, label):
+        model = self.models.get(label)
+        if model is not None and label not in self.fields:
+            self.fields[label] = {field.attname: field for field in model._meta.concrete_fields}
+        return model
+
+    def flush(self):
+        if self.pending:
+            self.pending_model._base_manager.bulk_create(self.pending, batch_size=self.batch_size)
+            label = self.pending_model._meta.label_lower
+            self.inserted[label] = self.inserted.get(label, 0) + len(self.pending)
+        self.pending = []
+
+    def clear_table(self, label):
+        self.flush()
+        model = self._model(label)
+        if model is not None:
+            model._base_manager.all()._raw_delete(connection.alias)
+            self.touched.add(model)
+
+    def clear_range(self, label, after, last):
+        self.flush()
+        model = self._model(label)
+        if model is None:
+            return
+        queryset = model._base_manager.all()
+        if after is not None:
+            queryset = queryset.filter(pk__gt=after)
+        if last is not None:
+            queryset = queryset.filter(pk__lte=last)
+        queryset._raw_delete(connection.alias)
+        self.touched.add(model)
+
+    def add(self, label, values):
+        model = self._model(label)
+        if model is None:
+            # Таблицы, которой больше нет в схеме, — пропускаем, но учитываем при сверке
+            self.skipped += 1
+            self.inserted[label] = self.inserted.get(label, 0) + 1
+            return
+        if model is not self.pending_model:
+            self.flush()
+            self.pending_model = model
+        fields = self.fields[label]
+        data = {}
+        for attname, value in values.items():
+            field = fields.get(attname)
+            if field is not None:
+                data[attname] = field.to_python(value) if value is not None else None
+        self.pending.append(model(**data))
+        self.touched.add(model)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+
+def _check_base(header, force):
+    if header.get("mode") != "incremental" or force:
+        return
+    current = current_backup_id()
+    if header.get("base") != current:
+        raise ValueError(
+            f"Инкремент собран от копии #{header.get('base')}, а база сейчас в состоянии "
+            f"{f'копии #{current}' if current else 'неизвестной копии'}. Сначала восстановите базовую копию."
+        )
+
+
+def read_backup(lines, batch_size=None, force=False):
+    """Восстанавливает копию из итератора строк JSONL; возвращает ``{"mode", "rows", "backup_id"}``.
+
+    Инкремент проверяется до первого изменения: его база должна совпадать с
+    ``current_backup_id()``, иначе ``ValueError`` (``force`` отключает проверку).
+    """
+    batch_size = batch_size or _setting('BACKUP_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    loader = _Loader(batch_size)
+    header = None
+    end = None
+    with transaction.atomic():
+        _defer_constraints()
+        for raw in lines:
+            if not raw.strip():
+                continue
+            obj = json.loads(raw)
+            if "model" in obj:
+                loader.add(obj["model"], obj["fields"])
+            elif "chunk" in obj:
+                loader.clear_range(obj["chunk"], obj.get("after"), obj.get("last"))
+            elif "table" in obj:
+                loader.clear_table(obj["table"])
+            elif "backup" in obj:
+                header = obj["backup"]
+                _check_base(header, force)
+            elif "end" in obj:
+                end = obj["end"]
+        loader.flush()
+        if header is None or end is None:
+            raise ValueError("Файл копии неполный: нет заголовка или завершающей строки.")
+        expected = {label: rows for label, rows in end.get("rows", {}).items() if rows}
+        if expected != loader.inserted:
+            raise ValueError("Число строк в копии не совпадает с заявленным — файл повреждён.")
+        tables = [model._meta.db_table for model in loader.touched]
+        connection.check_constraints(table_names=tables)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), list(loader.touched)):
+                cursor.execute(sql)
+        # Кэши витрины, корзин и промокодов собраны по старым данным
+        transaction.on_commit(cache.clear)
+    return {
+        "mode": header.get("mode"),
+        "base": header.get("base"),
+        "backup_id": _backup_id_by_uuid(header.get("id")),
+        "rows": loader.inserted,
+        "skipped": loader.skipped,
+    }
+
+
+def restore_backup(path, batch_size=None, force=False):
+    """Восстанавливает копию из файла: JSONL, дамп ``pg_dump`` или старый JSON ``dumpdata``."""
+    from apps.accounts.models import Backups
+
+    path = Path(path)
+    name = path.name.lower()
+    if name.endswith(PG_DUMP_SUFFIX):
+        summary = _pg_restore(path)
+        summary["backup_id"] = (
+            Backups.objects.filter(status="success", file_path=str(path)).values_list('backup_id', flat=True).first()
+        )
+        return summary
+    if name.endswith('.gz'):
+        with gzip.open(path, 'rt', encoding='utf-8') as handle:
+            return read_backup(handle, batch_size=batch_size, force=force)
+    with path.open('rb') as handle:
+        head = handle.read(512).lstrip()
+    if head.startswith(b'{"backup"'):
+        with path.open('r', encoding='utf-8') as handle:
+            return read_backup(handle, batch_size=batch_size, force=force)
+    from django.core.management import call_command
+
+    call_command("loaddata", str(path))
+    return {"engine": "loaddata"}
@@ -7,7 +7,15 @@ class BackupForm(forms.Form):
         initial=True,
         label="Подтверждаю создание резервной копии",
     )
+    incremental = forms.BooleanField(
+        required=False,
+        label="Только изменения с прошлой копии",
+    )
 
 
 class RestoreForm(forms.Form):
-    backup_file = forms.FileField(label="Файл резервной копии (.json)")
+    backup_file = forms.FileField(label="Файл резервной копии (.jsonl.gz, .dump или .json)")
+    force = forms.BooleanField(
+        required=False,
+        label="Применить инкремент, даже если база не в состоянии его базовой копии",
+    )
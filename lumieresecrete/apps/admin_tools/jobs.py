@@ -0,0 +1,27 @@
+from pathlib import Path
+
+from apps.jobs.registry import register
+
+from .utils import backup_database, log_action, restore_database
+
+
+@register('admin_tools.backup')
+def backup_job(job):
+    """``payload``: ``incremental`` — только изменения с прошлой копии."""
+    path = backup_database(job.created_by, incremental=bool(job.payload.get('incremental')))
+    if job.created_by:
+        log_action(job.created_by, "create_backup", {"path": path, "job": job.job_id})
+    return {"file": path}
+
+
+@register('admin_tools.restore')
+def restore_job(job):
+    """Восстановление из загруженного файла; ``payload``: ``path``, ``source`` (имя загрузки), ``force``."""
+    source = Path(job.payload['path'])
+    try:
+        summary = restore_database(str(source), user=job.created_by, force=bool(job.payload.get('force')))
+    finally:
+        source.unlink(missing_ok=True)
+    if job.created_by:
+        log_action(job.created_by, "restore_backup", {"source": job.payload.get('source'), "job": job.job_id})
+    return {"source": job.payload.get('source'), "rows": summary.get("rows")}
@@ -0,0 +1,134 @@
+import gzip
+import json
+import io
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from apps.accounts.models import Backups
+from apps.admin_tools import backup as backup_engine
+from apps.admin_tools.backup import restore_backup
+from apps.admin_tools.utils import backup_database, restore_database
+from apps.catalog.models import Category
+
+User = get_user_model()
+
+
+class StreamingBackupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        override = override_settings(BACKUP_DIR=self.directory.name, BACKUP_ENGINE='auto', BACKUP_CHUNK_SIZE=2)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.admin = User.objects.create_user(username='admin', password='secret')
+        for name in ('Кольца', 'Серьги', 'Браслеты', 'Подвески', 'Броши'):
+            Category.objects.create(name=name)
+
+    def _names(self):
+        return list(Category.objects.order_by('pk').values_list('pk', 'name'))
+
+    def _lines(self, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as handle:
+            return [json.loads(line) for line in handle]
+
+    def test_full_backup_round_trip(self):
+        expected = self._names()
+        path = backup_database(self.admin)
+        self.assertTrue(path.endswith('-full.jsonl.gz'))
+        backup = Backups.objects.get(file_path=path)
+        self.assertEqual((backup.type, backup.status), ('full-backup', 'success'))
+        table = backup.manifest['tables']['catalog.category']
+        self.assertEqual(table['rows'], 5)
+        self.assertEqual([chunk[2] for chunk in table['chunks']], [2, 2, 1])
+        self.assertEqual(len(table['sha256']), 64)
+        self.assertNotIn('accounts.backups', backup.manifest['tables'])
+
+        Category.objects.filter(name='Серьги').update(name='Изменено')
+        Category.objects.filter(name='Броши').delete()
+        Category.objects.create(name='Лишняя')
+        summary = restore_database(path, user=self.admin)
+        self.assertEqual(summary['rows']['catalog.category'], 5)
+        self.assertEqual(self._names(), expected)
+        self.assertGreater(Category.objects.create(name='Новая').pk, expected[-1][0])
+
+    def test_incremental_writes_only_changed_chunks(self):
+        backup_database(self.admin)
+        base = Backups.objects.get(type='full-backup')
+        Category.objects.filter(name='Браслеты').update(name='Браслеты на цепочке')
+        Category.objects.filter(name='Кольца').delete()
+        Category.objects.create(name='Запонки')
+        expected = self._names()
+
+        path = backup_database(self.admin, incremental=True)
+        backup = Backups.objects.get(file_path=path)
+        self.assertEqual((backup.type, backup.manifest['base']), ('incremental-backup', base.backup_id))
+        table = backup.manifest['tables']['catalog.category']
+        self.assertEqual(table['rows'], 5)
+        self.assertNotEqual(table['sha256'], base.manifest['tables']['catalog.category']['sha256'])
+        lines = self._lines(path)
+        chunks = [line for line in lines if line.get('chunk') == 'catalog.category']
+        # Первый кусок (удаление), второй (переименование) и хвост с новой строкой; третий кусок не менялся
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(sum(1 for line in lines if line.get('model') == 'catalog.category'), 4)
+        self.assertEqual(backup.manifest['tables']['catalog.product']['written_rows'], 0)
+
+        restore_database(base.file_path)
+        self.assertEqual(len(self._names()), 5)
+        restore_database(path)
+        self.assertEqual(self._names(), expected)
+
+    def test_incremental_requires_its_base_state(self):
+        backup_database(self.admin)
+        Category.objects.filter(name='Кольца').update(name='Кольца с камнем')
+        path = backup_database(self.admin, incremental=True)
+        Category.objects.filter(name='Подвески').update(name='Кулоны')
+        before = self._names()
+        # База сейчас в состоянии самого инкремента, а не его базовой копии
+        with self.assertRaisesMessage(ValueError, "Сначала восстановите базовую копию"):
+            restore_database(path)
+        self.assertEqual(self._names(), before)
+        self.assertFalse(Backups.objects.filter(type='restore').exists())
+        summary = restore_database(path, force=True)
+        self.assertEqual(summary['backup_id'], Backups.objects.get(file_path=path, status='success').backup_id)
+        self.assertEqual(self._names(), before)
+
+    def test_incremental_without_base_falls_back_to_full(self):
+        path = backup_database(incremental=True)
+        self.assertTrue(path.endswith('-full.jsonl.gz'))
+        self.assertEqual(Backups.objects.get(file_path=path).manifest['mode'], 'full')
+
+    def test_truncated_file_is_rejected_without_changes(self):
+        path = backup_database()
+        lines = self._lines(path)[:-1]
+        with gzip.open(path, 'wt', encoding='utf-8') as handle:
+            handle.writelines(json.dumps(line, ensure_ascii=False) + '\n' for line in lines)
+        Category.objects.create(name='Сохранится')
+        before = self._names()
+        with self.assertRaises(ValueError):
+            restore_backup(path)
+        self.assertEqual(self._names(), before)
+
+
+class PgRestoreTests(TestCase):
+    def test_restores_data_only_over_current_schema(self):
+        fed = io.BytesIO()
+        psql = mock.Mock(stdin=mock.Mock(write=fed.write, close=lambda: None))
+        psql.wait.return_value = 0
+        dump = mock.Mock(stdout=io.BytesIO(b'COPY "Categories" FROM stdin;\n'))
+        dump.wait.return_value = 0
+        dump.returncode = 0
+        with mock.patch.object(backup_engine.subprocess, 'Popen', side_effect=[psql, dump]) as popen:
+            restore_backup('/tmp/backup-full.dump')
+        pg_restore_args = popen.call_args_list[1].args[0]
+        self.assertIn('--data-only', pg_restore_args)
+        self.assertNotIn('--clean', pg_restore_args)
+        script = fed.getvalue().decode('utf-8')
+        self.assertTrue(script.startswith('BEGIN;\nSET CONSTRAINTS ALL DEFERRED;\n'))
+        self.assertIn('DELETE FROM "Categories";', script)
+        self.assertNotIn('"Backups"', script)
+        self.assertTrue(script.endswith('COPY "Categories" FROM stdin;\nCOMMIT;\n'))
@@ -1,49 +1,48 @@
-import io
-from pathlib import Path
-
-from django.conf import settings
-from django.core.management import call_command
 from django.utils import timezone
 
 from apps.auditlog.utils import log_user_action
 from apps.accounts.models import Backups
 
+from .backup import create_backup, restore_backup
+
 
-def backup_database(user=None):
-    backup_dir = Path(settings.BASE_DIR).parent / "backups"
-    backup_dir.mkdir(parents=True, exist_ok=True)
-    filename = timezone.now().strftime("backup-%Y%m%d-%H%M%S.json")
-    destination = backup_dir / filename
-    with destination.open("w", encoding="utf-8") as handle:
-        call_command(
-            "dumpdata",
-            "--natural-foreign",
-            "--natural-primary",
-            "--indent",
-            "2",
-            stdout=handle,
+def backup_database(user=None, incremental=False):
+    """Создаёт копию (см. ``apps.admin_tools.backup``) и запись ``Backups`` с манифестом."""
+    try:
+        destination, manifest = create_backup(incremental=incremental)
+    except Exception as exc:
+        Backups.objects.create(
+            created_at=timezone.now().isoformat(),
+            type="incremental-backup" if incremental else "full-backup",
+            status="failed",
+            manifest={"error": str(exc)},
+            user=user,
         )
+        raise
     Backups.objects.create(
         created_at=timezone.now().isoformat(),
-        type="manual-backup",
+        type=f"{manifest['mode']}-backup",
         file_path=str(destination),
         status="success",
+        manifest=manifest,
         user=user,
     )
     if user:
-        log_user_action(user, "dumpdata", {"file": str(destination)})
+        log_user_action(user, "backup", {"file": str(destination), "mode": manifest["mode"], "engine": manifest["engine"]})
     return str(destination)
 
 
-def restore_database(backup_file, user=None):
-    call_command("loaddata", backup_file)
+def restore_database(backup_file, user=None, force=False):
+    summary = restore_backup(backup_file, force=force)
     Backups.objects.create(
         created_at=timezone.now().isoformat(),
         type="restore",
         file_path=str(backup_file),
         status="restored",
+        manifest=summary,
         user=user,
     )
+    return summary
 
 
 def log_action(user, action, metadata=None):
@@ -1,15 +1,24 @@
 import tempfile
-from pathlib import Path
 
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.core.files.uploadedfile import UploadedFile
-from django.http import FileResponse, HttpResponseRedirect
-from django.shortcuts import render
-from django.urls import reverse
+from django.shortcuts import redirect, render
 
+from apps.auditlog.buffer import audit_stats
+from apps.jobs.models import Job
+from apps.jobs.services import enqueue, results_dir
+
+from .backup import JSONL_SUFFIX, PG_DUMP_SUFFIX
 from .forms import BackupForm, RestoreForm
-from .utils import backup_database, log_action, restore_database
+
+
+def _upload_suffix(name):
+    name = (name or "").lower()
+    for suffix in (JSONL_SUFFIX, PG_DUMP_SUFFIX):
+        if name.endswith(suffix):
+            return suffix
+    return ".json"
 
 
 @staff_member_required
@@ -19,30 +28,30 @@ def maintenance_view(request):
 
     if request.method == "POST":
         if "backup" in request.POST and backup_form.is_valid():
-            backup_path = backup_database(request.user)
-            log_action(request.user, "create_backup", {"path": backup_path})
-            messages.success(request, "Резервная копия успешно создана.")
-            return FileResponse(open(backup_path, "rb"), as_attachment=True, filename=Path(backup_path).name)
+            # Копия идёт минутами, поэтому выполняется воркером, а страница задачи ждёт результата
+            payload = {"incremental": backup_form.cleaned_data["incremental"]}
+            job = enqueue("admin_tools.backup", payload, user=request.user)
+            messages.info(request, "Резервная копия создаётся в фоне.")
+            return redirect("jobs:job_status", job_id=job.job_id)
 
         if "restore" in request.POST and restore_form.is_valid():
             uploaded: UploadedFile = restore_form.cleaned_data["backup_file"]
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".json") as tmp:
+            upload_dir = results_dir() / "uploads"
+            upload_dir.mkdir(parents=True, exist_ok=True)
+            # Формат копии restore_backup определяет по расширению
+            with tempfile.NamedTemporaryFile(delete=False, suffix=_upload_suffix(uploaded.name), dir=upload_dir) as tmp:
                 for chunk in uploaded.chunks():
                     tmp.write(chunk)
                 tmp_path = tmp.name
-            try:
-                restore_database(tmp_path, user=request.user)
-            except Exception as exc:
-                messages.error(request, f"Не удалось восстановить данные: {exc}")
-            else:
-                log_action(request.user, "restore_backup", {"source": uploaded.name})
-                messages.success(request, "Данные успешно восстановлены из резервной копии.")
-            finally:
-                Path(tmp_path).unlink(missing_ok=True)
-            return HttpResponseRedirect(reverse("admin_tools:maintenance"))
+            payload = {"path": tmp_path, "source": uploaded.name, "force": restore_form.cleaned_data["force"]}
+            job = enqueue("admin_tools.restore", payload, user=request.user)
+            messages.info(request, "Восстановление поставлено в очередь.")
+            return redirect("jobs:job_status", job_id=job.job_id)
 
     context = {
         "backup_form": backup_form,
         "restore_form": restore_form,
+        "audit_stats": audit_stats(),
+        "recent_jobs": Job.objects.filter(kind__startswith="admin_tools.").order_by("-job_id")[:5],
     }
     return render(request, "admin_tools/maintenance.html", context)
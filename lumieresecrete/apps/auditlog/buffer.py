@@ -0,0 +1,173 @@
+"""Буферизация событий аудита.
+
+Сигналы и middleware не пишут в базу сами, а складывают несохранённые строки
+``AuditLog`` и ``accounts.AuditLog`` в буфер. Внутри запроса буфер живёт до
+конца ответа и сбрасывается одним ``bulk_create`` на таблицу; вне запроса
+(команды, shell) события пишутся сразу. События из транзакции попадают в буфер
+только после её коммита — откат транзакции отменяет и их аудит.
+
+При ``AUDITLOG_ASYNC = True`` сброс отдаёт события фоновому потоку через
+ограниченную очередь. Если очередь заполнена, политика ``AUDITLOG_OVERFLOW``
+решает, что делать: ``drop`` — отбросить событие, ``block`` — подождать
+``AUDITLOG_BLOCK_TIMEOUT`` секунд (backpressure) и отбросить только после этого.
+"""
+import atexit
+import logging
+import queue
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 5000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_BLOCK_TIMEOUT = 0.5
+
+_state = threading.local()
+_stats_lock = threading.Lock()
+_stats = {"queued": 0, "flushed": 0, "dropped": 0, "failed": 0}
+
+
+def _bump(counter, amount=1):
+    if amount:
+        with _stats_lock:
+            _stats[counter] += amount
+
+
+def audit_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    writer = _writer
+    stats["queue_depth"] = writer.queue.qsize() if writer is not None else 0
+    return stats
+
+
+def reset_audit_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def write_events(events):
+    """Синхронно пишет события: один ``bulk_create`` на каждую модель."""
+    by_model = defaultdict(list)
+    for obj in events:
+        by_model[type(obj)].append(obj)
+    for model, objs in by_model.items():
+        try:
+            model.objects.bulk_create(objs, batch_size=DEFAULT_BATCH_SIZE)
+            _bump("flushed", len(objs))
+        except Exception:
+            logger.exception("Не удалось записать %s событий аудита в %s", len(objs), model._meta.db_table)
+            _bump("failed", len(objs))
+
+
+class _BackgroundWriter:
+    def __init__(self, maxsize, overflow, block_timeout, batch_size):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.batch_size = batch_size
+        self.thread = threading.Thread(target=self._run, name="auditlog-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, events):
+        for obj in events:
+            try:
+                if self.overflow == 'block':
+                    self.queue.put(obj, timeout=self.block_timeout)
+                else:
+                    self.queue.put_nowait(obj)
+            except queue.Full:
+                _bump("dropped")
+
+    def _drain(self, first):
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._drain(self.queue.get())
+            stop = None in batch
+            close_old_connections()
+            write_events([obj for obj in batch if obj is not None])
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                return
+
+    def stop(self, timeout=5):
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self.thread.join(timeout)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    if not getattr(settings, 'AUDITLOG_ASYNC', False):
+        return None
+    with _writer_lock:
+        if _writer is None:
+            _writer = _BackgroundWriter(
+                maxsize=getattr(settings, 'AUDITLOG_QUEUE_SIZE', DEFAULT_QUEUE_SIZE),
+                overflow=getattr(settings, 'AUDITLOG_OVERFLOW', 'drop'),
+                block_timeout=getattr(settings, 'AUDITLOG_BLOCK_TIMEOUT', DEFAULT_BLOCK_TIMEOUT),
+                batch_size=getattr(settings, 'AUDITLOG_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+            )
+            atexit.register(_writer.stop)
+        return _writer
+
+
+def dispatch(events):
+    """Отправляет готовую пачку в фоновый поток или пишет её сразу."""
+    if not events:
+        return
+    writer = _get_writer()
+    if writer is not None:
+        writer.submit(events)
+    else:
+        write_events(events)
+
+
+def begin_request_buffer():
+    _state.buffer = []
+
+
+def flush_request_buffer():
+    events = getattr(_state, "buffer", None)
+    _state.buffer = None
+    if events:
+        dispatch(events)
+
+
+def _deliver(events):
+    buffer = getattr(_state, "buffer", None)
+    if buffer is not None:
+        buffer.extend(events)
+    else:
+        dispatch(events)
+
+
+def record(*events):
+    """Ставит несохранённые объекты журнала в очередь на запись."""
+    events = [obj for obj in events if obj is not None]
+    if not events:
+        return
+    _bump("queued", len(events))
+    # Вне транзакции колбэк выполняется сразу; внутри — после коммита, а при откате savepoint отбрасывается
+    transaction.on_commit(lambda: _deliver(events))
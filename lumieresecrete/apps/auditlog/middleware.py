@@ -1,5 +1,6 @@
 from django.utils.deprecation import MiddlewareMixin
 
+from .buffer import begin_request_buffer, flush_request_buffer, record
 from .models import AuditLog
 from .utils import (
     clear_context,
@@ -23,6 +24,7 @@ class AuditLogMiddleware(MiddlewareMixin):
         else:
             ip = request.META.get("REMOTE_ADDR")
         set_request_context(path=request.path, method=request.method, ip=ip)
+        begin_request_buffer()
 
     def process_response(self, request, response):
         try:
@@ -30,7 +32,7 @@ class AuditLogMiddleware(MiddlewareMixin):
                 return response
             if request.method in ("POST", "PUT", "PATCH", "DELETE"):
                 user = get_current_user()
-                AuditLog.objects.create(
+                record(AuditLog(
                     user=user,
                     action=AuditLog.ACTION_REQUEST,
                     event_type=AuditLog.EVENT_REQUEST,
@@ -41,9 +43,11 @@ class AuditLogMiddleware(MiddlewareMixin):
                         "status_code": response.status_code,
                         "user_agent": request.META.get("HTTP_USER_AGENT"),
                     },
-                )
+                ))
             return response
         finally:
+            # Все события запроса уходят одной пачкой на таблицу
+            flush_request_buffer()
             clear_context()
 
     def process_exception(self, request, exception):
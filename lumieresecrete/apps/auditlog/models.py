@@ -9,6 +9,7 @@ class AuditLog(models.Model):
     ACTION_CREATE = "create"
     ACTION_UPDATE = "update"
     ACTION_DELETE = "delete"
+    ACTION_IMPORT = "import"
     ACTION_REQUEST = "request"
 
     EVENT_CHOICES = (
@@ -1,10 +1,14 @@
+import copy
 import json
+from functools import lru_cache
 
 from django.apps import apps
-from django.db.models.signals import post_delete, post_save, pre_save
-from django.forms.models import model_to_dict
+from django.conf import settings
+from django.db import models
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
 from django.utils import timezone
 
+from .buffer import record
 from .models import AuditLog
 from .utils import get_current_user, get_request_metadata
 
@@ -23,21 +27,94 @@ def _is_project_model(model):
     return True
 
 
-def _serialize_instance(instance):
+def _identity(value):
+    return value
+
+
+def _to_string(value):
+    return str(value)
+
+
+def _to_iso(value):
+    return value.isoformat()
+
+
+def _file_name(value):
+    return getattr(value, "name", None) or None
+
+
+_JSON_NATIVE = (
+    models.AutoField, models.BigAutoField, models.SmallAutoField, models.IntegerField,
+    models.FloatField, models.BooleanField, models.CharField, models.TextField, models.JSONField,
+    models.ForeignKey, models.OneToOneField,
+)
+
+
+def _converter_for(field):
+    if isinstance(field, models.FileField):
+        return _file_name
+    if isinstance(field, (models.DateTimeField, models.DateField, models.TimeField)):
+        return _to_iso
+    if isinstance(field, _JSON_NATIVE):
+        return _identity
+    return _to_string
+
+
+@lru_cache(maxsize=None)
+def _field_serializers(model):
+    """Один раз на модель: ``(имя, attname, конвертер)`` для полей, которые попадают в аудит."""
+    return tuple(
+        (field.name, field.attname, _converter_for(field))
+        for field in model._meta.concrete_fields
+        if getattr(field, "editable", False)
+    )
+
+
+def _convert(convert, value):
+    if value is None:
+        return None
     try:
-        data = model_to_dict(instance)
+        return convert(value)
     except Exception:
-        data = {}
-        for field in instance._meta.fields:
-            data[field.name] = getattr(instance, field.name, None)
-    for key, value in data.items():
-        try:
-            json.dumps(value, ensure_ascii=False)
-        except (TypeError, ValueError):
-            data[key] = str(value)
+        return str(value)
+
+
+def _serialize_instance(instance):
+    data = {}
+    values = instance.__dict__
+    for name, attname, convert in _field_serializers(type(instance)):
+        if attname in values:
+            data[name] = _convert(convert, values[attname])
     return data
 
 
+def _snapshot(instance):
+    values = instance.__dict__
+    snapshot = {}
+    for _name, attname, _convert in _field_serializers(type(instance)):
+        if attname in values:
+            value = values[attname]
+            # JSON-поля меняют на месте — без копии такое изменение не попало бы в diff
+            snapshot[attname] = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+    return snapshot
+
+
+def _diff(instance):
+    """Изменённые с момента загрузки поля: ``(old, new)`` в сериализованном виде."""
+    before = getattr(instance, "_audit_snapshot", None)
+    if before is None:
+        return None, None
+    values = instance.__dict__
+    old_data, new_data = {}, {}
+    for name, attname, convert in _field_serializers(type(instance)):
+        if attname not in values or attname not in before:
+            continue
+        if values[attname] != before[attname]:
+            old_data[name] = _convert(convert, before[attname])
+            new_data[name] = _convert(convert, values[attname])
+    return old_data, new_data
+
+
 def _legacy_fragment(data):
     if not data:
         return None
@@ -48,26 +125,27 @@ def _legacy_fragment(data):
     return payload[:255]
 
 
-def _log_change(instance, action, old_data=None, new_data=None):
+def _record_change(model, object_pk, action, payload, old_data=None):
     user = get_current_user()
     meta = get_request_metadata()
-    payload = new_data or _serialize_instance(instance)
-    AuditLog.objects.create(
+    entry = AuditLog(
         event_type=AuditLog.EVENT_DB,
         action=action,
-        app_label=instance._meta.app_label,
-        model_name=instance.__class__.__name__,
-        object_pk=str(getattr(instance, instance._meta.pk.attname, "")),
+        app_label=model._meta.app_label,
+        model_name=model.__name__,
+        object_pk=str(object_pk)[:64],
         user=user,
-        path=meta.get("path"),
-        method=meta.get("method"),
+        path=meta.get("path") or "",
+        method=meta.get("method") or "",
         ip_address=meta.get("ip"),
         changes=payload,
+        metadata={"old": old_data} if old_data and action == AuditLog.ACTION_UPDATE else None,
     )
+    legacy_entry = None
     try:
         from apps.accounts.models import AuditLog as LegacyAuditLog
-        LegacyAuditLog.objects.create(
-            table_name=instance._meta.db_table[:255],
+        legacy_entry = LegacyAuditLog(
+            table_name=model._meta.db_table[:255],
             operation=action[:255] if isinstance(action, str) else str(action)[:255],
             datetime=timezone.now(),
             old_value=_legacy_fragment(old_data),
@@ -77,9 +155,45 @@ def _log_change(instance, action, old_data=None, new_data=None):
         )
     except Exception:
         pass
+    record(entry, legacy_entry)
+
+
+def _log_change(instance, action, old_data=None, new_data=None):
+    payload = new_data or _serialize_instance(instance)
+    object_pk = getattr(instance, instance._meta.pk.attname, "")
+    _record_change(instance.__class__, object_pk, action, payload, old_data)
+
+
+def log_bulk_create(instances, object_pk=""):
+    """Одно событие аудита на пачку строк из ``bulk_create``, который не шлёт сигналов."""
+    instances = list(instances)
+    if not instances:
+        return
+    model = type(instances[0])
+    payload = {
+        "count": len(instances),
+        "objects": [_serialize_instance(instance) for instance in instances],
+    }
+    _record_change(model, object_pk, AuditLog.ACTION_CREATE, payload)
+    for instance in instances:
+        instance._audit_snapshot = _snapshot(instance)
+
+
+def log_bulk_summary(model, action, summary, object_pk=""):
+    """Одно сводное событие на массовую операцию, когда перечислять строки слишком дорого."""
+    _record_change(model, object_pk, action, summary)
+
+
+def _capture_mode():
+    return getattr(settings, "AUDITLOG_CAPTURE_MODE", "diff")
+
+
+def _capture_post_init(sender, instance, **kwargs):
+    instance._audit_snapshot = _snapshot(instance)
 
 
 def _capture_pre_save(sender, instance, **kwargs):
+    # Режим full: прежнее поведение с перечитыванием строки перед сохранением
     if sender is AuditLog:
         return
     pk = getattr(instance, instance._meta.pk.attname, None)
@@ -96,10 +210,19 @@ def _capture_pre_save(sender, instance, **kwargs):
 def _handle_post_save(sender, instance, created, **kwargs):
     if sender is AuditLog:
         return
-    action = AuditLog.ACTION_CREATE if created else AuditLog.ACTION_UPDATE
-    key = (sender, getattr(instance, instance._meta.pk.attname, None))
-    old_data = _PRE_SAVE_STATE.pop(key, None)
-    _log_change(instance, action, old_data=old_data, new_data=_serialize_instance(instance))
+    if created:
+        _log_change(instance, AuditLog.ACTION_CREATE, new_data=_serialize_instance(instance))
+    elif _capture_mode() == "full":
+        key = (sender, getattr(instance, instance._meta.pk.attname, None))
+        old_data = _PRE_SAVE_STATE.pop(key, None)
+        _log_change(instance, AuditLog.ACTION_UPDATE, old_data=old_data, new_data=_serialize_instance(instance))
+    else:
+        old_data, new_data = _diff(instance)
+        if new_data is None:
+            _log_change(instance, AuditLog.ACTION_UPDATE, new_data=_serialize_instance(instance))
+        elif new_data:
+            _log_change(instance, AuditLog.ACTION_UPDATE, old_data=old_data, new_data=new_data)
+    instance._audit_snapshot = _snapshot(instance)
 
 
 def _handle_post_delete(sender, instance, **kwargs):
@@ -113,7 +236,10 @@ def register_audit_signals():
     for model in apps.get_models():
         if not _is_project_model(model):
             continue
-        pre_save.connect(_capture_pre_save, sender=model, weak=False)
+        if _capture_mode() == "full":
+            pre_save.connect(_capture_pre_save, sender=model, weak=False)
+        else:
+            post_init.connect(_capture_post_init, sender=model, weak=False)
         post_save.connect(_handle_post_save, sender=model, weak=False)
         post_delete.connect(_handle_post_delete, sender=model, weak=False)
 
@@ -0,0 +1,77 @@
+import threading
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase
+
+from apps.accounts.models import AuditLog as LegacyAuditLog
+from apps.auditlog import buffer
+from apps.auditlog.models import AuditLog
+from apps.catalog.models import Category
+from apps.orders.models import Status
+
+
+class AuditBufferTests(TestCase):
+    def setUp(self):
+        buffer.reset_audit_stats()
+
+    def tearDown(self):
+        buffer.flush_request_buffer()
+
+    def test_request_events_are_flushed_in_one_batch_per_table(self):
+        buffer.begin_request_buffer()
+        with self.captureOnCommitCallbacks(execute=True):
+            for name in ('Кольца', 'Серьги', 'Браслеты'):
+                Category.objects.create(name=name)
+        self.assertFalse(AuditLog.objects.filter(model_name='Category').exists())
+        with self.assertNumQueries(2):
+            buffer.flush_request_buffer()
+        self.assertEqual(AuditLog.objects.filter(model_name='Category').count(), 3)
+        self.assertEqual(LegacyAuditLog.objects.filter(table_name='Categories').count(), 3)
+        self.assertEqual(buffer.audit_stats()['flushed'], 6)
+
+    def test_rolled_back_savepoint_drops_its_events(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Кольца')
+            try:
+                with transaction.atomic():
+                    Category.objects.create(name='Черновик')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        names = [entry.changes['name'] for entry in AuditLog.objects.filter(model_name='Category')]
+        self.assertEqual(names, ['Кольца'])
+
+    def test_background_writer_drops_when_queue_is_full(self):
+        release = threading.Event()
+        with mock.patch.object(buffer, 'write_events', side_effect=lambda events: release.wait(5)):
+            writer = buffer._BackgroundWriter(maxsize=1, overflow='drop', block_timeout=0, batch_size=10)
+            writer.submit([AuditLog(action='request')])
+            # Поток забрал первое событие и «пишет» его; второе занимает очередь, третье лишнее
+            for _ in range(50):
+                if writer.queue.empty():
+                    break
+                threading.Event().wait(0.01)
+            writer.submit([AuditLog(action='request'), AuditLog(action='request')])
+            self.assertEqual(buffer.audit_stats()['dropped'], 1)
+            release.set()
+            writer.stop()
+
+
+class AuditDiffCaptureTests(TestCase):
+    def test_update_records_only_changed_fields_without_reselect(self):
+        status = Status.objects.create(name_status='Создан')
+        status = Status.objects.get(pk=status.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            status.name_status = 'Оплачен'
+            with self.assertNumQueries(1):
+                status.save()
+        entry = AuditLog.objects.get(model_name='Status', action=AuditLog.ACTION_UPDATE)
+        self.assertEqual(entry.changes, {'name_status': 'Оплачен'})
+        self.assertEqual(entry.metadata, {'old': {'name_status': 'Создан'}})
+
+    def test_unchanged_save_is_not_logged(self):
+        status = Status.objects.create(name_status='Отменён')
+        with self.captureOnCommitCallbacks(execute=True):
+            status.save()
+        self.assertFalse(AuditLog.objects.filter(model_name='Status', action=AuditLog.ACTION_UPDATE).exists())
@@ -2,6 +2,7 @@ from threading import local
 
 from django.utils import timezone
 
+from .buffer import record
 from .models import AuditLog
 
 _state = local()
@@ -36,7 +37,7 @@ def get_request_metadata():
 
 
 def log_user_action(user, action, metadata=None, path=None, method=None, ip=None):
-    AuditLog.objects.create(
+    record(AuditLog(
         user=user,
         action=action,
         event_type=AuditLog.EVENT_REQUEST,
@@ -45,4 +46,4 @@ def log_user_action(user, action, metadata=None, path=None, method=None, ip=None
         ip_address=ip or getattr(_state, "ip", None),
         metadata=metadata or {},
         created_at=timezone.now(),
-    )
+    ))
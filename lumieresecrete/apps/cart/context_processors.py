@@ -0,0 +1,17 @@
+from django.utils.functional import SimpleLazyObject
+
+from .snapshot import snapshot_totals
+from .views import _cart_items_and_total
+
+
+def cart_badge(request):
+    """Число товаров в корзине для шапки; считается по снимку и только если шаблон его выводит."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {"cart_count": 0}
+
+    def _count():
+        items, _ = _cart_items_and_total(user)
+        return snapshot_totals(items)[1]
+
+    return {"cart_count": SimpleLazyObject(_count)}
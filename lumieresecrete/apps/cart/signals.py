@@ -0,0 +1,99 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.catalog.models import Favorite, Product, ProductImage
+from apps.catalog.signals import catalog_imported
+from apps.common.oncommit import coalesce_on_commit
+from apps.orders.models import PromoCode
+from apps.product_variants.models import Colors, ProductVariant, ProductVariantImage, Sizes
+from apps.stores.models import Store
+
+from . import snapshot as cart_snapshot
+from .models import CartItem
+from .views import _build_cart_line, _reprice_cart_line
+
+
+@receiver(post_save, sender=CartItem)
+def patch_cart_snapshot_line(sender, instance, **kwargs):
+    user_id, item_id = instance.user_id, instance.pk
+    variant_id, price, quantity = instance.product_variant_id, instance.price, instance.quantity
+
+    def update_line(line):
+        # Смена количества или цены не требует запросов; другой вариант — собираем строку заново
+        if line.get("variant_id") != variant_id:
+            return None
+        return _reprice_cart_line(line, price, quantity)
+
+    transaction.on_commit(lambda: cart_snapshot.upsert_line(
+        user_id, item_id, lambda: _build_cart_line(user_id, item_id), update_line,
+    ))
+
+
+@receiver(post_delete, sender=CartItem)
+def drop_cart_snapshot_line(sender, instance, **kwargs):
+    user_id, item_id = instance.user_id, instance.pk
+    transaction.on_commit(lambda: cart_snapshot.remove_line(user_id, item_id))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def patch_cart_snapshot_favorite(sender, instance, signal, **kwargs):
+    user_id, product_id, is_favorite = instance.user_id, instance.product_id, signal is post_save
+    transaction.on_commit(lambda: cart_snapshot.mark_favorite(user_id, product_id, is_favorite))
+
+
+def _invalidate_carts_with(field, ids):
+    """Сбрасывает после коммита снимки корзин, где есть позиции с ``field`` из ``ids``."""
+    def invalidate(ids):
+        user_ids = CartItem.objects.filter(**{f"{field}__in": ids}).values_list('user_id', flat=True).distinct()
+        cart_snapshot.invalidate_snapshots(user_ids)
+
+    coalesce_on_commit(f"cart.snapshots.{field}", {pk for pk in ids if pk}, invalidate)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cart_snapshots(sender, instance, **kwargs):
+    _invalidate_carts_with('product_variant__product_id', [instance.pk])
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def invalidate_variant_cart_snapshots(sender, instance, update_fields=None, **kwargs):
+    # Остаток в строки корзины не попадает, поэтому резервирование и пополнение склада снимки не трогают
+    if update_fields is not None and set(update_fields) <= {'quantity'}:
+        return
+    _invalidate_carts_with('product_variant_id', [instance.pk])
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_product_image_cart_snapshots(sender, instance, **kwargs):
+    _invalidate_carts_with('product_variant__product_id', [instance.product_id])
+
+
+@receiver(post_save, sender=ProductVariantImage)
+@receiver(post_delete, sender=ProductVariantImage)
+def invalidate_variant_image_cart_snapshots(sender, instance, **kwargs):
+    _invalidate_carts_with('product_variant_id', [instance.variant_id])
+
+
+@receiver(post_save, sender=Colors)
+@receiver(post_save, sender=Sizes)
+@receiver(post_save, sender=Store)
+def invalidate_dictionary_cart_snapshots(sender, instance, **kwargs):
+    field = {Colors: 'product_variant__color_id', Sizes: 'product_variant__size_id', Store: 'product_variant__store_id'}[sender]
+    _invalidate_carts_with(field, [instance.pk])
+
+
+@receiver(post_save, sender=PromoCode)
+@receiver(post_delete, sender=PromoCode)
+def invalidate_cart_promo_states(sender, instance, **kwargs):
+    # Состояние промокода кешируется рядом со снимками; правки промокодов редки, сбрасываем всё
+    transaction.on_commit(cart_snapshot.invalidate_all_snapshots)
+
+
+@receiver(catalog_imported)
+def invalidate_cart_snapshots_after_import(sender, product_ids, **kwargs):
+    _invalidate_carts_with('product_variant__product_id', product_ids)
@@ -0,0 +1,157 @@
+"""Кешированный снимок корзины пользователя.
+
+Снимок — список строк корзины в том виде, в каком их показывают страницы
+корзины и оформления заказа, плюс номер версии. Он лежит в кеше под ключом
+пользователя, и при чтении корзины запросы к базе не нужны.
+
+Каждое изменение корзины атомарно увеличивает счётчик версии пользователя
+(``cache.incr``). Запись в кеше действительна, только пока её версия совпадает
+со счётчиком. Добавление, изменение и удаление строк (сигналы ``CartItem``)
+правят снимок на месте и переводят его на новую версию. Если за это время
+снимок успел поменять кто-то другой, запись удаляется, и следующее чтение
+пересобирает корзину целиком. Правки каталога (товары, варианты, фото,
+цвета, размеры, бутики) поднимают версию только тех пользователей, в чьих
+корзинах есть затронутые варианты; остаток варианта в снимок не входит, так
+что списание со склада снимков не трогает. Правки промокодов меняют версию
+всего пространства ``cart`` (``apps.common.cache``). LRU процесса у него
+выключен: снимок сверяется со счётчиком в общем кеше.
+
+Рядом, под отдельным ключом, кешируется состояние промокода для пары
+«код + сумма корзины». Оно живёт ``PROMO_STATE_TIMEOUT`` секунд и нужно только
+для показа корзины. При оформлении заказа промокод проверяется заново.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from apps.common.cache import namespace
+
+SNAPSHOT_TIMEOUT = 900
+PROMO_STATE_TIMEOUT = 60
+
+_carts = namespace('cart', local_timeout=0)
+
+
+def _key(user_id):
+    return f"snapshot:{user_id}"
+
+
+def _promo_key(user_id):
+    return f"promo:{user_id}"
+
+
+def _version_key(user_id):
+    return f"cart:version:{user_id}"
+
+
+def _current_version(user_id):
+    return cache.get(_version_key(user_id), 0)
+
+
+def _next_version(user_id):
+    key = _version_key(user_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        return cache.incr(key)
+
+
+def get_snapshot(user_id, builder):
+    """Возвращает снимок ``{"version", "lines"}``; при промахе собирает строки через ``builder()``."""
+    version = _current_version(user_id)
+    key = _key(user_id)
+    snapshot = _carts.get(key)
+    if snapshot is not None and snapshot["version"] == version:
+        return snapshot
+    # Версия читается до сборки: правка, пришедшая во время сборки, сделает этот снимок устаревшим
+    snapshot = {"version": version, "lines": builder()}
+    _carts.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def snapshot_totals(lines):
+    """Сумма и число единиц товара по строкам снимка."""
+    subtotal = sum((line["line_total"] for line in lines), start=Decimal('0'))
+    count = sum(line["quantity"] or 0 for line in lines)
+    return subtotal, count
+
+
+def patch_snapshot(user_id, mutate):
+    """Применяет ``mutate(lines) -> lines`` к снимку и поднимает версию.
+
+    ``mutate`` вызывается только для действующего снимка, так что дорогие
+    запросы внутри него не выполняются впустую. Если снимка нет или он
+    устарел, версия всё равно поднимается: следующее чтение соберёт корзину заново.
+    """
+    key = _key(user_id)
+    snapshot = _carts.get(key)
+    version = _next_version(user_id)
+    if snapshot is None or snapshot["version"] != version - 1:
+        _carts.delete(key)
+        return
+    lines = mutate([dict(line) for line in snapshot["lines"]])
+    _carts.set(key, {"version": version, "lines": lines}, SNAPSHOT_TIMEOUT)
+
+
+def upsert_line(user_id, item_id, build_line, update_line=None):
+    """Заменяет или добавляет строку ``item_id``.
+
+    ``update_line(line)`` правит уже лежащую строку без запросов к базе и
+    возвращает ``None``, если строку нужно собрать заново через ``build_line()``.
+    Если ``build_line()`` вернул ``None``, строка удаляется.
+    """
+    def mutate(lines):
+        for index, line in enumerate(lines):
+            if line["id"] == item_id:
+                patched = update_line(line) if update_line is not None else None
+                if patched is None:
+                    patched = build_line()
+                if patched is None:
+                    return lines[:index] + lines[index + 1:]
+                lines[index] = patched
+                return lines
+        line = build_line()
+        return lines + [line] if line is not None else lines
+
+    patch_snapshot(user_id, mutate)
+
+
+def remove_line(user_id, item_id):
+    patch_snapshot(user_id, lambda lines: [line for line in lines if line["id"] != item_id])
+
+
+def mark_favorite(user_id, product_id, is_favorite):
+    def mutate(lines):
+        for line in lines:
+            if line.get("product_id") == product_id:
+                line["is_favorite"] = is_favorite
+        return lines
+
+    patch_snapshot(user_id, mutate)
+
+
+def invalidate_snapshots(user_ids):
+    """Делает устаревшими снимки перечисленных пользователей."""
+    for user_id in set(user_ids):
+        _next_version(user_id)
+
+
+def invalidate_all_snapshots():
+    _carts.invalidate()
+
+
+def get_promo_state(user_id, code, subtotal):
+    entry = _carts.get(_promo_key(user_id))
+    if entry is not None and entry["code"] == code and entry["subtotal"] == subtotal:
+        return dict(entry["state"])
+    return None
+
+
+def store_promo_state(user_id, code, subtotal, state):
+    _carts.set(
+        _promo_key(user_id),
+        {"code": code, "subtotal": subtotal, "state": dict(state, instance=None)},
+        PROMO_STATE_TIMEOUT,
+    )
+
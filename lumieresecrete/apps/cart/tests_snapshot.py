@@ -0,0 +1,126 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.cart import snapshot as cart_snapshot
+from apps.cart import views as cart_views
+from apps.cart.models import CartItem
+from apps.catalog.models import Category, Favorite, Product
+from apps.product_variants.models import Colors, ProductVariant, Sizes
+from apps.stores.models import Store
+
+User = get_user_model()
+
+AJAX = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+
+
+class CartSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', password='secret')
+        self.client.force_login(self.user)
+        # Отложенные обновления фикстур выполняем сразу: иначе следующие правки схлопнутся в них и не выполнятся
+        with self.captureOnCommitCallbacks(execute=True):
+            store = Store.objects.create(name='Бутик')
+            category = Category.objects.create(name='Кольца')
+            color = Colors.objects.create(name_color='Золото')
+            self.variants = [
+                ProductVariant.objects.create(
+                    product=Product.objects.create(name=f'Кольцо {index}', category=category),
+                    color=color, size=Sizes.objects.create(size=str(16 + index)),
+                    store=store, price=Decimal('1000.00') * (index + 1), quantity=10,
+                )
+                for index in range(3)
+            ]
+            self.item = CartItem.objects.create(
+                user=self.user, product_variant=self.variants[0], quantity=1, price=self.variants[0].price,
+            )
+
+    def _cart(self):
+        return self.client.get(reverse('view_cart'), {'format': 'json'}).json()
+
+    def _no_rebuild(self):
+        return mock.patch.object(cart_views, '_build_cart_lines', side_effect=AssertionError('полная пересборка'))
+
+    def _post(self, url, data=None):
+        # Правка снимка выполняется после коммита, как в обычном запросе без ATOMIC_REQUESTS
+        with self._no_rebuild(), self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, data or {}, **AJAX)
+
+    def _patched_cart(self):
+        with self._no_rebuild():
+            return self._cart()
+
+    def test_repeated_reads_do_not_touch_cart_tables(self):
+        self._cart()
+        with CaptureQueriesContext(connection) as queries:
+            data = self._cart()
+        self.assertEqual(data['totals']['subtotal'], '1000.00')
+        self.assertFalse([q for q in queries.captured_queries if 'CartItem' in q['sql'] or 'Favorite' in q['sql']])
+
+    def test_add_update_remove_patch_snapshot_in_place(self):
+        self._cart()
+        self._post(reverse('add_to_cart'), {'product_variant_id': self.variants[1].pk, 'quantity': 2})
+        self.assertEqual(self._patched_cart()['totals']['subtotal'], '5000.00')
+        self._post(reverse('cart_update', args=[self.item.pk]), {'quantity': 3})
+        self.assertEqual(self._patched_cart()['totals']['subtotal'], '7000.00')
+        self._post(reverse('remove_from_cart', args=[self.item.pk]))
+        data = self._patched_cart()
+        self.assertEqual(data['totals']['subtotal'], '4000.00')
+        self.assertEqual([(item['name'], item['quantity']) for item in data['items']], [('Кольцо 1', 2)])
+
+    def test_clear_and_undo(self):
+        self._cart()
+        token = self._post(reverse('remove_from_cart', args=[self.item.pk])).json()['undo_token']
+        self._post(reverse('cart_undo'), {'token': token})
+        self.assertEqual(self._patched_cart()['totals']['subtotal'], '1000.00')
+        self._post(reverse('cart_clear'))
+        self.assertEqual(self._patched_cart()['items'], [])
+
+    def test_favorite_toggle_patches_flag(self):
+        items, _ = cart_views._cart_items_and_total(self.user)
+        self.assertFalse(items[0]['is_favorite'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Favorite.objects.create(user=self.user, product=self.variants[0].product)
+        with self._no_rebuild():
+            items, _ = cart_views._cart_items_and_total(self.user)
+        self.assertTrue(items[0]['is_favorite'])
+
+    def test_version_mismatch_forces_rebuild(self):
+        self._cart()
+        # Другой процесс поменял корзину, но снимок поправить не успел
+        cache.incr(cart_snapshot._version_key(self.user.pk))
+        CartItem.objects.filter(pk=self.item.pk).update(quantity=5)
+        self.assertEqual(self._cart()['totals']['subtotal'], '5000.00')
+
+    def test_catalog_change_invalidates_every_snapshot(self):
+        self._cart()
+        product = self.variants[0].product
+        product.name = 'Кольцо с бриллиантом'
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertEqual(self._cart()['items'][0]['name'], 'Кольцо с бриллиантом')
+
+    def test_unrelated_catalog_changes_keep_snapshot(self):
+        self._cart()
+        other = self.variants[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            other.product.name = 'Другое кольцо'
+            other.product.save()
+            other.price = Decimal('1.00')
+            other.save()
+            self.variants[0].quantity = 3
+            self.variants[0].save(update_fields=['quantity'])
+        self.assertEqual(self._patched_cart()['items'][0]['name'], 'Кольцо 0')
+
+    def test_header_badge_counts_units(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('cart_update', args=[self.item.pk]), {'quantity': 4}, **AJAX)
+        response = self.client.get(reverse('view_cart'))
+        self.assertContains(response, '<span class="cart-count">4</span>', html=True)
@@ -4,6 +4,7 @@ from datetime import datetime
 from decimal import Decimal, InvalidOperation
 
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse, HttpResponseNotFound, HttpResponseBadRequest
 from django.shortcuts import redirect, render
@@ -11,7 +12,11 @@ from django.urls import reverse
 from django.utils import timezone
 from django.views.decorators.http import require_http_methods
 
-from apps.orders.models import Order, OrderItem, Status, Payment, PromoCode
+from apps.orders.models import Status
+from apps.orders.promo_table import lookup_promo
+from apps.orders.services import OrderService
+
+from . import snapshot as cart_snapshot
 try:
     from apps.catalog.models import Favorite
 except Exception:
@@ -29,6 +34,11 @@ try:
 except Exception:
     ProductVariant = None
 
+try:
+    from apps.stores.models import Store
+except Exception:
+    Store = None
+
 
 def _wants_json(request):
     return request.headers.get('x-requested-with') == 'XMLHttpRequest' or request.GET.get('format') == 'json'
@@ -65,17 +75,18 @@ def _clear_promo_code(request):
         request.session.modified = True
 
 
-def _evaluate_promo(promo: PromoCode, subtotal: Decimal):
+def _evaluate_promo(entry, subtotal: Decimal):
+    """Проверяет запись из таблицы промокодов (``promo_table``) без запросов к базе."""
     now = timezone.now()
-    if not promo.is_active:
+    if not entry["is_active"]:
         return Decimal('0'), "Промокод больше не активен.", False
-    if promo.valid_from and now < promo.valid_from:
+    if entry["valid_from"] and now < entry["valid_from"]:
         return Decimal('0'), "Промокод ещё не начал действовать.", False
-    if promo.valid_to and now > promo.valid_to:
+    if entry["valid_to"] and now > entry["valid_to"]:
         return Decimal('0'), "Срок действия промокода истёк.", False
-    if promo.usage_limit and promo.usage_count >= promo.usage_limit:
+    if entry["exhausted"]:
         return Decimal('0'), "Промокод больше недоступен.", False
-    min_total = promo.min_order_total or Decimal('0')
+    min_total = entry["min_total"]
     if subtotal < min_total:
         return (
             Decimal('0'),
@@ -83,11 +94,10 @@ def _evaluate_promo(promo: PromoCode, subtotal: Decimal):
             True,
         )
     discount = Decimal('0')
-    if promo.discount_percent:
-        percent = promo.discount_percent / Decimal('100')
-        discount = (subtotal * percent).quantize(Decimal('0.01'))
-    elif promo.discount_amount:
-        discount = min(promo.discount_amount, subtotal).quantize(Decimal('0.01'))
+    if entry["percent"]:
+        discount = (subtotal * entry["percent"]).quantize(Decimal('0.01'))
+    elif entry["amount"]:
+        discount = min(entry["amount"], subtotal).quantize(Decimal('0.01'))
     if discount <= 0:
         return Decimal('0'), "Скидка не может быть применена к этой сумме.", False
     return discount, None, False
@@ -108,8 +118,8 @@ def _resolve_cart_promo(request, subtotal: Decimal):
             "min_total_display": None,
             "instance": None,
         }
-    promo = PromoCode.objects.filter(code__iexact=code).first()
-    if not promo:
+    entry = lookup_promo(code)
+    if entry is None:
         _clear_promo_code(request)
         return {
             "code": code,
@@ -123,7 +133,8 @@ def _resolve_cart_promo(request, subtotal: Decimal):
             "min_total_display": None,
             "instance": None,
         }
-    discount, message, recoverable = _evaluate_promo(promo, subtotal)
+    promo = entry["promo"]
+    discount, message, recoverable = _evaluate_promo(entry, subtotal)
     is_applied = discount > 0 and not message
     return {
         "code": promo.code,
@@ -139,6 +150,19 @@ def _resolve_cart_promo(request, subtotal: Decimal):
     }
 
 
+def _cart_promo_state(request, subtotal: Decimal):
+    """Состояние промокода для показа корзины; на ``PROMO_STATE_TIMEOUT`` секунд берётся из кеша."""
+    code = _get_stored_promo_code(request)
+    if not code:
+        return _resolve_cart_promo(request, subtotal)
+    state = cart_snapshot.get_promo_state(request.user.pk, code, subtotal)
+    if state is None:
+        state = _resolve_cart_promo(request, subtotal)
+        if _get_stored_promo_code(request):
+            cart_snapshot.store_promo_state(request.user.pk, code, subtotal, state)
+    return state
+
+
 def _promo_payload(state):
     if not state:
         return None
@@ -158,10 +182,8 @@ def _cart_queryset(user):
     return CartItem.objects.filter(user=user).select_related(
         'product_variant__product',
         'product_variant__color',
-        'product_variant__size'
-    ).prefetch_related(
-        'product_variant__images',
-        'product_variant__product__images'
+        'product_variant__size',
+        'product_variant__store',
     )
 
 
@@ -174,17 +196,7 @@ def _favorite_product_ids(user):
 def _variant_image_url(variant):
     if variant is None:
         return PLACEHOLDER_IMAGE
-    getter = getattr(variant, 'get_primary_image_url', None)
-    if callable(getter):
-        url = getter()
-        if url:
-            return url
-    product = getattr(variant, 'product', None)
-    if product and hasattr(product, 'images'):
-        legacy = product.images.first()
-        if legacy and legacy.image_url:
-            return legacy.image_url
-    return PLACEHOLDER_IMAGE
+    return getattr(variant, 'primary_image_url', '') or PLACEHOLDER_IMAGE
 
 
 def _store_key(store):
@@ -211,40 +223,76 @@ def _store_label(store):
     return _store_details(store)["display"]
 
 
+def _cart_line(it, favorite_ids):
+    variant = getattr(it, 'product_variant', None)
+    product = getattr(variant, 'product', None)
+    store = getattr(variant, 'store', None)
+    price = it.price or getattr(variant, 'price', Decimal('0'))
+    line_total = (price or Decimal('0')) * (it.quantity or 0)
+    product_id = getattr(product, 'product_id', getattr(product, 'id', None))
+    detail_url = reverse('product_detail', args=[product_id]) if product_id else None
+    favorite_url = reverse('favorite_toggle', args=[product_id]) if product_id else None
+    details = _store_details(store)
+    return {
+        "id": it.pk,
+        "variant_id": it.product_variant_id,
+        "product_id": product_id,
+        "name": getattr(product, 'name', str(variant)),
+        "price": price,
+        "price_display": _format_currency(price),
+        "quantity": it.quantity,
+        "line_total": line_total,
+        "line_total_display": _format_currency(line_total),
+        "photo": _variant_image_url(variant),
+        "color": getattr(getattr(variant, 'color', None), 'name_color', ''),
+        "size": getattr(getattr(variant, 'size', None), 'size', ''),
+        "store_label": details["display"],
+        "store": dict(details, id=_store_key(store), store_id=getattr(store, 'store_id', None)),
+        "detail_url": detail_url,
+        "favorite_url": favorite_url,
+        "is_favorite": product_id in favorite_ids,
+        "update_url": reverse('cart_update', args=[it.pk]),
+        "remove_url": reverse('remove_from_cart', args=[it.pk]),
+    }
+
+
+def _build_cart_lines(user):
+    favorite_ids = _favorite_product_ids(user)
+    return [_cart_line(it, favorite_ids) for it in _cart_queryset(user)]
+
+
+def _build_cart_line(user, item_id):
+    """Строка одной позиции для точечной правки снимка; ``None``, если позиции уже нет."""
+    it = _cart_queryset(user).filter(pk=item_id).first()
+    if it is None:
+        return None
+    product_id = it.product_variant.product_id if it.product_variant_id else None
+    favorite_ids = set()
+    if Favorite is not None and product_id and Favorite.objects.filter(user=user, product_id=product_id).exists():
+        favorite_ids.add(product_id)
+    return _cart_line(it, favorite_ids)
+
+
+def _reprice_cart_line(line, price, quantity):
+    """Пересчитывает цену и количество строки снимка без запросов к базе."""
+    price = price or line["price"]
+    line_total = (price or Decimal('0')) * (quantity or 0)
+    line.update({
+        "price": price,
+        "price_display": _format_currency(price),
+        "quantity": quantity,
+        "line_total": line_total,
+        "line_total_display": _format_currency(line_total),
+    })
+    return line
+
+
 def _cart_items_and_total(user):
     if CartItem is None:
         return [], Decimal('0')
-    items = []
-    total = Decimal('0')
-    favorite_ids = _favorite_product_ids(user)
-    for it in _cart_queryset(user):
-        variant = getattr(it, 'product_variant', None)
-        product = getattr(variant, 'product', None)
-        store = getattr(variant, 'store', None)
-        price = it.price or getattr(variant, 'price', Decimal('0'))
-        line_total = (price or Decimal('0')) * (it.quantity or 0)
-        total += line_total
-        product_id = getattr(product, 'product_id', getattr(product, 'id', None))
-        detail_url = reverse('product_detail', args=[product_id]) if product_id else None
-        favorite_url = reverse('favorite_toggle', args=[product_id]) if product_id else None
-        items.append({
-            "id": it.pk,
-            "name": getattr(product, 'name', str(variant)),
-            "price": price,
-            "price_display": _format_currency(price),
-            "quantity": it.quantity,
-            "line_total": line_total,
-            "line_total_display": _format_currency(line_total),
-            "photo": _variant_image_url(variant),
-            "color": getattr(getattr(variant, 'color', None), 'name_color', ''),
-            "size": getattr(getattr(variant, 'size', None), 'size', ''),
-            "store_label": _store_label(store),
-            "detail_url": detail_url,
-            "favorite_url": favorite_url,
-            "is_favorite": product_id in favorite_ids,
-            "update_url": reverse('cart_update', args=[it.pk]),
-            "remove_url": reverse('remove_from_cart', args=[it.pk]),
-        })
+    snapshot = cart_snapshot.get_snapshot(user.pk, lambda: _build_cart_lines(user))
+    items = snapshot["lines"]
+    total, _ = cart_snapshot.snapshot_totals(items)
     return items, total
 
 
@@ -289,7 +337,7 @@ def cart_list(request):
         payload = {"items": [], "totals": totals, "promo": _promo_payload(promo_state)}
         return JsonResponse(payload) if _wants_json(request) else render(request, 'cart/cart_view.html', empty)
     items, subtotal = _cart_items_and_total(request.user)
-    promo_state = _resolve_cart_promo(request, subtotal)
+    promo_state = _cart_promo_state(request, subtotal)
     totals = _cart_totals(subtotal, promo_state)
     if _wants_json(request):
         return JsonResponse({
@@ -361,12 +409,13 @@ def cart_apply_promo(request):
         _clear_promo_code(request)
         return _respond("Добавьте товары в корзину, чтобы применить промокод.", level='error', status_code=400)
 
-    promo = PromoCode.objects.filter(code__iexact=code).first()
-    if not promo:
+    entry = lookup_promo(code)
+    if entry is None:
         _clear_promo_code(request)
         return _respond("Промокод не найден.", level='error', status_code=404)
 
-    discount, message, recoverable = _evaluate_promo(promo, subtotal)
+    promo = entry["promo"]
+    discount, message, recoverable = _evaluate_promo(entry, subtotal)
     if message and not recoverable:
         _clear_promo_code(request)
         return _respond(message, level='error', status_code=400)
@@ -429,7 +478,7 @@ def cart_add(request):
 
     if is_json or _wants_json(request):
         _, subtotal = _cart_items_and_total(request.user)
-        promo_state = _resolve_cart_promo(request, subtotal)
+        promo_state = _cart_promo_state(request, subtotal)
         totals = _cart_totals(subtotal, promo_state)
         line_total = (obj.price or Decimal('0')) * (obj.quantity or 0)
         return JsonResponse({
@@ -470,7 +519,7 @@ def cart_update(request, item_id=None):
         obj.delete()
         if is_json or _wants_json(request):
             _, subtotal = _cart_items_and_total(request.user)
-            promo_state = _resolve_cart_promo(request, subtotal)
+            promo_state = _cart_promo_state(request, subtotal)
             totals = _cart_totals(subtotal, promo_state)
             return JsonResponse({
                 "deleted": True,
@@ -483,7 +532,7 @@ def cart_update(request, item_id=None):
     obj.save()
     if is_json or _wants_json(request):
         _, subtotal = _cart_items_and_total(request.user)
-        promo_state = _resolve_cart_promo(request, subtotal)
+        promo_state = _cart_promo_state(request, subtotal)
         totals = _cart_totals(subtotal, promo_state)
         line_total = (obj.price or Decimal('0')) * obj.quantity
         return JsonResponse({
@@ -524,7 +573,7 @@ def cart_remove(request, item_id=None):
     obj.delete()
     if _wants_json(request):
         _, subtotal = _cart_items_and_total(request.user)
-        promo_state = _resolve_cart_promo(request, subtotal)
+        promo_state = _cart_promo_state(request, subtotal)
         totals = _cart_totals(subtotal, promo_state)
         return JsonResponse({
             "deleted": True,
@@ -586,7 +635,7 @@ def cart_undo(request):
         item.price = price
         item.save()
     _, subtotal = _cart_items_and_total(request.user)
-    promo_state = _resolve_cart_promo(request, subtotal)
+    promo_state = _cart_promo_state(request, subtotal)
     totals = _cart_totals(subtotal, promo_state)
     if _wants_json(request):
         line_total = (item.price or Decimal('0')) * item.quantity
@@ -641,50 +690,35 @@ def get_cart(request):
 def checkout(request):
     if CartItem is None:
         return HttpResponseNotFound("Cart model not available")
-    items = CartItem.objects.filter(user=request.user).select_related(
-        'product_variant__product',
-        'product_variant__color',
-        'product_variant__size'
-    ).prefetch_related(
-        'product_variant__images',
-        'product_variant__product__images'
-    )
+    lines, total = _cart_items_and_total(request.user)
     summary = []
-    total = Decimal('0')
     store_entries = {}
-    for it in items:
-        line_total = (it.price or Decimal('0')) * (it.quantity or 0)
-        total += line_total
-        variant = it.product_variant
-        store = getattr(variant, 'store', None)
-        store_key = _store_key(store)
-        if store_key not in store_entries:
-            details = _store_details(store)
-            store_entries[store_key] = {
-                "id": store_key,
-                "name": details["name"],
-                "display": details["display"],
-                "city": details["city"],
-                "street": details["street"],
-                "store": store,
+    for line in lines:
+        store = line["store"]
+        if store["id"] not in store_entries:
+            store_entries[store["id"]] = {
+                "id": store["id"],
+                "name": store["name"],
+                "display": store["display"],
+                "city": store["city"],
+                "street": store["street"],
+                "store_id": store["store_id"],
             }
-        product = getattr(variant, 'product', None)
-        product_id = getattr(product, 'product_id', getattr(product, 'pk', None))
         summary.append({
-            "name": str(product or variant),
-            "color": getattr(getattr(variant, 'color', None), 'name_color', ''),
-            "size": getattr(getattr(variant, 'size', None), 'size', ''),
-            "price": it.price,
-            "price_display": _format_currency(it.price) if it.price is not None else None,
-            "quantity": it.quantity,
-            "photo": _variant_image_url(variant),
-            "item_id": it.pk,
-            "store_label": store_entries[store_key]["display"],
-            "line_total": line_total,
-            "line_total_display": _format_currency(line_total),
-            "update_url": reverse('cart_update', args=[it.pk]),
-            "remove_url": reverse('remove_from_cart', args=[it.pk]),
-            "detail_url": reverse('product_detail', args=[product_id]) if product_id else None,
+            "name": line["name"],
+            "color": line["color"],
+            "size": line["size"],
+            "price": line["price"],
+            "price_display": line["price_display"],
+            "quantity": line["quantity"],
+            "photo": line["photo"],
+            "item_id": line["id"],
+            "store_label": store["display"],
+            "line_total": line["line_total"],
+            "line_total_display": line["line_total_display"],
+            "update_url": line["update_url"],
+            "remove_url": line["remove_url"],
+            "detail_url": line["detail_url"],
         })
 
     promo_state = _resolve_cart_promo(request, total)
@@ -697,12 +731,12 @@ def checkout(request):
             "display": "Бутик Lumiere Secrète, Москва",
             "city": "",
             "street": "",
-            "store": None,
+            "store_id": None,
         }
         store_entries[fallback_entry["id"]] = fallback_entry
     pickup_choices = list(store_entries.values())
     pickup_lookup = {entry["id"]: entry for entry in pickup_choices}
-    real_store_ids = {entry["id"] for entry in pickup_choices if entry["store"] is not None}
+    real_store_ids = {entry["id"] for entry in pickup_choices if entry["store_id"] is not None}
     if summary and len(real_store_ids) > 1:
         messages.error(request, "В корзине есть товары из нескольких бутиков. Пожалуйста, оформите отдельный заказ для каждого бутика.")
         return redirect('view_cart')
@@ -837,63 +871,32 @@ def checkout(request):
 
         status_obj, _ = Status.objects.get_or_create(name_status='В обработке')
         selected_pickup_entry = selected_pickup_entry or pickup_choices[0]
-        order_store = selected_pickup_entry["store"] if selected_pickup_entry else None
-        meta_string = timezone.localtime().strftime("%Y-%m-%d %H:%M")
-        meta_pairs = {
-            "Имя": form_data["first_name"],
-            "Фамилия": form_data["last_name"],
-            "Телефон": form_data["phone"],
-            "Адрес": form_data["address"],
-            "Город": form_data["city"],
-            "Комментарий": form_data["comment"],
-            "Доставка": "Самовывоз" if form_data["shipping_method"] == "pickup" else "Доставка",
+        order_store = None
+        if selected_pickup_entry and selected_pickup_entry["store_id"] is not None and Store is not None:
+            order_store = Store.objects.filter(pk=selected_pickup_entry["store_id"]).first()
+        placed_at = timezone.now()
+        checkout_meta = {
+            "first_name": form_data["first_name"],
+            "last_name": form_data["last_name"],
+            "phone": form_data["phone"],
+            "address": form_data["address"],
+            "city": form_data["city"],
+            "comment": form_data["comment"],
+            "shipping": "Самовывоз" if form_data["shipping_method"] == "pickup" else "Доставка",
         }
         if selected_pickup_entry and selected_pickup_entry.get("display"):
-            meta_pairs["Бутик"] = selected_pickup_entry["display"]
-        for label, value in meta_pairs.items():
-            if value:
-                meta_string += f" | {label}: {value}"
-
-        order = Order.objects.create(
-            user=request.user,
-            status=status_obj,
-            total_amount=Decimal('0'),
-            created_at=meta_string,
-            store=order_store
-        )
-        running_total = Decimal('0')
-        for it in items:
-            price = it.price or Decimal('0')
-            OrderItem.objects.create(
-                order=order,
-                product_variant=it.product_variant,
-                quantity=it.quantity,
-                price=price
-            )
-            running_total += price * (it.quantity or 0)
-        promo_for_order = promo_state or _resolve_cart_promo(request, running_total)
+            checkout_meta["pickup_store"] = selected_pickup_entry["display"]
+        checkout_meta = {key: value for key, value in checkout_meta.items() if value}
+
+        promo_for_order = promo_state or _resolve_cart_promo(request, total)
         discount_value = promo_for_order.get('discount') if promo_for_order.get('is_applied') else Decimal('0')
         promo_instance = promo_for_order.get('instance') if promo_for_order.get('is_applied') else None
-        discount_value = min(discount_value or Decimal('0'), running_total)
-        payable_total = max(Decimal('0'), running_total - discount_value)
-        order.total_amount = payable_total
-        order.discount_amount = discount_value
-        order.promo_code = promo_instance
-        order.save()
-        if promo_instance:
-            promo_instance.register_use()
 
         if payment_flow == "now":
             masked_last = card_number_raw[-4:] if card_number_raw else ""
             label_suffix = f" ••••{masked_last}" if masked_last else ""
             payment_label = f"Онлайн оплата картой{label_suffix}"
             payment_status = "В обработке"
-            request.session['checkout_card'] = {
-                "card_number": form_data["card_number"],
-                "card_holder": form_data["card_holder"],
-                "card_expiry": form_data["card_expiry"],
-            }
-            request.session.modified = True
         else:
             if delivery_payment_method == "cash_on_delivery":
                 payment_label = "Оплата при получении (наличные)"
@@ -901,12 +904,41 @@ def checkout(request):
                 payment_label = "Оплата при получении (карта)"
             payment_status = "Ожидает оплаты"
 
-        Payment.objects.create(
-            order=order,
-            method=payment_label,
-            amount=payable_total,
-            status=payment_status
+        # Снимок нужен для показа; заказ собирается из актуальных строк корзины
+        items = CartItem.objects.filter(user=request.user).select_related(
+            'product_variant__product',
+            'product_variant__color',
+            'product_variant__size'
         )
+        try:
+            order = OrderService.place_order(
+                request.user,
+                [(it.product_variant, it.quantity, it.price or Decimal('0')) for it in items],
+                status=status_obj,
+                store=order_store,
+                placed_at=placed_at,
+                checkout_meta=checkout_meta,
+                discount=discount_value,
+                promo_code=promo_instance,
+                payment={"method": payment_label, "status": payment_status},
+            )
+        except ValidationError as exc:
+            return render(request, 'cart/checkout.html', {
+                "items": summary,
+                "total": total,
+                "form_data": form_data,
+                "form_errors": exc.messages,
+                "pickup_choices": pickup_choices,
+                "cart_summary": cart_summary,
+                "promo": promo_state,
+            })
+        if payment_flow == "now":
+            request.session['checkout_card'] = {
+                "card_number": form_data["card_number"],
+                "card_holder": form_data["card_holder"],
+                "card_expiry": form_data["card_expiry"],
+            }
+            request.session.modified = True
 
         items.delete()
         _clear_promo_code(request)
@@ -8,8 +8,8 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('product_id', 'name', 'category')
-    search_fields = ('name',)
+    list_display = ('product_id', 'name', 'category', 'external_code')
+    search_fields = ('name', 'external_code')
     list_filter = ('category',)
 
 
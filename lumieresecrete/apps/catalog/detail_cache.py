@@ -0,0 +1,63 @@
+"""Кеш общей части страницы товара.
+
+Матрица вариантов, галерея, характеристики и публичные отзывы одинаковы для
+всех посетителей, поэтому собираются один раз на товар и лежат в кеше.
+Персональные данные (избранное, свой отзыв, право оставить отзыв) и похожие
+товары (строки витрины других товаров, один индексный запрос) вычисляются во
+вьюхе поверх закешированного payload.
+
+Ключ товара сбрасывается сигналами вариантов, фото и отзывов; изменения
+справочников (категории, цвета, размеры, бутики) меняют версию пространства
+``catalog.detail`` (см. ``apps.common.cache``). Payload собирается один раз
+на все процессы, даже если его одновременно запросили несколько воркеров.
+"""
+from django.core.cache import cache
+
+from apps.common.cache import namespace
+
+DETAIL_CACHE_TIMEOUT = 600
+HITS_KEY = 'catalog:detail:hits'
+MISSES_KEY = 'catalog:detail:misses'
+
+
+_payloads = namespace('catalog.detail')
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def get_product_payload(product, builder):
+    """Возвращает payload товара из кеша или собирает его через ``builder(product)``."""
+    payload = _payloads.get(product.product_id)
+    if payload is not None:
+        _count(HITS_KEY)
+        return payload
+    _count(MISSES_KEY)
+    return _payloads.get_or_set(product.product_id, lambda: builder(product), DETAIL_CACHE_TIMEOUT)
+
+
+def invalidate_product_payload(*product_ids):
+    _payloads.delete_many([product_id for product_id in product_ids if product_id])
+
+
+def invalidate_all_payloads():
+    _payloads.invalidate()
+
+
+def detail_cache_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else None,
+    }
+
+
+def reset_detail_cache_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,178 @@
+"""Фасеты боковой панели каталога: значения фильтров и число товаров по каждому.
+
+Все счётчики считаются за один проход по строкам ``CatalogListing``, которые
+прошли «нефасетные» условия (поиск, наличие, цена). Для каждого измерения
+товар учитывается, если он проходит фильтры всех *остальных* измерений —
+так выбранный цвет не обнуляет счётчики соседних цветов. Результат кешируется
+по нормализованному ключу фильтра в пространстве ``catalog.facets``
+(``apps.common.cache``); его версия сбрасывается при любом обновлении витрины.
+"""
+import hashlib
+import json
+from collections import Counter, defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.apps import apps as global_apps
+from apps.common.cache import namespace
+
+from .listing import unpack_tokens
+from .search import apply_search
+
+FACETS_CACHE_TIMEOUT = 300
+FACET_DIMENSIONS = ('category', 'color', 'size', 'store', 'structure')
+
+
+def _normalize_price(value):
+    try:
+        return str(Decimal(str(value)).normalize()) if value not in (None, '') else ''
+    except (InvalidOperation, TypeError, ValueError):
+        return ''
+
+
+def normalize_filter_state(search='', categories=(), colors=(), sizes=(), stores=(), structures=(),
+                           in_stock=False, price_min=None, price_max=None):
+    """Приводит параметры фильтра к каноническому виду (порядок и дубли не важны)."""
+    def _values(values):
+        return sorted({str(value).strip() for value in values if str(value).strip()})
+
+    return {
+        "search": (search or '').strip().lower(),
+        "category": _values(categories),
+        "color": _values(colors),
+        "size": _values(sizes),
+        "store": _values(stores),
+        "structure": _values(structures),
+        "in_stock": bool(in_stock),
+        "price_min": _normalize_price(price_min),
+        "price_max": _normalize_price(price_max),
+    }
+
+
+_facets = namespace('catalog.facets')
+
+
+def facet_cache_key(state):
+    return hashlib.sha1(json.dumps(state, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def invalidate_facets():
+    """Сбрасывает все закешированные фасеты одним инкрементом версии."""
+    _facets.invalidate()
+
+
+def _base_queryset(state):
+    CatalogListing = global_apps.get_model('catalog', 'CatalogListing')
+    queryset = CatalogListing.objects.all()
+    if state["search"]:
+        queryset = apply_search(queryset, state["search"])
+    if state["in_stock"]:
+        queryset = queryset.filter(in_stock=True)
+    if state["price_min"]:
+        queryset = queryset.filter(max_price__gte=Decimal(state["price_min"]))
+    if state["price_max"]:
+        queryset = queryset.filter(min_price__lte=Decimal(state["price_max"]))
+    return queryset
+
+
+def _count_facets(state):
+    selected = {dim: set(state[dim]) for dim in FACET_DIMENSIONS}
+    counts = {dim: Counter() for dim in FACET_DIMENSIONS}
+    size_counts = defaultdict(Counter)
+    category_names = {}
+    total = 0
+
+    rows = _base_queryset(state).values_list(
+        'category_id', 'category_name', 'color_ids', 'size_ids', 'store_ids', 'structures'
+    )
+    for category_id, category_name, color_ids, size_ids, store_ids, structures in rows.iterator(chunk_size=2000):
+        category_key = str(category_id) if category_id is not None else ''
+        values = {
+            "category": {category_key} if category_key else set(),
+            "color": set(unpack_tokens(color_ids)),
+            "size": set(unpack_tokens(size_ids)),
+            "store": set(unpack_tokens(store_ids)),
+            "structure": set(unpack_tokens(structures)),
+        }
+        misses = [dim for dim in FACET_DIMENSIONS if selected[dim] and not (values[dim] & selected[dim])]
+        if not misses:
+            total += 1
+        if len(misses) > 1:
+            continue
+        # Товар, не прошедший ровно одно измерение, всё равно считается в нём самом
+        for dim in FACET_DIMENSIONS:
+            if misses and misses[0] != dim:
+                continue
+            counts[dim].update(values[dim])
+            if dim == 'size':
+                category_names[category_key] = category_name
+                size_counts[category_key].update(values[dim])
+    return counts, size_counts, category_names, total
+
+
+def _build_payload(state):
+    Category = global_apps.get_model('catalog', 'Category')
+    Colors = global_apps.get_model('product_variants', 'Colors')
+    Sizes = global_apps.get_model('product_variants', 'Sizes')
+    Store = global_apps.get_model('stores', 'Store')
+
+    counts, size_counts, category_names, total = _count_facets(state)
+
+    categories = [
+        {"category_id": row["category_id"], "name": row["name"], "count": counts["category"][str(row["category_id"])]}
+        for row in Category.objects.order_by('name').values('category_id', 'name')
+    ]
+    colors = [
+        {
+            "gemstone_id": row["gemstone_id"],
+            "name_color": row["name_color"],
+            "color_code": row["color_code"],
+            "count": counts["color"][str(row["gemstone_id"])],
+        }
+        for row in Colors.objects.order_by('name_color').values('gemstone_id', 'name_color', 'color_code')
+    ]
+    stores = [
+        {"store_id": row["store_id"], "name": row["name"], "count": counts["store"][str(row["store_id"])]}
+        for row in Store.objects.order_by('name').values('store_id', 'name')
+    ]
+
+    size_ids = set(counts["size"]) | set(state["size"])
+    size_labels = {
+        str(row["size_id"]): row["size"]
+        for row in Sizes.objects.filter(size_id__in=[sid for sid in size_ids if sid.isdigit()]).values('size_id', 'size')
+    }
+    size_groups = []
+    for category_key, sizes_counter in size_counts.items():
+        group_sizes = [
+            {"size_id": int(size_id), "size": size_labels[size_id], "count": count}
+            for size_id, count in sizes_counter.items()
+            if size_id in size_labels
+        ]
+        if not group_sizes:
+            continue
+        group_sizes.sort(key=lambda item: (item["size"] or "").lower())
+        size_groups.append({
+            "category_id": int(category_key) if category_key else None,
+            "category_name": category_names.get(category_key) or "Без категории",
+            "sizes": group_sizes,
+        })
+    size_groups.sort(key=lambda item: (item["category_name"] or "").lower())
+
+    structures = [
+        {"value": value, "count": count}
+        for value, count in sorted(counts["structure"].items(), key=lambda item: item[0].lower())
+    ]
+
+    return {
+        "categories": categories,
+        "colors": colors,
+        "stores": stores,
+        "size_groups": size_groups,
+        "size_labels": size_labels,
+        "structures": structures,
+        "total": total,
+    }
+
+
+def get_facets(state):
+    """Фасеты для нормализованного состояния фильтра (см. ``normalize_filter_state``)."""
+    return _facets.get_or_set(facet_cache_key(state), lambda: _build_payload(state), FACETS_CACHE_TIMEOUT)
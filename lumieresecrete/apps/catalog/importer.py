@@ -0,0 +1,301 @@
+"""Массовая загрузка каталога из выгрузки поставщика.
+
+Выгрузка — CSV (заголовок в первой строке) или JSONL (объект на строку) с
+колонками ``COLUMNS``. Товар определяется по ``product_code``
+(``Product.external_code``), вариант — по ``sku`` (``ProductVariant.sku``).
+Категории, цвета, размеры и бутики ищутся по названию, недостающие
+создаются.
+
+Файл читается потоком пачками по ``batch_size`` строк. Пачка проверяется
+целиком без ``full_clean`` (обязательные справочники, длины строк, границы
+цены и количества — как у полей ``ProductVariant`` и ``ProductVariant.clean``) и
+записывается в своей транзакции: справочники и товары — по одному
+``bulk_create``, варианты — одним ``bulk_create(update_conflicts=True)``.
+Поштучных сигналов нет. После каждой пачки рассылается
+``catalog_imported``: подписчики пересобирают витрину и фото, сбрасывают
+кэши. В аудит на весь импорт пишется одно сводное событие.
+"""
+import csv
+import io
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from apps.auditlog.models import AuditLog
+from apps.auditlog.signals import log_bulk_summary
+from apps.product_variants.models import Colors, ProductVariant, Sizes
+from apps.stores.models import Store
+
+from .models import Category, Product
+from .signals import catalog_imported
+
+COLUMNS = (
+    'product_code', 'product_name', 'category', 'sku', 'color', 'color_code', 'size', 'store',
+    'price', 'previous_price', 'quantity', 'structure', 'description',
+)
+REQUIRED = ('product_code', 'product_name', 'sku', 'color', 'size', 'store', 'price')
+TEXT_LIMITS = (
+    ('product_code', 64), ('sku', 64), ('product_name', 255), ('category', 255), ('color', 255),
+    ('color_code', 100), ('size', 100), ('store', 255), ('structure', 100),
+)
+_PRICE_FIELD = ProductVariant._meta.get_field('price')
+MAX_PRICE = Decimal(10) ** (_PRICE_FIELD.max_digits - _PRICE_FIELD.decimal_places)
+# Quantity — IntegerField, в PostgreSQL это int4
+MAX_QUANTITY = 2 ** 31 - 1
+DEFAULT_BATCH_SIZE = 2000
+VARIANT_UPDATE_FIELDS = [
+    'product', 'color', 'size', 'store', 'price', 'previous_price', 'quantity', 'structure', 'description',
+]
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.products = 0
+        self.errors = []
+        self.error_count = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def imported(self):
+        return self.created + self.updated
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "products": self.products,
+            "errors": self.error_count,
+            "seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+def detect_format(name):
+    return 'jsonl' if str(name).lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def iter_rows(fileobj, fmt='csv'):
+    """Строки выгрузки как ``(номер строки, словарь)``; ``fileobj`` — текстовый поток."""
+    if fmt == 'jsonl':
+        for line_no, line in enumerate(fileobj, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield line_no, {"__error__": f"неверный JSON: {exc}"}
+                continue
+            yield line_no, row if isinstance(row, dict) else {"__error__": "строка не объект JSON"}
+        return
+    reader = csv.DictReader(fileobj)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _text(value):
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def _decimal(value, field, errors, required=False):
+    text = _text(value).replace(' ', '').replace('\xa0', '').replace(',', '.')
+    if not text:
+        if required:
+            errors.append(f"{field}: пусто")
+        return None
+    try:
+        number = Decimal(text)
+        if not number.is_finite():
+            raise InvalidOperation
+        number = number.quantize(Decimal('0.01'))
+    except InvalidOperation:
+        errors.append(f"{field}: не число «{value}»")
+        return None
+    if number < 0:
+        errors.append(f"{field}: отрицательное значение")
+    elif number >= MAX_PRICE:
+        errors.append(f"{field}: больше {MAX_PRICE - Decimal('0.01')}")
+    return number
+
+
+def _quantity(value, errors):
+    text = _text(value)
+    if not text:
+        return 0
+    try:
+        number = int(Decimal(text.replace(',', '.')))
+    except (InvalidOperation, ValueError, OverflowError):
+        errors.append(f"quantity: не число «{value}»")
+        return None
+    if number < 0:
+        errors.append("quantity: отрицательное значение")
+    elif number > MAX_QUANTITY:
+        errors.append(f"quantity: больше {MAX_QUANTITY}")
+    return number
+
+
+def validate_batch(rows, report):
+    """Проверяет пачку ``(line, row)``; возвращает чистые строки, последняя строка SKU побеждает."""
+    clean = {}
+    for line, row in rows:
+        if "__error__" in row:
+            report.add_error(line, row["__error__"])
+            continue
+        errors = []
+        data = {column: _text(row.get(column)) for column in COLUMNS}
+        for column in REQUIRED:
+            if not data[column]:
+                errors.append(f"{column}: обязательное поле")
+        data['price'] = _decimal(row.get('price'), 'price', errors, required=True)
+        data['previous_price'] = _decimal(row.get('previous_price'), 'previous_price', errors)
+        data['quantity'] = _quantity(row.get('quantity'), errors)
+        for column, limit in TEXT_LIMITS:
+            if len(data[column]) > limit:
+                errors.append(f"{column}: длиннее {limit} символов")
+        if errors:
+            report.add_error(line, "; ".join(dict.fromkeys(errors)))
+            continue
+        clean[data['sku']] = data
+    return list(clean.values())
+
+
+class _Dictionaries:
+    """Кэш «название → id» для справочников на всё время импорта."""
+
+    SPECS = {
+        'category': (Category, 'name', 'category_id'),
+        'color': (Colors, 'name_color', 'gemstone_id'),
+        'size': (Sizes, 'size', 'size_id'),
+        'store': (Store, 'name', 'store_id'),
+    }
+
+    def __init__(self):
+        self.ids = {column: {} for column in self.SPECS}
+
+    def resolve(self, rows):
+        for column, (model, field, pk_name) in self.SPECS.items():
+            known = self.ids[column]
+            names = {row[column] for row in rows if row[column] and row[column] not in known}
+            if not names:
+                continue
+            for pk, name in model.objects.filter(**{f"{field}__in": names}).order_by(pk_name).values_list(pk_name, field):
+                known.setdefault(name, pk)
+            missing = sorted(names - set(known))
+            if missing:
+                extra = {}
+                if column == 'color':
+                    codes = {row['color']: row['color_code'] for row in rows if row['color_code']}
+                    extra = {name: {"color_code": codes.get(name) or None} for name in missing}
+                model.objects.bulk_create([model(**{field: name}, **extra.get(name, {})) for name in missing])
+                for pk, name in model.objects.filter(**{f"{field}__in": missing}).values_list(pk_name, field):
+                    known.setdefault(name, pk)
+
+    def get(self, column, name):
+        return self.ids[column].get(name) if name else None
+
+
+def _upsert_products(rows, dictionaries):
+    products = {}
+    for row in rows:
+        products[row['product_code']] = Product(
+            external_code=row['product_code'],
+            name=row['product_name'],
+            category_id=dictionaries.get('category', row['category']),
+        )
+    Product.objects.bulk_create(
+        list(products.values()),
+        update_conflicts=True,
+        unique_fields=['external_code'],
+        update_fields=['name', 'category'],
+    )
+    return dict(Product.objects.filter(external_code__in=list(products)).values_list('external_code', 'product_id'))
+
+
+def _import_batch(rows, dictionaries, report):
+    skus = [row['sku'] for row in rows]
+    existing = set(ProductVariant.objects.filter(sku__in=skus).values_list('sku', flat=True))
+    dictionaries.resolve(rows)
+    product_ids = _upsert_products(rows, dictionaries)
+    ProductVariant.objects.bulk_create(
+        [
+            ProductVariant(
+                sku=row['sku'],
+                product_id=product_ids[row['product_code']],
+                color_id=dictionaries.get('color', row['color']),
+                size_id=dictionaries.get('size', row['size']),
+                store_id=dictionaries.get('store', row['store']),
+                price=row['price'],
+                previous_price=row['previous_price'],
+                quantity=row['quantity'],
+                structure=row['structure'] or None,
+                description=row['description'] or None,
+            )
+            for row in rows
+        ],
+        update_conflicts=True,
+        unique_fields=['sku'],
+        update_fields=VARIANT_UPDATE_FIELDS,
+    )
+    report.created += len(rows) - len(existing)
+    report.updated += len(existing)
+    touched = set(product_ids.values())
+    report.products += len(touched)
+    catalog_imported.send(sender=ProductVariant, product_ids=touched)
+
+
+def import_catalog(fileobj, fmt='csv', batch_size=DEFAULT_BATCH_SIZE, dry_run=False, progress=None):
+    """Загружает выгрузку из текстового потока ``fileobj`` и возвращает ``ImportReport``.
+
+    При ``dry_run`` строки только проверяются, в базу ничего не пишется.
+    """
+    report = ImportReport()
+    dictionaries = _Dictionaries()
+    batch = []
+
+    def flush():
+        rows = validate_batch(batch, report)
+        if rows and not dry_run:
+            with transaction.atomic():
+                _import_batch(rows, dictionaries, report)
+        batch.clear()
+        if progress is not None:
+            progress(report)
+
+    for line, row in iter_rows(fileobj, fmt):
+        report.rows += 1
+        batch.append((line, row))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    report.elapsed = time.perf_counter() - report.started
+    if not dry_run and report.rows:
+        log_bulk_summary(ProductVariant, AuditLog.ACTION_IMPORT, dict(report.as_dict(), format=fmt))
+    return report
+
+
+def open_feed(path, encoding='utf-8-sig'):
+    """Текстовый поток файла выгрузки; ``-`` — стандартный ввод."""
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding=encoding, newline='')
+    return open(path, encoding=encoding, newline='')
@@ -0,0 +1,184 @@
+"""Поддержка таблицы ``CatalogListing`` — витрины каталога по одной строке на товар.
+
+Строки собираются пачками через ``values()``-запросы (без экземпляров моделей),
+поэтому сборщик одинаково работает и с живыми моделями, и с историческими
+моделями из миграций.
+"""
+from collections import defaultdict
+
+from django.apps import apps as global_apps
+from django.db.models import Count, Q
+
+from apps.common.oncommit import coalesce_on_commit
+from apps.product_variants.image_urls import load_images, pick_card_images
+
+TOKEN_SEPARATOR = '|'
+CARD_SWATCH_LIMIT = 6
+CARD_SIZE_LIMIT = 6
+REBUILD_BATCH_SIZE = 500
+
+LISTING_UPDATE_FIELDS = [
+    'name', 'category', 'category_name', 'min_price', 'max_price', 'in_stock',
+    'has_sale', 'color_ids', 'size_ids', 'store_ids', 'structures', 'popularity',
+    'latest_variant_id', 'primary_image_url', 'hover_image_url', 'search_text',
+    'card', 'updated_at',
+]
+
+
+def pack_tokens(values):
+    tokens = []
+    for value in values:
+        text = str(value).strip() if value is not None else ''
+        if text and text not in tokens:
+            tokens.append(text)
+    if not tokens:
+        return ''
+    return f"{TOKEN_SEPARATOR}{TOKEN_SEPARATOR.join(tokens)}{TOKEN_SEPARATOR}"
+
+
+def unpack_tokens(value):
+    return [token for token in (value or '').split(TOKEN_SEPARATOR) if token]
+
+
+def token_filter(field, values):
+    """Q-условие «строка содержит хотя бы одно из значений»."""
+    condition = Q()
+    for value in values:
+        text = str(value).strip()
+        if text:
+            condition |= Q(**{f"{field}__contains": f"{TOKEN_SEPARATOR}{text}{TOKEN_SEPARATOR}"})
+    return condition
+
+
+def _models(registry):
+    registry = registry or global_apps
+    return {
+        "Product": registry.get_model('catalog', 'Product'),
+        "CatalogListing": registry.get_model('catalog', 'CatalogListing'),
+        "ProductVariant": registry.get_model('product_variants', 'ProductVariant'),
+        "OrderItem": registry.get_model('orders', 'OrderItem'),
+    }
+
+
+def build_listing_rows(product_ids, registry=None):
+    models = _models(registry)
+    Product = models["Product"]
+    ProductVariant = models["ProductVariant"]
+
+    products = list(
+        Product.objects.filter(product_id__in=product_ids)
+        .values('product_id', 'name', 'category_id', 'category__name')
+    )
+    if not products:
+        return []
+    ids = [row['product_id'] for row in products]
+
+    variants_by_product = defaultdict(list)
+    variant_rows = ProductVariant.objects.filter(product_id__in=ids).values(
+        'product_variant_id', 'product_id', 'price', 'previous_price', 'quantity',
+        'structure', 'description', 'color_id', 'color__name_color', 'color__color_code',
+        'size_id', 'size__size', 'store_id',
+    ).order_by('product_variant_id')
+    for row in variant_rows:
+        variants_by_product[row['product_id']].append(row)
+
+    images_by_variant, product_images = load_images(ids, registry=registry)
+
+    popularity = dict(
+        models["OrderItem"].objects.filter(product_variant__product_id__in=ids)
+        .values('product_variant__product_id')
+        .annotate(total=Count('order_item_id'))
+        .values_list('product_variant__product_id', 'total')
+    )
+
+    CatalogListing = models["CatalogListing"]
+    rows = []
+    for product in products:
+        product_id = product['product_id']
+        variants = variants_by_product.get(product_id, [])
+        prices = [v['price'] for v in variants if v['price'] is not None]
+        swatches = []
+        for v in variants:
+            if v['color_id'] is None:
+                continue
+            swatch = {"name": v['color__name_color'], "code": v['color__color_code'] or "#7d4047"}
+            if swatch not in swatches:
+                swatches.append(swatch)
+        size_labels = sorted({v['size__size'] for v in variants if v['size_id'] is not None and v['size__size']})
+        structures = sorted({(v['structure'] or '').strip() for v in variants if (v['structure'] or '').strip()})
+        variant_images = []
+        for v in variants:
+            variant_images.extend(images_by_variant.get(v['product_variant_id'], []))
+        primary, hover, srcset = pick_card_images(variant_images, product_images.get(product_id, []))
+        search_parts = [product['name'] or '', product['category__name'] or '']
+        search_parts += [v['description'] for v in variants if v['description']]
+        search_parts += [swatch['name'] for swatch in swatches if swatch['name']]
+        search_parts += structures
+        rows.append(CatalogListing(
+            product_id=product_id,
+            name=product['name'],
+            category_id=product['category_id'],
+            category_name=product['category__name'] or '',
+            min_price=min(prices) if prices else None,
+            max_price=max(prices) if prices else None,
+            in_stock=any((v['quantity'] or 0) > 0 for v in variants),
+            has_sale=any(
+                v['previous_price'] and v['price'] is not None and v['previous_price'] > v['price']
+                for v in variants
+            ),
+            color_ids=pack_tokens(v['color_id'] for v in variants),
+            size_ids=pack_tokens(v['size_id'] for v in variants),
+            store_ids=pack_tokens(v['store_id'] for v in variants),
+            structures=pack_tokens(structures),
+            popularity=popularity.get(product_id, 0),
+            latest_variant_id=max((v['product_variant_id'] for v in variants), default=None),
+            primary_image_url=primary,
+            hover_image_url=hover,
+            search_text="\n".join(search_parts).lower().replace('ё', 'е'),
+            card={
+                "colors": swatches[:CARD_SWATCH_LIMIT],
+                "sizes": size_labels[:CARD_SIZE_LIMIT],
+                "structures": structures,
+                "srcset": srcset,
+            },
+        ))
+    return rows
+
+
+def refresh_listing(product_ids, registry=None):
+    """Пересобирает строки витрины для переданных товаров."""
+    ids = {int(pid) for pid in product_ids if pid}
+    if not ids:
+        return 0
+    CatalogListing = _models(registry)["CatalogListing"]
+    rows = build_listing_rows(ids, registry=registry)
+    missing = ids - {row.product_id for row in rows}
+    if missing:
+        CatalogListing.objects.filter(product_id__in=missing).delete()
+    if rows:
+        CatalogListing.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=LISTING_UPDATE_FIELDS,
+        )
+    if registry is None:
+        from .facets import invalidate_facets
+        invalidate_facets()
+    return len(rows)
+
+
+def rebuild_listing(batch_size=REBUILD_BATCH_SIZE, registry=None):
+    """Полная пересборка витрины пачками по ``batch_size`` товаров."""
+    models = _models(registry)
+    all_ids = list(models["Product"].objects.order_by('product_id').values_list('product_id', flat=True))
+    models["CatalogListing"].objects.exclude(product_id__in=all_ids).delete()
+    total = 0
+    for start in range(0, len(all_ids), batch_size):
+        total += refresh_listing(all_ids[start:start + batch_size], registry=registry)
+    return total
+
+
+def schedule_listing_refresh(product_ids):
+    """Откладывает пересборку строк до коммита, схлопывая повторы в транзакции."""
+    coalesce_on_commit('catalog.listing', {int(pid) for pid in product_ids if pid}, refresh_listing)
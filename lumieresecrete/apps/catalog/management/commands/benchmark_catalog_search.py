@@ -0,0 +1,47 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from apps.catalog.models import CatalogListing, Product
+from apps.catalog.search import apply_search
+
+DEFAULT_QUERIES = ['кольцо', 'золото', 'серьги с фианитом', 'серебро 925']
+PAGE_SIZE = 24
+
+
+class Command(BaseCommand):
+    help = "Сравнивает прежний поиск через icontains с полнотекстовым поиском по витрине."
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', help="Поисковые запросы (по умолчанию — типовой набор).")
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def _legacy(self, query):
+        qs = Product.objects.filter(
+            Q(name__icontains=query) | Q(variants__description__icontains=query)
+        ).distinct().order_by('-product_id')
+        return qs.count(), list(qs[:PAGE_SIZE])
+
+    def _fulltext(self, query):
+        qs = apply_search(CatalogListing.objects.all(), query, with_rank=True).order_by('-search_rank', '-product_id')
+        return qs.count(), list(qs[:PAGE_SIZE])
+
+    def _measure(self, func, query, repeat):
+        timings = []
+        found = 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            found, _rows = func(query)
+            timings.append((time.perf_counter() - started) * 1000)
+        return found, statistics.median(timings), max(timings)
+
+    def handle(self, *args, **options):
+        queries = options['queries'] or DEFAULT_QUERIES
+        repeat = max(1, options['repeat'])
+        self.stdout.write(f"{'запрос':<24}{'путь':<12}{'найдено':>10}{'медиана, мс':>14}{'макс, мс':>12}")
+        for query in queries:
+            for label, func in (('icontains', self._legacy), ('fulltext', self._fulltext)):
+                found, median_ms, max_ms = self._measure(func, query, repeat)
+                self.stdout.write(f"{query[:23]:<24}{label:<12}{found:>10}{median_ms:>14.2f}{max_ms:>12.2f}")
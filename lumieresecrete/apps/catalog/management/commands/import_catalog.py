@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.catalog.importer import DEFAULT_BATCH_SIZE, detect_format, import_catalog, open_feed
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает выгрузку поставщика (CSV или JSONL) в каталог: товары, варианты, цвета, размеры и бутики. "
+        "Существующие варианты обновляются по артикулу (sku)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Файл выгрузки или «-» для стандартного ввода.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Формат (по умолчанию — по расширению файла).")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Строк в одной пачке и транзакции.")
+        parser.add_argument('--encoding', default='utf-8-sig')
+        parser.add_argument('--dry-run', action='store_true', help="Только проверить строки, ничего не записывая.")
+        parser.add_argument('--strict', action='store_true', help="Завершиться с ошибкой, если есть отклонённые строки.")
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+
+        def progress(report):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Строк прочитано: {report.rows}, записано: {report.imported}, ошибок: {report.error_count}")
+
+        try:
+            fileobj = open_feed(options['path'], encoding=options['encoding'])
+        except OSError as exc:
+            raise CommandError(f"Не удалось открыть {options['path']}: {exc}") from exc
+        with fileobj:
+            report = import_catalog(
+                fileobj, fmt=fmt, batch_size=max(1, options['batch_size']),
+                dry_run=options['dry_run'], progress=progress,
+            )
+
+        for line, message in report.errors:
+            self.stderr.write(f"Строка {line}: {message}")
+        if report.error_count > len(report.errors):
+            self.stderr.write(f"…и ещё {report.error_count - len(report.errors)} ошибок.")
+        verb = "Проверено" if options['dry_run'] else "Загружено"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb}: строк {report.rows}, новых вариантов {report.created}, обновлено {report.updated}, "
+            f"товаров {report.products}, отклонено {report.error_count}. "
+            f"{report.elapsed:.1f} с, {report.rows_per_second:.0f} строк/с."
+        ))
+        if options['strict'] and report.error_count:
+            raise CommandError(f"Отклонено строк: {report.error_count}.")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.catalog.listing import REBUILD_BATCH_SIZE, rebuild_listing
+
+
+class Command(BaseCommand):
+    help = "Полностью пересобирает витрину каталога (таблица CatalogListing)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total = rebuild_listing(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(f"Витрина каталога пересобрана: {total} товаров."))
@@ -0,0 +1,54 @@
+# Generated by Django 4.2 on 2026-10-17 19:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_listing(apps, schema_editor):
+    from apps.catalog.listing import rebuild_listing
+    rebuild_listing(registry=apps)
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_reviewmoderationlog_state'),
+        ('orders', '0006_ordernotification'),
+        ('product_variants', '0003_remove_productvariant_photo_productvariantimage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogListing',
+            fields=[
+                ('product', models.OneToOneField(db_column='ProductID', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='catalog.product')),
+                ('name', models.CharField(db_column='Name', max_length=255)),
+                ('category_name', models.CharField(blank=True, db_column='CategoryName', max_length=255)),
+                ('min_price', models.DecimalField(blank=True, db_column='MinPrice', decimal_places=2, max_digits=10, null=True)),
+                ('max_price', models.DecimalField(blank=True, db_column='MaxPrice', decimal_places=2, max_digits=10, null=True)),
+                ('in_stock', models.BooleanField(db_column='InStock', default=False)),
+                ('has_sale', models.BooleanField(db_column='HasSale', default=False)),
+                ('color_ids', models.TextField(blank=True, db_column='ColorIDs', default='')),
+                ('size_ids', models.TextField(blank=True, db_column='SizeIDs', default='')),
+                ('store_ids', models.TextField(blank=True, db_column='StoreIDs', default='')),
+                ('structures', models.TextField(blank=True, db_column='Structures', default='')),
+                ('popularity', models.PositiveIntegerField(db_column='Popularity', default=0)),
+                ('latest_variant_id', models.IntegerField(blank=True, db_column='LatestVariantID', null=True)),
+                ('primary_image_url', models.TextField(blank=True, db_column='PrimaryImageURL', default='')),
+                ('hover_image_url', models.TextField(blank=True, db_column='HoverImageURL', default='')),
+                ('search_text', models.TextField(blank=True, db_column='SearchText', default='')),
+                ('card', models.JSONField(blank=True, db_column='Card', default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_column='UpdatedAt')),
+                ('category', models.ForeignKey(blank=True, db_column='CategoryID', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalog.category')),
+            ],
+            options={
+                'db_table': 'CatalogListing',
+                'indexes': [models.Index(fields=['category'], name='catalog_listing_category_idx'), models.Index(fields=['-latest_variant_id'], name='catalog_listing_latest_idx'), models.Index(fields=['-popularity'], name='catalog_listing_popular_idx'), models.Index(fields=['min_price'], name='catalog_listing_min_price_idx'), models.Index(fields=['max_price'], name='catalog_listing_max_price_idx')],
+            },
+        ),
+        migrations.RunPython(populate_listing, noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-17 12:00
+
+from django.db import migrations
+
+SEARCH_INDEX_NAME = 'catalog_listing_search_gin'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {SEARCH_INDEX_NAME} ON "CatalogListing" '
+        "USING GIN (to_tsvector('russian'::regconfig, \"SearchText\"))"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {SEARCH_INDEX_NAME}')
+
+
+def refill_search_text(apps, schema_editor):
+    # Документ поиска расширен категорией, цветами и структурами
+    from apps.catalog.listing import rebuild_listing
+
+    rebuild_listing(registry=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_cataloglisting'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(refill_search_text, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:46
+
+from django.db import migrations, models
+
+
+def populate_image_urls(apps, schema_editor):
+    from apps.product_variants.image_urls import rebuild_image_urls
+    rebuild_image_urls(registry=apps)
+
+
+def noop(apps, schema_editor):
+    pass
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_cataloglisting_search_index'),
+        ('product_variants', '0005_productvariant_image_urls'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='hover_image_url',
+            field=models.TextField(blank=True, db_column='HoverImageURL', default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='primary_image_url',
+            field=models.TextField(blank=True, db_column='PrimaryImageURL', default='', editable=False),
+        ),
+        migrations.RunPython(populate_image_urls, noop),
+    ]
@@ -23,6 +23,11 @@ class Product(models.Model):
         db_column='CategoryID',
         related_name='products'
     )
+    # Код товара у поставщика — ключ для import_catalog
+    external_code = models.CharField(max_length=64, unique=True, null=True, blank=True, db_column='ExternalCode')
+    # Фото карточки товара, пересчитываются сигналами, см. apps.product_variants.image_urls
+    primary_image_url = models.TextField(blank=True, default='', editable=False, db_column='PrimaryImageURL')
+    hover_image_url = models.TextField(blank=True, default='', editable=False, db_column='HoverImageURL')
 
     class Meta:
         db_table = 'Products'
@@ -99,3 +104,57 @@ class ReviewModerationLog(models.Model):
 
     def __str__(self):
         return f"Moderation log #{self.log_id} for review {self.review_id}"
+
+
+class CatalogListing(models.Model):
+    """Одна денормализованная строка на товар для выдачи каталога.
+
+    Списки идентификаторов хранятся строкой вида ``|1|5|7|`` — так фильтр по
+    любому значению сводится к ``LIKE '%|5|%'`` без JOIN-ов к вариантам.
+    """
+
+    product = models.OneToOneField(
+        'catalog.Product',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        db_column='ProductID',
+        related_name='listing'
+    )
+    name = models.CharField(max_length=255, db_column='Name')
+    category = models.ForeignKey(
+        'catalog.Category',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_column='CategoryID',
+        related_name='+'
+    )
+    category_name = models.CharField(max_length=255, blank=True, db_column='CategoryName')
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, db_column='MinPrice')
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, db_column='MaxPrice')
+    in_stock = models.BooleanField(default=False, db_column='InStock')
+    has_sale = models.BooleanField(default=False, db_column='HasSale')
+    color_ids = models.TextField(blank=True, default='', db_column='ColorIDs')
+    size_ids = models.TextField(blank=True, default='', db_column='SizeIDs')
+    store_ids = models.TextField(blank=True, default='', db_column='StoreIDs')
+    structures = models.TextField(blank=True, default='', db_column='Structures')
+    popularity = models.PositiveIntegerField(default=0, db_column='Popularity')
+    latest_variant_id = models.IntegerField(null=True, blank=True, db_column='LatestVariantID')
+    primary_image_url = models.TextField(blank=True, default='', db_column='PrimaryImageURL')
+    hover_image_url = models.TextField(blank=True, default='', db_column='HoverImageURL')
+    search_text = models.TextField(blank=True, default='', db_column='SearchText')
+    card = models.JSONField(default=dict, blank=True, db_column='Card')
+    updated_at = models.DateTimeField(auto_now=True, db_column='UpdatedAt')
+
+    class Meta:
+        db_table = 'CatalogListing'
+        indexes = [
+            models.Index(fields=['category'], name='catalog_listing_category_idx'),
+            models.Index(fields=['-latest_variant_id'], name='catalog_listing_latest_idx'),
+            models.Index(fields=['-popularity'], name='catalog_listing_popular_idx'),
+            models.Index(fields=['min_price'], name='catalog_listing_min_price_idx'),
+            models.Index(fields=['max_price'], name='catalog_listing_max_price_idx'),
+        ]
+
+    def __str__(self):
+        return f"Listing for {self.name}"
@@ -0,0 +1,160 @@
+"""Полнотекстовый поиск по витрине каталога.
+
+Документ поиска — поле ``CatalogListing.search_text`` (название, категория,
+описания вариантов, цвета и структуры). На PostgreSQL поиск идёт по
+``to_tsvector('russian', "SearchText")`` с GIN-индексом (миграция 0007),
+каждое слово запроса ищется как префикс, результаты ранжируются ``ts_rank``.
+На остальных базах (SQLite в разработке и тестах) используется инвертированный
+индекс в памяти процесса; он перестраивается, когда меняется отпечаток витрины.
+"""
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.apps import apps as global_apps
+from django.db import connections
+from django.db.models import BooleanField, Case, Count, FloatField, Func, Max, Value, When
+
+SUGGEST_LIMIT = 8
+MAX_QUERY_TERMS = 8
+NAME_WEIGHT = 3.0
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or '').lower().replace('ё', 'е'))
+
+
+def query_terms(query):
+    """Слова запроса без дублей; ``_`` выкидываем — в tsquery он не нужен."""
+    terms = []
+    for token in tokenize(query):
+        token = token.replace('_', '')
+        if token and token not in terms:
+            terms.append(token)
+    return terms[:MAX_QUERY_TERMS]
+
+
+class TsVector(Func):
+    template = "to_tsvector('russian'::regconfig, %(expressions)s)"
+
+
+class TsQuery(Func):
+    template = "to_tsquery('russian'::regconfig, %(expressions)s)"
+
+
+class TsMatch(Func):
+    template = "%(expressions)s"
+    arg_joiner = ' @@ '
+    output_field = BooleanField()
+
+
+class TsRank(Func):
+    function = 'ts_rank'
+    output_field = FloatField()
+
+
+def _uses_postgres(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def _prefix_tsquery(terms):
+    return ' & '.join(f"{term}:*" for term in terms)
+
+
+class InvertedIndex:
+    """Словарь «токен → {product_id: вес}» с отсортированным словарём для префиксов."""
+
+    def __init__(self, rows):
+        postings = defaultdict(dict)
+        self.names = {}
+        for product_id, name, text in rows:
+            self.names[product_id] = name
+            name_tokens = set(tokenize(name))
+            for token in tokenize(text):
+                weight = NAME_WEIGHT if token in name_tokens else 1.0
+                bucket = postings[token]
+                bucket[product_id] = bucket.get(product_id, 0.0) + weight
+        self.postings = dict(postings)
+        self.vocabulary = sorted(self.postings)
+
+    def _expand(self, prefix):
+        start = bisect_left(self.vocabulary, prefix)
+        for token in self.vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            yield token
+
+    def search(self, terms):
+        """Товары, где каждое слово запроса встречается хотя бы как префикс; ``{id: score}``."""
+        scores = None
+        for term in terms:
+            matched = defaultdict(float)
+            for token in self._expand(term):
+                exact_bonus = 2.0 if token == term else 1.0
+                for product_id, weight in self.postings[token].items():
+                    matched[product_id] += weight * exact_bonus
+            if scores is None:
+                scores = dict(matched)
+            else:
+                scores = {pid: score + matched[pid] for pid, score in scores.items() if pid in matched}
+            if not scores:
+                return {}
+        return scores or {}
+
+
+_index_lock = threading.Lock()
+_index_state = {"fingerprint": None, "index": None}
+
+
+def _listing_fingerprint(queryset):
+    stats = queryset.model.objects.using(queryset.db).aggregate(total=Count('pk'), updated=Max('updated_at'))
+    return stats['total'], stats['updated']
+
+
+def get_inverted_index(queryset=None):
+    """Индекс процесса; перестраивается, если витрина изменилась с прошлой сборки."""
+    if queryset is None:
+        queryset = global_apps.get_model('catalog', 'CatalogListing').objects.all()
+    fingerprint = _listing_fingerprint(queryset)
+    with _index_lock:
+        if _index_state["index"] is None or _index_state["fingerprint"] != fingerprint:
+            rows = queryset.model.objects.using(queryset.db).values_list('product_id', 'name', 'search_text')
+            _index_state["index"] = InvertedIndex(rows.iterator(chunk_size=2000))
+            _index_state["fingerprint"] = fingerprint
+        return _index_state["index"]
+
+
+def apply_search(queryset, query, with_rank=False):
+    """Фильтрует queryset витрины по запросу; при ``with_rank`` добавляет ``search_rank``."""
+    terms = query_terms(query)
+    if not terms:
+        return queryset
+    if _uses_postgres(queryset):
+        vector = TsVector('search_text')
+        tsquery = TsQuery(Value(_prefix_tsquery(terms)))
+        queryset = queryset.filter(TsMatch(vector, tsquery))
+        if with_rank:
+            queryset = queryset.annotate(search_rank=TsRank(vector, tsquery))
+        return queryset
+    scores = get_inverted_index(queryset).search(terms)
+    queryset = queryset.filter(product_id__in=list(scores))
+    if with_rank:
+        queryset = queryset.annotate(search_rank=Case(
+            *[When(product_id=product_id, then=Value(score)) for product_id, score in scores.items()],
+            default=Value(0.0),
+            output_field=FloatField(),
+        ))
+    return queryset
+
+
+def suggest(query, limit=SUGGEST_LIMIT):
+    """Подсказки для строки поиска: ``[{"id": ..., "name": ...}]`` по убыванию релевантности."""
+    CatalogListing = global_apps.get_model('catalog', 'CatalogListing')
+    if not query_terms(query):
+        return []
+    ranked = apply_search(CatalogListing.objects.all(), query, with_rank=True)
+    rows = ranked.order_by('-search_rank', '-popularity', '-product_id').values('product_id', 'name')[:limit]
+    return [{"id": row['product_id'], "name": row['name']} for row in rows]
@@ -0,0 +1,146 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from apps.orders.models import OrderItem
+from apps.orders.signals import order_items_created
+from apps.product_variants.image_urls import schedule_image_refresh
+from apps.product_variants.models import Colors, ProductVariant, ProductVariantImage, Sizes
+from apps.stores.models import Store
+
+from .detail_cache import invalidate_all_payloads, invalidate_product_payload
+from .facets import invalidate_facets
+from .listing import schedule_listing_refresh
+from .models import Category, Product, ProductImage, ProductReview
+
+# Массовый импорт (apps.catalog.importer) пишет через bulk_create: подписчики получают id затронутых товаров
+catalog_imported = Signal()
+
+
+def _variant_product_ids(**filters):
+    return ProductVariant.objects.filter(**filters).values_list('product_id', flat=True).distinct()
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_listing(sender, instance, **kwargs):
+    schedule_listing_refresh([instance.pk])
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def refresh_variant_listing(sender, instance, **kwargs):
+    schedule_listing_refresh([instance.product_id])
+
+
+@receiver(post_save, sender=ProductVariantImage)
+@receiver(post_delete, sender=ProductVariantImage)
+def refresh_variant_image_listing(sender, instance, **kwargs):
+    schedule_listing_refresh(_variant_product_ids(pk=instance.variant_id))
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def refresh_product_image_listing(sender, instance, **kwargs):
+    schedule_listing_refresh([instance.product_id])
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def refresh_popularity_listing(sender, instance, **kwargs):
+    schedule_listing_refresh(_variant_product_ids(pk=instance.product_variant_id))
+
+
+# Удаление справочника обнуляет ссылки (SET_NULL) до post_delete, поэтому товары
+# собираются в pre_delete; пересборка всё равно выполнится после коммита удаления
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def refresh_category_listing(sender, instance, **kwargs):
+    schedule_listing_refresh(
+        Product.objects.filter(category_id=instance.pk).values_list('product_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Colors)
+@receiver(pre_delete, sender=Colors)
+def refresh_color_listing(sender, instance, **kwargs):
+    schedule_listing_refresh(_variant_product_ids(color_id=instance.pk))
+
+
+@receiver(post_save, sender=Sizes)
+@receiver(pre_delete, sender=Sizes)
+def refresh_size_listing(sender, instance, **kwargs):
+    schedule_listing_refresh(_variant_product_ids(size_id=instance.pk))
+
+
+@receiver(post_save, sender=Store)
+@receiver(pre_delete, sender=Store)
+def refresh_store_listing(sender, instance, **kwargs):
+    schedule_listing_refresh(_variant_product_ids(store_id=instance.pk))
+
+
+@receiver(post_save, sender=ProductVariantImage)
+@receiver(post_delete, sender=ProductVariantImage)
+def refresh_variant_image_urls(sender, instance, **kwargs):
+    schedule_image_refresh(_variant_product_ids(pk=instance.variant_id))
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def refresh_product_image_urls(sender, instance, **kwargs):
+    # Новый вариант без фото берёт фото товара, удалённый — забирает свои из карточки товара
+    schedule_image_refresh([instance.product_id])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Colors)
+@receiver(post_delete, sender=Colors)
+@receiver(post_save, sender=Sizes)
+@receiver(post_delete, sender=Sizes)
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+def invalidate_dictionary_caches(sender, instance, **kwargs):
+    # Названия значений фильтров и характеристик лежат в кешах фасетов и карточек товара
+    invalidate_facets()
+    invalidate_all_payloads()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def invalidate_product_detail(sender, instance, **kwargs):
+    product_id = instance.product_id
+    transaction.on_commit(lambda: invalidate_product_payload(product_id))
+
+
+@receiver(post_save, sender=ProductVariantImage)
+@receiver(post_delete, sender=ProductVariantImage)
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def invalidate_variant_product_detail(sender, instance, **kwargs):
+    # Заказ меняет остатки через хранимую процедуру, мимо сигналов варианта
+    variant_id = instance.variant_id if sender is ProductVariantImage else instance.product_variant_id
+    product_ids = list(_variant_product_ids(pk=variant_id))
+    transaction.on_commit(lambda: invalidate_product_payload(*product_ids))
+
+
+@receiver(order_items_created)
+def refresh_bulk_order_products(sender, order, items, **kwargs):
+    product_ids = list(_variant_product_ids(pk__in={item.product_variant_id for item in items}))
+    schedule_listing_refresh(product_ids)
+    transaction.on_commit(lambda: invalidate_product_payload(*product_ids))
+
+
+@receiver(catalog_imported)
+def refresh_imported_products(sender, product_ids, **kwargs):
+    product_ids = list(product_ids)
+    schedule_listing_refresh(product_ids)
+    schedule_image_refresh(product_ids)
+    transaction.on_commit(lambda: invalidate_product_payload(*product_ids))
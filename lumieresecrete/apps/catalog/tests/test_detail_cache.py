@@ -0,0 +1,74 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.catalog.detail_cache import detail_cache_stats
+from apps.catalog.models import Category, Product, ProductReview
+from apps.product_variants.models import Colors, ProductVariant, Sizes
+from apps.stores.models import Store
+
+User = get_user_model()
+
+
+class ProductDetailCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.objects.create(name='Подвески')
+            self.product = Product.objects.create(name='Подвеска Luna', category=category)
+            self.variant = ProductVariant.objects.create(
+                product=self.product, color=Colors.objects.create(name_color='Золото'),
+                size=Sizes.objects.create(size='45'), store=Store.objects.create(name='Бутик'),
+                price=Decimal('4200.00'), quantity=3,
+            )
+        self.url = reverse('product_detail', args=[self.product.pk])
+
+    def _price(self):
+        return self.client.get(self.url, {'format': 'json'}).json()['price_min']
+
+    def test_second_hit_is_served_from_cache(self):
+        self.client.get(self.url, {'format': 'json'})
+        self.assertEqual(detail_cache_stats()['misses'], 1)
+        self.client.get(self.url, {'format': 'json'})
+        stats = detail_cache_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['hit_ratio'], 0.5)
+
+    def test_variant_and_review_changes_invalidate(self):
+        self.assertEqual(self._price(), '4200.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.variant.price = Decimal('3900.00')
+            self.variant.save()
+        self.assertEqual(self._price(), '3900.00')
+
+        author = User.objects.create_user(username='critic', password='secret')
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductReview.objects.create(product=self.product, user=author, rating=5, comment='Чудо', is_public=True)
+        data = self.client.get(self.url, {'format': 'json'}).json()
+        self.assertEqual(data['reviews'][0]['author'], 'critic')
+        self.assertEqual(detail_cache_stats()['misses'], 3)
+
+    def test_related_cards_follow_other_products(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Product.objects.create(name='Подвеска Sol', category=self.product.category)
+            ProductVariant.objects.create(
+                product=other, color=self.variant.color, size=self.variant.size, store=self.variant.store,
+                price=Decimal('5100.00'), quantity=1,
+            )
+        self.assertEqual([card['name'] for card in self.client.get(self.url).context['related_products']], ['Подвеска Sol'])
+        with self.captureOnCommitCallbacks(execute=True):
+            other.name = 'Подвеска Sol II'
+            other.save()
+        response = self.client.get(self.url)
+        self.assertEqual([card['name'] for card in response.context['related_products']], ['Подвеска Sol II'])
+        self.assertEqual(detail_cache_stats()['hits'], 1)
+
+    def test_favorite_flag_is_per_visitor(self):
+        self.client.get(self.url)
+        session = self.client.session
+        session['wishlist'] = [self.product.pk]
+        session.save()
+        self.assertTrue(self.client.get(self.url, {'format': 'json'}).json()['is_favorite'])
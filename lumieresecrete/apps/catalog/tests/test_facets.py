@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from apps.catalog.facets import get_facets, normalize_filter_state
+from apps.catalog.models import Category, Product
+from apps.product_variants.models import Colors, ProductVariant, Sizes
+from apps.stores.models import Store
+
+
+class CatalogFacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.rings = Category.objects.create(name='Кольца')
+        self.store = Store.objects.create(name='Бутик')
+        self.gold = Colors.objects.create(name_color='Золото', color_code='#d4af37')
+        self.silver = Colors.objects.create(name_color='Серебро', color_code='#c0c0c0')
+        self.size_16 = Sizes.objects.create(size='16')
+        self.size_17 = Sizes.objects.create(size='17')
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, color, size, quantity in (
+                ('Кольцо A', self.gold, self.size_16, 1),
+                ('Кольцо B', self.gold, self.size_17, 0),
+                ('Кольцо C', self.silver, self.size_17, 3),
+            ):
+                product = Product.objects.create(name=name, category=self.rings)
+                ProductVariant.objects.create(
+                    product=product, color=color, size=size, store=self.store,
+                    price=Decimal('1000.00'), quantity=quantity, structure='Золото 585',
+                )
+
+    def _count(self, items, key, value):
+        return next(item['count'] for item in items if item[key] == value)
+
+    def test_counts_ignore_own_dimension(self):
+        facets = get_facets(normalize_filter_state(colors=[str(self.gold.pk)], categories=[str(self.rings.pk)]))
+        self.assertEqual(facets['total'], 2)
+        # Соседний цвет считается без учёта выбранного цвета
+        self.assertEqual(self._count(facets['colors'], 'gemstone_id', self.silver.pk), 1)
+        self.assertEqual(self._count(facets['colors'], 'gemstone_id', self.gold.pk), 2)
+        sizes = facets['size_groups'][0]['sizes']
+        self.assertEqual(self._count(sizes, 'size_id', self.size_17.pk), 1)
+        self.assertEqual(facets['structures'], [{'value': 'Золото 585', 'count': 2}])
+
+    def test_result_is_cached_per_normalized_key(self):
+        state = normalize_filter_state(colors=[str(self.gold.pk), str(self.gold.pk)], in_stock=True)
+        get_facets(state)
+        with self.assertNumQueries(0):
+            facets = get_facets(normalize_filter_state(colors=[str(self.gold.pk)], in_stock=True))
+        self.assertEqual(facets['total'], 1)
+
+    def test_listing_refresh_invalidates_cache(self):
+        state = normalize_filter_state(in_stock=True)
+        self.assertEqual(get_facets(state)['total'], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            variant = ProductVariant.objects.get(quantity=0)
+            variant.quantity = 5
+            variant.save()
+        self.assertEqual(get_facets(state)['total'], 3)
@@ -0,0 +1,100 @@
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.auditlog.models import AuditLog
+from apps.catalog.importer import import_catalog
+from apps.catalog.models import CatalogListing, Product
+from apps.product_variants.models import Colors, ProductVariant, Sizes
+from apps.stores.models import Store
+
+HEADER = "product_code,product_name,category,sku,color,color_code,size,store,price,previous_price,quantity,structure\n"
+FEED = HEADER + (
+    "R-1,Кольцо Aurora,Кольца,R-1-G-16,Золото,#d4af37,16,Бутик на Тверской,\"9 000,00\",,3,Золото 585\n"
+    "R-1,Кольцо Aurora,Кольца,R-1-S-17,Серебро,,17,Бутик на Тверской,4500,5000,0,\n"
+    "E-7,Серьги Luna,Серьги,E-7-G,Золото,,16,Бутик на Тверской,12000,,1,\n"
+)
+
+
+class CatalogImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _import(self, text, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return import_catalog(io.StringIO(text), **kwargs)
+
+    def test_csv_creates_catalog_and_dictionaries(self):
+        report = self._import(FEED, batch_size=2)
+        self.assertEqual((report.rows, report.created, report.updated, report.error_count), (3, 3, 0, 0))
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual(Store.objects.count(), 1)
+        self.assertEqual(Sizes.objects.count(), 2)
+        self.assertEqual(Colors.objects.get(name_color='Золото').color_code, '#d4af37')
+        variant = ProductVariant.objects.get(sku='R-1-G-16')
+        self.assertEqual((variant.price, variant.quantity, variant.structure), (Decimal('9000.00'), 3, 'Золото 585'))
+        self.assertEqual(variant.product.category.name, 'Кольца')
+        # Импортированный вариант проходит full_clean при обычном сохранении
+        ProductVariant.objects.get(sku='E-7-G').save()
+        # Витрина собирается подписчиком catalog_imported, без поштучных сигналов
+        listing = CatalogListing.objects.get(product__external_code='R-1')
+        self.assertEqual((listing.min_price, listing.has_sale), (Decimal('4500.00'), True))
+
+    def test_reimport_updates_by_sku(self):
+        self._import(FEED)
+        report = self._import(HEADER + "R-1,Кольцо Aurora II,Кольца,R-1-G-16,Золото,,16,Бутик на Тверской,9900,,5,\n")
+        self.assertEqual((report.created, report.updated), (0, 1))
+        variant = ProductVariant.objects.get(sku='R-1-G-16')
+        self.assertEqual((variant.price, variant.quantity), (Decimal('9900.00'), 5))
+        self.assertEqual(variant.product.name, 'Кольцо Aurora II')
+        self.assertEqual(ProductVariant.objects.count(), 3)
+        self.assertEqual(Colors.objects.count(), 2)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        feed = HEADER + (
+            "R-1,Кольцо,Кольца,R-1-A,Золото,,16,Бутик,-5,,1,\n"
+            "R-1,Кольцо,Кольца,,Золото,,16,Бутик,100,,1,\n"
+            "R-1,Кольцо,Кольца,R-1-B,Золото,,16,Бутик,100,,много,\n"
+            "R-1,Кольцо,Кольца,R-1-C,Золото,,16,Бутик,100,,1,\n"
+            "R-1,Кольцо,Кольца,R-1-D,Золото,,,Бутик,100,,1,\n"
+            "R-1,Кольцо,Кольца,R-1-E,Золото,,16,Бутик,100000000,,1,\n"
+            "R-1,Кольцо,Кольца,R-1-F,Золото,,16,Бутик,100,,3000000000,\n"
+            "R-1,Кольцо,Кольца,R-1-G,Золото,,16,Бутик,NaN,,Infinity,\n"
+        )
+        report = self._import(feed)
+        self.assertEqual((report.created, report.error_count), (1, 7))
+        self.assertEqual([line for line, _ in report.errors], [2, 3, 4, 6, 7, 8, 9])
+        self.assertIn("price: отрицательное значение", report.errors[0][1])
+        self.assertIn("size: обязательное поле", report.errors[3][1])
+        self.assertIn("price: больше 99999999.99", report.errors[4][1])
+        self.assertIn("quantity: больше", report.errors[5][1])
+
+    def test_jsonl_and_single_audit_entry(self):
+        lines = [
+            {
+                "product_code": "B-1", "product_name": "Браслет", "sku": f"B-1-{index}", "color": "Серебро",
+                "size": "18", "store": "Бутик", "price": 1000 + index, "quantity": 2,
+            }
+            for index in range(5)
+        ]
+        report = self._import("\n".join(json.dumps(line) for line in lines) + "\n{oops\n", fmt='jsonl')
+        self.assertEqual((report.created, report.error_count), (5, 1))
+        entries = AuditLog.objects.filter(action=AuditLog.ACTION_IMPORT)
+        self.assertEqual(entries.count(), 1)
+        self.assertEqual(entries.get().changes["created"], 5)
+        self.assertFalse(AuditLog.objects.filter(model_name='ProductVariant', action=AuditLog.ACTION_CREATE).exists())
+
+    def test_command_dry_run_writes_nothing(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', delete=False) as feed:
+            feed.write(FEED)
+        self.addCleanup(os.remove, feed.name)
+        out = io.StringIO()
+        call_command('import_catalog', feed.name, '--dry-run', stdout=out)
+        self.assertIn("строк/с", out.getvalue())
+        self.assertFalse(ProductVariant.objects.exists())
@@ -0,0 +1,65 @@
+import re
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.catalog.models import Category, Product
+from apps.common.pagination import decode_cursor, encode_cursor
+from apps.product_variants.models import Colors, ProductVariant, Sizes
+from apps.stores.models import Store
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Серьги')
+        store = Store.objects.create(name='Бутик')
+        color = Colors.objects.create(name_color='Золото')
+        size = Sizes.objects.create(size='б/р')
+        with self.captureOnCommitCallbacks(execute=True):
+            for idx in range(30):
+                product = Product.objects.create(name=f'Серьги {idx:02d}', category=category)
+                ProductVariant.objects.create(
+                    product=product, color=color, size=size, store=store,
+                    price=Decimal('1000.00') + (idx % 4) * 100, quantity=1,
+                )
+            # Товар без вариантов: цена NULL должна уходить в конец выдачи
+            Product.objects.create(name='Серьги без цены', category=category)
+
+    def _walk(self, sort):
+        url = reverse('catalog_list')
+        params = {'partial': '1', 'pagination': 'keyset', 'sort': sort}
+        seen, pages = [], 0
+        while True:
+            data = self.client.get(url, params).json()
+            self.assertEqual(data['estimated_total'], 31)
+            seen.extend(re.findall(r'alt="([^"]+)" data-primary-img', data['products_html']))
+            pages += 1
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        return seen, pages, data
+
+    def test_walks_every_product_once_for_each_sort(self):
+        for sort in ('newest', 'price_asc', 'price_desc', 'popular'):
+            seen, pages, last = self._walk(sort)
+            self.assertEqual(pages, 2, sort)
+            self.assertEqual(len(set(seen)), 31, sort)
+            self.assertIsNotNone(last['prev_cursor'])
+
+    def test_prev_cursor_returns_previous_page(self):
+        url = reverse('catalog_list')
+        first = self.client.get(url, {'partial': '1', 'pagination': 'keyset'}).json()
+        second = self.client.get(url, {'partial': '1', 'cursor': first['next_cursor']}).json()
+        back = self.client.get(url, {'partial': '1', 'cursor': second['prev_cursor']}).json()
+        self.assertEqual(back['products_html'], first['products_html'])
+        self.assertIsNone(back['prev_cursor'])
+
+    def test_broken_cursor_starts_from_first_page(self):
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        self.assertEqual(decode_cursor(encode_cursor([Decimal('10.50'), 3])), (['10.50', 3], 'next'))
+        response = self.client.get(reverse('catalog_list'), {'partial': '1', 'cursor': '!!!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['prev_cursor'])
@@ -0,0 +1,95 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.catalog.listing import rebuild_listing
+from apps.catalog.models import CatalogListing, Category, Product
+from apps.catalog.search import apply_search, suggest
+from apps.orders.models import Order, OrderItem
+from apps.product_variants.models import Colors, ProductVariant, ProductVariantImage, Sizes
+from apps.stores.models import Store
+
+User = get_user_model()
+
+
+class CatalogListingTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Кольца')
+        self.store = Store.objects.create(name='Бутик')
+        self.gold = Colors.objects.create(name_color='Золото', color_code='#d4af37')
+        self.silver = Colors.objects.create(name_color='Серебро', color_code='#c0c0c0')
+        self.size = Sizes.objects.create(size='17')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(name='Кольцо Aurora', category=self.category)
+            self.cheap = ProductVariant.objects.create(
+                product=self.product, color=self.silver, size=self.size, store=self.store,
+                price=Decimal('1500.00'), previous_price=Decimal('2000.00'), quantity=0,
+                description='Тонкое кольцо с фианитом',
+            )
+            self.rich = ProductVariant.objects.create(
+                product=self.product, color=self.gold, size=self.size, store=self.store,
+                price=Decimal('9000.00'), quantity=2, structure='Золото 585',
+            )
+            ProductVariantImage.objects.create(variant=self.rich, source_url='https://example.com/a.jpg', is_primary=True)
+            ProductVariantImage.objects.create(variant=self.rich, source_url='https://example.com/b.jpg')
+
+    def _listing(self):
+        return CatalogListing.objects.get(product=self.product)
+
+    def test_listing_row_is_built_on_save(self):
+        listing = self._listing()
+        self.assertEqual(listing.min_price, Decimal('1500.00'))
+        self.assertEqual(listing.max_price, Decimal('9000.00'))
+        self.assertTrue(listing.in_stock)
+        self.assertTrue(listing.has_sale)
+        self.assertEqual(listing.latest_variant_id, self.rich.pk)
+        self.assertEqual(listing.primary_image_url, 'https://example.com/a.jpg')
+        self.assertEqual(listing.hover_image_url, 'https://example.com/b.jpg')
+        self.assertIn(f'|{self.gold.pk}|', listing.color_ids)
+        self.assertEqual(listing.card['structures'], ['Золото 585'])
+
+    def test_dictionary_deletes_refresh_listing(self):
+        gold_id, size_id, store_id = self.gold.pk, self.size.pk, self.store.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.gold.delete()
+            self.size.delete()
+            self.store.delete()
+            self.category.delete()
+        listing = self._listing()
+        self.assertNotIn(f'|{gold_id}|', listing.color_ids)
+        self.assertNotIn(f'|{size_id}|', listing.size_ids)
+        self.assertNotIn(f'|{store_id}|', listing.store_ids)
+        self.assertEqual((listing.category_id, listing.category_name), (None, ''))
+
+    def test_order_item_updates_popularity(self):
+        user = User.objects.create_user(username='buyer', password='secret')
+        order = Order.objects.create(user=user, total_amount=Decimal('9000.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderItem.objects.create(order=order, product_variant=self.rich, quantity=1, price=Decimal('9000.00'))
+        self.assertEqual(self._listing().popularity, 1)
+
+    def test_rebuild_drops_stale_rows(self):
+        CatalogListing.objects.all().delete()
+        self.assertEqual(rebuild_listing(), 1)
+        self.assertTrue(CatalogListing.objects.filter(product=self.product).exists())
+
+    def test_catalog_list_filters_against_listing(self):
+        url = reverse('catalog_list')
+        response = self.client.get(url, {'partial': '1', 'color': str(self.gold.pk), 'in_stock': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Кольцо Aurora', response.json()['products_html'])
+        response = self.client.get(url, {'partial': '1', 'price_min': '10000'})
+        self.assertNotIn('Кольцо Aurora', response.json()['products_html'])
+        response = self.client.get(url, {'partial': '1', 'q': 'фианит'})
+        self.assertIn('Кольцо Aurora', response.json()['products_html'])
+
+    def test_search_matches_prefixes_and_colors(self):
+        listings = CatalogListing.objects.all()
+        self.assertTrue(apply_search(listings, 'кольц фиан').exists())
+        self.assertTrue(apply_search(listings, 'серебро').exists())
+        self.assertFalse(apply_search(listings, 'браслет').exists())
+        self.assertEqual(suggest('кольцо aur')[0]['id'], self.product.pk)
+        response = self.client.get(reverse('catalog_search_suggest'), {'q': 'aur'})
+        self.assertEqual(response.json()['suggestions'][0]['name'], 'Кольцо Aurora')
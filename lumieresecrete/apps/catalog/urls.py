@@ -3,7 +3,9 @@ from . import views
 
 urlpatterns = [
     path('', views.catalog_list, name='catalog_list'),
+    path('search/suggest/', views.catalog_search_suggest, name='catalog_search_suggest'),
     path('<int:pk>/', views.product_detail, name='product_detail'),
+    path('cache-stats/', views.catalog_cache_stats, name='catalog_cache_stats'),
     path('<int:pk>/favorite/', views.favorite_toggle, name='favorite_toggle'),
     path('favorites/', views.favorites_list, name='favorites_list'),
     path('favorites/clear/', views.favorite_clear, name='favorite_clear'),
@@ -1,25 +1,36 @@
 from decimal import Decimal, InvalidOperation
 
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db.models import Avg, Count, Max, Min, Q
+from django.db.models import Avg, Count, DecimalField, F, Max, Min, Q, Value
+from django.db.models.functions import Coalesce
 from django.http import JsonResponse, HttpResponseNotFound, HttpResponseBadRequest
 from django.shortcuts import render, redirect, get_object_or_404
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.views.decorators.http import require_http_methods
 
+from apps.common.pagination import (
+    CURSOR_PARAM, KEYSET_MODE, PAGINATION_PARAM, keyset_paginate, wants_keyset,
+)
+
+from .detail_cache import detail_cache_stats, get_product_payload
+from .facets import get_facets, normalize_filter_state
 from .forms import ProductReviewForm
+from .listing import token_filter
+from .search import apply_search, suggest
 
 try:
-    from .models import Product, Category, ProductImage, Favorite, ProductReview
+    from .models import Product, Category, ProductImage, Favorite, ProductReview, CatalogListing
 except Exception:
     Product = None
     Category = None
     ProductImage = None
     Favorite = None
     ProductReview = None
+    CatalogListing = None
 
 try:
     from apps.product_variants.models import ProductVariant, Colors, Sizes
@@ -45,8 +56,10 @@ except Exception:
 
 try:
     from apps.accounts.models import UserSettings
+    from apps.accounts.user_cache import get_user_settings
 except Exception:
     UserSettings = None
+    get_user_settings = None
 
 PALETTE = {
     "cream": "#F1ECE6",
@@ -56,6 +69,14 @@ PALETTE = {
     "charcoal": "#2E2E2E",
 }
 PLACEHOLDER_IMAGE = "https://placehold.co/600x400/F1ECE6/2E2E2E?text=Lumiere"
+PRICE_SORT_CEILING = Decimal('99999999.99')
+
+KEYSET_SORT_KEYS = {
+    'price_asc': (Coalesce('min_price', Value(PRICE_SORT_CEILING), output_field=DecimalField()), False),
+    'price_desc': (Coalesce('max_price', Value(Decimal('-1')), output_field=DecimalField()), True),
+    'popular': (F('popularity'), True),
+    'newest': (Coalesce('latest_variant_id', Value(0)), True),
+}
 
 
 def _product_gallery_payload(product, include_placeholder=False):
@@ -205,6 +226,32 @@ def _collect_variant_data(product):
     return payload, list(colors.values()), list(sizes.values()), list(stores.values()), selected
 
 
+def _listing_card(listing, favorite_ids=(), newest_ids=()):
+    card = listing.card or {}
+    primary_photo = listing.primary_image_url or PLACEHOLDER_IMAGE
+    return {
+        "id": listing.product_id,
+        "name": listing.name,
+        "category": listing.category_name or "Без категории",
+        "price_min": listing.min_price,
+        "price_max": listing.max_price,
+        "photo": primary_photo,
+        "hover_photo": listing.hover_image_url or primary_photo,
+        "photo_srcset": card.get("srcset", {}).get("primary"),
+        "hover_srcset": card.get("srcset", {}).get("hover"),
+        "colors": card.get("colors", []),
+        "sizes": card.get("sizes", []),
+        "structures": card.get("structures", []),
+        "is_new": listing.product_id in newest_ids,
+        "has_sale": listing.has_sale,
+        "in_stock": listing.in_stock,
+        "favorite_url": reverse('favorite_toggle', args=[listing.product_id]),
+        "quick_view_url": reverse('product_detail', args=[listing.product_id]),
+        "detail_url": reverse('product_detail', args=[listing.product_id]),
+        "is_favorite": listing.product_id in favorite_ids,
+    }
+
+
 def _product_to_dict(p):
     try:
         return {
@@ -235,42 +282,32 @@ def catalog_list(request):
     in_stock = query_params.get("in_stock")
     price_min_qs = query_params.get("price_min")
     price_max_qs = query_params.get("price_max")
-    sort = query_params.get("sort", "newest")
-
-    products = Product.objects.all().prefetch_related(
-        'images',
-        'variants__color',
-        'variants__size',
-        'variants__store',
-        'variants__images'
-    ).annotate(
-        popularity=Count('variants__orderitem', distinct=True),
-        latest_variant=Max('variants__product_variant_id')
-    )
+    sort = query_params.get("sort") or ("relevance" if search_query else "newest")
+
+    listings = CatalogListing.objects.all()
 
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(variants__description__icontains=search_query)
-        )
+        listings = apply_search(listings, search_query, with_rank=True)
+    if sort == 'relevance' and not search_query:
+        sort = 'newest'
 
     if category_param:
-        products = products.filter(category__category_id__in=category_param)
+        listings = listings.filter(category_id__in=category_param)
 
     if color_param:
-        products = products.filter(variants__color__gemstone_id__in=color_param)
+        listings = listings.filter(token_filter('color_ids', color_param))
 
     if size_param:
-        products = products.filter(variants__size__size_id__in=size_param)
+        listings = listings.filter(token_filter('size_ids', size_param))
 
     if store_param:
-        products = products.filter(variants__store__store_id__in=store_param)
+        listings = listings.filter(token_filter('store_ids', store_param))
 
     if structure_param:
-        products = products.filter(variants__structure__in=structure_param)
+        listings = listings.filter(token_filter('structures', structure_param))
 
     if in_stock == '1':
-        products = products.filter(variants__quantity__gt=0)
+        listings = listings.filter(in_stock=True)
 
     def _safe_decimal(value):
         try:
@@ -278,138 +315,80 @@ def catalog_list(request):
         except (InvalidOperation, TypeError, ValueError):
             return None
 
-    price_bounds = ProductVariant.objects.aggregate(
-        min_price=Min('price'),
-        max_price=Max('price')
+    price_bounds = CatalogListing.objects.aggregate(
+        min_price=Min('min_price'),
+        max_price=Max('max_price')
     )
     price_min = _safe_decimal(price_min_qs)
     price_max = _safe_decimal(price_max_qs)
+    # Как и раньше: хотя бы один вариант дороже min и хотя бы один дешевле max
     if price_min is not None:
-        products = products.filter(variants__price__gte=price_min)
+        listings = listings.filter(max_price__gte=price_min)
     if price_max is not None:
-        products = products.filter(variants__price__lte=price_max)
+        listings = listings.filter(min_price__lte=price_max)
 
     sort_map = {
-        'price_asc': 'variants__price',
-        'price_desc': '-variants__price',
+        'price_asc': F('min_price').asc(nulls_last=True),
+        'price_desc': F('max_price').desc(nulls_last=True),
         'popular': '-popularity',
-        'newest': '-latest_variant',
+        'newest': F('latest_variant_id').desc(nulls_last=True),
+        'relevance': F('search_rank').desc(),
     }
-    order_field = sort_map.get(sort, '-latest_variant')
-    products = products.order_by(order_field, '-product_id').distinct()
+    order_field = sort_map.get(sort, sort_map['newest'])
+    if sort == 'relevance':
+        listings = listings.order_by(order_field, '-popularity', '-product_id')
+    else:
+        listings = listings.order_by(order_field, '-product_id')
+
+    facets = get_facets(normalize_filter_state(
+        search=search_query,
+        categories=category_param,
+        colors=color_param,
+        sizes=size_param,
+        stores=store_param,
+        structures=structure_param,
+        in_stock=in_stock == '1',
+        price_min=price_min,
+        price_max=price_max,
+    ))
 
     per_page = _user_page_size(request, 24)
-    paginator = Paginator(products, per_page)
-    page_number = query_params.get('page')
-    page_obj = paginator.get_page(page_number)
+    keyset_mode = wants_keyset(request)
+    if keyset_mode:
+        # Те же сортировки, но NULL заменены крайними значениями, чтобы ключ был сравним.
+        # Ранг релевантности — вещественное число, по нему курсор не строим: порядок как у «новинок».
+        sort_key, descending = KEYSET_SORT_KEYS.get(sort, KEYSET_SORT_KEYS['newest'])
+        page_obj = keyset_paginate(
+            listings.annotate(sort_key=sort_key),
+            [('sort_key', descending), ('product_id', True)],
+            cursor=query_params.get(CURSOR_PARAM),
+            per_page=per_page,
+            estimated_total=facets["total"],
+        )
+    else:
+        paginator = Paginator(listings, per_page)
+        page_number = query_params.get('page')
+        page_obj = paginator.get_page(page_number)
 
     favorite_ids = _sync_favorite_ids(request)
 
-    newest_ids = list(
-        Product.objects.order_by('-product_id').values_list('product_id', flat=True)[:5]
+    newest_ids = set(
+        CatalogListing.objects.order_by('-product_id').values_list('product_id', flat=True)[:5]
     )
 
-    product_cards = []
-    for product in page_obj.object_list:
-        variants = list(product.variants.all())
-        prices = [v.price for v in variants if v.price is not None]
-        min_price = min(prices) if prices else None
-        max_price = max(prices) if prices else None
-        swatches = []
-        for v in variants:
-            color = getattr(v, 'color', None)
-            if color:
-                swatch = {
-                    "name": color.name_color,
-                    "code": color.color_code or "#7d4047",
-                }
-                if swatch not in swatches:
-                    swatches.append(swatch)
-        size_labels = sorted({getattr(v.size, 'size', '') for v in variants if v.size})
-        structures = sorted({(v.structure or '').strip() for v in variants if v.structure})
-        flat_images = []
-        for v in variants:
-            flat_images.extend(v.get_image_payload(fallback=False))
-        if not flat_images:
-            flat_images = _product_gallery_payload(product, include_placeholder=True)
-        primary_photo = next((img["url"] for img in flat_images if img.get("is_primary")), None)
-        if not primary_photo and flat_images:
-            primary_photo = flat_images[0].get("url")
-        if not primary_photo:
-            primary_photo = PLACEHOLDER_IMAGE
-        hover_photo = None
-        if len(flat_images) > 1:
-            hover_photo = next((img["url"] for img in flat_images if img.get("url") != primary_photo), None)
-        hover_photo = hover_photo or primary_photo
-        has_sale = any(v.previous_price and v.previous_price > v.price for v in variants)
-        is_new = product.product_id in newest_ids
-        in_stock_flag = any((v.quantity or 0) > 0 for v in variants)
-        product_cards.append({
-            "id": product.product_id,
-            "name": product.name,
-            "category": getattr(product.category, "name", "Без категории"),
-            "price_min": min_price,
-            "price_max": max_price,
-            "photo": primary_photo,
-            "hover_photo": hover_photo,
-            "colors": swatches[:6],
-            "sizes": size_labels[:6],
-            "structures": structures,
-            "is_new": is_new,
-            "has_sale": has_sale,
-            "in_stock": in_stock_flag,
-            "favorite_url": reverse('favorite_toggle', args=[product.product_id]),
-            "quick_view_url": reverse('product_detail', args=[product.product_id]),
-            "detail_url": reverse('product_detail', args=[product.product_id]),
-            "is_favorite": product.product_id in favorite_ids,
-        })
+    product_cards = [
+        _listing_card(listing, favorite_ids=favorite_ids, newest_ids=newest_ids)
+        for listing in page_obj.object_list
+    ]
 
-    # Структуры материалов: показываем только при выбранной категории и фильтруем по ней
-    structure_values = set()
-    if ProductVariant is not None and category_param:
-        for value in ProductVariant.objects.filter(
-            product__category__category_id__in=category_param
-        ).exclude(structure__isnull=True).values_list('structure', flat=True).distinct():
-            if value:
-                structure_values.add((value or '').strip())
-
-    size_groups = []
-    if ProductVariant is not None and Category is not None and Sizes is not None:
-        group_map = {}
-        base_qs = ProductVariant.objects.filter(size__isnull=False)
-        if category_param:
-            base_qs = base_qs.filter(product__category__category_id__in=category_param)
-        size_rows = base_qs.values(
-            'product__category__category_id',
-            'product__category__name',
-            'size__size_id',
-            'size__size',
-        ).distinct()
-        for row in size_rows:
-            cat_id = row['product__category__category_id']
-            cat_key = str(cat_id) if cat_id is not None else 'none'
-            group = group_map.setdefault(cat_key, {
-                "category_id": cat_id,
-                "category_name": row['product__category__name'] or "Без категории",
-                "sizes": [],
-            })
-            if not any(size['size_id'] == row['size__size_id'] for size in group["sizes"]):
-                group["sizes"].append({
-                    "size_id": row['size__size_id'],
-                    "size": row['size__size'],
-                })
-        for group in group_map.values():
-            group["sizes"].sort(key=lambda item: (item["size"] or "").lower())
-        size_groups = sorted(group_map.values(), key=lambda item: (item["category_name"] or "").lower())
-
-    # По умолчанию не показываем общий список размеров, только группированный по категории
+    # Размеры и структуры показываем только при выбранной категории
     filters_data = {
-        "categories": Category.objects.all().order_by('name') if Category else [],
-        "colors": Colors.objects.all().order_by('name_color') if Colors else [],
+        "categories": facets["categories"],
+        "colors": facets["colors"],
         "sizes": [],
-        "size_groups": size_groups if category_param else [],
-        "stores": Store.objects.all().order_by('name') if Store else [],
-        "structures": sorted(structure_values) if category_param else [],
+        "size_groups": facets["size_groups"] if category_param else [],
+        "stores": facets["stores"],
+        "structures": facets["structures"] if category_param else [],
         "price": price_bounds,
     }
 
@@ -417,25 +396,20 @@ def catalog_list(request):
     if search_query:
         active_filters.append({"label": f"Поиск: {search_query}", "param": "q"})
     for cid in category_param:
-        cat_name = next((c.name for c in filters_data["categories"] if str(c.category_id) == str(cid)), "Категория")
+        cat_name = next((c["name"] for c in filters_data["categories"] if str(c["category_id"]) == str(cid)), "Категория")
         active_filters.append({"label": cat_name, "param": "category", "value": cid})
     for color_id in color_param:
-        color = next((c for c in filters_data["colors"] if str(c.gemstone_id) == color_id), None)
+        color = next((c for c in filters_data["colors"] if str(c["gemstone_id"]) == color_id), None)
         if color:
-            active_filters.append({"label": f"Цвет: {color.name_color}", "param": "color", "value": color_id})
-    # Для лейбла размера найдём объекты напрямую, чтобы не зависеть от filters_data.sizes
-    if Sizes is not None:
-        for size_id in size_param:
-            try:
-                size_obj = Sizes.objects.filter(pk=size_id).first()
-                if size_obj:
-                    active_filters.append({"label": f"Размер: {getattr(size_obj, 'size', '')}", "param": "size", "value": size_id})
-            except Exception:
-                continue
+            active_filters.append({"label": f"Цвет: {color['name_color']}", "param": "color", "value": color_id})
+    for size_id in size_param:
+        size_label = facets["size_labels"].get(str(size_id).strip())
+        if size_label is not None:
+            active_filters.append({"label": f"Размер: {size_label}", "param": "size", "value": size_id})
     for store_id in store_param:
-        store = next((s for s in filters_data["stores"] if str(s.store_id) == store_id), None)
+        store = next((s for s in filters_data["stores"] if str(s["store_id"]) == store_id), None)
         if store:
-            active_filters.append({"label": f"Магазин: {store.name}", "param": "store", "value": store_id})
+            active_filters.append({"label": f"Магазин: {store['name']}", "param": "store", "value": store_id})
     for structure in structure_param:
         active_filters.append({"label": f"Структура: {structure}", "param": "structure", "value": structure})
     if in_stock == '1':
@@ -446,13 +420,11 @@ def catalog_list(request):
         active_filters.append({"label": f"Макс. цена: {price_max}", "param": "price_max", "value": price_max})
 
     recommendations = []
-    top_products = Product.objects.annotate(popularity=Count('variants__orderitem')).order_by('-popularity')[:3]
-    for rec in top_products:
-        rec_image = rec.images.first().image_url if hasattr(rec, 'images') and rec.images.first() else PLACEHOLDER_IMAGE
+    for rec in CatalogListing.objects.order_by('-popularity', '-product_id')[:3]:
         recommendations.append({
             "id": rec.product_id,
             "name": rec.name,
-            "photo": rec_image,
+            "photo": rec.primary_image_url or PLACEHOLDER_IMAGE,
             "detail_url": reverse('product_detail', args=[rec.product_id]),
         })
 
@@ -482,8 +454,11 @@ def catalog_list(request):
         "per_page": per_page,
     }
     base_querydict = query_params.copy()
-    if 'page' in base_querydict:
-        base_querydict.pop('page')
+    for param in ('page', CURSOR_PARAM, 'partial'):
+        if param in base_querydict:
+            base_querydict.pop(param)
+    if keyset_mode:
+        base_querydict[PAGINATION_PARAM] = KEYSET_MODE
     context["base_query"] = base_querydict.urlencode()
 
     if wants_partial:
@@ -500,28 +475,41 @@ def catalog_list(request):
             "pagination_html": pagination_html,
             "active_filters_html": active_filters_html,
             "filters_html": filters_html,
+            **(page_obj.as_json() if keyset_mode else {}),
         })
 
     return render(request, "catalog/catalog_list.html", context)
 
-def product_detail(request, pk=None):
-    wants_json = request.headers.get('x-requested-with') == 'XMLHttpRequest' or request.GET.get('format') == 'json'
-    if Product is None:
-        if wants_json:
-            return JsonResponse({"detail": "Product model not available"}, status=404)
-        return HttpResponseNotFound("Product model not available")
+def catalog_search_suggest(request):
+    query = request.GET.get("q", "").strip()
+    suggestions = [
+        {"id": item["id"], "name": item["name"], "url": reverse('product_detail', args=[item["id"]])}
+        for item in suggest(query)
+    ] if len(query) >= 2 else []
+    return JsonResponse({"suggestions": suggestions})
+
+
+def _related_listing_cards(product, limit=4):
+    related_qs = CatalogListing.objects.exclude(product_id=product.product_id).order_by('product_id')
+    related = list(related_qs.filter(category_id=product.category_id)[:limit]) if product.category_id else []
+    if len(related) < limit:
+        related.extend(related_qs.exclude(product_id__in=[rel.product_id for rel in related])[:limit - len(related)])
+    return [
+        {
+            "id": rel.product_id,
+            "name": rel.name,
+            "photo": rel.primary_image_url or PLACEHOLDER_IMAGE,
+            "price": rel.min_price,
+            "detail_url": reverse('product_detail', args=[rel.product_id]),
+        }
+        for rel in related
+    ]
 
-    product = Product.objects.filter(product_id=pk).first() or Product.objects.filter(pk=pk).first()
-    if not product:
-        if wants_json:
-            return JsonResponse({"detail": "Product not found"}, status=404)
-        return HttpResponseNotFound("Product not found")
 
-    favorite_ids = _sync_favorite_ids(request)
+def _build_product_payload(product):
+    """Общая для всех посетителей часть страницы товара (кешируется целиком)."""
     product_gallery = _product_gallery_payload(product, include_placeholder=True)
     variant_data, color_options, size_options, store_options, selected_variant = _collect_variant_data(product)
-    favorite_toggle_url = reverse('favorite_toggle', args=[product.product_id])
-    detail_url = reverse('product_detail', args=[product.product_id])
 
     initial_gallery = []
     if selected_variant:
@@ -533,18 +521,11 @@ def product_detail(request, pk=None):
             "alt": product.name,
             "is_primary": True,
         }]
-    primary_photo = initial_gallery[0]["url"]
 
     prices = [entry["price"] for entry in variant_data if entry["price"] is not None]
-    price_min = min(prices) if prices else None
-    price_max = max(prices) if prices else None
 
     reviews = []
     reviews_summary = {"rating": 0, "count": 0}
-    review_form = None
-    user_can_review = False
-    existing_review = None
-    purchased = False
     if ProductReview is not None:
         reviews_qs = ProductReview.objects.filter(product=product, is_public=True).select_related('user')
         agg = reviews_qs.aggregate(avg=Avg('rating'), count=Count('id'))
@@ -552,7 +533,96 @@ def product_detail(request, pk=None):
             "rating": round(agg['avg'], 1) if agg['avg'] else 0,
             "count": agg['count'] or 0,
         }
-        reviews = list(reviews_qs)
+        for review in reviews_qs:
+            full_name = review.user.get_full_name()
+            reviews.append({
+                "user": {"get_full_name": full_name, "username": review.user.username},
+                "author": full_name or review.user.username,
+                "rating": review.rating,
+                "comment": review.comment,
+                "created_at": review.created_at,
+            })
+
+    def variant_value(key, default):
+        if selected_variant:
+            value = selected_variant.get(key)
+            if value:
+                return value
+        return default
+
+    available_sizes = sorted({size["label"] for size in size_options if size.get("label")})
+    available_colors = sorted({color.get("name") for color in color_options if color.get("name")})
+
+    specifications = [
+        {"label": "Артикул", "value": f"LS-{product.product_id:05d}", "key": "sku"},
+        {"label": "Категория", "value": getattr(product.category, "name", "Без категории"), "key": "category"},
+        {"label": "Структура", "value": variant_value("structure", "Уточнить"), "key": "structure"},
+        {"label": "Бутик", "value": variant_value("store", "Lumiere Secrète"), "key": "store"},
+    ]
+    characteristics = [
+        {"label": "Размер", "value": variant_value("size_label", ", ".join(available_sizes) or "One Size"), "key": "size"},
+        {"label": "Материал", "value": variant_value("structure", "Гипоаллергенный сплав"), "key": "material"},
+        {"label": "Цвет", "value": variant_value("color_name", ", ".join(available_colors) or "монохром"), "key": "color"},
+    ]
+
+    return {
+        "product_gallery": product_gallery,
+        "variant_data": variant_data,
+        "color_options": color_options,
+        "size_options": size_options,
+        "store_options": store_options,
+        "selected_variant": selected_variant,
+        "initial_gallery": initial_gallery,
+        "primary_photo": initial_gallery[0].get("hover") or initial_gallery[0]["url"],
+        "price_min": min(prices) if prices else None,
+        "price_max": max(prices) if prices else None,
+        "reviews": reviews,
+        "reviews_summary": reviews_summary,
+        "specifications": specifications,
+        "characteristics": characteristics,
+    }
+
+
+@staff_member_required
+def catalog_cache_stats(request):
+    return JsonResponse({"product_detail": detail_cache_stats()})
+
+
+def product_detail(request, pk=None):
+    wants_json = request.headers.get('x-requested-with') == 'XMLHttpRequest' or request.GET.get('format') == 'json'
+    if Product is None:
+        if wants_json:
+            return JsonResponse({"detail": "Product model not available"}, status=404)
+        return HttpResponseNotFound("Product model not available")
+
+    product = Product.objects.select_related('category').filter(product_id=pk).first() \
+        or Product.objects.select_related('category').filter(pk=pk).first()
+    if not product:
+        if wants_json:
+            return JsonResponse({"detail": "Product not found"}, status=404)
+        return HttpResponseNotFound("Product not found")
+
+    favorite_ids = _sync_favorite_ids(request)
+    payload = get_product_payload(product, _build_product_payload)
+    product_gallery = payload["product_gallery"]
+    variant_data = payload["variant_data"]
+    selected_variant = payload["selected_variant"]
+    initial_gallery = payload["initial_gallery"]
+    primary_photo = payload["primary_photo"]
+    price_min = payload["price_min"]
+    price_max = payload["price_max"]
+    reviews = payload["reviews"]
+    reviews_summary = payload["reviews_summary"]
+    # Карточки похожих товаров берутся из чужих строк витрины, поэтому в payload товара не кешируются
+    related_products = _related_listing_cards(product)
+    favorite_toggle_url = reverse('favorite_toggle', args=[product.product_id])
+    detail_url = reverse('product_detail', args=[product.product_id])
+
+    review_form = None
+    user_can_review = False
+    existing_review = None
+    purchased = False
+    if ProductReview is not None:
         if request.user.is_authenticated:
             if OrderItem is not None:
                 purchased = OrderItem.objects.filter(
@@ -583,22 +653,7 @@ def product_detail(request, pk=None):
         elif user_can_review:
             review_form = ProductReviewForm(product=product)
 
-    def variant_value(key, default):
-        if selected_variant:
-            value = selected_variant.get(key)
-            if value:
-                return value
-        return default
-
-    available_sizes = sorted({size["label"] for size in size_options if size.get("label")})
-    available_colors = sorted({color.get("name") for color in color_options if color.get("name")})
-
-    specifications = [
-        {"label": "Артикул", "value": f"LS-{product.product_id:05d}", "key": "sku"},
-        {"label": "Категория", "value": getattr(product.category, "name", "Без категории"), "key": "category"},
-        {"label": "Структура", "value": variant_value("structure", "Уточнить"), "key": "structure"},
-        {"label": "Бутик", "value": variant_value("store", "Lumiere Secrète"), "key": "store"},
-    ]
+    specifications = list(payload["specifications"])
     created_attr = getattr(product, "created_at", None)
     if created_attr:
         specifications.append({
@@ -606,40 +661,7 @@ def product_detail(request, pk=None):
             "value": _format_with_user_date(request, created_attr),
             "key": "created",
         })
-    characteristics = [
-        {"label": "Размер", "value": variant_value("size_label", ", ".join(available_sizes) or "One Size"), "key": "size"},
-        {"label": "Материал", "value": variant_value("structure", "Гипоаллергенный сплав"), "key": "material"},
-        {"label": "Цвет", "value": variant_value("color_name", ", ".join(available_colors) or "монохром"), "key": "color"},
-    ]
-
-    related_candidates = Product.objects.exclude(product_id=product.product_id)
-    if product.category_id:
-        related_candidates = related_candidates.filter(category_id=product.category_id)
-    related_candidates = related_candidates.prefetch_related('variants__color', 'variants__size', 'variants__images', 'images')
-    related_list = list(related_candidates[:4])
-    if len(related_list) < 4:
-        extra = Product.objects.exclude(product_id__in=[product.product_id] + [rel.product_id for rel in related_list])\
-            .prefetch_related('variants__color', 'variants__size', 'variants__images', 'images')[:4 - len(related_list)]
-        related_list.extend(extra)
-    related_products = []
-    for rel in related_list:
-        rel_variants = list(rel.variants.all())
-        rel_prices = [rv.price for rv in rel_variants if rv.price is not None]
-        rel_image = None
-        for variant in rel_variants:
-            rel_image = variant.get_primary_image_url()
-            if rel_image:
-                break
-        if not rel_image:
-            fallback_gallery = _product_gallery_payload(rel, include_placeholder=True)
-            rel_image = fallback_gallery[0]["url"] if fallback_gallery else PLACEHOLDER_IMAGE
-        related_products.append({
-            "id": rel.product_id,
-            "name": rel.name,
-            "photo": rel_image or PLACEHOLDER_IMAGE,
-            "price": rel_prices[0] if rel_prices else None,
-            "detail_url": reverse('product_detail', args=[rel.product_id]),
-        })
+    characteristics = payload["characteristics"]
 
     if wants_json:
         variant_param = request.GET.get('variant')
@@ -666,10 +688,10 @@ def product_detail(request, pk=None):
             "detail_url": detail_url,
             "reviews": [
                 {
-                    "author": (review.user.get_full_name() or review.user.username) if hasattr(review, 'user') else '',
-                    "rating": review.rating,
-                    "comment": review.comment,
-                    "created_at": review.created_at.isoformat(),
+                    "author": review["author"],
+                    "rating": review["rating"],
+                    "comment": review["comment"],
+                    "created_at": review["created_at"].isoformat(),
                 } for review in reviews
             ],
             "reviews_summary": reviews_summary,
@@ -684,9 +706,9 @@ def product_detail(request, pk=None):
     context = {
         "product": product,
         "variant_data": variant_data,
-        "color_options": color_options,
-        "size_options": size_options,
-        "store_options": store_options,
+        "color_options": payload["color_options"],
+        "size_options": payload["size_options"],
+        "store_options": payload["store_options"],
         "selected_variant": selected_variant,
         "selected_color_id": selected_variant["color_id"] if selected_variant else None,
         "selected_size_id": selected_variant["size_id"] if selected_variant else None,
@@ -769,7 +791,7 @@ def favorites_list(request):
     page_number = query_params.get('page')
 
     base_qs = Product.objects.filter(product_id__in=favorite_ids).prefetch_related(
-        'variants__color', 'variants__size', 'variants__store', 'variants__images', 'images'
+        'variants__color', 'variants__size', 'variants__store'
     )
     if search_query:
         base_qs = base_qs.filter(
@@ -796,8 +818,18 @@ def favorites_list(request):
     products = base_qs.order_by(order, '-product_id').distinct()
 
     per_page = _user_page_size(request, 12)
-    paginator = Paginator(products, per_page)
-    page_obj = paginator.get_page(page_number)
+    keyset_mode = wants_keyset(request)
+    if keyset_mode:
+        keys = [('product_id', True)]
+        if sort in ('cheap', 'expensive'):
+            products = products.annotate(
+                sort_price=Coalesce('min_price', Value(PRICE_SORT_CEILING), output_field=DecimalField())
+            )
+            keys.insert(0, ('sort_price', sort == 'expensive'))
+        page_obj = keyset_paginate(products, keys, cursor=query_params.get(CURSOR_PARAM), per_page=per_page)
+    else:
+        paginator = Paginator(products, per_page)
+        page_obj = paginator.get_page(page_number)
 
     store_options = []
     if Store is not None and favorite_ids:
@@ -822,12 +854,8 @@ def favorites_list(request):
             selected = variants[0]
         if selected is None:
             continue
-        image = selected.get_primary_image_url() if selected else None
-        if not image:
-            fallback_gallery = _product_gallery_payload(product, include_placeholder=True)
-            image = fallback_gallery[0]["url"] if fallback_gallery else PLACEHOLDER_IMAGE
+        image = selected.primary_image_url or product.primary_image_url or PLACEHOLDER_IMAGE
         store_obj = getattr(selected, 'store', None)
-        image = image or PLACEHOLDER_IMAGE
         cards.append({
             "product_id": product.product_id,
             "name": product.name,
@@ -844,11 +872,17 @@ def favorites_list(request):
         })
 
     base_querydict = query_params.copy()
-    if 'page' in base_querydict:
-        base_querydict.pop('page')
+    for param in ('page', CURSOR_PARAM):
+        if param in base_querydict:
+            base_querydict.pop(param)
     base_query = base_querydict.urlencode()
     next_page_url = None
-    if page_obj.has_next():
+    if keyset_mode and page_obj.has_next():
+        next_params = base_querydict.copy()
+        next_params[PAGINATION_PARAM] = KEYSET_MODE
+        next_params[CURSOR_PARAM] = page_obj.next_cursor
+        next_page_url = f"?{next_params.urlencode()}"
+    elif not keyset_mode and page_obj.has_next():
         next_params = base_querydict.copy()
         next_params['page'] = page_obj.next_page_number()
         next_page_url = f"?{next_params.urlencode()}" if next_params else f"?page={page_obj.next_page_number()}"
@@ -970,13 +1004,7 @@ def _user_page_size(request, default):
     size = default
     if UserSettings is not None and request.user.is_authenticated:
         try:
-            settings_obj = getattr(request.user, "_cached_usersettings", None)
-            if settings_obj is None:
-                try:
-                    settings_obj = request.user.usersettings
-                except UserSettings.DoesNotExist:
-                    settings_obj = None
-                setattr(request.user, "_cached_usersettings", settings_obj)
+            settings_obj = get_user_settings(request.user)
             if settings_obj is not None:
                 value = settings_obj.page_size or default
                 size = max(1, min(60, int(value)))
@@ -989,13 +1017,7 @@ def _format_with_user_date(request, value):
     fmt = "%d.%m.%Y %H:%M"
     if UserSettings is not None and request.user.is_authenticated:
         try:
-            settings_obj = getattr(request.user, "_cached_usersettings", None)
-            if settings_obj is None:
-                try:
-                    settings_obj = request.user.usersettings
-                except UserSettings.DoesNotExist:
-                    settings_obj = None
-                setattr(request.user, "_cached_usersettings", settings_obj)
+            settings_obj = get_user_settings(request.user)
             if settings_obj is not None:
                 fmt = settings_obj.date_format or fmt
         except Exception:
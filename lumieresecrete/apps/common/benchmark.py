@@ -0,0 +1,239 @@
+"""Нагрузочные замеры горячих страниц магазина.
+
+``generate_dataset`` наполняет базу синтетическим каталогом: N товаров × M
+вариантов, K заказов за последние 30 дней, покупатель и менеджер. Данные
+детерминированы (``seed``), поэтому замеры разных прогонов сравнимы.
+``run_scenarios`` прогоняет сценарии через тестовый клиент Django и по каждому
+записывает p50/p95 времени ответа, число запросов к базе и пиковую память.
+
+Время меряется без ``tracemalloc``, потому что трассировка памяти замедляет
+код в разы. Пиковая память снимается отдельным прогоном. Результат — словарь,
+который команда ``run_benchmarks`` сохраняет в JSON как базовую линию и с
+которым сравнивает последующие прогоны (``compare_results``).
+"""
+import gc
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+BUYER_USERNAME = 'bench-buyer'
+MANAGER_USERNAME = 'bench-manager'
+CART_LINES = 3
+
+
+def generate_dataset(products=200, variants=4, orders=1000, seed=1):
+    """Создаёт синтетические данные и возвращает контекст для сценариев."""
+    from apps.accounts.models import Role, UserRole
+    from apps.catalog.listing import rebuild_listing
+    from apps.catalog.models import Category, Product
+    from apps.orders.models import Order, OrderItem, Status
+    from apps.product_variants.models import Colors, ProductVariant, Sizes
+    from apps.reports.rollup import rebuild_rollup
+    from apps.stores.models import Store
+
+    rng = random.Random(seed)
+    User = get_user_model()
+    stores = [Store.objects.create(name=f'Бутик {index + 1}') for index in range(3)]
+    categories = [Category.objects.create(name=name) for name in ('Кольца', 'Серьги', 'Колье', 'Браслеты', 'Подвески')]
+    colors = [Colors.objects.create(name_color=name) for name in ('Золото', 'Серебро', 'Платина', 'Розовое золото')]
+    sizes = [Sizes.objects.create(size=str(15 + index)) for index in range(6)]
+
+    product_rows = Product.objects.bulk_create([
+        Product(name=f'Украшение {index + 1}', category=categories[index % len(categories)])
+        for index in range(products)
+    ])
+    variant_rows = ProductVariant.objects.bulk_create([
+        ProductVariant(
+            product=product,
+            color=colors[offset % len(colors)],
+            size=sizes[(offset // len(colors)) % len(sizes)],
+            store=stores[product_index % len(stores)],
+            price=Decimal(rng.randrange(1500, 150000)),
+            quantity=10 ** 6,
+        )
+        for product_index, product in enumerate(product_rows)
+        for offset in range(variants)
+    ])
+
+    buyer = User.objects.create_user(username=BUYER_USERNAME, password='bench', first_name='Анна', last_name='Иванова')
+    manager = User.objects.create_user(username=MANAGER_USERNAME, password='bench')
+    UserRole.objects.create(user=manager, role=Role.objects.create(role_name='менеджер'))
+    customers = [buyer] + [User.objects.create_user(username=f'bench-{index}', password='bench') for index in range(9)]
+    statuses = [Status.objects.create(name_status=name) for name in ('В обработке', 'Доставлен', 'Отменён')]
+
+    now = timezone.now()
+    order_rows = []
+    order_lines = []
+    for _ in range(orders):
+        lines = [(variant, rng.randint(1, 2)) for variant in rng.sample(variant_rows, min(len(variant_rows), rng.randint(1, 3)))]
+        placed_at = now - timedelta(minutes=rng.randrange(30 * 24 * 60))
+        order_rows.append(Order(
+            user=rng.choice(customers),
+            status=rng.choice(statuses),
+            store=lines[0][0].store,
+            total_amount=sum((variant.price * quantity for variant, quantity in lines), Decimal('0')),
+            placed_at=placed_at,
+            created_at=placed_at.isoformat(),
+        ))
+        order_lines.append(lines)
+    order_rows = Order.objects.bulk_create(order_rows)
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product_variant=variant, quantity=quantity, price=variant.price)
+        for order, lines in zip(order_rows, order_lines)
+        for variant, quantity in lines
+    ])
+    # bulk_create не шлёт сигналов — витрину и итоги продаж собираем целиком
+    rebuild_listing()
+    rebuild_rollup()
+    return {
+        "buyer": buyer,
+        "manager": manager,
+        "store": stores[0],
+        "product_id": product_rows[len(product_rows) // 2].pk,
+        "cart_variants": [variant for variant in variant_rows if variant.store_id == stores[0].pk][:CART_LINES],
+    }
+
+
+def _fill_cart(context):
+    from apps.cart.models import CartItem
+
+    CartItem.objects.filter(user=context["buyer"]).delete()
+    for variant in context["cart_variants"]:
+        CartItem.objects.create(user=context["buyer"], product_variant=variant, quantity=1, price=variant.price)
+
+
+def _checkout_form(context):
+    return {
+        'first_name': 'Анна', 'last_name': 'Иванова', 'phone': '+7 999 000-00-00',
+        'shipping_method': 'pickup', 'pickup_location': str(context["store"].pk),
+        'payment_flow': 'later', 'delivery_payment_method': 'cash_on_delivery',
+    }
+
+
+# Сценарий: пользователь, подготовка (вне замера) и сам запрос
+SCENARIOS = {
+    "catalog_list": {
+        "user": None,
+        "request": lambda client, context: client.get(reverse('catalog_list')),
+    },
+    "product_detail": {
+        "user": None,
+        "request": lambda client, context: client.get(reverse('product_detail', args=[context["product_id"]])),
+    },
+    "cart_list": {
+        "user": "buyer",
+        "setup_once": _fill_cart,
+        "request": lambda client, context: client.get(reverse('view_cart')),
+    },
+    "checkout": {
+        "user": "buyer",
+        "setup": _fill_cart,
+        "request": lambda client, context: client.post(reverse('checkout'), _checkout_form(context)),
+    },
+    "order_history": {
+        "user": "buyer",
+        "request": lambda client, context: client.get(reverse('orders:order_history')),
+    },
+    "manager_dashboard": {
+        "user": "manager",
+        "request": lambda client, context: client.get(reverse('reports:manager_dashboard')),
+    },
+}
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def _client(scenario, context):
+    client = Client()
+    if scenario["user"]:
+        client.force_login(context[scenario["user"]])
+    return client
+
+
+def run_scenario(name, context, repeat=20, warmup=2):
+    """Замер одного сценария: ``{"p50_ms", "p95_ms", "mean_ms", "queries", "peak_kb", "status"}``."""
+    scenario = SCENARIOS[name]
+    client = _client(scenario, context)
+    setup = scenario.get("setup")
+    if scenario.get("setup_once"):
+        scenario["setup_once"](context)
+
+    def call():
+        if setup:
+            setup(context)
+        return scenario["request"](client, context)
+
+    for _ in range(warmup):
+        call()
+
+    timings = []
+    queries = []
+    status = None
+    for _ in range(max(1, repeat)):
+        if setup:
+            setup(context)
+        gc.collect()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = scenario["request"](client, context)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured.captured_queries))
+        status = response.status_code
+
+    if setup:
+        setup(context)
+    tracemalloc.start()
+    try:
+        scenario["request"](client, context)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "p50_ms": round(_percentile(timings, 50), 3),
+        "p95_ms": round(_percentile(timings, 95), 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "queries": max(queries),
+        "peak_kb": round(peak / 1024, 1),
+        "status": status,
+    }
+
+
+def run_scenarios(context, names=None, repeat=20, warmup=2):
+    return {name: run_scenario(name, context, repeat=repeat, warmup=warmup) for name in (names or SCENARIOS)}
+
+
+def compare_results(current, baseline, tolerance=0.25):
+    """Регрессии относительно базовой линии: список строк, пустой — всё в порядке.
+
+    Время и память сравниваются с допуском ``tolerance``; число запросов
+    должно быть не больше базового.
+    """
+    problems = []
+    for name, result in current.get("scenarios", {}).items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        if result["status"] != base["status"]:
+            problems.append(f"{name}: код ответа {result['status']} вместо {base['status']}")
+        if result["queries"] > base["queries"]:
+            problems.append(f"{name}: запросов {result['queries']} вместо {base['queries']}")
+        for metric, unit in (("p95_ms", "мс"), ("peak_kb", "КБ")):
+            limit = base[metric] * (1 + tolerance)
+            if result[metric] > limit:
+                problems.append(f"{name}: {metric} {result[metric]} {unit} > {limit:.1f} {unit}")
+    return problems
@@ -0,0 +1,383 @@
+"""Двухуровневый кэш: LRU процесса перед общим кэшем.
+
+Общий уровень — ``CACHES['default']``: Redis, если задан ``DJANGO_REDIS_URL``,
+иначе ``SQLiteCache`` — файл SQLite на машине, общий для всех воркеров
+gunicorn. Перед ним в каждом процессе стоит ``LocalLRU`` на
+``CACHE_LOCAL_MAX_ENTRIES`` ключей, которые живут ``CACHE_LOCAL_TIMEOUT``
+секунд.
+
+Кэши строятся на пространствах имён: ``namespace('catalog.detail')``.
+У пространства есть версия в общем кэше. Она передаётся в ``version`` ключей
+Django, и ``invalidate()`` сбрасывает все ключи пространства одним
+инкрементом. Версия тоже запоминается в процессе на ``CACHE_LOCAL_TIMEOUT``
+секунд. Поэтому после сброса или ``delete`` в другом процессе LRU соседних
+воркеров может отдавать старое значение не дольше этого срока. Пространства,
+которым это недопустимо (корзина, роли), создаются с ``local_timeout=0`` и
+ходят только в общий кэш.
+
+``get_or_set`` пересчитывает значение один раз на все процессы: внутри
+процесса — полосатые блокировки по ключу, между процессами — ``add``
+ключа-замка в общем кэше. Остальные ждут результат до ``CACHE_LOCK_TIMEOUT``
+секунд и только потом считают сами.
+"""
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+LOCK_POLL_INTERVAL = 0.05
+LOCK_STRIPES = 64
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class LocalLRU:
+    """LRU процесса с TTL.
+
+    Хранит pickle-байты, как и общие бэкенды: каждый ``get`` возвращает свою
+    копию, и правка результата вызывающим не портит кэш.
+    """
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """``(найдено, значение)``."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            if entry[1] <= time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            data = entry[0]
+        return True, pickle.loads(data)
+
+    def set(self, key, value, timeout=None):
+        ttl = self.timeout if timeout is None else min(timeout, self.timeout)
+        if ttl <= 0:
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data[key] = (data, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TieredCache:
+    """Пространство имён кэша: версия, LRU процесса и общий кэш ``alias``."""
+
+    def __init__(self, name, local_timeout=None, max_entries=None, alias='default'):
+        self.name = name
+        self.alias = alias
+        self.local_timeout = _setting('CACHE_LOCAL_TIMEOUT', 5) if local_timeout is None else local_timeout
+        max_entries = max_entries or _setting('CACHE_LOCAL_MAX_ENTRIES', 1000)
+        self.local = LocalLRU(max_entries, self.local_timeout) if self.local_timeout > 0 else None
+        self.lock_timeout = _setting('CACHE_LOCK_TIMEOUT', 10)
+        self._version = None
+        self._version_key = f"ns:{name}:version"
+        self._stripes = [threading.RLock() for _ in range(LOCK_STRIPES)]
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def _key(self, key):
+        return f"{self.name}:{key}"
+
+    def version(self):
+        memo = self._version
+        now = time.monotonic()
+        if memo is not None and memo[1] > now:
+            return memo[0]
+        version = self.shared.get(self._version_key)
+        if version is None:
+            # Случайное начало: после очистки общего кэша ключи не совпадут со старыми копиями в LRU
+            self.shared.add(self._version_key, random.randrange(1, 2 ** 31), None)
+            version = self.shared.get(self._version_key, 1)
+        if self.local is not None:
+            self._version = (version, now + self.local_timeout)
+        return version
+
+    def invalidate(self):
+        """Сбрасывает все ключи пространства во всех процессах."""
+        try:
+            self.shared.incr(self._version_key)
+        except ValueError:
+            self.shared.add(self._version_key, random.randrange(1, 2 ** 31), None)
+        self.clear_local()
+
+    def clear_local(self):
+        self._version = None
+        if self.local is not None:
+            self.local.clear()
+
+    def _local_ttl(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return None
+        return timeout
+
+    def get(self, key, default=None):
+        version = self.version()
+        if self.local is not None:
+            found, value = self.local.get((version, key))
+            if found:
+                return value
+        value = self.shared.get(self._key(key), _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        if self.local is not None:
+            self.local.set((version, key), value)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        version = self.version()
+        self.shared.set(self._key(key), value, timeout, version=version)
+        if self.local is not None:
+            self.local.set((version, key), value, self._local_ttl(timeout))
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return
+        version = self.version()
+        self.shared.delete_many([self._key(key) for key in keys], version=version)
+        if self.local is not None:
+            for key in keys:
+                self.local.delete((version, key))
+
+    def get_or_set(self, key, builder, timeout=DEFAULT_TIMEOUT):
+        """Значение из кэша или ``builder()``; одновременно считает только один вызывающий."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._stripes[hash(key) % LOCK_STRIPES]:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            version = self.version()
+            lock_key = self._key(key) + ':lock'
+            if not self.shared.add(lock_key, os.getpid(), self.lock_timeout, version=version):
+                value = self._wait_for(key, version)
+                if value is not _MISSING:
+                    return value
+            try:
+                value = builder()
+                self.set(key, value, timeout)
+            finally:
+                self.shared.delete(lock_key, version=version)
+            return value
+
+    def _wait_for(self, key, version):
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = self.shared.get(self._key(key), _MISSING, version=version)
+            if value is not _MISSING:
+                if self.local is not None:
+                    self.local.set((version, key), value)
+                return value
+            if not self.shared.has_key(self._key(key) + ':lock', version=version):
+                break
+        return _MISSING
+
+
+_namespaces = {}
+_namespaces_lock = threading.Lock()
+
+
+def namespace(name, local_timeout=None, max_entries=None, alias='default'):
+    """Пространство имён ``name``; параметры учитываются при первом вызове."""
+    with _namespaces_lock:
+        tiered = _namespaces.get(name)
+        if tiered is None:
+            tiered = _namespaces[name] = TieredCache(name, local_timeout, max_entries, alias)
+        return tiered
+
+
+def clear_local():
+    """Сбрасывает LRU и запомненные версии всех пространств этого процесса."""
+    for tiered in list(_namespaces.values()):
+        tiered.clear_local()
+
+
+@contextmanager
+def _immediate(db):
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        yield db
+    except BaseException:
+        db.execute('ROLLBACK')
+        raise
+    db.execute('COMMIT')
+
+
+class SQLiteCache(BaseCache):
+    """Общий кэш в файле SQLite — замена Redis на одной машине.
+
+    Все процессы открывают один файл в режиме WAL и видят одни ключи.
+    ``add`` и ``incr`` атомарны между процессами (``BEGIN IMMEDIATE``).
+    Протухшие записи удаляются при чтении и при чистке раз в
+    ``CULL_EVERY`` записей. ``clear()`` сбрасывает и LRU этого процесса.
+    """
+
+    CULL_EVERY = 200
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    def _db(self):
+        state = getattr(self._local, 'state', None)
+        # После fork соединение родителя использовать нельзя
+        if state is not None and state[0] == os.getpid():
+            return state[1]
+        Path(self._path).parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(self._path, timeout=10, isolation_level=None, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)')
+        db.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+        self._local.state = (os.getpid(), db)
+        return db
+
+    @staticmethod
+    def _dumps(value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _alive(expires, now=None):
+        return expires is None or expires > (now or time.time())
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._db().execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return default
+        if not self._alive(row[1]):
+            self._db().execute('DELETE FROM cache WHERE key = ? AND expires <= ?', (key, time.time()))
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        mapping = {self.make_and_validate_key(key, version=version): key for key in keys}
+        found = {}
+        made = list(mapping)
+        now = time.time()
+        for start in range(0, len(made), 500):
+            part = made[start:start + 500]
+            marks = ','.join('?' * len(part))
+            rows = self._db().execute(f'SELECT key, value, expires FROM cache WHERE key IN ({marks})', part)
+            for made_key, value, expires in rows:
+                if self._alive(expires, now):
+                    found[mapping[made_key]] = pickle.loads(value)
+        return found
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._db().execute(
+            'SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [(self.make_and_validate_key(key, version=version), self._dumps(value), expires) for key, value in data.items()]
+        db = self._db()
+        if expires is not None and expires <= time.time():
+            # timeout=0: «не кэшировать», старое значение тоже убираем
+            db.executemany('DELETE FROM cache WHERE key = ?', [(row[0],) for row in rows])
+            return []
+        db.executemany('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)', rows)
+        self._writes += len(rows)
+        if self._writes >= self.CULL_EVERY:
+            self._writes = 0
+            self._cull(db)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self.get_backend_timeout(timeout)
+        with _immediate(self._db()) as db:
+            row = db.execute('SELECT expires FROM cache WHERE key = ?', (key,)).fetchone()
+            if row is not None and self._alive(row[0]):
+                return False
+            db.execute('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)', (key, self._dumps(value), expires))
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._db().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        made_key = self.make_and_validate_key(key, version=version)
+        with _immediate(self._db()) as db:
+            row = db.execute('SELECT value, expires FROM cache WHERE key = ?', (made_key,)).fetchone()
+            if row is None or not self._alive(row[1]):
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            db.execute('UPDATE cache SET value = ? WHERE key = ?', (self._dumps(value), made_key))
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._db().execute('DELETE FROM cache WHERE key = ?', (key,)).rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        self._db().executemany(
+            'DELETE FROM cache WHERE key = ?', [(self.make_and_validate_key(key, version=version),) for key in keys]
+        )
+
+    def clear(self):
+        self._db().execute('DELETE FROM cache')
+        clear_local()
+
+    def _cull(self, db):
+        db.execute('DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            # Первыми уходят записи, которым и так скоро истекать; вечные — последними
+            db.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires IS NULL, expires LIMIT ?)',
+                (max(1, count // self._cull_frequency),),
+            )
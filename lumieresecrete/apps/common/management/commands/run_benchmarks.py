@@ -0,0 +1,93 @@
+import json
+import platform
+from pathlib import Path
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.utils import timezone
+
+from apps.common.benchmark import SCENARIOS, compare_results, generate_dataset, run_scenarios
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогоняет нагрузочные сценарии витрины на синтетических данных в отдельной тестовой базе "
+        "и сравнивает результат с базовой линией."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--variants', type=int, default=4, help="Вариантов на товар.")
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--repeat', type=int, default=20, help="Замеров на сценарий.")
+        parser.add_argument('--warmup', type=int, default=2, help="Прогревочных запросов на сценарий.")
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help="Только эти сценарии.")
+        parser.add_argument('--baseline', default='benchmarks/baseline.json', help="Файл базовой линии.")
+        parser.add_argument('--save-baseline', action='store_true', help="Записать результат как новую базовую линию.")
+        parser.add_argument('--output', help="Сохранить результат прогона в JSON.")
+        parser.add_argument('--tolerance', type=float, default=0.25, help="Допуск по времени и памяти (0.25 = 25%%).")
+        parser.add_argument('--keepdb', action='store_true', help="Не удалять тестовую базу после прогона.")
+        parser.add_argument(
+            '--nomigrations', action='store_true',
+            help="Создать схему по моделям, без миграций (быстрее, но без процедур и триггеров PostgreSQL).",
+        )
+
+    def handle(self, *args, **options):
+        if options['nomigrations']:
+            with override_settings(MIGRATION_MODULES={config.label: None for config in apps.get_app_configs()}):
+                return self._run(options)
+        return self._run(options)
+
+    def _run(self, options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        try:
+            context = generate_dataset(
+                products=max(1, options['products']), variants=max(1, options['variants']),
+                orders=max(0, options['orders']), seed=options['seed'],
+            )
+            scenarios = run_scenarios(
+                context, names=options['scenario'], repeat=options['repeat'], warmup=max(0, options['warmup']),
+            )
+            vendor = connection.vendor
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        result = {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "database": vendor,
+                "python": platform.python_version(),
+                "products": options['products'],
+                "variants": options['variants'],
+                "orders": options['orders'],
+                "seed": options['seed'],
+                "repeat": options['repeat'],
+            },
+            "scenarios": scenarios,
+        }
+        self.stdout.write(f"{'сценарий':<20}{'p50, мс':>10}{'p95, мс':>10}{'запросов':>10}{'память, КБ':>12}")
+        for name, row in scenarios.items():
+            self.stdout.write(f"{name:<20}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['queries']:>10}{row['peak_kb']:>12.1f}")
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding='utf-8')
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f"Базовая линия сохранена в {baseline_path}."))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(f"Базовой линии {baseline_path} нет — запустите с --save-baseline.")
+            return
+        baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+        problems = compare_results(result, baseline, tolerance=options['tolerance'])
+        if problems:
+            raise CommandError("Регрессии относительно базовой линии:\n" + "\n".join(problems))
+        self.stdout.write(self.style.SUCCESS("Регрессий относительно базовой линии нет."))
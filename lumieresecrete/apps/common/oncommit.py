@@ -0,0 +1,44 @@
+"""Отложенная до коммита обработка пачки id, общая для денормализаций.
+
+Витрина каталога, фото вариантов и дневные итоги продаж пересобираются по
+набору затронутых id. Сигналы шлются на каждую строку, поэтому в одной
+транзакции набирается много мелких вызовов; ``coalesce_on_commit`` копит их
+в одном on_commit-колбэке на ключ и вызывает обработчик один раз.
+"""
+from django.db import transaction
+
+
+class _PendingCallback:
+    """on_commit-колбэк, копящий id до конца транзакции."""
+
+    def __init__(self, key, callback):
+        self.key = key
+        self.callback = callback
+        self.ids = set()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        self.callback(self.ids)
+
+
+def coalesce_on_commit(key, ids, callback):
+    """Вызывает ``callback(ids)`` после коммита, схлопывая повторы с тем же ``key``.
+
+    Вне транзакции обработчик вызывается сразу.
+    """
+    ids = set(ids)
+    if not ids:
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        callback(ids)
+        return
+    for entry in connection.run_on_commit:
+        pending = entry[1]
+        if isinstance(pending, _PendingCallback) and pending.key == key and not pending.done:
+            pending.ids |= ids
+            return
+    pending = _PendingCallback(key, callback)
+    pending.ids |= ids
+    transaction.on_commit(pending)
@@ -0,0 +1,192 @@
+"""Бюджет SQL-запросов на запрос к странице.
+
+``QueryBudgetMiddleware`` считает для каждого запроса число SQL-запросов,
+суммарное время в базе, повторы одинаковых запросов (N+1 обычно виден как
+десятки повторов одного отпечатка) и время рендеринга шаблонов. Счёт идёт
+через ``connection.execute_wrapper``, поэтому ``DEBUG`` не нужен.
+
+Бюджеты объявляются в ``QUERY_BUDGETS`` по имени URL (``view_name`` с
+пространством имён, например ``orders:order_history``): число — лимит
+запросов, словарь — ``queries``/``duplicates``/``db_ms``. Превышение пишется
+предупреждением в лог ``apps.common.querybudget``. При ``QUERY_BUDGET_STRICT``
+бросается ``QueryBudgetExceeded``, и тест падает. В ``DEBUG`` ответ получает
+заголовок ``Server-Timing`` для панели Network браузера.
+
+Для тестов есть ``QueryBudgetTestMixin.assertWithinQueryBudget(response)`` и
+контекстный менеджер ``collect_queries()`` для кода вне вьюх.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_SPACES = re.compile(r'\s+')
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    """Отпечаток запроса: одинаковые запросы с разными параметрами и длиной ``IN (...)`` совпадают."""
+    return _IN_LIST.sub('IN (...)', _SPACES.sub(' ', sql).strip())
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def db_ms(self):
+        return self.db_seconds * 1000
+
+    @property
+    def template_ms(self):
+        return self.template_seconds * 1000
+
+    @property
+    def max_duplicates(self):
+        return max(self.fingerprints.values(), default=0)
+
+    def duplicates(self, minimum=2):
+        """Повторяющиеся запросы: ``[(отпечаток, число)]`` по убыванию."""
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= minimum]
+
+
+def _instrumented_render(original):
+    def render(self, context):
+        stats = getattr(_local, 'stats', None)
+        if stats is None or getattr(_local, 'rendering', False):
+            return original(self, context)
+        # Считаем только внешний шаблон: include и extends уже входят в его время
+        _local.rendering = True
+        started = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            stats.template_seconds += time.perf_counter() - started
+            _local.rendering = False
+
+    render.query_budget_original = original
+    return render
+
+
+def _install_template_timer():
+    if not hasattr(Template._render, 'query_budget_original'):
+        Template._render = _instrumented_render(Template._render)
+
+
+@contextmanager
+def collect_queries(using=None):
+    """Собирает ``QueryStats`` по всем (или одному) соединениям внутри блока."""
+    _install_template_timer()
+    stats = QueryStats()
+    previous = getattr(_local, 'stats', None)
+    _local.stats = stats
+    aliases = [using] if using else list(connections)
+    try:
+        with ExitStack() as stack:
+            for alias in aliases:
+                stack.enter_context(connections[alias].execute_wrapper(stats))
+            yield stats
+    finally:
+        _local.stats = previous
+
+
+def get_budget(view_name):
+    """Бюджет вьюхи как словарь ``queries``/``duplicates``/``db_ms`` или ``None``."""
+    budgets = getattr(settings, 'QUERY_BUDGETS', {}) or {}
+    budget = budgets.get(view_name)
+    if budget is None:
+        budget = getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+    if budget is None:
+        return None
+    if isinstance(budget, int):
+        return {"queries": budget}
+    return budget
+
+
+def check_budget(view_name, stats):
+    """Список нарушений бюджета; пустой, если бюджета нет или он соблюдён."""
+    budget = get_budget(view_name)
+    if not budget:
+        return []
+    problems = []
+    if budget.get("queries") is not None and stats.count > budget["queries"]:
+        problems.append(f"{stats.count} запросов при бюджете {budget['queries']}")
+    if budget.get("duplicates") is not None and stats.max_duplicates > budget["duplicates"]:
+        sql, count = stats.duplicates()[0]
+        problems.append(f"запрос повторён {count} раз при бюджете {budget['duplicates']}: {sql[:200]}")
+    if budget.get("db_ms") is not None and stats.db_ms > budget["db_ms"]:
+        problems.append(f"{stats.db_ms:.1f} мс в базе при бюджете {budget['db_ms']} мс")
+    return problems
+
+
+def server_timing(stats, total_seconds):
+    return ", ".join([
+        f'db;dur={stats.db_ms:.1f};desc="{stats.count} queries"',
+        f'tpl;dur={stats.template_ms:.1f}',
+        f'total;dur={total_seconds * 1000:.1f}',
+    ])
+
+
+class QueryBudgetMiddleware:
+    """Меряет запросы к базе на каждый запрос и сверяет их с ``QUERY_BUDGETS``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', settings.DEBUG):
+            return self.get_response(request)
+        started = time.perf_counter()
+        with collect_queries() as stats:
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else None
+        response.query_stats = stats
+        if settings.DEBUG:
+            response['Server-Timing'] = server_timing(stats, time.perf_counter() - started)
+        problems = check_budget(view_name, stats) if view_name else []
+        if problems:
+            message = f"{view_name} ({request.method} {request.path}) превысил бюджет: " + "; ".join(problems)
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class QueryBudgetTestMixin:
+    """Проверки бюджета в тестах: ответ должен пройти через ``QueryBudgetMiddleware``."""
+
+    def assertWithinQueryBudget(self, response, view_name=None):
+        stats = getattr(response, 'query_stats', None)
+        if stats is None:
+            self.fail("Ответ без query_stats: включите QUERY_BUDGET_ENABLED.")
+        view_name = view_name or response.resolver_match.view_name
+        problems = check_budget(view_name, stats)
+        if problems:
+            self.fail(f"{view_name}: " + "; ".join(problems))
@@ -0,0 +1,47 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from apps.common.benchmark import CART_LINES, SCENARIOS, compare_results, generate_dataset, run_scenario, run_scenarios
+from apps.orders.models import Order
+
+
+class BenchmarkHarnessTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.context = generate_dataset(products=6, variants=2, orders=15, seed=3)
+
+    def test_dataset_shape(self):
+        self.assertEqual(Order.objects.count(), 15)
+        self.assertEqual(len(self.context["cart_variants"]), CART_LINES)
+        self.assertEqual({variant.store_id for variant in self.context["cart_variants"]}, {self.context["store"].pk})
+
+    def test_every_scenario_reports_metrics(self):
+        results = run_scenarios(self.context, repeat=2, warmup=0)
+        self.assertEqual(set(results), set(SCENARIOS))
+        for name, row in results.items():
+            self.assertLess(row["status"], 400, name)
+            self.assertGreater(row["queries"], 0, name)
+            self.assertLessEqual(row["p50_ms"], row["p95_ms"], name)
+            self.assertGreater(row["peak_kb"], 0, name)
+
+    @override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_STRICT=True)
+    def test_scenarios_fit_query_budgets(self):
+        # Превышение бюджета в строгом режиме — исключение из вьюхи
+        cache.clear()
+        for name, row in run_scenarios(self.context, repeat=1, warmup=0).items():
+            self.assertLess(row["status"], 400, name)
+
+    def test_checkout_scenario_places_orders(self):
+        before = Order.objects.filter(user=self.context["buyer"]).count()
+        row = run_scenario("checkout", self.context, repeat=2, warmup=1)
+        self.assertEqual(row["status"], 302)
+        # прогрев, два замера и прогон для замера памяти
+        self.assertEqual(Order.objects.filter(user=self.context["buyer"]).count(), before + 4)
+
+    def test_compare_flags_regressions(self):
+        baseline = {"scenarios": {"cart_list": {"p95_ms": 10.0, "queries": 4, "peak_kb": 100.0, "status": 200}}}
+        current = {"scenarios": {"cart_list": {"p95_ms": 12.0, "queries": 5, "peak_kb": 200.0, "status": 200}}}
+        problems = compare_results(current, baseline, tolerance=0.25)
+        self.assertEqual(len(problems), 2)
+        self.assertTrue(problems[0].startswith("cart_list: запросов 5"))
+        self.assertEqual(compare_results(baseline, baseline), [])
@@ -0,0 +1,140 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from apps.accounts.models import Role, UserRole, UserSettings
+from apps.accounts.user_cache import _manager_key, _users, user_is_manager
+from apps.common.cache import LocalLRU, SQLiteCache, TieredCache
+
+User = get_user_model()
+
+
+class LocalLRUTests(SimpleTestCase):
+    def test_bounded_ttl_and_copies(self):
+        lru = LocalLRU(max_entries=2, timeout=60)
+        lru.set('a', {'n': 1})
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual(lru.get('b'), (False, None))
+        found, value = lru.get('a')
+        value['n'] = 99
+        self.assertEqual(lru.get('a'), (True, {'n': 1}))
+        lru.set('d', 4, timeout=0.01)
+        time.sleep(0.02)
+        self.assertEqual(lru.get('d'), (False, None))
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        self.backend = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 10}})
+
+    def test_basic_operations(self):
+        self.backend.set('a', {'x': 1})
+        self.assertEqual(self.backend.get('a'), {'x': 1})
+        self.assertFalse(self.backend.add('a', 2))
+        self.assertTrue(self.backend.add('b', 5))
+        self.assertEqual(self.backend.incr('b', 2), 7)
+        self.assertEqual(self.backend.get_many(['a', 'b', 'c']), {'a': {'x': 1}, 'b': 7})
+        with self.assertRaises(ValueError):
+            self.backend.incr('missing')
+        self.backend.set('short', 1, timeout=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.backend.get('short'))
+        self.assertTrue(self.backend.add('short', 2))
+        self.backend.set('a', 1, timeout=0)
+        self.assertFalse(self.backend.has_key('a'))
+
+    def test_shared_between_connections(self):
+        other = SQLiteCache(self.path, {})
+        self.backend.set('key', 'value', version=3)
+        self.assertEqual(other.get('key', version=3), 'value')
+        self.assertIsNone(other.get('key'))
+        other.clear()
+        self.assertIsNone(self.backend.get('key', version=3))
+
+
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidate_changes_version_for_all_processes(self):
+        first = TieredCache('tests.tiered', local_timeout=60)
+        second = TieredCache('tests.tiered', local_timeout=0)
+        first.set('answer', 42)
+        self.assertEqual(second.get('answer'), 42)
+        second.invalidate()
+        self.assertIsNone(second.get('answer'))
+        # Первый «процесс» держит запомненную версию и LRU, пока не истечёт local_timeout
+        self.assertEqual(first.get('answer'), 42)
+        first.clear_local()
+        self.assertIsNone(first.get('answer'))
+
+    def test_none_and_false_are_cached(self):
+        tiered = TieredCache('tests.falsy', local_timeout=0)
+        calls = []
+        for _ in range(2):
+            self.assertIs(tiered.get_or_set('flag', lambda: calls.append(1) or False), False)
+        self.assertEqual(len(calls), 1)
+
+    def test_single_flight_recompute(self):
+        tiered = TieredCache('tests.flight', local_timeout=60)
+        calls = []
+        results = []
+
+        def builder():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'payload'
+
+        threads = [threading.Thread(target=lambda: results.append(tiered.get_or_set('key', builder))) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['payload'] * 6)
+
+
+class UserCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='manager', password='secret')
+        UserSettings.objects.create(user=self.user, page_size=24)
+
+    def test_role_is_shared_between_user_objects(self):
+        role = Role.objects.create(role_name='менеджер')
+        UserRole.objects.create(user=self.user, role=role)
+        self.assertTrue(User.objects.get(pk=self.user.pk).is_manager)
+        fresh = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(fresh.is_manager)
+        UserRole.objects.filter(user=self.user).delete()
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_manager)
+
+    def test_revoked_role_is_not_recached_before_commit(self):
+        UserRole.objects.create(user=self.user, role=Role.objects.create(role_name='менеджер'))
+        self.assertTrue(user_is_manager(self.user))
+        with self.captureOnCommitCallbacks(execute=True):
+            UserRole.objects.filter(user=self.user).delete()
+            # Запрос из другого воркера до коммита ещё видит роль и кладёт её обратно в кеш
+            _users.set(_manager_key(self.user.pk), True)
+        self.assertFalse(user_is_manager(self.user))
+
+    def test_settings_invalidated_on_save(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('catalog_list'))
+        settings_obj = UserSettings.objects.get(user=self.user)
+        settings_obj.theme = 'dark'
+        settings_obj.save()
+        response = self.client.get(reverse('catalog_list'))
+        self.assertEqual(response.context['theme_preference'], 'dark')
@@ -0,0 +1,17 @@
+from django.test import TestCase
+
+from apps.common.oncommit import coalesce_on_commit
+
+
+class CoalesceOnCommitTests(TestCase):
+    def test_ids_are_merged_per_key_until_commit(self):
+        calls = []
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            coalesce_on_commit('first', [1, 2], lambda ids: calls.append(('first', ids)))
+            coalesce_on_commit('first', [2, 3], lambda ids: calls.append(('other', ids)))
+            coalesce_on_commit('second', [1], lambda ids: calls.append(('second', ids)))
+            coalesce_on_commit('second', [], lambda ids: calls.append(('empty', ids)))
+            self.assertEqual(calls, [])
+        self.assertEqual(len(callbacks), 2)
+        self.assertEqual(calls, [('first', {1, 2, 3}), ('second', {1})])
+
@@ -0,0 +1,73 @@
+import logging
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.cart.models import CartItem
+from apps.catalog.models import Favorite, Product
+from apps.common.benchmark import generate_dataset
+from apps.common.querybudget import QueryBudgetExceeded, QueryBudgetTestMixin, collect_queries, fingerprint
+
+
+@override_settings(QUERY_BUDGET_ENABLED=True)
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.context = generate_dataset(products=12, variants=3, orders=40, seed=5)
+        self.client.force_login(self.context["buyer"])
+
+    def test_fingerprint_ignores_in_list_length(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "T" WHERE "ID" IN (%s, %s)'),
+            fingerprint('SELECT *  FROM "T"\nWHERE "ID" IN (%s, %s, %s)'),
+        )
+
+    def test_collect_queries_counts_duplicates(self):
+        with collect_queries() as stats:
+            for product in Product.objects.all()[:3]:
+                list(product.variants.all())
+        self.assertEqual(stats.count, 4)
+        self.assertEqual(stats.max_duplicates, 3)
+
+    def test_storefront_views_stay_within_budget(self):
+        product_ids = list(Product.objects.values_list('pk', flat=True)[:4])
+        for product_id in product_ids:
+            Favorite.objects.create(user=self.context["buyer"], product_id=product_id)
+        item = CartItem.objects.create(
+            user=self.context["buyer"], product_variant=self.context["cart_variants"][0], quantity=1, price=1,
+        )
+        token = self.client.post(
+            reverse('remove_from_cart', args=[item.pk]), HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        ).json()['undo_token']
+        responses = [
+            self.client.get(reverse('catalog_list')),
+            self.client.get(reverse('product_detail', args=[self.context["product_id"]])),
+            self.client.get(reverse('view_cart')),
+            self.client.post(reverse('cart_undo'), {'token': token}, HTTP_X_REQUESTED_WITH='XMLHttpRequest'),
+            self.client.post(reverse('favorites_add_all_to_cart'), HTTP_X_REQUESTED_WITH='XMLHttpRequest'),
+            self.client.get(reverse('checkout')),
+            self.client.get(reverse('orders:order_history')),
+        ]
+        self.client.force_login(self.context["manager"])
+        responses.append(self.client.get(reverse('reports:manager_dashboard')))
+        for response in responses:
+            self.assertLess(response.status_code, 400, response.resolver_match.view_name)
+            self.assertWithinQueryBudget(response)
+
+    @override_settings(DEBUG=True, QUERY_BUDGETS={'catalog_list': 1})
+    def test_debug_adds_server_timing_and_logs_overrun(self):
+        with self.assertLogs('apps.common.querybudget', logging.WARNING) as logs:
+            response = self.client.get(reverse('catalog_list'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('catalog_list', logs.output[0])
+
+    @override_settings(QUERY_BUDGET_STRICT=True, QUERY_BUDGETS={'catalog_list': {'queries': 1}})
+    def test_strict_mode_fails_request(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('catalog_list'))
+
+    def test_template_time_is_recorded(self):
+        response = self.client.get(reverse('view_cart'))
+        self.assertGreater(response.query_stats.template_ms, 0)
+        self.assertLess(response.query_stats.template_ms, 60 * 1000)
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "apps.jobs"
+
+    def ready(self):
+        # Обработчики задач лежат в модулях jobs.py приложений
+        from django.utils.module_loading import autodiscover_modules
+
+        autodiscover_modules('jobs')
@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.jobs.services import DEFAULT_POLL_INTERVAL, requeue_stale, run_pending, worker_loop
+
+
+def _worker_main(stop_event, poll_interval):
+    # Родитель обрабатывает сигналы сам и останавливает детей через stop_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    worker_loop(stop_event=stop_event, poll_interval=poll_interval)
+
+
+class Command(BaseCommand):
+    help = "Запускает процессы-воркеры фоновых задач (таблица Jobs)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=max(1, min(4, os.cpu_count() or 1)))
+        parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL)
+        parser.add_argument('--once', action='store_true', help="Выполнить накопившиеся задачи в текущем процессе и выйти.")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            requeue_stale()
+            done = run_pending()
+            self.stdout.write(self.style.SUCCESS(f"Выполнено задач: {done}."))
+            return
+
+        context = multiprocessing.get_context('fork')
+        stop_event = context.Event()
+        processes = max(1, options['processes'])
+        poll_interval = max(0.1, options['poll_interval'])
+
+        def spawn():
+            # Соединения родителя нельзя наследовать в дочерних процессах
+            connections.close_all()
+            process = context.Process(target=_worker_main, args=(stop_event, poll_interval), daemon=True)
+            process.start()
+            return process
+
+        stopping = []
+
+        def stop(signum, frame):
+            # В обработчике сигнала нельзя трогать stop_event: его блокировка может быть уже захвачена
+            stopping.append(signum)
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        workers = [spawn() for _ in range(processes)]
+        self.stdout.write(f"Запущено воркеров: {processes} (PID {', '.join(str(p.pid) for p in workers)})")
+        self.stdout.flush()
+        while not stopping:
+            time.sleep(poll_interval)
+            for index, process in enumerate(workers):
+                if not process.is_alive() and not stopping:
+                    self.stderr.write(f"Воркер {process.pid} завершился с кодом {process.exitcode}, перезапуск.")
+                    workers[index] = spawn()
+        stop_event.set()
+        for process in workers:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+        self.stdout.write(self.style.SUCCESS("Воркеры остановлены."))
@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-17 20:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('job_id', models.AutoField(db_column='JobID', primary_key=True, serialize=False)),
+                ('kind', models.CharField(db_column='Kind', max_length=100)),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], db_column='Status', default='queued', max_length=20)),
+                ('payload', models.JSONField(blank=True, db_column='Payload', default=dict)),
+                ('result', models.JSONField(blank=True, db_column='Result', default=dict)),
+                ('result_file', models.CharField(blank=True, db_column='ResultFile', default='', max_length=500)),
+                ('error', models.TextField(blank=True, db_column='Error', default='')),
+                ('attempts', models.PositiveIntegerField(db_column='Attempts', default=0)),
+                ('worker', models.CharField(blank=True, db_column='Worker', default='', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_column='CreatedAt')),
+                ('started_at', models.DateTimeField(blank=True, db_column='StartedAt', null=True)),
+                ('finished_at', models.DateTimeField(blank=True, db_column='FinishedAt', null=True)),
+                ('created_by', models.ForeignKey(blank=True, db_column='CreatedBy', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'Jobs',
+                'indexes': [models.Index(fields=['status', 'job_id'], name='jobs_status_id')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 21:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, db_column='HeartbeatAt', null=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import models
+
+
+class Job(models.Model):
+    """Фоновая задача: ставится вьюхой, выполняется процессом ``run_workers``."""
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Готово'),
+        (STATUS_FAILED, 'Ошибка'),
+    )
+
+    job_id = models.AutoField(primary_key=True, db_column='JobID')
+    kind = models.CharField(max_length=100, db_column='Kind')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_column='Status')
+    payload = models.JSONField(default=dict, blank=True, db_column='Payload')
+    result = models.JSONField(default=dict, blank=True, db_column='Result')
+    result_file = models.CharField(max_length=500, blank=True, default='', db_column='ResultFile')
+    error = models.TextField(blank=True, default='', db_column='Error')
+    attempts = models.PositiveIntegerField(default=0, db_column='Attempts')
+    worker = models.CharField(max_length=100, blank=True, default='', db_column='Worker')
+    created_by = models.ForeignKey(
+        'accounts.User', on_delete=models.SET_NULL, null=True, blank=True,
+        db_column='CreatedBy', related_name='jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_column='CreatedAt')
+    started_at = models.DateTimeField(null=True, blank=True, db_column='StartedAt')
+    heartbeat_at = models.DateTimeField(null=True, blank=True, db_column='HeartbeatAt')
+    finished_at = models.DateTimeField(null=True, blank=True, db_column='FinishedAt')
+
+    class Meta:
+        db_table = 'Jobs'
+        indexes = [models.Index(fields=['status', 'job_id'], name='jobs_status_id')]
+
+    def __str__(self):
+        return f"{self.kind} #{self.job_id} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
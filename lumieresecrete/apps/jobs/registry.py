@@ -0,0 +1,26 @@
+"""Реестр обработчиков фоновых задач.
+
+Обработчик — функция ``handler(job)``, которая возвращает словарь результата.
+Если задача создаёт файл для скачивания, путь кладётся в ключ ``"file"``
+(удобно получать его через ``services.result_path``). Приложения регистрируют
+обработчики в своих модулях ``jobs.py`` — их подхватывает ``JobsConfig.ready``.
+"""
+_HANDLERS = {}
+
+
+def register(kind):
+    def decorator(func):
+        _HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def get_handler(kind):
+    try:
+        return _HANDLERS[kind]
+    except KeyError:
+        raise LookupError(f"Неизвестный тип задачи: {kind}") from None
+
+
+def registered_kinds():
+    return sorted(_HANDLERS)
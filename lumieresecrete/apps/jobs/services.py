@@ -0,0 +1,186 @@
+"""Очередь фоновых задач в таблице ``Jobs`` без внешнего брокера.
+
+Задачу захватывает условный ``UPDATE ... WHERE Status = 'queued'`` — из
+нескольких процессов его выигрывает ровно один, так что блокировки строк и
+``SKIP LOCKED`` не нужны и очередь одинаково работает на PostgreSQL и SQLite.
+Пока обработчик работает, отдельный поток раз в ``JOBS_HEARTBEAT_INTERVAL`` секунд
+обновляет ``heartbeat_at``. Задачи без пульса дольше ``JOBS_STALE_AFTER`` секунд
+(процесс воркера умер) возвращаются в очередь, пока не исчерпан
+``JOBS_MAX_ATTEMPTS``; итог записывается, только если строка всё ещё
+принадлежит этому воркеру, поэтому «воскресший» воркер не затрёт чужой запуск.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+from .registry import get_handler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_STALE_AFTER = 5 * 60
+DEFAULT_HEARTBEAT_INTERVAL = 60
+DEFAULT_MAX_ATTEMPTS = 3
+CLAIM_CANDIDATES = 10
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def results_dir():
+    return Path(_setting('JOBS_RESULT_DIR', Path(settings.BASE_DIR).parent / "job_results"))
+
+
+def result_path(job, filename):
+    """Путь для файла-результата задачи; каталог создаётся при необходимости."""
+    directory = results_dir() / str(job.job_id)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / filename
+
+
+def enqueue(kind, payload=None, user=None):
+    """Ставит задачу в очередь; тип проверяется сразу, чтобы опечатка не ждала воркера."""
+    get_handler(kind)
+    return Job.objects.create(kind=kind, payload=payload or {}, created_by=user)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_next(worker=None):
+    """Захватывает самую старую задачу из очереди или возвращает None."""
+    worker = worker or worker_name()
+    while True:
+        candidates = list(
+            Job.objects.filter(status=Job.STATUS_QUEUED).order_by('job_id').values_list('job_id', flat=True)[:CLAIM_CANDIDATES]
+        )
+        if not candidates:
+            return None
+        for job_id in candidates:
+            now = timezone.now()
+            claimed = Job.objects.filter(job_id=job_id, status=Job.STATUS_QUEUED).update(
+                status=Job.STATUS_RUNNING,
+                worker=worker,
+                started_at=now,
+                heartbeat_at=now,
+                attempts=F('attempts') + 1,
+            )
+            if claimed:
+                return Job.objects.get(job_id=job_id)
+
+
+def _owned(job):
+    return Job.objects.filter(job_id=job.job_id, status=Job.STATUS_RUNNING, worker=job.worker)
+
+
+def heartbeat(job):
+    """Отмечает, что воркер жив; ``False``, если задачу уже отдали другому воркеру."""
+    return bool(_owned(job).update(heartbeat_at=timezone.now()))
+
+
+def _heartbeat_loop(job, stop_event, interval):
+    try:
+        while not stop_event.wait(interval):
+            try:
+                if not heartbeat(job):
+                    break
+            except Exception:
+                logger.exception("Не удалось обновить пульс задачи %s #%s", job.kind, job.job_id)
+    finally:
+        connections.close_all()
+
+
+def run_job(job):
+    """Выполняет захваченную задачу и сохраняет результат или текст ошибки."""
+    stop_event = threading.Event()
+    pulse = threading.Thread(
+        target=_heartbeat_loop,
+        args=(job, stop_event, _setting('JOBS_HEARTBEAT_INTERVAL', DEFAULT_HEARTBEAT_INTERVAL)),
+        name=f"job-heartbeat-{job.job_id}",
+        daemon=True,
+    )
+    pulse.start()
+    try:
+        handler = get_handler(job.kind)
+        result = handler(job) or {}
+    except Exception:
+        logger.exception("Задача %s #%s завершилась ошибкой", job.kind, job.job_id)
+        job.status = Job.STATUS_FAILED
+        job.error = traceback.format_exc(limit=20)
+    else:
+        file_path = result.pop('file', '')
+        job.status = Job.STATUS_DONE
+        job.result = result
+        job.result_file = str(file_path) if file_path else ''
+        job.error = ''
+    finally:
+        stop_event.set()
+        pulse.join()
+    job.finished_at = timezone.now()
+    saved = _owned(job).update(
+        status=job.status, result=job.result, result_file=job.result_file,
+        error=job.error, finished_at=job.finished_at,
+    )
+    if not saved:
+        logger.warning("Задача %s #%s уже не принадлежит воркеру %s, результат отброшен", job.kind, job.job_id, job.worker)
+        job.refresh_from_db()
+    return job
+
+
+def requeue_stale(now=None):
+    """Возвращает в очередь задачи, чей воркер перестал слать пульс; исчерпавшие попытки помечает ошибкой."""
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=_setting('JOBS_STALE_AFTER', DEFAULT_STALE_AFTER))
+    stale = Job.objects.filter(status=Job.STATUS_RUNNING, heartbeat_at__lt=cutoff)
+    max_attempts = _setting('JOBS_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=Job.STATUS_FAILED, error="Воркер не завершил задачу.", finished_at=now,
+    )
+    requeued = stale.filter(attempts__lt=max_attempts).update(status=Job.STATUS_QUEUED, worker='')
+    return requeued, failed
+
+
+def run_pending(limit=None, worker=None):
+    """Выполняет задачи из очереди, пока она не опустеет (или до ``limit`` штук)."""
+    done = 0
+    while limit is None or done < limit:
+        job = claim_next(worker)
+        if job is None:
+            break
+        run_job(job)
+        done += 1
+    return done
+
+
+def worker_loop(stop_event=None, poll_interval=None):
+    """Цикл процесса-воркера: берёт задачи, а при пустой очереди спит ``poll_interval`` секунд."""
+    poll_interval = poll_interval or _setting('JOBS_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+    worker = worker_name()
+    while stop_event is None or not stop_event.is_set():
+        close_old_connections()
+        try:
+            requeue_stale()
+            job = claim_next(worker)
+        except Exception:
+            logger.exception("Воркер %s не смог получить задачу", worker)
+            job = None
+        if job is None:
+            if stop_event is not None:
+                stop_event.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+            continue
+        run_job(job)
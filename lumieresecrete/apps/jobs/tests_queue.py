@@ -0,0 +1,110 @@
+import csv
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.models import Role, UserRole
+from apps.catalog.models import Category, Product
+from apps.jobs.models import Job
+from apps.jobs.registry import register
+from apps.jobs.services import claim_next, enqueue, heartbeat, requeue_stale, run_job, run_pending
+from apps.orders.models import Order, OrderItem
+from apps.product_variants.models import Colors, ProductVariant, Sizes
+from apps.stores.models import Store
+
+User = get_user_model()
+
+
+@register('tests.fail')
+def _failing_job(job):
+    raise ValueError("сломалось")
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.results = tempfile.TemporaryDirectory()
+        self.addCleanup(self.results.cleanup)
+        override = override_settings(JOBS_RESULT_DIR=self.results.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.manager = User.objects.create_user(username='manager', password='secret')
+        UserRole.objects.create(user=self.manager, role=Role.objects.create(role_name='менеджер'))
+        self.client.login(username='manager', password='secret')
+
+    def test_job_is_claimed_once(self):
+        job = enqueue('tests.fail')
+        self.assertEqual(claim_next('first').job_id, job.job_id)
+        self.assertIsNone(claim_next('second'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.attempts), (Job.STATUS_RUNNING, 'first', 1))
+
+    def test_failure_is_recorded(self):
+        job = enqueue('tests.fail', user=self.manager)
+        self.assertEqual(run_pending(), 1)
+        data = self.client.get(reverse('jobs:job_status', args=[job.job_id]), {'format': 'json'}).json()
+        self.assertEqual(data['status'], Job.STATUS_FAILED)
+        self.assertIn('сломалось', data['error'])
+        self.assertIsNone(data['download_url'])
+
+    @override_settings(JOBS_STALE_AFTER=60, JOBS_MAX_ATTEMPTS=2)
+    def test_stale_jobs_are_requeued_until_attempts_run_out(self):
+        job = enqueue('tests.fail')
+        claim_next('dead-worker')
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(requeue_stale(), (1, 0))
+        claim_next('dead-worker')
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(requeue_stale(), (0, 1))
+
+    @override_settings(JOBS_STALE_AFTER=60)
+    def test_long_job_with_heartbeat_is_not_requeued(self):
+        job = enqueue('tests.fail')
+        claimed = claim_next('busy-worker')
+        Job.objects.filter(pk=job.pk).update(
+            started_at=timezone.now() - timedelta(hours=2), heartbeat_at=timezone.now() - timedelta(minutes=5),
+        )
+        self.assertTrue(heartbeat(claimed))
+        self.assertEqual(requeue_stale(), (0, 0))
+
+    @override_settings(JOBS_STALE_AFTER=60)
+    def test_requeued_job_is_not_finished_by_previous_worker(self):
+        job = enqueue('tests.fail')
+        slow = claim_next('slow-worker')
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+        requeue_stale()
+        claim_next('new-worker')
+        self.assertFalse(heartbeat(slow))
+        run_job(slow)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.error), (Job.STATUS_RUNNING, 'new-worker', ''))
+
+    def test_background_export_is_polled_and_downloaded(self):
+        store = Store.objects.create(name='Бутик')
+        variant = ProductVariant.objects.create(
+            product=Product.objects.create(name='Кольцо', category=Category.objects.create(name='Кольца')),
+            color=Colors.objects.create(name_color='Золото'), size=Sizes.objects.create(size='17'),
+            store=store, price=Decimal('990.00'), quantity=5,
+        )
+        order = Order.objects.create(user=self.manager, store=store, total_amount=0, placed_at=timezone.now())
+        OrderItem.objects.create(order=order, product_variant=variant, quantity=2, price=variant.price)
+
+        response = self.client.get(reverse('reports:manager_export'), {'period': '7d', 'format': 'csv', 'background': '1'})
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('jobs:job_status', args=[job.job_id]))
+        self.assertEqual(job.payload['params'], {'period': '7d', 'format': 'csv'})
+
+        run_pending()
+        data = self.client.get(reverse('jobs:job_status', args=[job.job_id]), {'format': 'json'}).json()
+        self.assertEqual(data['status'], Job.STATUS_DONE)
+        download = self.client.get(data['download_url'])
+        rows = list(csv.reader(b''.join(download.streaming_content).decode('utf-8').splitlines()))
+        self.assertEqual(rows[1][2:], ['Бутик', 'Кольцо', '2', '1980.00'])
+
+        other = User.objects.create_user(username='other', password='secret')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(data['download_url']).status_code, 403)
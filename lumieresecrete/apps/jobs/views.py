@@ -0,0 +1,47 @@
+from pathlib import Path
+
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, HttpResponseForbidden, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
+
+from .models import Job
+
+
+def _can_access(job, user):
+    return user.is_staff or (job.created_by_id is not None and job.created_by_id == user.id)
+
+
+def job_payload(job):
+    return {
+        "id": job.job_id,
+        "kind": job.kind,
+        "status": job.status,
+        "status_label": job.get_status_display(),
+        "finished": job.is_finished,
+        "result": job.result,
+        "error": job.error.strip().splitlines()[-1] if job.error else '',
+        "download_url": reverse('jobs:job_download', args=[job.job_id]) if job.result_file else None,
+    }
+
+
+@login_required
+def job_status(request, job_id: int):
+    job = get_object_or_404(Job, job_id=job_id)
+    if not _can_access(job, request.user):
+        return HttpResponseForbidden("Недостаточно прав.")
+    payload = job_payload(job)
+    if request.GET.get('format') == 'json':
+        return JsonResponse(payload)
+    return render(request, 'jobs/job_status.html', {"job": job, "job_data": payload})
+
+
+@login_required
+def job_download(request, job_id: int):
+    job = get_object_or_404(Job, job_id=job_id, status=Job.STATUS_DONE)
+    if not _can_access(job, request.user):
+        return HttpResponseForbidden("Недостаточно прав.")
+    path = Path(job.result_file) if job.result_file else None
+    if path is None or not path.is_file():
+        raise Http404("Файл результата не найден")
+    return FileResponse(path.open('rb'), as_attachment=True, filename=path.name)
@@ -0,0 +1,107 @@
+"""Дата оформления и данные покупателя из оформления заказа.
+
+Исторически ``Order.created_at`` — varchar вида
+``"2024-05-01 12:30 | Имя: Анна | Телефон: +7..."``. Новые заказы дополнительно
+пишут время в индексированное поле ``placed_at``, а пары «метка: значение» — в
+JSON ``checkout_meta``; старые строки переносит команда
+``backfill_order_placed_at``. Строка ``created_at`` продолжает заполняться в
+прежнем формате, чтобы не ломать выгрузки и SQL-процедуры.
+"""
+from datetime import datetime
+
+from django.utils import timezone
+
+META_SEPARATOR = ' | '
+META_LABELS = {
+    "Имя": "first_name",
+    "Фамилия": "last_name",
+    "Телефон": "phone",
+    "Адрес": "address",
+    "Город": "city",
+    "Комментарий": "comment",
+    "Доставка": "shipping",
+    "Бутик": "pickup_store",
+}
+META_KEYS = {key: label for label, key in META_LABELS.items()}
+DATETIME_FORMATS = ("%Y-%m-%d %H:%M", "%Y-%m-%d", "%d.%m.%Y %H:%M", "%d.%m.%Y")
+
+
+def parse_timestamp(value):
+    """Разбирает дату из начала строки ``created_at``; возвращает aware datetime или None."""
+    if not value:
+        return None
+    head = str(value).split(META_SEPARATOR, 1)[0].strip()
+    for fmt in DATETIME_FORMATS:
+        try:
+            parsed = datetime.strptime(head, fmt)
+        except (ValueError, TypeError):
+            continue
+        return timezone.make_aware(parsed, timezone.get_current_timezone())
+    return None
+
+
+def parse_meta(value):
+    """Пары «метка: значение» из хвоста строки ``created_at`` в виде словаря с латинскими ключами."""
+    meta = {}
+    if not value:
+        return meta
+    for chunk in str(value).split(META_SEPARATOR)[1:]:
+        label, sep, text = chunk.partition(':')
+        if not sep:
+            continue
+        label = label.strip()
+        meta[META_LABELS.get(label, label)] = text.strip()
+    return meta
+
+
+def format_created_at(placed_at, meta):
+    """Собирает строку ``created_at`` в прежнем формате из времени и метаданных."""
+    result = timezone.localtime(placed_at).strftime("%Y-%m-%d %H:%M")
+    for key, value in meta.items():
+        if value:
+            result += f"{META_SEPARATOR}{META_KEYS.get(key, key)}: {value}"
+    return result
+
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_orders(batch_size=BACKFILL_BATCH_SIZE, start_after=0, progress=None):
+    """Заполняет ``placed_at`` и ``checkout_meta`` у заказов, где ``placed_at`` ещё пуст.
+
+    Идёт пачками по возрастанию ``order_id`` и пишет каждую пачку одним
+    ``bulk_update``, поэтому прерванный запуск можно продолжить: повторный
+    проход подхватит только незаполненные строки, а ``start_after`` позволяет
+    пропустить уже просмотренный диапазон. Заказы, чью дату разобрать не
+    удалось, остаются с пустым ``placed_at`` (и не попадают в фильтры по
+    периоду и отчёты) — они считаются отдельно. Возвращает
+    ``(обновлено, пропущено, последний id)``.
+    """
+    from .models import Order
+
+    updated = skipped = 0
+    last_id = start_after or 0
+    while True:
+        batch = list(
+            Order.objects.filter(placed_at__isnull=True, order_id__gt=last_id)
+            .order_by('order_id')
+            .only('order_id', 'created_at', 'checkout_meta')[:batch_size]
+        )
+        if not batch:
+            break
+        changed = []
+        for order in batch:
+            placed_at = parse_timestamp(order.created_at)
+            if placed_at is None:
+                skipped += 1
+                continue
+            order.placed_at = placed_at
+            order.checkout_meta = parse_meta(order.created_at) or order.checkout_meta or {}
+            changed.append(order)
+        if changed:
+            Order.objects.bulk_update(changed, ['placed_at', 'checkout_meta'])
+        updated += len(changed)
+        last_id = batch[-1].order_id
+        if progress is not None:
+            progress(updated, skipped, last_id)
+    return updated, skipped, last_id
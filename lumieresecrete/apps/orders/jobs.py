@@ -0,0 +1,31 @@
+import shutil
+from datetime import date
+
+from apps.jobs.registry import register
+from apps.jobs.services import result_path
+
+from .models import Order
+
+
+@register('orders.receipt_pdf')
+def render_receipt_job(job):
+    """PDF-чек заказа для менеджера; ``payload``: ``order_id``, ``base_url``."""
+    from .views import _cached_receipt_pdf
+
+    order = Order.objects.select_related('user', 'status', 'store', 'promo_code').get(order_id=job.payload['order_id'])
+    path = result_path(job, f"receipt_{order.order_id}.pdf")
+    cached, _ = _cached_receipt_pdf(order, base_url=job.payload.get('base_url'))
+    shutil.copyfile(cached, path)
+    return {"file": str(path), "order_id": order.order_id}
+
+
+@register('orders.day_receipts')
+def render_day_receipts_job(job):
+    """ZIP со всеми чеками за день для бухгалтерии; ``payload``: ``day`` (YYYY-MM-DD), ``base_url``."""
+    from .receipt_pool import write_day_receipts
+
+    day = date.fromisoformat(job.payload['day'])
+    path = result_path(job, f"receipts_{day.isoformat()}.zip")
+    with open(path, 'wb') as fileobj:
+        count = write_day_receipts(day, fileobj, base_url=job.payload.get('base_url'))
+    return {"file": str(path), "day": day.isoformat(), "receipts": count}
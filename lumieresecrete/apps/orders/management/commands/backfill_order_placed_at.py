@@ -0,0 +1,35 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from apps.orders.checkout_meta import BACKFILL_BATCH_SIZE, backfill_orders
+
+
+class Command(BaseCommand):
+    help = "Переносит дату и данные покупателя из строки Orders.CreatedAt в поля PlacedAt и CheckoutMeta."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE)
+        parser.add_argument(
+            '--start-after', type=int, default=0,
+            help="Продолжить с заказа, следующего за указанным ID (последний ID печатается после каждой пачки).",
+        )
+
+    def handle(self, *args, **options):
+        def progress(updated, skipped, last_id):
+            self.stdout.write(f"Обработано до заказа #{last_id}, заполнено: {updated}, без даты: {skipped}")
+
+        updated, skipped, last_id = backfill_orders(
+            batch_size=max(1, options['batch_size']),
+            start_after=max(0, options['start_after']),
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Готово: заполнено {updated} заказов, последний ID {last_id}."))
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f"У {skipped} заказов дата в CreatedAt не распознана, PlacedAt остался пустым: "
+                "они не попадут в отчёты и фильтры по периоду. Исправьте CreatedAt "
+                "(заказы с PlacedAt IS NULL) и запустите команду повторно."
+            ))
+        if updated:
+            # bulk_update не шлёт сигналов, поэтому дневные итоги продаж пересобираем целиком
+            call_command('rebuild_sales_rollup', stdout=self.stdout)
@@ -0,0 +1,39 @@
+import os
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.orders.receipt_pool import shutdown_receipt_pool, start_receipt_pool, write_day_receipts
+
+
+class Command(BaseCommand):
+    help = "Складывает PDF-чеки всех заказов за день в ZIP-архив для бухгалтерии."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="День в формате YYYY-MM-DD (по умолчанию — вчера).")
+        parser.add_argument('--output', help="Путь к архиву (по умолчанию receipts_<дата>.zip в текущем каталоге).")
+        parser.add_argument('--base-url', default='/', help="Адрес сайта для ссылок и QR-кодов в чеках.")
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help="Число процессов рендеринга (0 — рендерить в текущем процессе).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            day = date.fromisoformat(options['date']) if options['date'] else timezone.localdate() - timedelta(days=1)
+        except ValueError as exc:
+            raise CommandError("Дата --date должна быть в формате YYYY-MM-DD.") from exc
+        output = options['output'] or f"receipts_{day.isoformat()}.zip"
+
+        def progress(written):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Готово чеков: {written}")
+
+        start_receipt_pool(workers=max(0, options['workers']))
+        try:
+            with open(output, 'wb') as fileobj:
+                written = write_day_receipts(day, fileobj, base_url=options['base_url'], progress=progress)
+        finally:
+            shutdown_receipt_pool()
+        self.stdout.write(self.style.SUCCESS(f"Чеков за {day.isoformat()}: {written}, архив {output}."))
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-17 20:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_ordernotification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='checkout_meta',
+            field=models.JSONField(blank=True, db_column='CheckoutMeta', default=dict),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='placed_at',
+            field=models.DateTimeField(blank=True, db_column='PlacedAt', db_index=True, null=True),
+        ),
+    ]
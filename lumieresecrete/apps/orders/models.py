@@ -1,8 +1,8 @@
 from decimal import Decimal
 
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import F, Q
+from django.db import connection, models
+from django.db.models import Q
 from django.utils import timezone
 
 class Status(models.Model):
@@ -71,15 +71,39 @@ class PromoCode(models.Model):
             return min(self.discount_amount, amount).quantize(Decimal('0.01'))
         return Decimal('0')
 
-    def register_use(self):
-        PromoCode.objects.filter(pk=self.pk).update(usage_count=F('usage_count') + 1)
-        self.refresh_from_db(fields=['usage_count'])
+    def register_use(self) -> bool:
+        """Атомарно засчитывает использование; ``False``, если лимит в базе уже исчерпан.
+
+        Новое значение счётчика возвращается тем же ``UPDATE ... RETURNING`` и
+        записывается в ``usage_count``, так что ``limit_reached`` не требует запроса.
+        """
+        quote = connection.ops.quote_name
+        count = quote(self._meta.get_field('usage_count').column)
+        limit = quote(self._meta.get_field('usage_limit').column)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {quote(self._meta.db_table)} SET {count} = {count} + 1 "
+                f"WHERE {quote(self._meta.pk.column)} = %s "
+                f"AND ({limit} IS NULL OR {limit} = 0 OR {count} < {limit}) RETURNING {count}",
+                [self.pk],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return False
+        self.usage_count = row[0]
+        return True
+
+    @property
+    def limit_reached(self) -> bool:
+        return bool(self.usage_limit) and self.usage_count >= self.usage_limit
 
 
 class Order(models.Model):
     order_id = models.AutoField(primary_key=True, db_column='OrderID')
     user = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True, db_column='UserID')
     created_at = models.CharField(max_length=255, null=True, blank=True, db_column='CreatedAt')  # SQL использует varchar
+    placed_at = models.DateTimeField(null=True, blank=True, db_index=True, db_column='PlacedAt')
+    checkout_meta = models.JSONField(default=dict, blank=True, db_column='CheckoutMeta')
     status = models.ForeignKey(Status, on_delete=models.SET_NULL, null=True, db_column='StatusID')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, db_column='TotalAmount')
     store = models.ForeignKey('stores.Store', on_delete=models.SET_NULL, null=True, db_column='StoreID')
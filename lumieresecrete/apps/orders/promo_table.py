@@ -0,0 +1,108 @@
+"""Таблица промокодов в памяти процесса.
+
+Корзина проверяет промокод при каждом показе. Поэтому все коды один раз
+читаются из базы и раскладываются в словарь по нормализованному коду (без
+пробелов, в верхнем регистре, как их сохраняет ``PromoCode.save``). В записи
+заранее посчитаны процент скидки, окно действия и лимит. Проверка кода —
+только сравнения в памяти, без запросов.
+
+Сохранение или удаление ``PromoCode`` поднимает версию пространства
+``orders.promo`` в общем кеше (``apps.common.cache``). Каждый процесс сверяет
+версию не чаще раза в ``CHECK_INTERVAL`` секунд и перечитывает таблицу, если
+она сменилась. Использование кода засчитывается
+условным ``UPDATE`` (``PromoCode.register_use``). При заказе решает именно он,
+поэтому таблица, устаревшая на пару секунд, не позволит превысить лимит.
+"""
+import threading
+import time
+from decimal import Decimal
+
+from django.db import transaction
+
+from apps.common.cache import namespace
+
+from .models import PromoCode
+
+CHECK_INTERVAL = 5
+
+# Своя копия таблицы и так живёт в процессе — LRU пространства не нужен
+_promos = namespace('orders.promo', local_timeout=0)
+
+_table = None
+_lock = threading.Lock()
+
+
+def normalize_code(code):
+    return (code or '').strip().upper()
+
+
+def _generation():
+    return _promos.version()
+
+
+def _compile(promo):
+    return {
+        "promo": promo,
+        "code": promo.code,
+        "is_active": promo.is_active,
+        "percent": (promo.discount_percent / Decimal('100')) if promo.discount_percent else None,
+        "amount": promo.discount_amount or None,
+        "min_total": promo.min_order_total or Decimal('0'),
+        "valid_from": promo.valid_from,
+        "valid_to": promo.valid_to,
+        "exhausted": bool(promo.usage_limit) and promo.usage_count >= promo.usage_limit,
+    }
+
+
+def _load(generation):
+    codes = {normalize_code(promo.code): _compile(promo) for promo in PromoCode.objects.all()}
+    return {"generation": generation, "checked_at": time.monotonic(), "codes": codes}
+
+
+def _current_table():
+    global _table
+    table = _table
+    if table is not None and time.monotonic() - table["checked_at"] < CHECK_INTERVAL:
+        return table
+    generation = _generation()
+    with _lock:
+        table = _table
+        if table is None or table["generation"] != generation:
+            table = _table = _load(generation)
+        else:
+            table["checked_at"] = time.monotonic()
+    return table
+
+
+def lookup_promo(code):
+    """Запись кода из таблицы или ``None``, если такого кода нет."""
+    return _current_table()["codes"].get(normalize_code(code))
+
+
+def claim_promo(promo):
+    """Засчитывает использование кода при заказе; ``False``, если лимит уже исчерпан.
+
+    Когда лимитированный код израсходован до конца, таблица сбрасывается после
+    коммита заказа, и корзины перестают его предлагать. Сброс до коммита дал бы
+    другим процессам перечитать ещё не исчерпанную строку и держать её до
+    следующей правки кода.
+    """
+    if not promo.register_use():
+        # Исчерпание уже закоммичено кем-то другим, а заказ сейчас откатится — сбрасываем сразу
+        reset_promo_table()
+        return False
+    if promo.limit_reached:
+        transaction.on_commit(reset_promo_table)
+    return True
+
+
+def forget_promo_table():
+    """Сбрасывает таблицу только в текущем процессе."""
+    global _table
+    _table = None
+
+
+def reset_promo_table():
+    """Сбрасывает таблицу во всех процессах; вызывается после коммита правки промокода."""
+    _promos.invalidate()
+    forget_promo_table()
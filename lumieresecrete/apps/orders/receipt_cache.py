@@ -0,0 +1,95 @@
+"""Дисковый кэш PDF-чеков.
+
+Чек зависит только от заказа, его позиций и того, публичная это версия или
+личная, поэтому готовый PDF хранится в ``RECEIPT_CACHE_DIR`` под ключом
+``<order_id>/<public|private>-<хэш>.pdf``. Хэш считается по дешёвым запросам
+(поля заказа и ``values_list`` позиций) и одновременно служит ETag ответа:
+клиент с совпадающим ``If-None-Match`` получает 304 без рендеринга, а любое
+изменение позиций, статуса или скидки даёт новый ключ. Сигналы заказа и
+позиций после коммита удаляют каталог заказа, чтобы устаревшие файлы не
+копились.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+
+def cache_dir():
+    return Path(getattr(settings, 'RECEIPT_CACHE_DIR', Path(settings.BASE_DIR).parent / 'receipt_cache'))
+
+
+def receipt_fingerprint(order, public=False, extra=()):
+    """Хэш содержимого чека; ``extra`` — строки, влияющие на вёрстку (адрес сайта, цель QR-кода)."""
+    from .models import OrderItem
+
+    user = order.user
+    parts = [
+        'public' if public else 'private',
+        order.order_id,
+        order.status_id,
+        order.discount_amount,
+        order.total_amount,
+        order.promo_code_id,
+        order.placed_at.isoformat() if order.placed_at else order.created_at,
+    ]
+    if user is not None:
+        parts.extend([user.get_full_name() or user.username])
+        if not public:
+            parts.append(getattr(getattr(user, 'profile', None), 'address', '') or '')
+    parts.extend(
+        OrderItem.objects.filter(order_id=order.order_id).order_by('pk').values_list(
+            'pk', 'product_variant_id', 'product_variant__product__name',
+            'product_variant__color__name_color', 'product_variant__size__size',
+            'quantity', 'price',
+        )
+    )
+    parts.extend(extra)
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()[:32]
+
+
+def receipt_etag(fingerprint):
+    return f'"{fingerprint}"'
+
+
+def receipt_path(order_id, fingerprint, public=False):
+    return cache_dir() / str(order_id) / f"{'public' if public else 'private'}-{fingerprint}.pdf"
+
+
+def load_receipt(order_id, fingerprint, public=False):
+    """Путь к готовому PDF или None, если его ещё нет."""
+    path = receipt_path(order_id, fingerprint, public)
+    return path if path.is_file() else None
+
+
+def store_receipt(order_id, fingerprint, pdf, public=False):
+    """Атомарно записывает PDF: параллельный запрос видит либо старый файл, либо целый новый."""
+    path = receipt_path(order_id, fingerprint, public)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Прежние ревизии той же версии чека больше не понадобятся
+    for stale in path.parent.glob(f"{'public' if public else 'private'}-*.pdf"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(pdf)
+        os.replace(tmp_name, path)
+    except Exception:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return path
+
+
+def invalidate_receipts(order_id):
+    shutil.rmtree(cache_dir() / str(order_id), ignore_errors=True)
+
+
+def schedule_receipt_invalidation(order_id):
+    """Удаляет чеки заказа после коммита: до него другие запросы ещё видят прежние данные."""
+    if order_id:
+        transaction.on_commit(lambda: invalidate_receipts(order_id))
@@ -0,0 +1,201 @@
+"""Пул процессов для рендеринга PDF-чеков.
+
+WeasyPrint тратит заметное время на поиск шрифтов и разбор стилей, и всё это
+выполняется в процессе веб-воркера. Пул из ``RECEIPT_POOL_WORKERS`` процессов
+запускается при старте приложения (``wsgi.py``/``asgi.py``); каждый процесс
+один раз настраивает Django, разбирает таблицу стилей чека и прогревает
+шрифты пробным рендером, после чего принимает заказы пачками.
+
+Процессы запускаются через ``spawn``: форк веб-процесса унаследовал бы его
+соединения с базой и потоки. Если пул выключен (``RECEIPT_POOL_WORKERS = 0``)
+или сломался, чеки рендерятся в текущем процессе — API от этого не меняется.
+
+Готовые PDF проходят через дисковый кэш (``receipt_cache``), поэтому пачка
+рендерит только заказы, чьей ревизии ещё нет на диске.
+"""
+import atexit
+import logging
+import multiprocessing
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 60
+DEFAULT_BATCH_SIZE = 50
+_WARMUP_HTML = '<html><body><h1>Lumiere Secrète</h1><p>Прогрев шрифтов</p></body></html>'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+    from . import views
+
+    if views.HTML is None:
+        return
+    styles = views._receipt_styles()
+    font_config = styles[1] if styles else None
+    # Первый рендер подгружает шрифты fontconfig/Pango — пусть это случится до первого чека
+    views.HTML(string=_WARMUP_HTML).write_pdf(font_config=font_config)
+
+
+def _render_local(tasks):
+    """Рендерит ``tasks`` — список ``(order_id, public, base_url, qr_target)`` — в текущем процессе."""
+    from . import views
+    from .models import Order
+
+    orders = Order.objects.select_related('user', 'status', 'store', 'promo_code').in_bulk(
+        [order_id for order_id, _, _, _ in tasks]
+    )
+    return [
+        views._render_receipt_pdf(orders[order_id], public=public, base_url=base_url, qr_target=qr_target)
+        for order_id, public, base_url, qr_target in tasks
+    ]
+
+
+def _render_in_worker(tasks):
+    from django.db import close_old_connections
+
+    close_old_connections()
+    return _render_local(tasks)
+
+
+def start_receipt_pool(workers=None):
+    """Запускает и прогревает пул, если он включён настройкой; повторный вызов ничего не делает."""
+    global _pool
+    workers = _setting('RECEIPT_POOL_WORKERS', 0) if workers is None else workers
+    if workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+            # Executor поднимает процессы лениво — пустые задачи заставляют их стартовать сразу
+            for future in [_pool.submit(_render_in_worker, []) for _ in range(workers)]:
+                future.add_done_callback(_log_failure)
+            atexit.register(shutdown_receipt_pool)
+        return _pool
+
+
+def shutdown_receipt_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Пул рендеринга чеков не запустился: %s", future.exception())
+
+
+def _chunks(items, size):
+    for index in range(0, len(items), size):
+        yield items[index:index + size]
+
+
+def _render_tasks(tasks):
+    """Рендерит задачи в пуле пачками параллельно, а без пула — в текущем процессе."""
+    if not tasks:
+        return []
+    pool = _pool
+    if pool is not None:
+        workers = pool._max_workers
+        # Пачка не больше RECEIPT_BATCH_SIZE, но так, чтобы работа досталась всем процессам
+        size = max(1, min(_setting('RECEIPT_BATCH_SIZE', DEFAULT_BATCH_SIZE), -(-len(tasks) // workers)))
+        try:
+            results = pool.map(_render_in_worker, _chunks(tasks, size), timeout=_setting('RECEIPT_POOL_TIMEOUT', DEFAULT_TIMEOUT))
+            return [pdf for chunk in results for pdf in chunk]
+        except (BrokenProcessPool, FutureTimeout, RuntimeError) as exc:
+            logger.warning("Пул рендеринга чеков недоступен (%s), рендерим в текущем процессе", exc)
+    return _render_local(tasks)
+
+
+def render_receipt(order, public=False, base_url=None, qr_target=None):
+    """Байты PDF одного чека без обращения к кэшу (кэширует вызывающий код)."""
+    return _render_tasks([(order.order_id, public, base_url, qr_target)])[0]
+
+
+def render_receipts(orders, public=False, base_url=None):
+    """Байты PDF для пачки заказов: ``{order_id: bytes}``.
+
+    Чеки, уже лежащие в кэше, читаются с диска, остальные рендерятся
+    параллельно и сохраняются в кэш.
+    """
+    from .receipt_cache import load_receipt, store_receipt
+    from .views import _receipt_revision
+
+    results = {}
+    misses = []
+    for order in orders:
+        _, qr_target, revision = _receipt_revision(order, public=public, base_url=base_url)
+        path = load_receipt(order.order_id, revision, public)
+        if path is not None:
+            results[order.order_id] = path.read_bytes()
+        else:
+            misses.append((order, revision, qr_target))
+    rendered = _render_tasks([(order.order_id, public, base_url, qr_target) for order, _, qr_target in misses])
+    for (order, revision, _), pdf in zip(misses, rendered):
+        store_receipt(order.order_id, revision, pdf, public)
+        results[order.order_id] = pdf
+    return results
+
+
+def day_orders(day):
+    from apps.reports.rollup import day_bounds
+
+    from .models import Order
+
+    start, end = day_bounds(day)
+    return (
+        Order.objects.filter(placed_at__gte=start, placed_at__lt=end)
+        .select_related('user', 'status', 'store', 'promo_code')
+        .order_by('placed_at', 'order_id')
+    )
+
+
+def write_day_receipts(day, fileobj, base_url=None, progress=None):
+    """Пишет ZIP со всеми чеками за локальный день ``day``; возвращает число чеков.
+
+    Заказы обрабатываются пачками ``RECEIPT_BATCH_SIZE``, так что в памяти
+    держится только одна пачка PDF.
+    """
+    batch_size = max(1, _setting('RECEIPT_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+    written = 0
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        batch = []
+        for order in day_orders(day).iterator(chunk_size=batch_size):
+            batch.append(order)
+            if len(batch) >= batch_size:
+                written += _write_batch(archive, batch, base_url)
+                batch = []
+                if progress is not None:
+                    progress(written)
+        if batch:
+            written += _write_batch(archive, batch, base_url)
+            if progress is not None:
+                progress(written)
+    return written
+
+
+def _write_batch(archive, orders, base_url):
+    for order_id, pdf in render_receipts(orders, base_url=base_url).items():
+        archive.writestr(f"receipt_{order_id}.pdf", pdf)
+    return len(orders)
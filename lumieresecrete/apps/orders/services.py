@@ -1,50 +1,112 @@
 from decimal import Decimal
 
 from django.core.exceptions import ValidationError
-from django.db import DatabaseError, connection, transaction
+from django.db import connection, transaction
+from django.utils import timezone
 
-from .models import Order, OrderItem
+from apps.auditlog.signals import log_bulk_create
 from apps.product_variants.models import ProductVariant
+from apps.product_variants.stock import reserve_stock
+
+from .checkout_meta import format_created_at
+from .models import Order, OrderItem, Payment
+from .promo_table import claim_promo
+from .signals import order_items_created
 
 class OrderService:
     @staticmethod
-    def create_order(user, cart_items):
-        if not cart_items:
+    def build_items(lines):
+        """Несохранённые позиции из строк ``(вариант, количество, цена)``; проверка — без запросов к базе.
+
+        Ошибки всех строк собираются в один ``ValidationError``.
+        """
+        items = []
+        errors = []
+        for index, (variant, quantity, price) in enumerate(lines, start=1):
+            if variant is None:
+                errors.append(f"Позиция {index}: товар больше недоступен.")
+                continue
+            item = OrderItem(product_variant=variant, quantity=quantity, price=price)
+            try:
+                item.clean_fields(exclude=['order', 'product_variant'])
+                item.clean()
+            except ValidationError as exc:
+                errors.extend(f"Позиция {index} ({variant}): {message}" for message in exc.messages)
+                continue
+            items.append(item)
+        if errors:
+            raise ValidationError(errors)
+        if not items:
             raise ValidationError("Корзина пуста — нечего оформлять.")
-        with transaction.atomic():
-            order = Order.objects.create(user=user, total_amount=Decimal('0.00'))
-            for raw_item in cart_items:
-                variant_id = raw_item.get('product_variant_id')
-                quantity = int(raw_item.get('quantity', 0) or 0)
-                if quantity <= 0:
-                    raise ValidationError("Количество товара должно быть положительным.")
-                try:
-                    variant = ProductVariant.objects.get(pk=variant_id)
-                except ProductVariant.DoesNotExist as exc:
-                    raise ValidationError(f"Вариант товара с ID {variant_id} не найден.") from exc
+        return items
 
-                try:
-                    with connection.cursor() as cursor:
-                        cursor.execute(
-                            "CALL sp_adjust_variant_stock(%s, %s)",
-                            [variant.pk, -quantity]
-                        )
-                except DatabaseError as db_exc:
-                    raise ValidationError(
-                        f"Не удалось зарезервировать остаток для {variant}: {db_exc}"
-                    ) from db_exc
+    @staticmethod
+    def place_order(user, lines, *, status=None, store=None, placed_at=None, checkout_meta=None,
+                    discount=Decimal('0'), promo_code=None, payment=None):
+        """Оформляет заказ из строк корзины одной транзакцией.
 
-                OrderItem.objects.create(
-                    order=order,
-                    product_variant=variant,
-                    quantity=quantity,
-                    price=variant.price
-                )
+        Остатки всех позиций резервируются одним ``reserve_stock`` (при нехватке —
+        ``InsufficientStock`` со всеми недостающими позициями). Позиции
+        проверяются в памяти и вставляются одним ``bulk_create``, итоги
+        считаются один раз, заказ сохраняется один раз. ``bulk_create`` не шлёт
+        ``post_save``, поэтому вместо событий по каждой позиции пишется одно
+        пакетное событие аудита и рассылается ``order_items_created``.
+        ``payment`` — словарь ``method``/``status`` для записи об оплате.
+        """
+        items = OrderService.build_items(lines)
+        subtotal = sum((item.price * item.quantity for item in items), Decimal('0'))
+        discount = min(discount or Decimal('0'), subtotal)
+        total = max(Decimal('0'), subtotal - discount)
+        placed_at = placed_at or timezone.now()
+        checkout_meta = checkout_meta or {}
+        with transaction.atomic():
+            reserve_stock([(item.product_variant_id, item.quantity) for item in items])
+            order = Order.objects.create(
+                user=user,
+                status=status,
+                store=store,
+                total_amount=total,
+                discount_amount=discount,
+                promo_code=promo_code,
+                created_at=format_created_at(placed_at, checkout_meta),
+                placed_at=placed_at,
+                checkout_meta=checkout_meta,
+            )
+            for item in items:
+                item.order = order
+            OrderItem.objects.bulk_create(items)
+            if connection.vendor == 'postgresql':
+                # Триггер trg_orderitems_recalculate переписал TotalAmount суммой позиций без скидки
+                Order.objects.filter(pk=order.pk).update(total_amount=total)
+            log_bulk_create(items, object_pk=order.pk)
+            order_items_created.send(sender=OrderItem, order=order, items=items)
+            if promo_code is not None and not claim_promo(promo_code):
+                raise ValidationError("Промокод больше недоступен.")
+            if payment:
+                Payment.objects.create(order=order, method=payment['method'], amount=total, status=payment['status'])
+        return order
 
-            with connection.cursor() as cursor:
-                cursor.execute("CALL sp_recalculate_order_total(%s)", [order.order_id])
-            order.refresh_from_db(fields=["total_amount"])
-            return order
+    @staticmethod
+    def create_order(user, cart_items):
+        """Заказ из API-корзины: ``cart_items`` — словари ``product_variant_id``/``quantity``, цены берутся из вариантов."""
+        if not cart_items:
+            raise ValidationError("Корзина пуста — нечего оформлять.")
+        requested = []
+        for raw_item in cart_items:
+            quantity = int(raw_item.get('quantity', 0) or 0)
+            if quantity <= 0:
+                raise ValidationError("Количество товара должно быть положительным.")
+            try:
+                variant_id = int(raw_item.get('product_variant_id'))
+            except (TypeError, ValueError) as exc:
+                raise ValidationError("Не указан вариант товара.") from exc
+            requested.append((variant_id, quantity))
+        variants = ProductVariant.objects.in_bulk([variant_id for variant_id, _ in requested])
+        missing = [str(variant_id) for variant_id, _ in requested if variant_id not in variants]
+        if missing:
+            raise ValidationError(f"Варианты товара с ID {', '.join(missing)} не найдены.")
+        lines = [(variants[variant_id], quantity, variants[variant_id].price) for variant_id, quantity in requested]
+        return OrderService.place_order(user, lines)
 
     @staticmethod
     def update_order_status(order_id, status_id):
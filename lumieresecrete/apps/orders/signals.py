@@ -1,12 +1,18 @@
-from django.db.models.signals import post_save, pre_save
-from django.dispatch import receiver
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
 
 from apps.auditlog.utils import get_current_user
 
-from .models import Order, OrderNotification, OrderStatusHistory
+from .models import Order, OrderItem, OrderNotification, OrderStatusHistory, PromoCode
+from .promo_table import forget_promo_table, reset_promo_table
+from .receipt_cache import schedule_receipt_invalidation
 
 _PREVIOUS_STATUS = {}
 
+# bulk_create позиций не шлёт post_save: подписчики получают заказ и список созданных позиций
+order_items_created = Signal()
+
 
 @receiver(pre_save, sender=Order)
 def cache_previous_status(sender, instance, **kwargs):
@@ -47,3 +53,24 @@ def track_status_history(sender, instance, created, **kwargs):
             old_status=previous_status_name or "—",
             new_status=status_name or "",
         )
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def drop_cached_receipts(sender, instance, created=False, **kwargs):
+    if not created:
+        schedule_receipt_invalidation(instance.pk)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def drop_cached_item_receipts(sender, instance, **kwargs):
+    schedule_receipt_invalidation(instance.order_id)
+
+
+@receiver(post_save, sender=PromoCode)
+@receiver(post_delete, sender=PromoCode)
+def refresh_promo_table(sender, instance, **kwargs):
+    # Свой процесс перечитает таблицу сразу, остальные — когда правка закоммичена
+    forget_promo_table()
+    transaction.on_commit(reset_promo_table)
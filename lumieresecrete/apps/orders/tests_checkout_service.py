@@ -0,0 +1,95 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.auditlog.models import AuditLog
+from apps.cart.models import CartItem
+from apps.catalog.models import Category, Product
+from apps.orders.models import Order, OrderItem, OrderStatusHistory, Payment, Status
+from apps.orders.services import OrderService
+from apps.product_variants.models import Colors, ProductVariant, Sizes
+from apps.reports.models import DailySalesRollup
+from apps.stores.models import Store
+
+User = get_user_model()
+
+
+class CheckoutServiceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', password='secret', first_name='Анна', last_name='Иванова')
+        self.store = Store.objects.create(name='Бутик')
+        self.status = Status.objects.create(name_status='В обработке')
+        category = Category.objects.create(name='Кольца')
+        color = Colors.objects.create(name_color='Золото')
+        self.variants = [
+            ProductVariant.objects.create(
+                product=Product.objects.create(name=f'Кольцо {index}', category=category),
+                color=color, size=Sizes.objects.create(size=str(15 + index)),
+                store=self.store, price=Decimal('1000.00') * (index + 1), quantity=10,
+            )
+            for index in range(10)
+        ]
+
+    def _lines(self, count):
+        return [(variant, 2, variant.price) for variant in self.variants[:count]]
+
+    def _place(self, count, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return OrderService.place_order(self.user, self._lines(count), status=self.status, store=self.store, **kwargs)
+
+    def test_order_is_created_with_totals_and_one_audit_event(self):
+        order = self._place(
+            3, discount=Decimal('500.00'), payment={'method': 'Онлайн оплата картой', 'status': 'В обработке'},
+        )
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal('11500.00'))
+        self.assertEqual(order.discount_amount, Decimal('500.00'))
+        self.assertEqual(OrderItem.objects.filter(order=order).count(), 3)
+        self.assertEqual(Payment.objects.get(order=order).amount, Decimal('11500.00'))
+        self.assertEqual(OrderStatusHistory.objects.filter(order=order).count(), 1)
+        audit = AuditLog.objects.get(model_name='OrderItem')
+        self.assertEqual((audit.object_pk, audit.changes['count']), (str(order.pk), 3))
+        self.assertEqual(DailySalesRollup.objects.count(), 3)
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        counts = []
+        for size in (2, 10):
+            # Пересборки после коммита (витрина, итоги продаж) здесь не выполняются — считаем саму транзакцию
+            with self.captureOnCommitCallbacks(execute=False), CaptureQueriesContext(connection) as queries:
+                OrderService.place_order(self.user, self._lines(size), status=self.status, store=self.store)
+            counts.append(len(queries.captured_queries))
+            self.assertEqual(
+                len([q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "OrderItems"')]), 1
+            )
+        self.assertEqual(counts[0], counts[1])
+
+    def test_invalid_lines_are_reported_together_and_nothing_is_saved(self):
+        lines = [(self.variants[0], 0, Decimal('10.00')), (self.variants[1], 1, Decimal('-1.00')), (None, 1, Decimal('1'))]
+        with self.assertRaises(ValidationError) as ctx:
+            OrderService.place_order(self.user, lines, status=self.status)
+        self.assertEqual(len(ctx.exception.messages), 3)
+        self.assertFalse(Order.objects.exists())
+
+    def test_checkout_view_uses_bulk_path(self):
+        for variant in self.variants[:4]:
+            CartItem.objects.create(user=self.user, product_variant=variant, quantity=1, price=variant.price)
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('checkout'), {
+                'first_name': 'Анна', 'last_name': 'Иванова', 'phone': '+7 999 000-00-00',
+                'shipping_method': 'pickup', 'pickup_location': str(self.store.store_id),
+                'payment_flow': 'later', 'delivery_payment_method': 'cash_on_delivery',
+            })
+        self.assertRedirects(response, reverse('orders:order_history'), fetch_redirect_response=False)
+        order = Order.objects.get(user=self.user)
+        self.assertEqual(order.total_amount, Decimal('10000.00'))
+        self.assertEqual(order.orderitem_set.count(), 4)
+        self.assertEqual(order.payment_set.get().status, 'Ожидает оплаты')
+        self.assertFalse(CartItem.objects.filter(user=self.user).exists())
@@ -0,0 +1,59 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.orders.checkout_meta import backfill_orders, format_created_at, parse_meta, parse_timestamp
+from apps.orders.models import Order
+
+User = get_user_model()
+
+
+class OrderPlacedAtTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='anna', password='secret')
+
+    def _legacy_order(self, created_at):
+        return Order.objects.create(user=self.user, total_amount=1000, created_at=created_at)
+
+    def test_parses_legacy_string_with_metadata(self):
+        value = '2025-03-01 10:15 | Имя: Анна | Телефон: +79990000000 | Бутик: Тверская, 1'
+        placed_at = parse_timestamp(value)
+        self.assertEqual(timezone.localtime(placed_at).strftime('%Y-%m-%d %H:%M'), '2025-03-01 10:15')
+        meta = parse_meta(value)
+        self.assertEqual(meta, {'first_name': 'Анна', 'phone': '+79990000000', 'pickup_store': 'Тверская, 1'})
+        self.assertEqual(format_created_at(placed_at, meta), value)
+
+    def test_backfill_is_batched_and_resumable(self):
+        first = self._legacy_order('2025-01-01 12:00 | Имя: Анна')
+        broken = self._legacy_order('когда-то')
+        last = self._legacy_order('02.01.2025 09:30')
+        updated, skipped, last_id = backfill_orders(batch_size=1, start_after=first.order_id)
+        self.assertEqual((updated, skipped, last_id), (1, 1, last.order_id))
+        first.refresh_from_db()
+        self.assertIsNone(first.placed_at)
+
+        updated, skipped, _ = backfill_orders(batch_size=2)
+        self.assertEqual((updated, skipped), (1, 1))
+        first.refresh_from_db()
+        self.assertEqual(first.checkout_meta, {'first_name': 'Анна'})
+        self.assertIsNotNone(first.placed_at)
+        self.assertFalse(Order.objects.filter(pk=broken.pk, placed_at__isnull=False).exists())
+
+        out = StringIO()
+        call_command('backfill_order_placed_at', stdout=out)
+        self.assertIn("У 1 заказов дата в CreatedAt не распознана", out.getvalue())
+
+    def test_history_period_filter_uses_placed_at(self):
+        recent = self._legacy_order('')
+        old = self._legacy_order('')
+        Order.objects.filter(pk=recent.pk).update(placed_at=timezone.now() - timedelta(days=2))
+        Order.objects.filter(pk=old.pk).update(placed_at=timezone.now() - timedelta(days=40))
+        self.client.login(username='anna', password='secret')
+        response = self.client.get(reverse('orders:order_history'), {'period': '30d'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([card['id'] for card in response.context['orders']], [recent.order_id])
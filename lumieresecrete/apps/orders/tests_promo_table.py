@@ -0,0 +1,94 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.cart.models import CartItem
+from apps.catalog.models import Category, Product
+from apps.orders import promo_table
+from apps.orders.models import Order, PromoCode
+from apps.orders.services import OrderService
+from apps.product_variants.models import Colors, ProductVariant, Sizes
+from apps.stores.models import Store
+
+User = get_user_model()
+
+
+class PromoTableTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.promo = PromoCode.objects.create(
+                code=' vip10 ', discount_percent=Decimal('10.00'), min_order_total=Decimal('3000.00'),
+            )
+
+    def test_lookup_is_case_insensitive_and_served_from_memory(self):
+        promo_table.lookup_promo('VIP10')
+        with self.assertNumQueries(0):
+            entry = promo_table.lookup_promo('  Vip10')
+        self.assertEqual(entry['promo'].pk, self.promo.pk)
+        self.assertEqual(entry['percent'], Decimal('0.1'))
+        self.assertIsNone(promo_table.lookup_promo('NOPE'))
+
+    def test_saving_promo_refreshes_table(self):
+        self.assertTrue(promo_table.lookup_promo('VIP10')['is_active'])
+        self.promo.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.promo.save()
+        self.assertFalse(promo_table.lookup_promo('VIP10')['is_active'])
+
+    def test_register_use_never_exceeds_limit(self):
+        self.promo.usage_limit = 2
+        self.promo.save()
+        self.assertEqual([self.promo.register_use() for _ in range(3)], [True, True, False])
+        self.promo.refresh_from_db()
+        self.assertEqual(self.promo.usage_count, 2)
+
+    def test_claiming_last_use_marks_code_exhausted(self):
+        self.promo.usage_limit = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            self.promo.save()
+        entry = promo_table.lookup_promo('VIP10')
+        self.assertFalse(entry['exhausted'])
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(1):
+                self.assertTrue(promo_table.claim_promo(entry['promo']))
+            # До коммита заказа таблица не сбрасывается
+            self.assertFalse(promo_table.lookup_promo('VIP10')['exhausted'])
+        self.assertTrue(promo_table.lookup_promo('VIP10')['exhausted'])
+        self.assertFalse(promo_table.claim_promo(entry['promo']))
+
+
+class PromoCheckoutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', password='secret')
+        self.client.force_login(self.user)
+        self.variant = ProductVariant.objects.create(
+            product=Product.objects.create(name='Колье', category=Category.objects.create(name='Украшения')),
+            color=Colors.objects.create(name_color='Золото'), size=Sizes.objects.create(size='45'),
+            store=Store.objects.create(name='Бутик'), price=Decimal('40000.00'), quantity=5,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            CartItem.objects.create(user=self.user, product_variant=self.variant, quantity=1, price=self.variant.price)
+            self.promo = PromoCode.objects.create(code='VIP10', discount_percent=Decimal('10.00'), usage_limit=1)
+
+    def test_apply_promo_uses_table(self):
+        response = self.client.post(
+            reverse('cart_apply_promo'), {'promo': 'vip10'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['totals']['total'], '36000.00')
+
+    def test_exhausted_code_rolls_back_order(self):
+        PromoCode.objects.filter(pk=self.promo.pk).update(usage_count=1)
+        with self.assertRaises(ValidationError):
+            OrderService.place_order(
+                self.user, [(self.variant, 1, self.variant.price)], discount=Decimal('4000.00'), promo_code=self.promo,
+            )
+        self.assertFalse(Order.objects.exists())
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.quantity, 5)
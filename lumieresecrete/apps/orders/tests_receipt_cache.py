@@ -0,0 +1,90 @@
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.catalog.models import Category, Product
+from apps.orders.models import Order, OrderItem, OrderShareToken, Status
+from apps.orders.receipt_cache import receipt_fingerprint
+from apps.product_variants.models import Colors, ProductVariant, Sizes
+from apps.stores.models import Store
+
+User = get_user_model()
+
+
+class ReceiptCacheTests(TestCase):
+    def setUp(self):
+        self.cache = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache.cleanup)
+        override = override_settings(RECEIPT_CACHE_DIR=self.cache.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        html_patch = mock.patch('apps.orders.views.HTML')
+        self.html = html_patch.start()
+        self.addCleanup(html_patch.stop)
+        self.html.return_value.write_pdf.return_value = b'%PDF-FAKE'
+
+        self.user = User.objects.create_user(username='alice', password='secret')
+        product = Product.objects.create(name='Кольцо', category=Category.objects.create(name='Кольца'))
+        variant = ProductVariant.objects.create(
+            product=product, price=1000, quantity=5,
+            color=Colors.objects.create(name_color='Золото'), size=Sizes.objects.create(size='17'),
+            store=Store.objects.create(name='Бутик'),
+        )
+        self.order = Order.objects.create(user=self.user, status=Status.objects.create(name_status='Создан'), total_amount=1000)
+        self.item = OrderItem.objects.create(order=self.order, product_variant=variant, quantity=1, price=1000)
+        self.url = reverse('orders:order_receipt', args=[self.order.order_id])
+        self.client.login(username='alice', password='secret')
+
+    def _renders(self):
+        return self.html.return_value.write_pdf.call_count
+
+    def test_repeated_download_is_served_from_disk(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(b''.join(first.streaming_content), b'%PDF-FAKE')
+        second = self.client.get(self.url)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(self._renders(), 1)
+        self.assertEqual(len(list(Path(self.cache.name, str(self.order.order_id)).glob('private-*.pdf'))), 1)
+
+    def test_download_computes_fingerprint_once(self):
+        self.client.get(self.url)
+        with mock.patch('apps.orders.views.receipt_fingerprint', wraps=receipt_fingerprint) as fingerprint:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(fingerprint.call_count, 1)
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self._renders(), 1)
+
+    def test_item_change_invalidates_receipt(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.quantity = 2
+            self.item.save()
+        self.assertFalse(Path(self.cache.name, str(self.order.order_id)).exists())
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self._renders(), 2)
+
+    def test_public_and_private_versions_are_cached_separately(self):
+        token = OrderShareToken.objects.create(
+            order=self.order, token='public-token', expires_at=timezone.now() + timedelta(days=1)
+        )
+        self.client.get(self.url)
+        public_url = reverse('orders:order_receipt_public', args=[self.order.order_id, token.token])
+        self.client.logout()
+        self.assertEqual(self.client.get(public_url).status_code, 200)
+        self.client.get(public_url)
+        self.assertEqual(self._renders(), 2)
+        directory = Path(self.cache.name, str(self.order.order_id))
+        self.assertEqual(len(list(directory.glob('public-*.pdf'))), 1)
@@ -0,0 +1,89 @@
+import io
+import tempfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.catalog.models import Category, Product
+from apps.orders import receipt_pool
+from apps.orders.models import Order, OrderItem
+from apps.product_variants.models import Colors, ProductVariant, Sizes
+from apps.reports.rollup import day_bounds
+from apps.stores.models import Store
+
+User = get_user_model()
+
+
+class _InlinePool:
+    """Подменяет ProcessPoolExecutor: выполняет пачки в тесте и запоминает их."""
+
+    _max_workers = 2
+
+    def __init__(self):
+        self.chunks = []
+
+    def map(self, fn, chunks, timeout=None):
+        chunks = list(chunks)
+        self.chunks.extend(chunks)
+        return [receipt_pool._render_local(chunk) for chunk in chunks]
+
+
+class ReceiptPoolTests(TestCase):
+    def setUp(self):
+        self.cache = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache.cleanup)
+        override = override_settings(RECEIPT_CACHE_DIR=self.cache.name, RECEIPT_BATCH_SIZE=2)
+        override.enable()
+        self.addCleanup(override.disable)
+        html_patch = mock.patch('apps.orders.views.HTML')
+        self.html = html_patch.start()
+        self.addCleanup(html_patch.stop)
+        self.html.return_value.write_pdf.side_effect = lambda **kwargs: b'%PDF-FAKE'
+
+        user = User.objects.create_user(username='buyer', password='secret')
+        store = Store.objects.create(name='Бутик')
+        variant = ProductVariant.objects.create(
+            product=Product.objects.create(name='Серьги', category=Category.objects.create(name='Серьги')),
+            color=Colors.objects.create(name_color='Серебро'), size=Sizes.objects.create(size='—'),
+            store=store, price=500, quantity=50,
+        )
+        self.day = timezone.localdate() - timedelta(days=1)
+        placed_at = day_bounds(self.day)[0] + timedelta(hours=12)
+        self.orders = []
+        for _ in range(3):
+            order = Order.objects.create(user=user, store=store, total_amount=500, placed_at=placed_at)
+            OrderItem.objects.create(order=order, product_variant=variant, quantity=1, price=500)
+            self.orders.append(order)
+        other = Order.objects.create(user=user, store=store, total_amount=500, placed_at=timezone.now() - timedelta(days=3))
+        OrderItem.objects.create(order=other, product_variant=variant, quantity=1, price=500)
+
+    def _renders(self):
+        return self.html.return_value.write_pdf.call_count
+
+    def test_batch_render_uses_disk_cache(self):
+        results = receipt_pool.render_receipts(self.orders, base_url='http://shop.test/')
+        self.assertEqual(sorted(results), [order.order_id for order in self.orders])
+        self.assertEqual(self._renders(), 3)
+        receipt_pool.render_receipts(self.orders, base_url='http://shop.test/')
+        self.assertEqual(self._renders(), 3)
+
+    def test_pool_receives_batches_for_every_worker(self):
+        pool = _InlinePool()
+        with mock.patch.object(receipt_pool, '_pool', pool):
+            results = receipt_pool.render_receipts(self.orders, base_url='http://shop.test/')
+        self.assertEqual(len(results), 3)
+        self.assertEqual([len(chunk) for chunk in pool.chunks], [2, 1])
+
+    def test_day_archive_contains_only_that_day(self):
+        buffer = io.BytesIO()
+        written = receipt_pool.write_day_receipts(self.day, buffer, base_url='http://shop.test/')
+        self.assertEqual(written, 3)
+        with zipfile.ZipFile(io.BytesIO(buffer.getvalue())) as archive:
+            self.assertEqual(
+                sorted(archive.namelist()),
+                sorted(f"receipt_{order.order_id}.pdf" for order in self.orders),
+            )
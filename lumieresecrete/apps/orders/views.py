@@ -1,10 +1,12 @@
 import base64
 import json
+import threading
 from datetime import datetime, timedelta
 from decimal import Decimal, InvalidOperation
+from functools import lru_cache
 from io import BytesIO
 from typing import Optional
-from urllib.parse import quote_plus
+from urllib.parse import quote_plus, urljoin
 
 import qrcode
 from django.conf import settings
@@ -12,6 +14,7 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q
 from django.http import (
+    FileResponse,
     HttpResponse,
     HttpResponseBadRequest,
     HttpResponseForbidden,
@@ -24,6 +27,7 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.crypto import get_random_string
 from django.utils.decorators import method_decorator
 from django.views import View
@@ -32,20 +36,28 @@ from django.views.decorators.http import require_POST
 from rest_framework import status, viewsets
 from rest_framework.response import Response
 try:
-    from weasyprint import HTML
+    from weasyprint import CSS, HTML
+    from weasyprint.text.fonts import FontConfiguration
     _WEASYPRINT_ERROR = None
 except Exception as exc:  # noqa: F401
-    HTML = None
+    CSS = HTML = FontConfiguration = None
     _WEASYPRINT_ERROR = exc
 
 from apps.cart.models import CartItem
+from apps.common.pagination import (
+    CURSOR_PARAM, KEYSET_MODE, PAGINATION_PARAM, keyset_paginate, wants_keyset,
+)
+from apps.orders.checkout_meta import parse_timestamp
 from apps.orders.models import Order, OrderItem, OrderShareToken, Status
+from apps.orders.receipt_cache import load_receipt, receipt_etag, receipt_fingerprint, store_receipt
+from apps.orders.receipt_pool import render_receipt
 try:
     from apps.stores.models import Store
 except Exception:
     Store = None
 
 PLACEHOLDER_IMAGE = "https://placehold.co/160x160/F1ECE6/2E2E2E?text=LS"
+ORDER_HISTORY_PAGE_SIZE = 8
 PERIOD_OPTIONS = {
     '7d': ('Последние 7 дней', 7),
     '30d': ('Последние 30 дней', 30),
@@ -55,18 +67,6 @@ PERIOD_OPTIONS = {
 }
 
 
-def _parse_order_datetime(value):
-    if not value:
-        return None
-    patterns = ("%Y-%m-%d %H:%M", "%Y-%m-%d", "%d.%m.%Y %H:%M", "%d.%m.%Y")
-    for fmt in patterns:
-        try:
-            return datetime.strptime(value, fmt)
-        except (ValueError, TypeError):
-            continue
-    return None
-
-
 def _build_order_cards(orders, *, product_term=None, order_number=None, highlight_predicates=None):
     highlight_predicates = highlight_predicates or []
     product_term = (product_term or '').lower()
@@ -116,6 +116,7 @@ def _build_order_cards(orders, *, product_term=None, order_number=None, highligh
             "id": order.order_id,
             "status": getattr(order.status, 'name_status', '—'),
             "created_at": order.created_at,
+            "placed_at": order.placed_at,
             "total": order.total_amount,
             "detail_url": reverse('orders:order_detail', args=[order.order_id]) if hasattr(order, 'order_id') else '#',
             "matches": matches,
@@ -210,6 +211,7 @@ class OrderCreateView(_OrderJsonMixin, View):
             "total_amount": payload.get("total_amount", 0),
             "store_id": payload.get("store_id"),
             "created_at": payload.get("created_at"),
+            "placed_at": parse_timestamp(payload.get("created_at")) or timezone.now(),
         }
         order = Order.objects.create(**data)
         return JsonResponse(self._order_to_dict(order), status=201)
@@ -230,6 +232,8 @@ class OrderUpdateView(_OrderJsonMixin, View):
         for field in ["status_id", "total_amount", "store_id", "created_at"]:
             if field in payload:
                 setattr(order, field, payload[field])
+        if "created_at" in payload:
+            order.placed_at = parse_timestamp(payload["created_at"]) or order.placed_at
         order.save()
         return JsonResponse(self._order_to_dict(order))
 
@@ -248,18 +252,15 @@ class OrderDeleteView(View):
 
 
 def _parse_order_datetime(value: Optional[str]) -> datetime:
-    if not value:
-        return timezone.now()
-    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d", "%d.%m.%Y %H:%M"):
-        try:
-            return timezone.make_aware(datetime.strptime(value, fmt))
-        except (ValueError, TypeError):
-            continue
-    return timezone.now()
+    return parse_timestamp(value) or timezone.now()
+
+
+def _order_placed_at(order: Order) -> datetime:
+    return order.placed_at or _parse_order_datetime(order.created_at)
 
 
 def _build_status_timeline(order: Order):
-    base_time = _parse_order_datetime(order.created_at)
+    base_time = _order_placed_at(order)
     history = []
     if hasattr(order, "status_history"):
         history = list(order.status_history.order_by("changed_at"))
@@ -302,21 +303,11 @@ def _build_order_items(order: Order):
         return []
     for item in items_manager.select_related(
         'product_variant__product', 'product_variant__color', 'product_variant__size'
-    ).prefetch_related(
-        'product_variant__images',
-        'product_variant__product__images'
     ):
         variant = item.product_variant
         product = getattr(variant, 'product', None)
         product_id = getattr(product, 'product_id', None)
-        image = None
-        if hasattr(variant, 'get_primary_image_url'):
-            image = variant.get_primary_image_url()
-        if not image and product and hasattr(product, 'images'):
-            legacy = product.images.first()
-            if legacy and legacy.image_url:
-                image = legacy.image_url
-        image = image or PLACEHOLDER_IMAGE
+        image = getattr(variant, 'primary_image_url', '') or PLACEHOLDER_IMAGE
         items.append({
             "name": getattr(product, 'name', str(variant)),
             "product_id": product_id,
@@ -362,8 +353,6 @@ def order_history(request):
         .select_related('status', 'store')
         .prefetch_related(
             'orderitem_set__product_variant__product',
-            'orderitem_set__product_variant__images',
-            'orderitem_set__product_variant__product__images'
         )
         .order_by('-order_id')
     )
@@ -386,17 +375,19 @@ def order_history(request):
         qs = qs.filter(status__name_status=status_filter)
     if store_filter:
         qs = qs.filter(store__store_id=store_filter)
-    orders = list(qs)
+    if query:
+        qs = qs.distinct()
     if period in PERIOD_OPTIONS and PERIOD_OPTIONS[period][1]:
         start_date = timezone.now() - timedelta(days=PERIOD_OPTIONS[period][1])
-        filtered = []
-        for order in orders:
-            parsed = _parse_order_datetime(order.created_at)
-            if parsed and parsed >= start_date:
-                filtered.append(order)
-        orders = filtered
-    paginator = Paginator(orders, 8)
-    page_obj = paginator.get_page(request.GET.get('page'))
+        qs = qs.filter(placed_at__gte=start_date)
+    keyset_mode = wants_keyset(request)
+    if keyset_mode:
+        page_obj = keyset_paginate(
+            qs, [('order_id', True)], cursor=request.GET.get(CURSOR_PARAM), per_page=ORDER_HISTORY_PAGE_SIZE
+        )
+    else:
+        paginator = Paginator(qs, ORDER_HISTORY_PAGE_SIZE)
+        page_obj = paginator.get_page(request.GET.get('page'))
     order_cards = _build_order_cards(
         page_obj.object_list,
         product_term=product_term,
@@ -411,8 +402,18 @@ def order_history(request):
             for store in store_qs
         ]
     base_query = request.GET.copy()
-    if 'page' in base_query:
-        base_query.pop('page')
+    for param in ('page', CURSOR_PARAM, 'partial'):
+        if param in base_query:
+            base_query.pop(param)
+    if keyset_mode:
+        base_query[PAGINATION_PARAM] = KEYSET_MODE
+    if request.GET.get('partial') == '1':
+        return JsonResponse({
+            "orders_html": render_to_string(
+                'orders/partials/order_cards.html', {"orders": order_cards}, request=request
+            ),
+            **(page_obj.as_json() if keyset_mode else {"has_next": page_obj.has_next()}),
+        })
     context = {
         "orders": order_cards,
         "page_obj": page_obj,
@@ -438,8 +439,6 @@ def order_detail_page(request, order_id: int):
             'orderitem_set__product_variant__product',
             'orderitem_set__product_variant__color',
             'orderitem_set__product_variant__size',
-            'orderitem_set__product_variant__images',
-            'orderitem_set__product_variant__product__images',
             'payment_set',
             'status_history__status',
             'status_history__changed_by',
@@ -460,6 +459,7 @@ def order_detail_page(request, order_id: int):
     return render(request, 'orders/order_detail.html', context)
 
 
+@lru_cache(maxsize=256)
 def _generate_qr_data(data: str) -> str:
     qr = qrcode.QRCode(version=2, box_size=10, border=2)
     qr.add_data(data)
@@ -470,7 +470,17 @@ def _generate_qr_data(data: str) -> str:
     return base64.b64encode(buffer.getvalue()).decode('utf-8')
 
 
-def _receipt_context(order: Order, request, public=False):
+def _receipt_qr_target(order: Order, request=None, public=False, base_url=None) -> str:
+    if public and request is not None:
+        return request.build_absolute_uri(request.path.replace('/receipt/', '/'))
+    path = reverse('orders:order_detail', args=[order.order_id])
+    if request is not None:
+        return request.build_absolute_uri(path)
+    return urljoin(base_url or '/', path)
+
+
+def _receipt_context(order: Order, request=None, public=False, base_url=None, qr_target=None):
+    """Контекст чека; без ``request`` (фоновая задача, пул рендеринга) ссылки строятся от ``base_url``."""
     items = _build_order_items(order)
     subtotal = sum(Decimal(item['subtotal']) for item in items)
     discount = getattr(order, 'discount_amount', Decimal('0'))
@@ -479,8 +489,7 @@ def _receipt_context(order: Order, request, public=False):
     tax = Decimal('0.00')
     shipping = Decimal('0.00')
     total = taxable_subtotal + shipping
-    detail_url = request.build_absolute_uri(reverse('orders:order_detail', args=[order.order_id]))
-    qr_target = detail_url if not public else request.build_absolute_uri(request.path.replace('/receipt/', '/'))
+    qr_target = qr_target or _receipt_qr_target(order, request, public, base_url)
     customer_name = ''
     if order.user:
         full_name = order.user.get_full_name() or order.user.username
@@ -516,36 +525,99 @@ def _ensure_weasyprint():
         raise RuntimeError(message)
 
 
-def _render_receipt_pdf(order: Order, request, public=False):
+_receipt_styles_local = threading.local()
+
+
+def _receipt_styles():
+    """Разобранная таблица стилей чека и конфигурация шрифтов, общие для всех рендеров потока.
+
+    Поиск шрифтов и разбор CSS выполняются один раз, а не на каждый чек.
+    Возвращает None, если WeasyPrint собран без ``CSS`` (тогда стили остаются в HTML).
+    """
+    styles = getattr(_receipt_styles_local, 'styles', None)
+    if styles is None and CSS is not None:
+        font_config = FontConfiguration()
+        stylesheet = CSS(string=render_to_string('orders/receipt.css'), font_config=font_config)
+        styles = _receipt_styles_local.styles = (stylesheet, font_config)
+    return styles
+
+
+def _render_receipt_pdf(order: Order, request=None, public=False, base_url=None, qr_target=None):
     """Render receipt to PDF using WeasyPrint.
 
     If WeasyPrint or system libs are unavailable, the caller can choose to
     fall back to HTML (handled in the view). This function will raise on error.
     """
     _ensure_weasyprint()
+    if request is not None:
+        base_url = request.build_absolute_uri('/')
+    context = _receipt_context(order, request, public=public, base_url=base_url, qr_target=qr_target)
+    styles = _receipt_styles()
+    context['external_styles'] = styles is not None
+    html = render_to_string('orders/receipt.html', context)
+    if styles is None:
+        return HTML(string=html, base_url=base_url).write_pdf()
+    stylesheet, font_config = styles
+    return HTML(string=html, base_url=base_url).write_pdf(stylesheets=[stylesheet], font_config=font_config)
+
+
+def _receipt_revision(order: Order, request=None, public=False, base_url=None):
+    """``(base_url, цель QR-кода, ревизия)`` — всё, от чего зависит содержимое PDF."""
+    if request is not None:
+        base_url = request.build_absolute_uri('/')
+    qr_target = _receipt_qr_target(order, request, public, base_url)
+    return base_url, qr_target, receipt_fingerprint(order, public, extra=(base_url or '', qr_target))
+
+
+def _cached_receipt_pdf(order: Order, request=None, public=False, base_url=None, revision=None):
+    """PDF чека из дискового кэша; при промахе рендерит его в пуле и сохраняет.
+
+    ``revision`` — уже посчитанный ``_receipt_revision``, чтобы не повторять
+    запрос отпечатка. Возвращает ``(путь к файлу, ETag)``.
+    """
+    base_url, qr_target, revision = revision or _receipt_revision(order, request, public, base_url)
+    path = load_receipt(order.order_id, revision, public)
+    if path is None:
+        pdf = render_receipt(order, public=public, base_url=base_url, qr_target=qr_target)
+        path = store_receipt(order.order_id, revision, pdf, public)
+    return path, receipt_etag(revision)
+
+
+def _receipt_response(request, order: Order, public=False, disposition='attachment'):
+    """Ответ с PDF чека; при совпадении ``If-None-Match`` — 304 без рендеринга и чтения файла."""
+    revision = _receipt_revision(order, request, public)
+    not_modified = get_conditional_response(request, etag=receipt_etag(revision[2]))
+    if not_modified is not None:
+        return not_modified
+    path, etag = _cached_receipt_pdf(order, request, public=public, revision=revision)
+    response = FileResponse(
+        open(path, 'rb'),
+        content_type='application/pdf',
+        as_attachment=disposition == 'attachment',
+        filename=f"receipt_{order.order_id}.pdf",
+    )
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _receipt_html_fallback(request, order: Order, public, exc):
     context = _receipt_context(order, request, public=public)
     html = render_to_string('orders/receipt.html', context)
-    pdf = HTML(string=html, base_url=request.build_absolute_uri('/')).write_pdf()
-    return pdf
+    if settings.DEBUG:
+        html = f"<!-- PDF generation error: {exc} -->\n" + html
+    return HttpResponse(html)
 
 
 @login_required(login_url='accounts:login')
 def order_receipt_pdf(request, order_id: int):
-    order = get_object_or_404(Order, order_id=order_id, user=request.user)
+    order = get_object_or_404(Order.objects.select_related('user', 'status', 'promo_code'), order_id=order_id, user=request.user)
     inline = request.GET.get('inline') == '1'
     try:
-        pdf = _render_receipt_pdf(order, request)
-        response = HttpResponse(pdf, content_type='application/pdf')
-        disposition = 'inline' if inline else 'attachment'
-        response['Content-Disposition'] = f"{disposition}; filename=receipt_{order_id}.pdf"
-        return response
+        return _receipt_response(request, order, disposition='inline' if inline else 'attachment')
     except Exception as exc:
         # Fallback to HTML representation so пользователь не видит 500
-        context = _receipt_context(order, request, public=False)
-        html = render_to_string('orders/receipt.html', context)
-        if settings.DEBUG:
-            html = f"<!-- PDF generation error: {exc} -->\n" + html
-        return HttpResponse(html)
+        return _receipt_html_fallback(request, order, False, exc)
 
 
 def order_receipt_public(request, order_id: int, token: str):
@@ -554,16 +626,9 @@ def order_receipt_public(request, order_id: int, token: str):
         return HttpResponseForbidden("Ссылка больше не активна")
     order = share_token.order
     try:
-        pdf = _render_receipt_pdf(order, request, public=True)
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = f"inline; filename=receipt_{order_id}.pdf"
-        return response
+        return _receipt_response(request, order, public=True, disposition='inline')
     except Exception as exc:
-        context = _receipt_context(order, request, public=True)
-        html = render_to_string('orders/receipt.html', context)
-        if settings.DEBUG:
-            html = f"<!-- PDF generation error: {exc} -->\n" + html
-        return HttpResponse(html)
+        return _receipt_html_fallback(request, order, True, exc)
 
 
 def _create_share_token(order: Order, channel: Optional[str] = None) -> OrderShareToken:
@@ -654,8 +719,6 @@ def order_search(request):
             'orderitem_set__product_variant__product__category',
             'orderitem_set__product_variant__color',
             'orderitem_set__product_variant__size',
-            'orderitem_set__product_variant__images',
-            'orderitem_set__product_variant__product__images',
         )
         .order_by('-order_id')
     )
@@ -719,34 +782,18 @@ def order_search(request):
     except InvalidOperation:
         price_max = None
 
-    orders = list(qs)
-    date_from = None
-    date_to = None
-    if form["date_from"]:
-        try:
-            date_from = datetime.strptime(form["date_from"], "%Y-%m-%d")
-        except ValueError:
-            date_from = None
-    if form["date_to"]:
-        try:
-            date_to = datetime.strptime(form["date_to"], "%Y-%m-%d")
-        except ValueError:
-            date_to = None
-
-    filtered_orders = []
-    for order in orders:
-        if price_min is not None and order.total_amount < price_min:
-            continue
-        if price_max is not None and order.total_amount > price_max:
-            continue
-        parsed = _parse_order_datetime(order.created_at)
-        if date_from and (not parsed or parsed < date_from):
-            continue
-        if date_to and (not parsed or parsed > date_to + timedelta(days=1)):
-            continue
-        filtered_orders.append(order)
-
-    paginator = Paginator(filtered_orders, 10)
+    if price_min is not None:
+        qs = qs.filter(total_amount__gte=price_min)
+    if price_max is not None:
+        qs = qs.filter(total_amount__lte=price_max)
+    date_from = parse_timestamp(form["date_from"])
+    date_to = parse_timestamp(form["date_to"])
+    if date_from:
+        qs = qs.filter(placed_at__gte=date_from)
+    if date_to:
+        qs = qs.filter(placed_at__lt=date_to + timedelta(days=1))
+
+    paginator = Paginator(qs, 10)
     page_obj = paginator.get_page(request.GET.get('page'))
     cards = _build_order_cards(
         page_obj.object_list,
@@ -12,15 +12,15 @@ class ProductVariantImageInline(admin.TabularInline):
     classes = ['collapse']
 
     def preview(self, obj):
-        url = getattr(obj, 'url', None)
-        if obj.pk and url:
+        url = obj.rendition_url('thumb') if obj.pk else None
+        if url:
             return mark_safe(f'<img src="{url}" style="height:60px;border-radius:6px;" />')
         return '—'
 
 @admin.register(ProductVariant)
 class ProductVariantAdmin(admin.ModelAdmin):
-    list_display = ('product_variant_id', 'product', 'color', 'size', 'price', 'quantity')
-    search_fields = ('product__name', 'color__name_color', 'size__size')
+    list_display = ('product_variant_id', 'sku', 'product', 'color', 'size', 'price', 'quantity')
+    search_fields = ('sku', 'product__name', 'color__name_color', 'size__size')
     list_filter = ('color', 'size', 'store')
     ordering = ('product', 'price')
     inlines = [ProductVariantImageInline]
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class ProductVariantsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "apps.product_variants"
+
+    def ready(self):
+        from . import signals  # noqa: F401
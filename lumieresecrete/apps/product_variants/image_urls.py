@@ -0,0 +1,156 @@
+"""Готовые URL главного фото и фото при наведении у вариантов и товаров.
+
+Корзина, избранное и история заказов показывают по одной картинке на
+строку. Раньше каждая строка подгружала все фото варианта и товара и
+выбирала главное в Python. Теперь выбор сделан заранее и лежит в полях
+``primary_image_url``/``hover_image_url`` у ``ProductVariant`` и ``Product``.
+Поля пересчитываются после коммита при изменении ``ProductVariantImage``,
+``ProductImage`` и состава вариантов (сигналы ``catalog``).
+
+Правило выбора то же, что у карточки каталога: фото с ``is_primary``, иначе
+первое; для наведения — первое фото с другим URL. Вариант без своих фото
+берёт старые фото товара (``ProductImage``). Если копии из ``renditions``
+построены, в поля попадают URL размеров ``card`` и ``hover``.
+
+Сборка идёт через ``values()``, поэтому её можно вызывать и из миграций с
+историческими моделями (``registry``).
+"""
+from collections import defaultdict
+
+from django.apps import apps as global_apps
+
+from apps.common.oncommit import coalesce_on_commit
+
+from .renditions import rendition_urls
+
+BATCH_SIZE = 500
+
+
+def _models(registry):
+    registry = registry or global_apps
+    return {
+        "Product": registry.get_model('catalog', 'Product'),
+        "ProductImage": registry.get_model('catalog', 'ProductImage'),
+        "ProductVariant": registry.get_model('product_variants', 'ProductVariant'),
+        "ProductVariantImage": registry.get_model('product_variants', 'ProductVariantImage'),
+    }
+
+
+def image_url(image_field, row):
+    name = row.get('image')
+    if name:
+        try:
+            return image_field.storage.url(name)
+        except Exception:
+            return ''
+    return row.get('source_url') or ''
+
+
+def image_entry(image_field, row):
+    """Строка ``values()`` фото варианта → ``{"url", "is_primary", "renditions"}`` или ``None``."""
+    url = image_url(image_field, row)
+    if not url:
+        return None
+    renditions = None
+    if row.get('image'):
+        renditions = rendition_urls(image_field.storage, row['image'], row.get('renditions'))
+    return {"url": url, "is_primary": row['is_primary'], "renditions": renditions or {}}
+
+
+def pick_card_images(variant_images, product_images):
+    """Повторяет выбор фото карточки из прежнего ``catalog_list``.
+
+    Возвращает ``(primary, hover, srcset)``: URL копий ``card``/``hover``, если
+    они построены, и ``srcset`` обеих картинок для ``<picture>`` карточки.
+    """
+    flat = variant_images or [{"url": url, "is_primary": idx == 0} for idx, url in enumerate(product_images)]
+    primary = next((img for img in flat if img.get("is_primary")), None)
+    if primary is None and flat:
+        primary = flat[0]
+    hover = None
+    if len(flat) > 1:
+        hover = next((img for img in flat if img["url"] != primary["url"]), None)
+    srcset = {}
+    for key, image in (("primary", primary), ("hover", hover)):
+        renditions = (image or {}).get("renditions") or {}
+        if renditions:
+            srcset[key] = {"webp": renditions["srcset"], "jpeg": renditions["srcset_jpeg"]}
+    primary_url = (primary or {}).get("renditions", {}).get("card") or (primary or {}).get("url") or ''
+    hover_url = (hover or {}).get("renditions", {}).get("hover") or (hover or {}).get("url") or ''
+    if not hover_url:
+        hover_url = primary_url
+        if "primary" in srcset:
+            srcset["hover"] = srcset["primary"]
+    return primary_url, hover_url, srcset
+
+
+def load_images(product_ids, registry=None):
+    """Фото товаров одним проходом: ``({variant_id: [entry]}, {product_id: [url]})``."""
+    models = _models(registry)
+    VariantImage = models["ProductVariantImage"]
+    image_field = VariantImage._meta.get_field('image')
+    values = ['variant_id', 'image', 'source_url', 'is_primary']
+    # В ранних миграциях у исторической модели ещё нет поля манифеста копий
+    if any(field.name == 'renditions' for field in VariantImage._meta.get_fields()):
+        values.append('renditions')
+    variant_images = defaultdict(list)
+    rows = VariantImage.objects.filter(variant__product_id__in=product_ids).values(*values).order_by('variant_id', 'order', 'id')
+    for row in rows:
+        entry = image_entry(image_field, row)
+        if entry:
+            variant_images[row['variant_id']].append(entry)
+    product_images = defaultdict(list)
+    legacy_rows = models["ProductImage"].objects.filter(product_id__in=product_ids).values(
+        'product_id', 'image_url'
+    ).order_by('position', 'image_id')
+    for row in legacy_rows:
+        if row['image_url']:
+            product_images[row['product_id']].append(row['image_url'])
+    return variant_images, product_images
+
+
+def refresh_image_urls(product_ids, registry=None):
+    """Пересчитывает поля фото у товаров и всех их вариантов; возвращает число изменённых строк."""
+    ids = {int(pid) for pid in product_ids if pid}
+    if not ids:
+        return 0
+    models = _models(registry)
+    variant_images, product_images = load_images(ids, registry=registry)
+    variants_by_product = defaultdict(list)
+    changed_variants = []
+    for variant in models["ProductVariant"].objects.filter(product_id__in=ids).only(
+        'product_variant_id', 'product_id', 'primary_image_url', 'hover_image_url'
+    ).order_by('product_variant_id'):
+        variants_by_product[variant.product_id].append(variant.pk)
+        primary, hover, _ = pick_card_images(variant_images.get(variant.pk, []), product_images.get(variant.product_id, []))
+        if (variant.primary_image_url, variant.hover_image_url) != (primary, hover):
+            variant.primary_image_url, variant.hover_image_url = primary, hover
+            changed_variants.append(variant)
+    changed_products = []
+    for product in models["Product"].objects.filter(product_id__in=ids).only(
+        'product_id', 'primary_image_url', 'hover_image_url'
+    ):
+        images = [entry for variant_id in variants_by_product.get(product.pk, []) for entry in variant_images.get(variant_id, [])]
+        primary, hover, _ = pick_card_images(images, product_images.get(product.pk, []))
+        if (product.primary_image_url, product.hover_image_url) != (primary, hover):
+            product.primary_image_url, product.hover_image_url = primary, hover
+            changed_products.append(product)
+    # bulk_update не шлёт сигналов: поля служебные, витрину и кэши они не трогают
+    fields = ['primary_image_url', 'hover_image_url']
+    models["ProductVariant"].objects.bulk_update(changed_variants, fields, batch_size=BATCH_SIZE)
+    models["Product"].objects.bulk_update(changed_products, fields, batch_size=BATCH_SIZE)
+    return len(changed_variants) + len(changed_products)
+
+
+def rebuild_image_urls(batch_size=BATCH_SIZE, registry=None):
+    """Полный пересчёт пачками по ``batch_size`` товаров."""
+    all_ids = list(_models(registry)["Product"].objects.order_by('product_id').values_list('product_id', flat=True))
+    total = 0
+    for start in range(0, len(all_ids), batch_size):
+        total += refresh_image_urls(all_ids[start:start + batch_size], registry=registry)
+    return total
+
+
+def schedule_image_refresh(product_ids):
+    """Откладывает пересчёт до коммита, схлопывая повторы в транзакции."""
+    coalesce_on_commit('product_variants.image_urls', {int(pid) for pid in product_ids if pid}, refresh_image_urls)
@@ -0,0 +1,14 @@
+from apps.jobs.registry import register
+
+from .models import ProductVariantImage
+from .renditions import build_renditions
+
+
+@register('product_variants.renditions')
+def build_renditions_job(job):
+    """Копии фото варианта для карточек и зума; ``payload``: ``image_id``, ``force``."""
+    image = ProductVariantImage.objects.filter(pk=job.payload['image_id']).first()
+    if image is None:
+        return {"image_id": job.payload['image_id'], "built": False}
+    built = build_renditions(image, force=job.payload.get('force', False))
+    return {"image_id": image.pk, "built": built, "sizes": sorted((image.renditions or {}).get("sizes", {}))}
@@ -0,0 +1,30 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from apps.product_variants.renditions import DEFAULT_BATCH_SIZE, build_pending_renditions, pending_images
+
+
+class Command(BaseCommand):
+    help = "Строит копии фото вариантов (thumb/card/hover/zoom, WebP и JPEG) для фото, у которых их ещё нет."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Пересобрать копии всех фото, а не только недостающие.")
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help="Число процессов масштабирования (0 — считать в текущем процессе).",
+        )
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Фото на одну пачку.")
+
+    def handle(self, *args, **options):
+        def progress(done):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Готово фото: {done}")
+
+        built = build_pending_renditions(
+            pending_images(force=options['force']),
+            workers=max(0, options['workers']),
+            batch_size=max(1, options['batch_size']),
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Копии построены для {built} фото."))
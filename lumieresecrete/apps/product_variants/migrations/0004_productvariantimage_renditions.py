@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_variants', '0003_remove_productvariant_photo_productvariantimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productvariantimage',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_variants', '0004_productvariantimage_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productvariant',
+            name='hover_image_url',
+            field=models.TextField(blank=True, db_column='HoverImageURL', default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='primary_image_url',
+            field=models.TextField(blank=True, db_column='PrimaryImageURL', default='', editable=False),
+        ),
+    ]
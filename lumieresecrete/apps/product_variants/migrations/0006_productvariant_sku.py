@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_variants', '0005_productvariant_image_urls'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productvariant',
+            name='sku',
+            field=models.CharField(blank=True, db_column='SKU', max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.core.exceptions import ValidationError
 from django.db import models
 
+from .renditions import RENDITIONS, rendition_urls
+
 class Colors(models.Model):
     gemstone_id = models.AutoField(primary_key=True, db_column='GemstoneID')
     name_color = models.CharField(max_length=255, db_column='NameColor')
@@ -30,6 +32,8 @@ class Sizes(models.Model):
 
 class ProductVariant(models.Model):
     product_variant_id = models.AutoField(primary_key=True, db_column='ProductVariantID')
+    # Артикул поставщика — ключ для import_catalog
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True, db_column='SKU')
     product = models.ForeignKey('catalog.Product', on_delete=models.CASCADE, db_column='ProductID', related_name='variants')
     color = models.ForeignKey('product_variants.Colors', on_delete=models.SET_NULL, null=True, db_column='ColorID', related_name='variants')
     size = models.ForeignKey('product_variants.Sizes', on_delete=models.SET_NULL, null=True, db_column='SizeID', related_name='variants')
@@ -39,6 +43,9 @@ class ProductVariant(models.Model):
     description = models.TextField(blank=True, null=True, db_column='Description')
     quantity = models.IntegerField(null=True, db_column='Quantity')
     store = models.ForeignKey('stores.Store', on_delete=models.SET_NULL, null=True, db_column='StoreID', related_name='product_variants')
+    # Выбранные заранее фото для корзины, избранного и заказов, см. apps.product_variants.image_urls
+    primary_image_url = models.TextField(blank=True, default='', editable=False, db_column='PrimaryImageURL')
+    hover_image_url = models.TextField(blank=True, default='', editable=False, db_column='HoverImageURL')
 
     class Meta:
         db_table = 'ProductVariant'
@@ -73,27 +80,38 @@ class ProductVariant(models.Model):
         return gallery
 
     def get_image_payload(self, fallback=True):
+        """Фото варианта: ``url`` исходника и URL копий по размерам (``thumb``, ``card``...).
+
+        ``srcset``/``srcset_jpeg`` пусты, пока копии не построены; размеры тогда
+        ссылаются на исходник.
+        """
         payload = []
         for image in self._prefetched_images():
             url = image.url
             if not url:
                 continue
-            payload.append({
+            item = {
                 "id": image.pk,
                 "url": url,
                 "alt": image.alt or str(self),
                 "is_primary": image.is_primary,
-            })
+            }
+            item.update(image.rendition_payload())
+            payload.append(item)
         if not payload and fallback:
             payload = self.get_product_gallery()
         return payload
 
-    def get_primary_image_url(self, fallback=True):
+    def get_primary_image_url(self, fallback=True, rendition=None):
         payload = self.get_image_payload(fallback=fallback)
-        for item in payload:
-            if item.get("is_primary") and item.get("url"):
-                return item["url"]
-        return payload[0]["url"] if payload else None
+        primary = next((item for item in payload if item.get("is_primary") and item.get("url")), None)
+        if primary is None and payload:
+            primary = payload[0]
+        if primary is None:
+            return None
+        if rendition and primary.get(rendition):
+            return primary[rendition]
+        return primary["url"]
 
     def clean(self):
         errors = {}
@@ -123,6 +141,8 @@ class ProductVariantImage(models.Model):
     order = models.PositiveIntegerField(default=0)
     is_primary = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Манифест копий фиксированной ширины, см. apps.product_variants.renditions
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
 
     class Meta:
         ordering = ['order', 'id']
@@ -140,3 +160,17 @@ class ProductVariantImage(models.Model):
             except ValueError:
                 return ''
         return self.source_url
+
+    def rendition_payload(self):
+        """URL копий по размерам плюс ``srcset`` (WebP) и ``srcset_jpeg``; без копий — исходник."""
+        urls = None
+        if self.image:
+            urls = rendition_urls(self.image.storage, self.image.name, self.renditions)
+        if urls is None:
+            url = self.url
+            urls = {kind: url for kind in RENDITIONS}
+            urls.update(srcset='', srcset_jpeg='')
+        return urls
+
+    def rendition_url(self, kind):
+        return self.rendition_payload().get(kind) or self.url
@@ -0,0 +1,234 @@
+"""Производные размеры фотографий вариантов (рендишены).
+
+Исходник ``ProductVariantImage.image`` бывает по 4–6 тысяч пикселей в
+ширину, а карточке каталога нужно 400. Для каждой загрузки строятся копии
+фиксированной ширины — ``thumb``, ``card``, ``hover``, ``zoom`` — в WebP и
+JPEG. Они лежат рядом с исходником (``<имя>__w<ширина>.<формат>``) в том же
+хранилище. Что построено, записано в ``ProductVariantImage.renditions``:
+
+    {"source": <имя исходника>, "width": ..., "height": ...,
+     "sizes": {"card": {"width": 400, "webp": <имя>, "jpg": <имя>}, ...}}
+
+Манифест действителен, пока ``source`` совпадает с текущим файлом. После
+замены фото шаблоны получают исходник, пока не отработает новая задача.
+
+Масштабирование — чистый CPU, поэтому ``render_renditions`` работает только
+с байтами и Pillow, без Django. Команда ``build_image_renditions`` гоняет её
+в пуле процессов, а после загрузки через админку та же функция выполняется
+в фоновой задаче ``product_variants.renditions``.
+"""
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Ширина в пикселях; увеличения нет — узкий исходник даёт копии своей ширины
+RENDITIONS = {
+    "thumb": 160,
+    "card": 400,
+    "hover": 800,
+    "zoom": 1600,
+}
+FORMATS = (("webp", "WEBP"), ("jpg", "JPEG"))
+DEFAULT_QUALITY = 82
+DEFAULT_BATCH_SIZE = 20
+
+
+def _quality():
+    return getattr(settings, 'IMAGE_RENDITION_QUALITY', DEFAULT_QUALITY)
+
+
+def rendition_name(name, suffix, ext):
+    root, _ = os.path.splitext(name)
+    return f"{root}__{suffix}.{ext}"
+
+
+def _flatten(image):
+    from PIL import Image
+
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_renditions(data, quality=DEFAULT_QUALITY):
+    """Байты исходника → ``(width, height, {kind: {"width", "height", "webp", "jpg"}})``.
+
+    Копии одинаковой ширины (узкий исходник) кодируются один раз: у таких
+    размеров в результате один и тот же словарь.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(BytesIO(data)) as opened:
+        source = _flatten(ImageOps.exif_transpose(opened))
+    width, height = source.size
+    encoded = {}
+    result = {}
+    # От крупного к мелкому: каждый размер уменьшается из предыдущего, а не из исходника
+    current = source
+    for kind, target in sorted(RENDITIONS.items(), key=lambda item: -item[1]):
+        target = min(target, width)
+        if target not in encoded:
+            size = (target, max(1, round(height * target / width)))
+            if current.size != size:
+                current = current.resize(size, Image.LANCZOS)
+            entry = {"width": size[0], "height": size[1]}
+            for ext, fmt in FORMATS:
+                buffer = BytesIO()
+                options = {"quality": quality, "method": 4} if fmt == "WEBP" else {"quality": quality, "optimize": True, "progressive": True}
+                current.save(buffer, fmt, **options)
+                entry[ext] = buffer.getvalue()
+            encoded[target] = entry
+        result[kind] = encoded[target]
+    return width, height, result
+
+
+def _render_in_worker(args):
+    data, quality = args
+    try:
+        return render_renditions(data, quality=quality)
+    except Exception as exc:
+        # Битый файл не должен ронять всю пачку: ошибка уходит в основной процесс и пишется в лог
+        return str(exc) or exc.__class__.__name__
+
+
+def is_current(manifest, name):
+    return bool(name) and bool(manifest) and manifest.get("source") == name and bool(manifest.get("sizes"))
+
+
+def rendition_urls(storage, name, manifest):
+    """URL копий по манифесту: ``{kind: url}`` (JPEG) плюс ``srcset`` (WebP) и ``srcset_jpeg``.
+
+    ``None``, если манифест устарел или копий ещё нет — тогда показывается исходник.
+    """
+    if not is_current(manifest, name):
+        return None
+    urls = {}
+    by_width = {}
+    for kind, entry in manifest["sizes"].items():
+        try:
+            urls[kind] = storage.url(entry["jpg"])
+            by_width.setdefault(entry["width"], (storage.url(entry["webp"]), urls[kind]))
+        except Exception:
+            return None
+    ordered = sorted(by_width.items())
+    urls["srcset"] = ", ".join(f"{webp} {width}w" for width, (webp, _) in ordered)
+    urls["srcset_jpeg"] = ", ".join(f"{jpg} {width}w" for width, (_, jpg) in ordered)
+    return urls
+
+
+def _store(storage, name, previous, rendered):
+    """Сохраняет копии рядом с ``name`` и возвращает новый манифест."""
+    from django.core.files.base import ContentFile
+
+    width, height, sizes = rendered
+    saved = {}
+    manifest = {"source": name, "width": width, "height": height, "sizes": {}}
+    for kind, entry in sizes.items():
+        stored = saved.get(id(entry))
+        if stored is None:
+            stored = {"width": entry["width"]}
+            for ext, _ in FORMATS:
+                target = rendition_name(name, f"w{entry['width']}", ext)
+                if storage.exists(target):
+                    storage.delete(target)
+                stored[ext] = storage.save(target, ContentFile(entry[ext]))
+            saved[id(entry)] = stored
+        manifest["sizes"][kind] = stored
+    # Копии прежнего исходника больше никому не нужны
+    keep = {entry[ext] for entry in manifest["sizes"].values() for ext, _ in FORMATS}
+    for entry in (previous or {}).get("sizes", {}).values():
+        for ext, _ in FORMATS:
+            path = entry.get(ext)
+            if path and path not in keep and storage.exists(path):
+                storage.delete(path)
+    return manifest
+
+
+def _read(image):
+    with image.image.storage.open(image.image.name, 'rb') as fileobj:
+        return fileobj.read()
+
+
+def _save_manifest(image, manifest):
+    image.renditions = manifest
+    # Через save, а не update(): сигналы обновят витрину каталога и кэши
+    image.save(update_fields=['renditions'])
+
+
+def build_renditions(image, force=False):
+    """Строит копии одного фото в текущем процессе; ``False``, если строить нечего."""
+    name = image.image.name if image.image else ''
+    if not name or (not force and is_current(image.renditions, name)):
+        return False
+    rendered = render_renditions(_read(image), quality=_quality())
+    _save_manifest(image, _store(image.image.storage, name, image.renditions, rendered))
+    return True
+
+
+def pending_images(force=False):
+    from .models import ProductVariantImage
+
+    queryset = ProductVariantImage.objects.exclude(image__isnull=True).exclude(image='').order_by('id')
+    if force:
+        return queryset
+    return (image for image in queryset.iterator() if not is_current(image.renditions, image.image.name))
+
+
+def build_pending_renditions(images, workers=None, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Досчитывает копии для ``images`` в пуле из ``workers`` процессов; возвращает число фото.
+
+    Файлы читаются и пишутся в основном процессе (хранилище может быть
+    удалённым), процессам уходят только байты. В памяти держится одна пачка.
+    При ``workers=0`` всё считается в текущем процессе.
+    """
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    quality = _quality()
+    pool = None
+    if workers > 0:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    done = 0
+    try:
+        batch = []
+        for image in images:
+            batch.append(image)
+            if len(batch) >= batch_size:
+                done += _build_batch(batch, pool, quality)
+                batch = []
+                if progress is not None:
+                    progress(done)
+        if batch:
+            done += _build_batch(batch, pool, quality)
+            if progress is not None:
+                progress(done)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+    return done
+
+
+def _build_batch(images, pool, quality):
+    sources = []
+    for image in images:
+        try:
+            sources.append((image, _read(image)))
+        except OSError as exc:
+            logger.warning("Фото %s не прочитано: %s", image.pk, exc)
+    tasks = [(data, quality) for _, data in sources]
+    results = pool.map(_render_in_worker, tasks) if pool is not None else map(_render_in_worker, tasks)
+    built = 0
+    for (image, _), rendered in zip(sources, results):
+        if isinstance(rendered, str):
+            logger.warning("Копии фото %s не построены: %s", image.pk, rendered)
+            continue
+        _save_manifest(image, _store(image.image.storage, image.image.name, image.renditions, rendered))
+        built += 1
+    return built
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import ProductVariantImage
+from .renditions import is_current
+
+
+def _enqueue_renditions(image_id):
+    from apps.jobs.services import enqueue
+
+    enqueue('product_variants.renditions', {"image_id": image_id})
+
+
+@receiver(post_save, sender=ProductVariantImage)
+def schedule_image_renditions(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'renditions'}:
+        return
+    if not getattr(settings, 'IMAGE_RENDITIONS_ON_UPLOAD', True):
+        return
+    name = instance.image.name if instance.image else ''
+    if not name or is_current(instance.renditions, name):
+        return
+    transaction.on_commit(lambda: _enqueue_renditions(instance.pk))
@@ -0,0 +1,101 @@
+"""Резервирование остатков вариантов при оформлении заказа.
+
+Вся корзина резервируется одним вызовом ``reserve_stock``. Строки вариантов
+блокируются ``SELECT ... FOR UPDATE`` в порядке возрастания ID. Две корзины
+с общими вариантами берут блокировки в одном порядке и поэтому не
+взаимоблокируются. Остатки списываются одним ``UPDATE``: на PostgreSQL это
+``UPDATE ... FROM (VALUES ...)``, на остальных базах — ``CASE`` по ID.
+Нехватка проверяется по заблокированным строкам до записи. Вызывающий код
+получает сразу все недостающие позиции, а не только первую.
+
+Резерв действует до конца внешней транзакции: откат заказа возвращает и остатки.
+"""
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import ProductVariant
+
+
+class InsufficientStock(ValidationError):
+    """Нехватка остатка; ``shortfalls`` — список словарей ``variant_id``/``variant``/``requested``/``available``."""
+
+    def __init__(self, shortfalls):
+        self.shortfalls = shortfalls
+        super().__init__([
+            f"Недостаточно товара «{entry['variant'] or entry['variant_id']}»: "
+            f"нужно {entry['requested']}, доступно {entry['available']}."
+            for entry in shortfalls
+        ])
+
+
+def _merge(pairs):
+    requested = {}
+    for variant_id, quantity in pairs:
+        quantity = int(quantity or 0)
+        if quantity <= 0:
+            raise ValidationError("Количество товара должно быть положительным.")
+        requested[int(variant_id)] = requested.get(int(variant_id), 0) + quantity
+    return dict(sorted(requested.items()))
+
+
+def _decrement(connection, requested):
+    if connection.vendor == 'postgresql':
+        values = ', '.join(['(%s, %s)'] * len(requested))
+        params = [value for pair in requested.items() for value in pair]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE "ProductVariant" AS pv '
+                f'SET "Quantity" = COALESCE(pv."Quantity", 0) - v.qty '
+                f'FROM (VALUES {values}) AS v(id, qty) '
+                f'WHERE pv."ProductVariantID" = v.id AND COALESCE(pv."Quantity", 0) >= v.qty',
+                params,
+            )
+            return cursor.rowcount
+    return ProductVariant.objects.using(connection.alias).filter(pk__in=list(requested)).update(
+        quantity=Case(
+            *[When(pk=variant_id, then=Coalesce(F('quantity'), Value(0)) - Value(qty)) for variant_id, qty in requested.items()],
+            output_field=IntegerField(),
+        )
+    )
+
+
+def reserve_stock(pairs):
+    """Списывает остатки для пар ``(variant_id, количество)`` одной операцией.
+
+    Повторяющиеся варианты суммируются. Возвращает заблокированные варианты
+    ``{id: ProductVariant}`` с остатками до списания. При нехватке бросает
+    ``InsufficientStock`` со всеми недостающими позициями и ничего не списывает.
+    """
+    requested = _merge(pairs)
+    if not requested:
+        return {}
+    alias = router.db_for_write(ProductVariant)
+    with transaction.atomic(using=alias):
+        locked = {
+            variant.pk: variant
+            for variant in ProductVariant.objects.using(alias)
+            .select_for_update(of=('self',))
+            .select_related('product', 'color', 'size')
+            .filter(pk__in=list(requested))
+            .order_by('pk')
+        }
+        shortfalls = []
+        for variant_id, quantity in requested.items():
+            variant = locked.get(variant_id)
+            available = (variant.quantity or 0) if variant is not None else 0
+            if available < quantity:
+                shortfalls.append({
+                    "variant_id": variant_id,
+                    "variant": str(variant) if variant is not None else None,
+                    "requested": quantity,
+                    "available": available,
+                })
+        if shortfalls:
+            raise InsufficientStock(shortfalls)
+        updated = _decrement(connections[alias], requested)
+        if updated != len(requested):
+            # Строки заблокированы, так что сюда попадает только запись в обход блокировок
+            raise ValidationError("Остатки изменились во время оформления заказа, попробуйте ещё раз.")
+    return locked
@@ -0,0 +1,85 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.cart.models import CartItem
+from apps.catalog.models import Category, Favorite, Product, ProductImage
+from apps.product_variants.image_urls import rebuild_image_urls
+from apps.product_variants.models import Colors, ProductVariant, ProductVariantImage, Sizes
+from apps.stores.models import Store
+
+User = get_user_model()
+
+
+class ImageUrlTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = Store.objects.create(name='Бутик')
+        self.color = Colors.objects.create(name_color='Золото')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(name='Кольцо Aurora', category=Category.objects.create(name='Кольца'))
+            self.first = self._variant('16')
+            self.second = self._variant('17')
+
+    def _variant(self, size):
+        return ProductVariant.objects.create(
+            product=self.product, color=self.color, size=Sizes.objects.create(size=size),
+            store=self.store, price=Decimal('9000.00'), quantity=3,
+        )
+
+    def _urls(self, obj):
+        obj.refresh_from_db()
+        return obj.primary_image_url, obj.hover_image_url
+
+    def test_variant_images_fill_variant_and_product(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductVariantImage.objects.create(variant=self.second, source_url='https://example.com/b.jpg', order=1)
+            ProductVariantImage.objects.create(variant=self.second, source_url='https://example.com/a.jpg', is_primary=True)
+        self.assertEqual(self._urls(self.second), ('https://example.com/a.jpg', 'https://example.com/b.jpg'))
+        self.assertEqual(self._urls(self.first), ('', ''))
+        self.assertEqual(self._urls(self.product), ('https://example.com/a.jpg', 'https://example.com/b.jpg'))
+
+    def test_variant_without_photos_uses_product_gallery(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductImage.objects.create(product=self.product, image_url='https://example.com/legacy.jpg')
+        self.assertEqual(self._urls(self.first)[0], 'https://example.com/legacy.jpg')
+        with self.captureOnCommitCallbacks(execute=True):
+            third = self._variant('18')
+        self.assertEqual(self._urls(third)[0], 'https://example.com/legacy.jpg')
+
+    def test_deleting_photo_moves_to_next_one(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            primary = ProductVariantImage.objects.create(variant=self.first, source_url='https://example.com/a.jpg', is_primary=True)
+            ProductVariantImage.objects.create(variant=self.first, source_url='https://example.com/b.jpg', order=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            primary.delete()
+        self.assertEqual(self._urls(self.first), ('https://example.com/b.jpg', 'https://example.com/b.jpg'))
+        self.assertEqual(self._urls(self.product)[0], 'https://example.com/b.jpg')
+
+    def test_rebuild_fills_rows_created_without_signals(self):
+        ProductVariantImage.objects.bulk_create([
+            ProductVariantImage(variant=self.first, source_url='https://example.com/a.jpg', is_primary=True),
+        ])
+        self.assertEqual(rebuild_image_urls(), 2)
+        self.assertEqual(self._urls(self.first)[0], 'https://example.com/a.jpg')
+        self.assertEqual(rebuild_image_urls(), 0)
+
+    def test_cart_and_favorites_do_not_load_photos(self):
+        user = User.objects.create_user(username='buyer', password='secret')
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductVariantImage.objects.create(variant=self.first, source_url='https://example.com/a.jpg', is_primary=True)
+        CartItem.objects.create(user=user, product_variant=self.first, quantity=1, price=self.first.price)
+        Favorite.objects.create(user=user, product=self.product)
+        self.client.force_login(user)
+        for name in ('view_cart', 'favorites_list'):
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(reverse(name))
+            self.assertContains(response, 'https://example.com/a.jpg')
+            tables = " ".join(query['sql'] for query in captured.captured_queries)
+            self.assertNotIn('productvariantimage', tables.lower(), name)
+            self.assertNotIn('"ProductImages"', tables, name)
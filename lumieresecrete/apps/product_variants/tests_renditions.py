@@ -0,0 +1,119 @@
+import os
+import tempfile
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from apps.catalog.models import CatalogListing, Category, Product
+from apps.jobs.models import Job
+from apps.jobs.services import run_pending
+from apps.product_variants.models import Colors, ProductVariant, ProductVariantImage, Sizes
+from apps.product_variants.renditions import build_pending_renditions, pending_images, render_renditions
+from apps.stores.models import Store
+
+
+def _png(width, height, color=(180, 120, 90)):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class RenditionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name, MEDIA_URL='/media/')
+        override.enable()
+        self.addCleanup(override.disable)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(name='Кольцо Aurora', category=Category.objects.create(name='Кольца'))
+            self.variant = ProductVariant.objects.create(
+                product=self.product, color=Colors.objects.create(name_color='Золото'),
+                size=Sizes.objects.create(size='17'), store=Store.objects.create(name='Бутик'),
+                price=Decimal('9000.00'), quantity=2,
+            )
+
+    def _upload(self, width=2000, height=1000, name='ring.png'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ProductVariantImage.objects.create(
+                variant=self.variant, image=SimpleUploadedFile(name, _png(width, height)), is_primary=True,
+            )
+
+    def _path(self, name):
+        return os.path.join(self.media.name, name)
+
+    def test_render_keeps_aspect_and_never_upscales(self):
+        width, height, sizes = render_renditions(_png(600, 300))
+        self.assertEqual((width, height), (600, 300))
+        self.assertEqual((sizes["thumb"]["width"], sizes["thumb"]["height"]), (160, 80))
+        self.assertEqual(sizes["card"]["width"], 400)
+        self.assertIs(sizes["hover"], sizes["zoom"])
+        self.assertEqual(sizes["zoom"]["width"], 600)
+        self.assertEqual(Image.open(BytesIO(sizes["card"]["webp"])).format, 'WEBP')
+        self.assertEqual(Image.open(BytesIO(sizes["card"]["jpg"])).size, (400, 200))
+
+    def test_upload_queues_job_that_stores_files_next_to_original(self):
+        image = self._upload()
+        self.assertEqual(Job.objects.filter(kind='product_variants.renditions').count(), 1)
+        self.assertEqual(image.rendition_url('card'), image.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(run_pending(), 1)
+        image.refresh_from_db()
+        root = os.path.splitext(image.image.name)[0]
+        self.assertEqual(image.renditions["sizes"]["card"]["jpg"], f"{root}__w400.jpg")
+        for entry in image.renditions["sizes"].values():
+            self.assertTrue(os.path.exists(self._path(entry["webp"])))
+            self.assertTrue(os.path.exists(self._path(entry["jpg"])))
+        # Сохранение манифеста не ставит задачу заново
+        self.assertEqual(Job.objects.count(), 1)
+
+        variant = ProductVariant.objects.prefetch_related('images').get(pk=self.variant.pk)
+        payload = variant.get_image_payload()[0]
+        self.assertEqual(payload["url"], image.url)
+        self.assertIn(f"/media/{root}__w1600.webp 1600w", payload["srcset"])
+        self.assertTrue(payload["srcset_jpeg"].startswith(f"/media/{root}__w160.jpg 160w"))
+        self.assertEqual(variant.get_primary_image_url(rendition='thumb'), f"/media/{root}__w160.jpg")
+        self.assertEqual(variant.get_primary_image_url(), image.url)
+
+        listing = CatalogListing.objects.get(product=self.product)
+        self.assertEqual(listing.primary_image_url, f"/media/{root}__w400.jpg")
+        self.assertIn("400w", listing.card["srcset"]["primary"]["webp"])
+
+    def test_replaced_original_falls_back_until_rebuilt(self):
+        image = self._upload()
+        run_pending()
+        image.refresh_from_db()
+        old = image.renditions["sizes"]["card"]["jpg"]
+
+        image.image = SimpleUploadedFile('ring2.png', _png(300, 300))
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        self.assertEqual(image.rendition_payload()["card"], image.url)
+        self.assertEqual(image.rendition_payload()["srcset"], '')
+
+        self.assertEqual(build_pending_renditions(pending_images(), workers=0), 1)
+        image.refresh_from_db()
+        self.assertEqual(image.renditions["sizes"]["zoom"]["width"], 300)
+        self.assertFalse(os.path.exists(self._path(old)))
+        self.assertEqual(list(pending_images()), [])
+
+    def test_backfill_uses_process_pool_and_skips_broken_files(self):
+        with override_settings(IMAGE_RENDITIONS_ON_UPLOAD=False):
+            good = self._upload(800, 800)
+            broken = ProductVariantImage.objects.create(
+                variant=self.variant, image=SimpleUploadedFile('broken.png', b'not an image'),
+            )
+        self.assertFalse(Job.objects.exists())
+
+        with self.assertLogs('apps.product_variants.renditions', 'WARNING'):
+            self.assertEqual(build_pending_renditions(pending_images(), workers=1), 1)
+        good.refresh_from_db()
+        broken.refresh_from_db()
+        self.assertEqual(good.renditions["sizes"]["hover"]["width"], 800)
+        self.assertEqual(broken.renditions, {})
@@ -0,0 +1,124 @@
+import threading
+import unittest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.catalog.models import Category, Product
+from apps.orders.models import Order
+from apps.orders.services import OrderService
+from apps.product_variants.models import Colors, ProductVariant, Sizes
+from apps.product_variants.stock import InsufficientStock, reserve_stock
+from apps.stores.models import Store
+
+User = get_user_model()
+
+
+def _variants(count, quantity):
+    store = Store.objects.create(name='Бутик')
+    category = Category.objects.create(name='Кольца')
+    color = Colors.objects.create(name_color='Золото')
+    return [
+        ProductVariant.objects.create(
+            product=Product.objects.create(name=f'Кольцо {index}', category=category),
+            color=color, size=Sizes.objects.create(size=str(16 + index)),
+            store=store, price=Decimal('100.00'), quantity=quantity,
+        )
+        for index in range(count)
+    ]
+
+
+class ReserveStockTests(TestCase):
+    def setUp(self):
+        self.variants = _variants(4, quantity=3)
+
+    def _quantities(self):
+        return list(ProductVariant.objects.order_by('pk').values_list('quantity', flat=True))
+
+    def test_reserves_all_lines_with_one_update(self):
+        pairs = [(variant.pk, 1) for variant in reversed(self.variants)] + [(self.variants[0].pk, 1)]
+        with CaptureQueriesContext(connection) as queries:
+            reserve_stock(pairs)
+        statements = [q['sql'].split()[0] for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(statements, ['SELECT', 'UPDATE'])
+        self.assertEqual(self._quantities(), [1, 2, 2, 2])
+
+    def test_reports_every_shortfall_and_keeps_stock(self):
+        with self.assertRaises(InsufficientStock) as ctx:
+            reserve_stock([(self.variants[0].pk, 5), (self.variants[1].pk, 1), (self.variants[2].pk, 4), (999999, 1)])
+        shortfalls = ctx.exception.shortfalls
+        self.assertEqual([entry['variant_id'] for entry in shortfalls], [self.variants[0].pk, self.variants[2].pk, 999999])
+        self.assertEqual(shortfalls[0]['available'], 3)
+        self.assertEqual(len(ctx.exception.messages), 3)
+        self.assertEqual(self._quantities(), [3, 3, 3, 3])
+
+    def test_rejects_non_positive_quantity(self):
+        with self.assertRaises(ValidationError):
+            reserve_stock([(self.variants[0].pk, 0)])
+
+    def test_failed_checkout_does_not_create_order(self):
+        user = User.objects.create_user(username='buyer', password='secret')
+        lines = [(variant, 4, variant.price) for variant in self.variants[:2]]
+        with self.assertRaises(InsufficientStock):
+            OrderService.place_order(user, lines)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self._quantities(), [3, 3, 3, 3])
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Нужны построчные блокировки PostgreSQL")
+class ConcurrentReservationTests(TransactionTestCase):
+    buyers = 8
+
+    def _run_buyers(self, carts):
+        barrier = threading.Barrier(len(carts))
+        outcomes = []
+        lock = threading.Lock()
+
+        def buy(user, lines):
+            try:
+                barrier.wait()
+                OrderService.place_order(user, lines)
+                result = 'ok'
+            except InsufficientStock:
+                result = 'shortage'
+            except Exception as exc:  # взаимоблокировка или другая ошибка базы
+                result = repr(exc)
+            finally:
+                connections.close_all()
+            with lock:
+                outcomes.append(result)
+
+        threads = [threading.Thread(target=buy, args=cart) for cart in carts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=60)
+        return outcomes
+
+    def _users(self):
+        return [User.objects.create_user(username=f'buyer{index}', password='secret') for index in range(self.buyers)]
+
+    def test_parallel_buyers_never_oversell(self):
+        variant = _variants(1, quantity=5)[0]
+        outcomes = self._run_buyers([(user, [(variant, 1, variant.price)]) for user in self._users()])
+        self.assertEqual(sorted(outcomes), ['ok'] * 5 + ['shortage'] * 3)
+        variant.refresh_from_db()
+        self.assertEqual(variant.quantity, 0)
+        self.assertEqual(Order.objects.count(), 5)
+
+    def test_carts_in_opposite_order_do_not_deadlock(self):
+        first, second = _variants(2, quantity=100)
+        carts = []
+        for index, user in enumerate(self._users()):
+            lines = [(first, 1, first.price), (second, 1, second.price)]
+            carts.append((user, lines if index % 2 else list(reversed(lines))))
+        outcomes = self._run_buyers(carts)
+        self.assertEqual(outcomes, ['ok'] * self.buyers)
+        self.assertEqual(
+            list(ProductVariant.objects.order_by('pk').values_list('quantity', flat=True)),
+            [100 - self.buyers, 100 - self.buyers],
+        )
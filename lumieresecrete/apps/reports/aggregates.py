@@ -0,0 +1,242 @@
+"""Агрегаты панели менеджера, посчитанные группирующими SQL-запросами.
+
+Счётчики заказов считаются по queryset заказов периода (см. ``period_orders``),
+разрезы продаж — по сгруппированным строкам ``sales_rows``: целые дни берутся
+из ``DailySalesRollup``, неполные дни на краях периода — из позиций заказов.
+Функции возвращают уже отсортированные строки в том виде, в каком их ждут
+шаблоны ``manager_dashboard`` и ``manager_stats``, — не больше, чем там
+выводится. Позиции заказов в Python не загружаются.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from apps.orders.models import Order, OrderItem
+
+from .models import DailySalesRollup
+from .rollup import day_bounds
+
+ZERO = Decimal('0.00')
+NO_SIZE_LABEL = 'Без размера'
+NO_STATUS_LABEL = 'Без статуса'
+DASHBOARD_LIMITS = {
+    'products': 8,
+    'categories': 10,
+    'sizes': 10,
+    'stores': 10,
+    'recent_orders': 10,
+}
+
+_MONEY = DecimalField(max_digits=14, decimal_places=2)
+_LINE_TOTAL = F('price') * F('quantity')
+
+
+def _revenue():
+    return Coalesce(Sum(_LINE_TOTAL, output_field=_MONEY), ZERO, output_field=_MONEY)
+
+
+def period_orders(start, end, store_id=None):
+    qs = Order.objects.filter(placed_at__isnull=False)
+    if store_id:
+        qs = qs.filter(store__store_id=store_id)
+    if start:
+        qs = qs.filter(placed_at__gte=start)
+    if end:
+        qs = qs.filter(placed_at__lte=end)
+    return qs
+
+
+def period_items(orders, category_id=None):
+    items = OrderItem.objects.filter(order__in=orders.values('order_id'))
+    if category_id:
+        items = items.filter(product_variant__product__category__category_id=category_id)
+    return items
+
+
+def split_period(start, end):
+    """Делит период на неполные дни по краям и целые дни ``[first_day, last_day)`` между ними.
+
+    Целые дни берутся из ``DailySalesRollup``; если период не длиннее суток,
+    целых дней нет и всё считается по позициям.
+    """
+    if end - start <= timedelta(days=1):
+        return [(start, end)], None
+    first_day = timezone.localtime(start).date()
+    if day_bounds(first_day)[0] != start:
+        first_day += timedelta(days=1)
+    last_day = timezone.localtime(end).date()
+    if first_day >= last_day:
+        return [(start, end)], None
+    head = (start, day_bounds(first_day)[0])
+    # Хвост включает сам момент ``end``, поэтому нужен даже при end ровно в полночь
+    tail = (day_bounds(last_day)[0], end)
+    return ([head] if head[0] < head[1] else []) + [tail], (first_day, last_day)
+
+
+def _live_sales(start, end, store_id, category_id, end_inclusive):
+    orders = period_orders(start, None, store_id)
+    orders = orders.filter(placed_at__lte=end) if end_inclusive else orders.filter(placed_at__lt=end)
+    rows = (
+        period_items(orders, category_id)
+        .values(
+            'order__store_id', 'order__store__name',
+            'product_variant__product__category_id', 'product_variant__product__category__name',
+            'product_variant__product_id', 'product_variant__product__name',
+            'product_variant__size__size',
+        )
+        .annotate(units=Coalesce(Sum('quantity'), 0), revenue=_revenue())
+        .order_by()
+    )
+    return [
+        {
+            'store_id': row['order__store_id'],
+            'store_name': row['order__store__name'],
+            'category_id': row['product_variant__product__category_id'],
+            'category_name': row['product_variant__product__category__name'],
+            'product_id': row['product_variant__product_id'],
+            'product_name': row['product_variant__product__name'],
+            'size': row['product_variant__size__size'],
+            'units': row['units'],
+            'revenue': row['revenue'],
+        }
+        for row in rows
+    ]
+
+
+def _rollup_sales(first_day, last_day, store_id, category_id):
+    qs = DailySalesRollup.objects.filter(day__gte=first_day, day__lt=last_day)
+    if store_id:
+        qs = qs.filter(store_id=store_id)
+    if category_id:
+        qs = qs.filter(category_id=category_id)
+    rows = (
+        qs.values('store_id', 'store__name', 'category_id', 'category__name', 'product_id', 'product__name', 'size__size')
+        .annotate(units=Coalesce(Sum('quantity'), 0), revenue=Coalesce(Sum('revenue'), ZERO, output_field=_MONEY))
+        .order_by()
+    )
+    return [
+        {
+            'store_id': row['store_id'],
+            'store_name': row['store__name'],
+            'category_id': row['category_id'],
+            'category_name': row['category__name'],
+            'product_id': row['product_id'],
+            'product_name': row['product__name'],
+            'size': row['size__size'],
+            'units': row['units'],
+            'revenue': row['revenue'],
+        }
+        for row in rows
+    ]
+
+
+def sales_rows(start, end, store_id=None, category_id=None, use_rollup=True):
+    """Сгруппированные продажи периода: по строке на (бутик, категория, товар, размер).
+
+    Целые дни читаются из ``DailySalesRollup``, края периода — из позиций
+    заказов. Число строк ограничено ассортиментом, а не числом заказов.
+    """
+    if not use_rollup:
+        return _live_sales(start, end, store_id, category_id, end_inclusive=True)
+    edges, full_days = split_period(start, end)
+    rows = []
+    for left, right in edges:
+        rows.extend(_live_sales(left, right, store_id, category_id, end_inclusive=right == end))
+    if full_days:
+        rows.extend(_rollup_sales(*full_days, store_id, category_id))
+    return rows
+
+
+def _ranked(groups, limit):
+    ranked = sorted(groups.items(), key=lambda pair: (-pair[1]['revenue'], pair[0]))
+    return [entry for _, entry in ranked[:limit]]
+
+
+def _group_by(rows, id_key, name_key):
+    groups = {}
+    for row in rows:
+        if row[id_key] is None:
+            continue
+        entry = groups.setdefault(row[id_key], {'name': row[name_key], 'quantity': 0, 'revenue': ZERO})
+        entry['quantity'] += row['units']
+        entry['revenue'] += row['revenue']
+    return groups
+
+
+def product_stats(rows, limit=DASHBOARD_LIMITS['products']):
+    return _ranked(_group_by(rows, 'product_id', 'product_name'), limit)
+
+
+def category_stats(rows, limit=DASHBOARD_LIMITS['categories']):
+    return _ranked(_group_by(rows, 'category_id', 'category_name'), limit)
+
+
+def size_stats(rows, limit=DASHBOARD_LIMITS['sizes']):
+    totals = {}
+    for row in rows:
+        label = NO_SIZE_LABEL if row['size'] is None else row['size']
+        totals[label] = totals.get(label, 0) + row['units']
+    return sorted(totals.items(), key=lambda pair: (-pair[1], pair[0]))[:limit]
+
+
+def store_stats(orders, rows, limit=DASHBOARD_LIMITS['stores']):
+    """Число заказов по бутикам — по всем заказам периода, выручка — по отфильтрованным продажам."""
+    stats = {
+        row['store__store_id']: {'name': row['store__name'], 'orders': row['orders'], 'revenue': ZERO}
+        for row in (
+            orders.filter(store__isnull=False)
+            .values('store__store_id', 'store__name')
+            .annotate(orders=Count('order_id'))
+        )
+    }
+    for row in rows:
+        entry = stats.get(row['store_id'])
+        if entry is not None:
+            entry['revenue'] += row['revenue']
+    return _ranked(stats, limit)
+
+
+def status_breakdown(orders):
+    rows = orders.values('status__name_status').annotate(count=Count('order_id')).order_by('-count', 'status__name_status')
+    return [(row['status__name_status'] or NO_STATUS_LABEL, row['count']) for row in rows]
+
+
+def daily_metrics(orders):
+    rows = (
+        orders.annotate(day=TruncDate('placed_at', tzinfo=timezone.get_current_timezone()))
+        .values('day')
+        .annotate(count=Count('order_id'), revenue=Coalesce(Sum('total_amount'), ZERO, output_field=_MONEY))
+        .order_by('day')
+    )
+    return [
+        {
+            'date': row['day'].isoformat(),
+            'label': row['day'].strftime('%d.%m'),
+            'count': row['count'],
+            'revenue': row['revenue'],
+        }
+        for row in rows
+    ]
+
+
+def order_summary(orders, rows):
+    return {
+        'count': orders.count(),
+        'revenue': sum((row['revenue'] for row in rows), ZERO),
+    }
+
+
+def recent_orders(orders, limit=DASHBOARD_LIMITS['recent_orders']):
+    return [
+        {
+            'id': order.order_id,
+            'status': getattr(order.status, 'name_status', '—'),
+            'store': getattr(order.store, 'name', '—'),
+            'total': order.total_amount,
+            'created': timezone.localtime(order.placed_at),
+        }
+        for order in orders.select_related('status', 'store').order_by('-placed_at', '-order_id')[:limit]
+    ]
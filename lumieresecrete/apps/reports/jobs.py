@@ -0,0 +1,22 @@
+from apps.jobs.registry import register
+from apps.jobs.services import result_path
+
+from . import streaming
+
+
+@register('reports.manager_export')
+def manager_export_job(job):
+    """Выгрузка панели менеджера в файл; ``payload["params"]`` — GET-параметры панели."""
+    from .views import _manager_export_rows
+
+    params = job.payload.get('params', {})
+    filename_base, headers, rows = _manager_export_rows(params)
+    if params.get('format', 'csv').lower() == 'xlsx':
+        path = result_path(job, f"{filename_base}.xlsx")
+        with path.open('wb') as handle:
+            streaming.write_xlsx(handle, headers, rows)
+    else:
+        path = result_path(job, f"{filename_base}.csv")
+        with path.open('w', encoding='utf-8', newline='') as handle:
+            streaming.write_csv(handle, headers, rows)
+    return {"file": str(path)}
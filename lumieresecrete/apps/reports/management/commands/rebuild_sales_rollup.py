@@ -0,0 +1,27 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.reports.rollup import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = "Полностью пересобирает дневные итоги продаж (таблица DailySalesRollup)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Пересобрать только дни начиная с даты YYYY-MM-DD.")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError as exc:
+                raise CommandError("Дата --since должна быть в формате YYYY-MM-DD.") from exc
+
+        def progress(day, inserted):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{day.isoformat()}: строк {inserted}")
+
+        days, inserted = rebuild_rollup(since=since, progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"Итоги продаж пересобраны: {days} дней, {inserted} строк."))
@@ -0,0 +1,85 @@
+# Generated by Django 4.2 on 2026-10-17 20:08
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+PRODUCT_PERFORMANCE_FROM_ROLLUP = """
+CREATE OR REPLACE VIEW "vw_product_performance" AS
+SELECT
+    p."ProductID" AS product_id,
+    p."Name" AS product_name,
+    c."Name" AS category_name,
+    COALESCE(SUM(r."Quantity"), 0) AS total_quantity,
+    COALESCE(SUM(r."Revenue"), 0) AS total_revenue
+FROM "Products" p
+LEFT JOIN "Categories" c ON p."CategoryID" = c."CategoryID"
+LEFT JOIN "DailySalesRollup" r ON r."ProductID" = p."ProductID"
+GROUP BY p."ProductID", p."Name", c."Name";
+"""
+
+PRODUCT_PERFORMANCE_FROM_ITEMS = """
+CREATE OR REPLACE VIEW "vw_product_performance" AS
+SELECT
+    p."ProductID" AS product_id,
+    p."Name" AS product_name,
+    c."Name" AS category_name,
+    COALESCE(SUM(oi."Quantity"), 0) AS total_quantity,
+    COALESCE(SUM(oi."Quantity" * oi."Price"), 0) AS total_revenue
+FROM "Products" p
+LEFT JOIN "Categories" c ON p."CategoryID" = c."CategoryID"
+LEFT JOIN "ProductVariant" pv ON pv."ProductID" = p."ProductID"
+LEFT JOIN "OrderItems" oi ON oi."ProductVariantID" = pv."ProductVariantID"
+GROUP BY p."ProductID", p."Name", c."Name";
+"""
+
+
+def fill_rollup(apps, schema_editor):
+    from apps.reports.rollup import rebuild_rollup
+
+    rebuild_rollup(registry=apps)
+
+
+def view_from_rollup(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(PRODUCT_PERFORMANCE_FROM_ROLLUP)
+
+
+def view_from_items(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(PRODUCT_PERFORMANCE_FROM_ITEMS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_variants', '0003_remove_productvariant_photo_productvariantimage'),
+        ('catalog', '0007_cataloglisting_search_index'),
+        ('stores', '0001_initial'),
+        ('orders', '0007_order_placed_at_checkout_meta'),
+        ('reports', '0002_reports_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('rollup_id', models.BigAutoField(db_column='RollupID', primary_key=True, serialize=False)),
+                ('day', models.DateField(db_column='Day')),
+                ('quantity', models.IntegerField(db_column='Quantity', default=0)),
+                ('revenue', models.DecimalField(db_column='Revenue', decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('order_count', models.IntegerField(db_column='OrderCount', default=0)),
+                ('discount', models.DecimalField(db_column='Discount', decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('category', models.ForeignKey(blank=True, db_column='CategoryID', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalog.category')),
+                ('product', models.ForeignKey(blank=True, db_column='ProductID', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_rollups', to='catalog.product')),
+                ('size', models.ForeignKey(blank=True, db_column='SizeID', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='product_variants.sizes')),
+                ('store', models.ForeignKey(blank=True, db_column='StoreID', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='stores.store')),
+            ],
+            options={
+                'db_table': 'DailySalesRollup',
+                'indexes': [models.Index(fields=['day', 'store'], name='sales_rollup_day_store'), models.Index(fields=['product', 'day'], name='sales_rollup_product_day')],
+            },
+        ),
+        migrations.RunPython(fill_rollup, migrations.RunPython.noop),
+        migrations.RunPython(view_from_rollup, view_from_items),
+    ]
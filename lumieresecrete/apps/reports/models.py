@@ -0,0 +1,44 @@
+from decimal import Decimal
+
+from django.db import models
+
+
+class DailySalesRollup(models.Model):
+    """Продажи за день в разрезе бутика, категории, товара и размера.
+
+    Строки дня целиком пересобираются из ``OrderItems`` (см. ``apps.reports.rollup``),
+    поэтому уникальный ключ не нужен: день удаляется и вставляется заново.
+    """
+
+    rollup_id = models.BigAutoField(primary_key=True, db_column='RollupID')
+    day = models.DateField(db_column='Day')
+    store = models.ForeignKey(
+        'stores.Store', on_delete=models.SET_NULL, null=True, blank=True,
+        db_column='StoreID', related_name='+'
+    )
+    category = models.ForeignKey(
+        'catalog.Category', on_delete=models.SET_NULL, null=True, blank=True,
+        db_column='CategoryID', related_name='+'
+    )
+    product = models.ForeignKey(
+        'catalog.Product', on_delete=models.SET_NULL, null=True, blank=True,
+        db_column='ProductID', related_name='sales_rollups'
+    )
+    size = models.ForeignKey(
+        'product_variants.Sizes', on_delete=models.SET_NULL, null=True, blank=True,
+        db_column='SizeID', related_name='+'
+    )
+    quantity = models.IntegerField(default=0, db_column='Quantity')
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), db_column='Revenue')
+    order_count = models.IntegerField(default=0, db_column='OrderCount')
+    discount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), db_column='Discount')
+
+    class Meta:
+        db_table = 'DailySalesRollup'
+        indexes = [
+            models.Index(fields=['day', 'store'], name='sales_rollup_day_store'),
+            models.Index(fields=['product', 'day'], name='sales_rollup_product_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: {self.product_id} × {self.quantity}"
@@ -0,0 +1,152 @@
+"""Поддержка таблицы ``DailySalesRollup`` — дневных итогов продаж.
+
+День — локальная дата ``Order.placed_at`` (``TIME_ZONE``). Строки дня
+пересобираются целиком одним проходом по ``values()``-запросу позиций, поэтому
+сборщик работает и с историческими моделями из миграций. Сигналы заказов и
+позиций откладывают пересборку затронутых дней до коммита транзакции.
+Категория товара копируется в строки, поэтому после её смены (админка,
+импорт каталога) пересобираются дни, где товар записан под прежней.
+
+Скидка заказа хранится на заказе, поэтому в строках она распределяется по
+позициям пропорционально их сумме.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.apps import apps as global_apps
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.common.oncommit import coalesce_on_commit
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+ROLLUP_LOCK_NAMESPACE = 4210
+
+
+def _models(registry):
+    registry = registry or global_apps
+    return (
+        registry.get_model('orders', 'Order'),
+        registry.get_model('orders', 'OrderItem'),
+        registry.get_model('reports', 'DailySalesRollup'),
+    )
+
+
+def local_day(value):
+    """Локальная дата момента оформления или None."""
+    if value is None:
+        return None
+    return timezone.localtime(value).date()
+
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min), timezone.get_current_timezone())
+
+
+def build_day_rows(day, registry=None):
+    """Несохранённые строки ``DailySalesRollup`` за день."""
+    Order, OrderItem, DailySalesRollup = _models(registry)
+    start, end = day_bounds(day)
+    lines = list(
+        OrderItem.objects.filter(order__placed_at__gte=start, order__placed_at__lt=end).values_list(
+            'order_id', 'order__store_id', 'order__discount_amount',
+            'product_variant__product__category_id', 'product_variant__product_id', 'product_variant__size_id',
+            'quantity', 'price',
+        )
+    )
+    subtotals = defaultdict(Decimal)
+    for order_id, _, _, _, _, _, quantity, price in lines:
+        subtotals[order_id] += (price or ZERO) * (quantity or 0)
+
+    groups = {}
+    for order_id, store_id, discount, category_id, product_id, size_id, quantity, price in lines:
+        line_total = (price or ZERO) * (quantity or 0)
+        key = (store_id, category_id, product_id, size_id)
+        entry = groups.setdefault(key, {"quantity": 0, "revenue": ZERO, "discount": ZERO, "orders": set()})
+        entry["quantity"] += quantity or 0
+        entry["revenue"] += line_total
+        entry["orders"].add(order_id)
+        if discount and subtotals[order_id]:
+            entry["discount"] += discount * line_total / subtotals[order_id]
+
+    return [
+        DailySalesRollup(
+            day=day,
+            store_id=store_id,
+            category_id=category_id,
+            product_id=product_id,
+            size_id=size_id,
+            quantity=entry["quantity"],
+            revenue=entry["revenue"].quantize(CENT, rounding=ROUND_HALF_UP),
+            order_count=len(entry["orders"]),
+            discount=entry["discount"].quantize(CENT, rounding=ROUND_HALF_UP),
+        )
+        for (store_id, category_id, product_id, size_id), entry in groups.items()
+    ]
+
+
+def stale_category_days(product_ids, registry=None):
+    """Дни, где строки товаров записаны не под их текущей категорией."""
+    _, _, DailySalesRollup = _models(registry)
+    return set(
+        DailySalesRollup.objects.filter(product_id__in=product_ids)
+        .exclude(category_id=F('product__category_id'))
+        .exclude(category__isnull=True, product__category__isnull=True)
+        .values_list('day', flat=True).distinct()
+    )
+
+
+def _lock_day(connection, day):
+    # Две параллельные пересборки одного дня иначе могут вставить строки дважды
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [ROLLUP_LOCK_NAMESPACE, day.toordinal()])
+
+
+def refresh_days(days, registry=None):
+    """Пересобирает строки перечисленных дней; возвращает число вставленных строк."""
+    _, _, DailySalesRollup = _models(registry)
+    alias = router.db_for_write(DailySalesRollup)
+    inserted = 0
+    for day in sorted({day for day in days if day}):
+        with transaction.atomic(using=alias):
+            _lock_day(connections[alias], day)
+            # Читаем позиции уже под блокировкой: иначе пересборка со старым снимком может записать поверх новой
+            rows = build_day_rows(day, registry)
+            DailySalesRollup.objects.filter(day=day).delete()
+            DailySalesRollup.objects.bulk_create(rows, batch_size=1000)
+        inserted += len(rows)
+    return inserted
+
+
+def rebuild_rollup(since=None, registry=None, progress=None):
+    """Полная пересборка: все дни с заказами (начиная с ``since``), лишние дни удаляются."""
+    Order, _, DailySalesRollup = _models(registry)
+    orders = Order.objects.filter(placed_at__isnull=False)
+    stale = DailySalesRollup.objects.all()
+    if since:
+        orders = orders.filter(placed_at__gte=day_bounds(since)[0])
+        stale = stale.filter(day__gte=since)
+    days = sorted(
+        day for day in orders.annotate(
+            placed_day=TruncDate('placed_at', tzinfo=timezone.get_current_timezone())
+        ).values_list('placed_day', flat=True).distinct()
+        if day
+    )
+    stale.exclude(day__in=days).delete()
+    inserted = 0
+    for day in days:
+        inserted += refresh_days([day], registry)
+        if progress is not None:
+            progress(day, inserted)
+    return len(days), inserted
+
+
+def schedule_rollup_refresh(days):
+    """Откладывает пересборку дней до коммита, схлопывая повторы в транзакции."""
+    coalesce_on_commit('reports.rollup', {day for day in days if day}, refresh_days)
@@ -0,0 +1,52 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from apps.catalog.models import Product
+from apps.catalog.signals import catalog_imported
+from apps.orders.models import Order, OrderItem
+from apps.orders.signals import order_items_created
+
+from .rollup import local_day, schedule_rollup_refresh, stale_category_days
+
+
+@receiver(post_init, sender=Order)
+def remember_order_day(sender, instance, **kwargs):
+    # Если дату заказа поменяют, пересобрать нужно и старый день
+    instance._rollup_day = local_day(instance.placed_at)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def refresh_order_rollup(sender, instance, **kwargs):
+    day = local_day(instance.placed_at)
+    schedule_rollup_refresh({getattr(instance, '_rollup_day', None), day})
+    instance._rollup_day = day
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def refresh_item_rollup(sender, instance, **kwargs):
+    order = instance.order if 'order' in instance._state.fields_cache else None
+    if order is not None:
+        placed_at = order.placed_at
+    else:
+        placed_at = Order.objects.filter(pk=instance.order_id).values_list('placed_at', flat=True).first()
+    schedule_rollup_refresh({local_day(placed_at)})
+
+
+@receiver(order_items_created)
+def refresh_bulk_items_rollup(sender, order, items, **kwargs):
+    schedule_rollup_refresh({local_day(order.placed_at)})
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_category_rollup(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'category' not in update_fields):
+        return
+    schedule_rollup_refresh(stale_category_days([instance.pk]))
+
+
+@receiver(catalog_imported)
+def refresh_imported_category_rollup(sender, product_ids, **kwargs):
+    # Импорт обновляет категорию через bulk_create(update_conflicts=True), мимо post_save
+    schedule_rollup_refresh(stale_category_days(product_ids))
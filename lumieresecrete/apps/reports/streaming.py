@@ -0,0 +1,68 @@
+"""Потоковая выгрузка отчётов в CSV и XLSX.
+
+Строки приходят генератором (обычно ``queryset.values_list(...).iterator()``),
+поэтому память не растёт с числом строк: CSV отдаётся кусками через
+``StreamingHttpResponse``, а XLSX пишется write-only листом openpyxl во
+временный файл на диске и отдаётся ``FileResponse`` по частям.
+"""
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+
+EXPORT_CHUNK_SIZE = 2000
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CSV_FLUSH_ROWS = 500
+
+
+class _Echo:
+    """Псевдо-файл для ``csv.writer``: ``write`` просто возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_chunks(headers, rows):
+    writer = csv.writer(_Echo())
+    buffer = [writer.writerow(headers)]
+    for row in rows:
+        buffer.append(writer.writerow(row))
+        if len(buffer) >= CSV_FLUSH_ROWS:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def csv_response(filename, headers, rows):
+    response = StreamingHttpResponse(_csv_chunks(headers, rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def write_xlsx(fileobj, headers, rows, title="Отчёт"):
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title=title)
+    worksheet.append(headers)
+    for row in rows:
+        worksheet.append(row)
+    workbook.save(fileobj)
+
+
+def xlsx_response(filename, headers, rows, title="Отчёт"):
+    spool = tempfile.TemporaryFile(suffix='.xlsx')
+    try:
+        write_xlsx(spool, headers, rows, title=title)
+        spool.seek(0)
+    except Exception:
+        spool.close()
+        raise
+    # FileResponse читает файл блоками и закрывает его после отдачи
+    return FileResponse(spool, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+def write_csv(fileobj, headers, rows):
+    writer = csv.writer(fileobj)
+    writer.writerow(headers)
+    writer.writerows(rows)
@@ -0,0 +1,138 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from apps.catalog.models import Category, Product
+from apps.orders.models import Order, OrderItem, Status
+from apps.product_variants.models import Colors, ProductVariant, Sizes
+from apps.reports.views import _gather_dashboard_data
+from apps.stores.models import Store
+
+User = get_user_model()
+
+
+def _legacy_breakdowns(orders, items):
+    """Прежний подсчёт панели в Python — эталон для сравнения с SQL-агрегатами."""
+    product_stats = defaultdict(lambda: {'name': '', 'quantity': 0, 'revenue': Decimal('0')})
+    category_stats = defaultdict(lambda: {'name': '', 'quantity': 0, 'revenue': Decimal('0')})
+    size_stats = defaultdict(int)
+    store_stats = defaultdict(lambda: {'name': '', 'orders': 0, 'revenue': Decimal('0')})
+    daily = defaultdict(lambda: {'count': 0, 'revenue': Decimal('0')})
+    total_revenue = Decimal('0')
+    for item in items:
+        line_total = (item.price or Decimal('0')) * (item.quantity or 0)
+        total_revenue += line_total
+        product = item.product_variant.product
+        product_stats[product.product_id]['name'] = product.name
+        product_stats[product.product_id]['quantity'] += item.quantity
+        product_stats[product.product_id]['revenue'] += line_total
+        if product.category:
+            category_stats[product.category.category_id]['name'] = product.category.name
+            category_stats[product.category.category_id]['quantity'] += item.quantity
+            category_stats[product.category.category_id]['revenue'] += line_total
+        size_stats[getattr(item.product_variant.size, 'size', 'Без размера')] += item.quantity
+        if item.order.store:
+            store_stats[item.order.store.store_id]['name'] = item.order.store.name
+            store_stats[item.order.store.store_id]['revenue'] += line_total
+    for store_id, count in Counter(order.store.store_id for order in orders if order.store).items():
+        store_stats[store_id]['name'] = next(order.store.name for order in orders if order.store and order.store.store_id == store_id)
+        store_stats[store_id]['orders'] = count
+    for order in orders:
+        day = timezone.localtime(order.placed_at).date()
+        daily[day]['count'] += 1
+        daily[day]['revenue'] += order.total_amount
+    # При равной выручке старая версия сохраняла порядок позиций; SQL-версия добавляет id/метку
+    def ranked(stats):
+        return [entry for _, entry in sorted(stats.items(), key=lambda pair: (-pair[1]['revenue'], pair[0]))]
+
+    return {
+        'product_stats': ranked(product_stats),
+        'category_stats': ranked(category_stats),
+        'size_stats': sorted(size_stats.items(), key=lambda x: (-x[1], x[0])),
+        'store_stats': ranked(store_stats),
+        'status_breakdown': sorted(Counter(order.status.name_status for order in orders).items()),
+        'order_summary': {'count': len(orders), 'revenue': total_revenue},
+        'daily_metrics': [
+            {'date': day.isoformat(), 'label': day.strftime('%d.%m'), 'count': data['count'], 'revenue': data['revenue']}
+            for day, data in sorted(daily.items())
+        ],
+    }
+
+
+class DashboardAggregatesParityTests(TestCase):
+    def setUp(self):
+        self.rings = Category.objects.create(name='Кольца')
+        earrings = Category.objects.create(name='Серьги')
+        stores = [Store.objects.create(name=f'Бутик {idx}') for idx in range(3)]
+        sizes = [Sizes.objects.create(size=label) for label in ('16', '17', '18')]
+        color = Colors.objects.create(name_color='Золото')
+        statuses = [Status.objects.create(name_status=name) for name in ('Создан', 'Доставлен')]
+        variants = []
+        for idx in range(6):
+            product = Product.objects.create(name=f'Изделие {idx}', category=self.rings if idx % 2 else earrings)
+            variants.append(ProductVariant.objects.create(
+                product=product, color=color, store=stores[idx % 3], size=sizes[idx % 3],
+                price=Decimal('1000.00') + idx * 250, quantity=10,
+            ))
+        user = User.objects.create_user(username='buyer', password='secret')
+        # Дневные итоги продаж пересобираются после коммита
+        with self.captureOnCommitCallbacks(execute=True):
+            now = timezone.now()
+            for idx in range(12):
+                order = Order.objects.create(
+                    user=user, status=statuses[idx % 2], store=stores[idx % 3] if idx != 11 else None,
+                    total_amount=Decimal('0'), placed_at=now - timedelta(days=idx * 3, hours=idx),
+                )
+                total = Decimal('0')
+                # Бутик 2 получает заказы только с серьгами — при фильтре по кольцам у него нет выручки
+                for offset in (range(1) if idx % 3 == 2 else range(1 + idx % 3)):
+                    variant = variants[(idx + 2 * offset) % 6]
+                    if idx % 3 == 2:
+                        variant = variants[0]
+                    quantity = 1 + (idx + offset) % 4
+                    OrderItem.objects.create(order=order, product_variant=variant, quantity=quantity, price=variant.price)
+                    total += variant.price * quantity
+                Order.objects.filter(pk=order.pk).update(total_amount=total)
+            # Заказ вне периода не должен попасть в статистику
+            Order.objects.create(user=user, status=statuses[0], store=stores[0], total_amount=5, placed_at=now - timedelta(days=90))
+
+    def _compare(self, params):
+        request = RequestFactory().get('/reports/manager/', params)
+        context = _gather_dashboard_data(request)
+        start, end = context['start'], context['end']
+        orders = list(
+            Order.objects.select_related('store', 'status')
+            .filter(placed_at__gte=start, placed_at__lte=end)
+            .filter(**({'store__store_id': params['store']} if params.get('store') else {}))
+        )
+        items = OrderItem.objects.filter(order__in=orders).select_related(
+            'order__store', 'product_variant__product__category', 'product_variant__size'
+        )
+        if params.get('category'):
+            items = items.filter(product_variant__product__category__category_id=params['category'])
+        expected = _legacy_breakdowns(orders, list(items))
+
+        self.assertEqual(context['product_stats'], expected['product_stats'][:8])
+        self.assertEqual(context['category_stats'], expected['category_stats'][:10])
+        self.assertEqual(context['size_stats'], expected['size_stats'][:10])
+        self.assertEqual(context['store_stats'], expected['store_stats'][:10])
+        self.assertEqual(sorted(context['status_breakdown']), expected['status_breakdown'])
+        self.assertEqual(context['order_summary'], expected['order_summary'])
+        self.assertEqual(context['daily_metrics'], expected['daily_metrics'])
+        self.assertEqual([row['id'] for row in context['recent_orders']],
+                         [order.order_id for order in sorted(orders, key=lambda o: o.placed_at, reverse=True)][:10])
+        return context
+
+    def test_matches_python_breakdowns(self):
+        context = self._compare({'period': '30d'})
+        self.assertEqual(context['order_summary']['count'], 10)
+
+    def test_matches_with_category_and_store_filters(self):
+        context = self._compare({'period': '90d', 'category': str(self.rings.category_id)})
+        self.assertTrue(any(store['revenue'] == 0 and store['orders'] for store in context['store_stats']))
+        store_id = Store.objects.get(name='Бутик 1').store_id
+        self._compare({'period': '90d', 'store': str(store_id)})
@@ -0,0 +1,57 @@
+import csv
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+from django.contrib.auth import get_user_model
+from django.http import StreamingHttpResponse
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from apps.accounts.models import Role, UserRole
+from apps.catalog.models import Category, Product
+from apps.orders.models import Order, OrderItem
+from apps.product_variants.models import Colors, ProductVariant, Sizes
+from apps.stores.models import Store
+
+User = get_user_model()
+
+
+class ManagerExportTests(TestCase):
+    def setUp(self):
+        manager = User.objects.create_user(username='manager', password='secret')
+        UserRole.objects.create(user=manager, role=Role.objects.create(role_name='менеджер'))
+        store = Store.objects.create(name='Бутик')
+        variant = ProductVariant.objects.create(
+            product=Product.objects.create(name='Кольцо', category=Category.objects.create(name='Кольца')),
+            color=Colors.objects.create(name_color='Золото'), size=Sizes.objects.create(size='17'),
+            store=store, price=Decimal('1500.00'), quantity=100,
+        )
+        for idx in range(25):
+            order = Order.objects.create(user=manager, store=store, total_amount=0, placed_at=timezone.now())
+            OrderItem.objects.create(order=order, product_variant=variant, quantity=1 + idx % 3, price=variant.price)
+        self.client.login(username='manager', password='secret')
+
+    def test_csv_is_streamed(self):
+        response = self.client.get(reverse('reports:manager_export'), {'period': '7d', 'format': 'csv'})
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+        self.assertEqual(rows[0], ['Order ID', 'Дата', 'Магазин', 'Товар', 'Количество', 'Выручка'])
+        self.assertEqual(len(rows), 26)
+        self.assertEqual(rows[1][2:], ['Бутик', 'Кольцо', '1', '1500.00'])
+
+    def test_xlsx_is_written_in_write_only_mode(self):
+        response = self.client.get(reverse('reports:manager_export'), {'period': '7d', 'format': 'xlsx'})
+        self.assertTrue(response['Content-Disposition'].endswith('.xlsx"'))
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True).active
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(len(rows), 26)
+        self.assertEqual(rows[2][2:], ('Бутик', 'Кольцо', 2, '3000.00'))
+
+    def test_dashboard_and_stats_render(self):
+        for name in ('reports:manager_dashboard', 'reports:manager_stats'):
+            response = self.client.get(reverse(name), {'period': '30d'})
+            self.assertEqual(response.status_code, 200, name)
+            self.assertEqual(response.context['order_summary']['count'], 25)
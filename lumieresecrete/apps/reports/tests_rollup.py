@@ -0,0 +1,118 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.catalog.importer import import_catalog
+from apps.catalog.models import Category, Product
+from apps.orders.models import Order, OrderItem
+from apps.product_variants.models import Colors, ProductVariant, Sizes
+from apps.reports import aggregates
+from apps.reports.models import DailySalesRollup
+from apps.reports.rollup import local_day
+from apps.stores.models import Store
+
+User = get_user_model()
+
+
+class DailySalesRollupTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Кольца')
+        color = Colors.objects.create(name_color='Золото')
+        size = Sizes.objects.create(size='17')
+        self.store = Store.objects.create(name='Бутик')
+        self.user = User.objects.create_user(username='buyer', password='secret')
+        self.variants = [
+            ProductVariant.objects.create(
+                product=Product.objects.create(name=f'Кольцо {idx}', category=category),
+                color=color, size=size, store=self.store, price=Decimal('1000.00') * (idx + 1), quantity=10,
+            )
+            for idx in range(2)
+        ]
+
+    def _order(self, placed_at, lines, discount=Decimal('0')):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(
+                user=self.user, store=self.store, total_amount=0, discount_amount=discount, placed_at=placed_at,
+            )
+            for variant, quantity in lines:
+                OrderItem.objects.create(order=order, product_variant=variant, quantity=quantity, price=variant.price)
+        return order
+
+    def _rows(self):
+        return sorted(
+            DailySalesRollup.objects.values_list('day', 'product_id', 'quantity', 'revenue', 'order_count', 'discount')
+        )
+
+    def test_order_changes_refresh_affected_days(self):
+        now = timezone.now()
+        first = self._order(now, [(self.variants[0], 1), (self.variants[1], 1)], discount=Decimal('300.00'))
+        self._order(now, [(self.variants[0], 2)])
+        today = local_day(now)
+        self.assertEqual(self._rows(), [
+            (today, self.variants[0].product_id, 3, Decimal('3000.00'), 2, Decimal('100.00')),
+            (today, self.variants[1].product_id, 1, Decimal('2000.00'), 1, Decimal('200.00')),
+        ])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.placed_at = now - timedelta(days=3)
+            first.save()
+        self.assertEqual(
+            set(DailySalesRollup.objects.values_list('day', flat=True)),
+            {today, local_day(first.placed_at)},
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self._rows(), [(today, self.variants[0].product_id, 2, Decimal('2000.00'), 1, Decimal('0.00'))])
+
+    def _categories(self):
+        return sorted(DailySalesRollup.objects.values_list('product_id', 'category__name'))
+
+    def test_category_change_refreshes_rollup(self):
+        now = timezone.now()
+        self._order(now - timedelta(days=2), [(self.variants[0], 1)])
+        self._order(now, [(self.variants[0], 1), (self.variants[1], 1)])
+        first, second = (variant.product for variant in self.variants)
+
+        first.category = Category.objects.create(name='Серьги')
+        with self.captureOnCommitCallbacks(execute=True):
+            first.save()
+        self.assertEqual(self._categories(), [
+            (first.pk, 'Серьги'), (first.pk, 'Серьги'), (second.pk, 'Кольца'),
+        ])
+
+        Product.objects.filter(pk=second.pk).update(external_code='R-2')
+        feed = (
+            "product_code,product_name,category,sku,color,size,store,price\n"
+            f"R-2,{second.name},Браслеты,R-2-NEW,Золото,17,Бутик,1500\n"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            import_catalog(StringIO(feed))
+        self.assertEqual(self._categories(), [
+            (first.pk, 'Серьги'), (first.pk, 'Серьги'), (second.pk, 'Браслеты'),
+        ])
+
+    def test_rebuild_command_matches_incremental_rows(self):
+        now = timezone.now()
+        for days_ago in (0, 1, 5, 12):
+            self._order(now - timedelta(days=days_ago), [(self.variants[days_ago % 2], 1 + days_ago % 3)])
+        incremental = self._rows()
+        DailySalesRollup.objects.all().delete()
+        call_command('rebuild_sales_rollup', stdout=StringIO())
+        self.assertEqual(self._rows(), incremental)
+
+    def test_dashboard_rows_from_rollup_match_live_rows(self):
+        now = timezone.now()
+        for days_ago in range(0, 40, 3):
+            self._order(now - timedelta(days=days_ago, hours=days_ago), [(self.variants[days_ago % 2], 1)])
+        start, end = now - timedelta(days=30), now
+        edges, full_days = aggregates.split_period(start, end)
+        self.assertIsNotNone(full_days)
+        from_rollup = aggregates.product_stats(aggregates.sales_rows(start, end))
+        live = aggregates.product_stats(aggregates.sales_rows(start, end, use_rollup=False))
+        self.assertEqual(from_rollup, live)
+        self.assertEqual(aggregates.split_period(now - timedelta(hours=20), now), ([(now - timedelta(hours=20), now)], None))
@@ -1,29 +1,29 @@
-import csv
-from collections import defaultdict, Counter
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-from io import BytesIO
 
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse, HttpResponseForbidden
+from django.http import JsonResponse, HttpResponseForbidden
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.http import url_has_allowed_host_and_scheme
 from django.views.decorators.http import require_http_methods
 from django.db import connections
-from django.db.models import Sum
-from openpyxl import Workbook
+from django.db.models import F, Sum
 
-from apps.orders.models import Order, OrderItem, OrderShareToken, Status
+from apps.orders.models import Order, OrderShareToken, Status
 from apps.catalog.models import Product, Category, ProductReview
 from apps.stores.models import Store
 from apps.product_variants.models import ProductVariant
-from apps.accounts.models import UserRole
-from apps.orders.views import _parse_order_datetime, _render_receipt_pdf
+from apps.accounts.user_cache import user_is_manager
+from apps.orders.views import _receipt_response
 from apps.orders.services import OrderService
+from apps.jobs.services import enqueue
+
+from . import aggregates, streaming
+from .models import DailySalesRollup
 
 PERIOD_CHOICES = {
     '7d': ('Последние 7 дней', 7),
@@ -40,14 +40,24 @@ def sales_report(request):
 
     if not start_date or not end_date:
         return JsonResponse({'error': 'Please provide start_date and end_date.'}, status=400)
-
-    sales_data = Order.objects.values('store__name').annotate(total_sales=Sum('total_amount'))
+    try:
+        start_day = date.fromisoformat(start_date)
+        end_day = date.fromisoformat(end_date)
+    except ValueError:
+        return JsonResponse({'error': 'Dates must be in YYYY-MM-DD format.'}, status=400)
+
+    sales_data = (
+        DailySalesRollup.objects.filter(day__gte=start_day, day__lte=end_day)
+        .values('store__name')
+        .annotate(total_sales=Sum(F('revenue') - F('discount')))
+        .order_by('store__name')
+    )
 
     return JsonResponse(list(sales_data), safe=False)
 
 def product_report(request):
     """Generate a report of products sold."""
-    product_data = Product.objects.annotate(total_sold=Sum('variants__orderitem__quantity')).filter(total_sold__gt=0)
+    product_data = Product.objects.annotate(total_sold=Sum('sales_rollups__quantity')).filter(total_sold__gt=0)
 
     return render(request, 'reports/product_report.html', {'products': product_data})
 
@@ -59,7 +69,7 @@ def store_report(request):
 
 
 def _user_is_manager(user):
-    return UserRole.objects.filter(user=user, role__role_name__iexact='менеджер').exists()
+    return user_is_manager(user)
 
 
 def _to_float(value):
@@ -82,119 +92,35 @@ def _parse_input_date(value):
     return None
 
 
-def _resolve_period(request):
+def _resolve_period(params):
     now = timezone.now()
-    period_key = request.GET.get('period', '30d')
+    period_key = params.get('period', '30d')
     if period_key in PERIOD_CHOICES and PERIOD_CHOICES[period_key][1]:
         days = PERIOD_CHOICES[period_key][1]
         start = now - timedelta(days=days)
         end = now
     else:
-        start = _parse_input_date(request.GET.get('start')) or (now - timedelta(days=30))
-        end = _parse_input_date(request.GET.get('end')) or now
+        start = _parse_input_date(params.get('start')) or (now - timedelta(days=30))
+        end = _parse_input_date(params.get('end')) or now
         period_key = 'custom'
     if start > end:
         start, end = end, start
     return start, end, period_key
 
 
-def _filtered_orders(start, end, store_id=None):
-    qs = Order.objects.select_related('status', 'store')
-    if store_id:
-        qs = qs.filter(store__store_id=store_id)
-    tz = timezone.get_current_timezone()
-    filtered = []
-    for order in qs:
-        parsed = _parse_order_datetime(order.created_at)
-        if not parsed:
-            continue
-        if timezone.is_naive(parsed):
-            parsed = timezone.make_aware(parsed, tz)
-        if start and parsed < start:
-            continue
-        if end and parsed > end:
-            continue
-        filtered.append((order, parsed))
-    return filtered
-
-
 def _gather_dashboard_data(request):
-    start, end, period_key = _resolve_period(request)
+    start, end, period_key = _resolve_period(request.GET)
     category_filter = request.GET.get('category') or ''
     store_filter = request.GET.get('store') or ''
 
-    orders = _filtered_orders(start, end, store_filter or None)
-    order_ids = [order.order_id for order, _ in orders]
-    items_qs = OrderItem.objects.filter(order__order_id__in=order_ids).select_related(
-        'order__store',
-        'product_variant__product__category',
-        'product_variant__size',
-    )
-    if category_filter:
-        items_qs = items_qs.filter(product_variant__product__category__category_id=category_filter)
-    items = list(items_qs)
-
-    product_stats = defaultdict(lambda: {'name': '', 'quantity': 0, 'revenue': Decimal('0')})
-    category_stats = defaultdict(lambda: {'name': '', 'quantity': 0, 'revenue': Decimal('0')})
-    size_stats = defaultdict(int)
-    store_stats = defaultdict(lambda: {'name': '', 'orders': 0, 'revenue': Decimal('0')})
-    total_revenue = Decimal('0')
-    daily_metrics = defaultdict(lambda: {'count': 0, 'revenue': Decimal('0')})
-
-    for item in items:
-        qty = item.quantity or 0
-        price = item.price or Decimal('0')
-        line_total = price * qty
-        total_revenue += line_total
-        variant = item.product_variant
-        product = getattr(variant, 'product', None)
-        category = getattr(product, 'category', None)
-        size_label = getattr(variant.size, 'size', 'Без размера')
-        product_name = getattr(product, 'name', 'Товар')
-        product_id = getattr(product, 'product_id', None)
-        if product_id is not None:
-            product_entry = product_stats[product_id]
-            product_entry['name'] = product_name
-            product_entry['quantity'] += qty
-            product_entry['revenue'] += line_total
-        if category:
-            cat_entry = category_stats[category.category_id]
-            cat_entry['name'] = category.name
-            cat_entry['quantity'] += qty
-            cat_entry['revenue'] += line_total
-        size_stats[size_label] += qty
-        store = item.order.store
-        if store:
-            store_entry = store_stats[store.store_id]
-            store_entry['name'] = store.name
-            store_entry['revenue'] += line_total
-
-    store_counts = Counter(order.store.store_id if order.store else 'unknown' for order, _ in orders)
-    for store_id, count in store_counts.items():
-        if store_id in store_stats:
-            store_stats[store_id]['orders'] = count
-        elif store_id != 'unknown':
-            store_obj = next((order.store for order, _ in orders if order.store and order.store.store_id == store_id), None)
-            if store_obj:
-                store_stats[store_id] = {
-                    'name': store_obj.name,
-                    'orders': count,
-                    'revenue': Decimal('0'),
-                }
-
-    status_breakdown = Counter(getattr(order.status, 'name_status', 'Без статуса') for order, _ in orders)
+    orders = aggregates.period_orders(start, end, store_filter or None)
+    sales = aggregates.sales_rows(start, end, store_filter or None, category_filter or None)
+
     inventory = ProductVariant.objects.select_related('product', 'size', 'store').order_by('quantity')[:10]
     User = get_user_model()
     new_users = User.objects.filter(date_joined__gte=start).count()
     active_users = User.objects.filter(last_login__gte=start).count()
     pending_reviews = ProductReview.objects.filter(is_public=False).select_related('product', 'user').order_by('-created_at')[:20]
-    recent_orders = sorted(orders, key=lambda item: item[1], reverse=True)[:10]
-    for order, parsed in orders:
-        day = parsed.date()
-        entry = daily_metrics[day]
-        entry['count'] += 1
-        total_amount = getattr(order, 'total_amount', None) or Decimal('0')
-        entry['revenue'] += total_amount
 
     filters_state = {
         'start': start.date().isoformat(),
@@ -215,51 +141,32 @@ def _gather_dashboard_data(request):
         'period_choices': PERIOD_CHOICES,
         'category_options': Category.objects.order_by('name'),
         'store_options': Store.objects.order_by('name'),
-        'product_stats': sorted(product_stats.values(), key=lambda x: x['revenue'], reverse=True),
-        'category_stats': sorted(category_stats.values(), key=lambda x: x['revenue'], reverse=True),
-        'size_stats': sorted(size_stats.items(), key=lambda x: x[1], reverse=True),
-        'store_stats': sorted(store_stats.values(), key=lambda x: x['revenue'], reverse=True),
-        'order_summary': {
-            'count': len(orders),
-            'revenue': total_revenue,
-        },
-        'status_breakdown': list(status_breakdown.items()),
+        'product_stats': aggregates.product_stats(sales),
+        'category_stats': aggregates.category_stats(sales),
+        'size_stats': aggregates.size_stats(sales),
+        'store_stats': aggregates.store_stats(orders, sales),
+        'order_summary': aggregates.order_summary(orders, sales),
+        'status_breakdown': aggregates.status_breakdown(orders),
         'inventory': inventory,
         'user_activity': {
             'new': new_users,
             'active': active_users,
         },
         'pending_reviews': pending_reviews,
-        'recent_orders': [
-            {
-                'id': order.order_id,
-                'status': getattr(order.status, 'name_status', '—'),
-                'store': getattr(order.store, 'name', '—'),
-                'total': order.total_amount,
-                'created': parsed,
-            } for order, parsed in recent_orders
-        ],
-        'daily_metrics': [
-            {
-                'date': day.isoformat(),
-                'label': day.strftime('%d.%m'),
-                'count': data['count'],
-                'revenue': data['revenue'],
-            }
-            for day, data in sorted(daily_metrics.items())
-        ],
+        'recent_orders': aggregates.recent_orders(orders),
+        'daily_metrics': aggregates.daily_metrics(orders),
         'export_query': query_string,
         'start': start,
         'end': end,
     }
-    return context, items
+    return context
 
 
 @login_required
 def manager_dashboard(request):
     if not _user_is_manager(request.user):
         return HttpResponseForbidden("Недостаточно прав.")
-    context, _ = _gather_dashboard_data(request)
+    context = _gather_dashboard_data(request)
     custom_views = _fetch_analytics_views()
     context["view_snapshots"] = custom_views
     return render(request, 'reports/manager_dashboard.html', context)
@@ -269,7 +176,7 @@ def manager_dashboard(request):
 def manager_stats(request):
     if not _user_is_manager(request.user):
         return HttpResponseForbidden("Недостаточно прав.")
-    context, _ = _gather_dashboard_data(request)
+    context = _gather_dashboard_data(request)
     context['chart_payload'] = {
         'status': [
             {'label': label or 'Нет статуса', 'value': count}
@@ -332,55 +239,46 @@ def _fetch_analytics_views():
     return data
 
 
+def _manager_export_rows(params):
+    """Имя файла, заголовки и генератор строк выгрузки менеджера по параметрам панели."""
+    start, end, _ = _resolve_period(params)
+    orders = aggregates.period_orders(start, end, params.get('store') or None)
+    items = aggregates.period_items(orders, params.get('category') or None)
+    filename_base = f"manager-report-{start.date().isoformat()}-to-{end.date().isoformat()}"
+
+    headers = ['Order ID', 'Дата', 'Магазин', 'Товар', 'Количество', 'Выручка']
+    rows = (
+        [
+            order_id,
+            timezone.localtime(placed_at).strftime("%Y-%m-%d %H:%M") if placed_at else '',
+            store_name or '—',
+            product_name or 'Товар',
+            qty or 0,
+            f"{((price or Decimal('0')) * (qty or 0)):.2f}",
+        ]
+        for order_id, placed_at, store_name, product_name, qty, price in items.order_by('order_id', 'order_item_id')
+        .values_list(
+            'order_id', 'order__placed_at', 'order__store__name', 'product_variant__product__name', 'quantity', 'price'
+        )
+        .iterator(chunk_size=streaming.EXPORT_CHUNK_SIZE)
+    )
+    return filename_base, headers, rows
+
+
 @login_required
 def manager_export(request):
     if not _user_is_manager(request.user):
         return HttpResponseForbidden("Недостаточно прав.")
-    context, items = _gather_dashboard_data(request)
-    export_format = request.GET.get('format', context['filters'].get('export_format', 'csv')).lower()
-    filename_base = f"manager-report-{context['filters']['start']}-to-{context['filters']['end']}"
-
-    headers = ['Order ID', 'Дата', 'Магазин', 'Товар', 'Количество', 'Выручка']
-    rows = []
-    for item in items:
-        order = item.order
-        product = getattr(item.product_variant, 'product', None)
-        product_name = getattr(product, 'name', 'Товар')
-        store_name = getattr(order.store, 'name', '—')
-        qty = item.quantity or 0
-        price = item.price or Decimal('0')
-        rows.append([
-            order.order_id,
-            order.created_at,
-            store_name,
-            product_name,
-            qty,
-            f"{(price * qty):.2f}",
-        ])
+    export_format = request.GET.get('format', 'csv').lower()
+    if request.GET.get('background') == '1':
+        params = {key: value for key, value in request.GET.items() if key != 'background'}
+        job = enqueue('reports.manager_export', {"params": params}, user=request.user)
+        return redirect('jobs:job_status', job_id=job.job_id)
 
+    filename_base, headers, rows = _manager_export_rows(request.GET)
     if export_format == 'xlsx':
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Отчёт"
-        ws.append(headers)
-        for row in rows:
-            ws.append(row)
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        response = HttpResponse(
-            buffer.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{filename_base}.xlsx"'
-        return response
-
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{filename_base}.csv"'
-    writer = csv.writer(response)
-    writer.writerow(headers)
-    writer.writerows(rows)
-    return response
+        return streaming.xlsx_response(f"{filename_base}.xlsx", headers, rows)
+    return streaming.csv_response(f"{filename_base}.csv", headers, rows)
 
 
 @login_required
@@ -459,17 +357,13 @@ def manager_orders(request):
         qs = qs.filter(user__username__icontains=client) | qs.filter(user__email__icontains=client)
     if status_id:
         qs = qs.filter(status__status_id=status_id)
-    # дата создаётся в varchar, поэтому фильтруем в python
     start = _parse_input_date(date_from)
     end = _parse_input_date(date_to)
-    orders = []
-    for o in qs[:300]:
-        dt = _parse_order_datetime(o.created_at)
-        if start and dt and dt < start:
-            continue
-        if end and dt and dt > end:
-            continue
-        orders.append(o)
+    if start:
+        qs = qs.filter(placed_at__gte=start)
+    if end:
+        qs = qs.filter(placed_at__lte=end)
+    orders = list(qs[:300])
     statuses = Status.objects.all().order_by('name_status')
     return render(request, 'reports/manager_orders.html', {
         'orders': orders,
@@ -520,16 +414,37 @@ def manager_order_status(request, order_id: int):
     return redirect(next_url)
 
 
+@login_required
+def manager_day_receipts(request):
+    """Ставит в очередь архив чеков за день (по умолчанию — вчера)."""
+    if not _user_is_manager(request.user):
+        return HttpResponseForbidden("Недостаточно прав.")
+    try:
+        day = date.fromisoformat(request.GET.get('day') or '')
+    except ValueError:
+        day = timezone.localdate() - timedelta(days=1)
+    job = enqueue(
+        'orders.day_receipts',
+        {"day": day.isoformat(), "base_url": request.build_absolute_uri('/')},
+        user=request.user,
+    )
+    return redirect('jobs:job_status', job_id=job.job_id)
+
+
 @login_required
 def manager_order_receipt(request, order_id: int):
     if not _user_is_manager(request.user):
         return HttpResponseForbidden("Недостаточно прав.")
     order = get_object_or_404(Order, order_id=order_id)
+    if request.GET.get('background') == '1':
+        job = enqueue(
+            'orders.receipt_pdf',
+            {"order_id": order.order_id, "base_url": request.build_absolute_uri('/')},
+            user=request.user,
+        )
+        return redirect('jobs:job_status', job_id=job.job_id)
     try:
-        pdf = _render_receipt_pdf(order, request, public=False)
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = f"attachment; filename=receipt_{order_id}.pdf"
-        return response
+        return _receipt_response(request, order, public=False)
     except Exception as exc:
         messages.error(request, f"PDF недоступен: {exc}")
         return redirect('reports:manager_order_detail', order_id=order_id)
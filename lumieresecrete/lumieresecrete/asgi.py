@@ -13,3 +13,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', os.getenv('DJANGO_SETTINGS_MODULE', 'lumieresecrete.settings.base'))
 
 application = get_asgi_application()
+
+# Процессы рендеринга чеков стартуют вместе с приложением, а не на первом запросе
+from apps.orders.receipt_pool import start_receipt_pool  # noqa: E402
+
+start_receipt_pool()
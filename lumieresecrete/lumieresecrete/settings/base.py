@@ -54,9 +54,12 @@ INSTALLED_APPS = [
     'apps.api',
     'apps.admin_tools',
     'apps.auditlog',
+    'apps.jobs',
+    'apps.common',
 ]
 
 MIDDLEWARE = [
+    'apps.common.querybudget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -82,6 +85,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'apps.accounts.context_processors.user_preferences',
+                'apps.cart.context_processors.cart_badge',
             ],
         },
     },
@@ -169,3 +173,78 @@ EMAIL_HOST_USER = env('DJANGO_EMAIL_HOST_USER', default='sinitsyna-liza@inbox.ru
 EMAIL_HOST_PASSWORD = env('DJANGO_EMAIL_HOST_PASSWORD', default='VN68cP1NQK1MprnBAUid')
 DEFAULT_FROM_EMAIL = env('DJANGO_DEFAULT_FROM_EMAIL', default='Lumiere Secrète <sinitsyna-liza@inbox.ru>')
 EMAIL_TIMEOUT = env.int('DJANGO_EMAIL_TIMEOUT', default=10)
+
+# Журнал аудита: события пишутся пачками в конце запроса; при AUDITLOG_ASYNC — фоновым потоком
+AUDITLOG_ASYNC = env.bool('DJANGO_AUDITLOG_ASYNC', default=False)
+AUDITLOG_QUEUE_SIZE = env.int('DJANGO_AUDITLOG_QUEUE_SIZE', default=5000)
+AUDITLOG_BATCH_SIZE = env.int('DJANGO_AUDITLOG_BATCH_SIZE', default=500)
+AUDITLOG_OVERFLOW = env('DJANGO_AUDITLOG_OVERFLOW', default='drop')  # drop | block
+AUDITLOG_BLOCK_TIMEOUT = env.float('DJANGO_AUDITLOG_BLOCK_TIMEOUT', default=0.5)
+# diff — снимок полей при загрузке и запись только изменённых; full — перечитывание строки перед save
+AUDITLOG_CAPTURE_MODE = env('DJANGO_AUDITLOG_CAPTURE_MODE', default='diff')
+
+# Фоновые задачи (apps.jobs): выполняются процессами `manage.py run_workers`, очередь — таблица Jobs
+JOBS_RESULT_DIR = Path(env('DJANGO_JOBS_RESULT_DIR', default=str(BASE_DIR.parent / 'job_results')))
+JOBS_POLL_INTERVAL = env.float('DJANGO_JOBS_POLL_INTERVAL', default=2.0)
+# Воркер обновляет пульс задачи раз в JOBS_HEARTBEAT_INTERVAL секунд; без пульса JOBS_STALE_AFTER секунд задача возвращается в очередь
+JOBS_HEARTBEAT_INTERVAL = env.int('DJANGO_JOBS_HEARTBEAT_INTERVAL', default=60)
+JOBS_STALE_AFTER = env.int('DJANGO_JOBS_STALE_AFTER', default=300)
+JOBS_MAX_ATTEMPTS = env.int('DJANGO_JOBS_MAX_ATTEMPTS', default=3)
+
+# Кэш PDF-чеков: файл на ревизию заказа (позиции, статус, скидка), версии для владельца и публичной ссылки раздельно
+RECEIPT_CACHE_DIR = Path(env('DJANGO_RECEIPT_CACHE_DIR', default=str(BASE_DIR.parent / 'receipt_cache')))
+# Пул процессов WeasyPrint для чеков (0 — рендерить в процессе веб-воркера); пачка — число чеков на одну передачу в процесс
+RECEIPT_POOL_WORKERS = env.int('DJANGO_RECEIPT_POOL_WORKERS', default=0)
+RECEIPT_POOL_TIMEOUT = env.int('DJANGO_RECEIPT_POOL_TIMEOUT', default=60)
+RECEIPT_BATCH_SIZE = env.int('DJANGO_RECEIPT_BATCH_SIZE', default=50)
+
+# Бюджет SQL-запросов по имени URL: число — лимит запросов, словарь — queries/duplicates/db_ms.
+# Превышение пишется в лог, при QUERY_BUDGET_STRICT (тесты) — исключение; в DEBUG добавляется Server-Timing
+QUERY_BUDGET_ENABLED = env.bool('DJANGO_QUERY_BUDGET_ENABLED', default=DEBUG)
+QUERY_BUDGET_STRICT = env.bool('DJANGO_QUERY_BUDGET_STRICT', default=False)
+QUERY_BUDGET_DEFAULT = None
+# Лимиты — максимум по тестовому набору (apps/common/tests_querybudget.py) и по данным бенчмарка
+# (apps/common/benchmark.generate_dataset по умолчанию: 200 товаров, 1000 заказов, холодный кеш). Повторы в product_detail,
+# favorites_add_all_to_cart и order_history — известные N+1: бюджет не даёт им расти, пока их не исправят
+QUERY_BUDGETS = {
+    'catalog_list': {'queries': 17, 'duplicates': 2},
+    'product_detail': {'queries': 24, 'duplicates': 3},
+    'view_cart': {'queries': 6, 'duplicates': 1},
+    'cart_undo': {'queries': 12, 'duplicates': 2},
+    'favorites_add_all_to_cart': {'queries': 30, 'duplicates': 4},
+    'checkout': {'queries': 22, 'duplicates': 1},
+    'orders:order_history': {'queries': 37, 'duplicates': 13},
+    'reports:manager_dashboard': {'queries': 21, 'duplicates': 1},
+}
+
+# Копии фото вариантов (thumb/card/hover/zoom, WebP и JPEG): строятся фоновой задачей после загрузки
+# и командой `manage.py build_image_renditions` для уже загруженных фото
+IMAGE_RENDITIONS_ON_UPLOAD = env.bool('DJANGO_IMAGE_RENDITIONS_ON_UPLOAD', default=True)
+IMAGE_RENDITION_QUALITY = env.int('DJANGO_IMAGE_RENDITION_QUALITY', default=82)
+
+# Резервные копии (apps/admin_tools/backup.py): таблицы пишутся кусками по BACKUP_CHUNK_SIZE строк в сжатый JSONL,
+# инкремент — только изменившиеся куски. 'auto' делает полные копии через pg_dump, если он есть (восстанавливаются
+# только данные поверх текущей схемы); по умолчанию — всегда JSONL, пока путь pg_dump не проверен на рабочей базе
+BACKUP_DIR = Path(env('DJANGO_BACKUP_DIR', default=str(BASE_DIR.parent / 'backups')))
+BACKUP_CHUNK_SIZE = env.int('DJANGO_BACKUP_CHUNK_SIZE', default=2000)
+BACKUP_ENGINE = env('DJANGO_BACKUP_ENGINE', default='jsonl')
+BACKUP_EXCLUDE_MODELS = ('accounts.backups', 'jobs.job', 'sessions.session')
+
+# Общий кэш процессов (apps/common/cache.py): Redis при DJANGO_REDIS_URL, иначе файл SQLite, общий для воркеров
+# на одной машине. Перед ним — LRU процесса: CACHE_LOCAL_TIMEOUT секунд — и срок жизни ключа, и предел
+# устаревания после сброса в соседнем процессе; CACHE_LOCK_TIMEOUT — сколько ждать чужого пересчёта в get_or_set
+REDIS_URL = env('DJANGO_REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'apps.common.cache.SQLiteCache',
+            'LOCATION': env('DJANGO_CACHE_LOCATION', default=str(BASE_DIR.parent / 'cache' / 'shared.sqlite3')),
+            'OPTIONS': {'MAX_ENTRIES': env.int('DJANGO_CACHE_MAX_ENTRIES', default=50000)},
+        }
+    }
+CACHES['default']['KEY_PREFIX'] = env('DJANGO_CACHE_KEY_PREFIX', default='lumiere')
+CACHE_LOCAL_TIMEOUT = env.int('DJANGO_CACHE_LOCAL_TIMEOUT', default=5)
+CACHE_LOCAL_MAX_ENTRIES = env.int('DJANGO_CACHE_LOCAL_MAX_ENTRIES', default=1000)
+CACHE_LOCK_TIMEOUT = env.int('DJANGO_CACHE_LOCK_TIMEOUT', default=10)
@@ -13,4 +13,5 @@ urlpatterns = [
     path('stores/', include('apps.stores.urls')),
     path('reports/', include('apps.reports.urls')),
     path('admin-tools/', include(('apps.admin_tools.urls', 'admin_tools'), namespace='admin_tools')),
+    path('jobs/', include(('apps.jobs.urls', 'jobs'), namespace='jobs')),
 ]
@@ -4,3 +4,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', os.getenv('DJANGO_SETTINGS_MODULE', 'lumieresecrete.settings.base'))
 
 application = get_wsgi_application()
+
+# Процессы рендеринга чеков стартуют вместе с приложением, а не на первом запросе
+from apps.orders.receipt_pool import start_receipt_pool  # noqa: E402
+
+start_receipt_pool()
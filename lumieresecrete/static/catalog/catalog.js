@@ -46,6 +46,7 @@ const catalog = {
     this.form.addEventListener('change', debounce(()=>this.submitFilters(),200));
     const searchInput = this.form.querySelector('[data-search-input]');
     searchInput?.addEventListener('input', debounce(()=>this.submitFilters(),400));
+    searchInput?.addEventListener('input', debounce(()=>this.loadSuggestions(searchInput),200));
     this.form.querySelectorAll('[data-slider-min],[data-slider-max]').forEach(slider=>{
       slider.addEventListener('input', ()=>{
         const min = this.form.querySelector('[data-slider-min]').value;
@@ -122,6 +123,23 @@ const catalog = {
       this.attachQuick();
     } catch(err){ console.error('filter error', err); }
   },
+  async loadSuggestions(input){
+    const list = this.form.querySelector('[data-search-suggestions]');
+    const url = input.dataset.suggestUrl;
+    if(!list || !url) return;
+    const term = input.value.trim();
+    if(term.length < 2){ list.innerHTML = ''; return; }
+    try {
+      const response = await fetch(`${url}?q=${encodeURIComponent(term)}`, {headers:{'X-Requested-With':'XMLHttpRequest'}});
+      const data = await response.json();
+      list.innerHTML = '';
+      (data.suggestions || []).forEach(item=>{
+        const option = document.createElement('option');
+        option.value = item.name;
+        list.appendChild(option);
+      });
+    } catch(err){ console.error('suggest error', err); }
+  },
   bindPagination(){
     qsa('[data-page-link]', this.pagination).forEach(link=>{
       link.addEventListener('click',(e)=>{
@@ -41,6 +41,7 @@
   const sizeLabel = detail.querySelector('[data-size-label]');
   const storeLabel = detail.querySelector('[data-store-label]');
   const mainImage = detail.querySelector('[data-gallery-main]');
+  const mainSource = detail.querySelector('[data-gallery-main-source]');
   const thumbsContainer = detail.querySelector('[data-gallery-thumbs]');
   const thumbsWrapper = detail.querySelector('[data-thumb-track]') || thumbsContainer;
   const thumbPrev = detail.querySelector('[data-thumb-prev]');
@@ -179,10 +180,15 @@
 
   const setMainImage = (image) => {
     if (!mainImage || !image) return;
-    const url = typeof image === 'string' ? image : image.url;
+    const url = typeof image === 'string' ? image : image.hover || image.url;
+    const srcset = typeof image === 'string' ? '' : image.srcset_jpeg || '';
     if (url) {
+      mainImage.srcset = srcset;
       mainImage.src = url;
     }
+    if (mainSource) {
+      mainSource.srcset = typeof image === 'string' ? '' : image.srcset || '';
+    }
     if (typeof image === 'object' && image.alt) {
       mainImage.alt = image.alt;
     }
@@ -201,7 +207,7 @@
       button.className = `gallery-thumb${index === 0 ? ' is-active' : ''}`;
       button.dataset.galleryThumb = '1';
       button.dataset.src = image.url;
-      button.innerHTML = `<img src=\"${image.url}\" alt=\"${image.alt || ''}\">`;
+      button.innerHTML = `<img src=\"${image.thumb || image.url}\" alt=\"${image.alt || ''}\">`;
       button.addEventListener('click', () => {
         thumbsWrapper.querySelectorAll('.gallery-thumb').forEach((thumb) => thumb.classList.remove('is-active'));
         button.classList.add('is-active');